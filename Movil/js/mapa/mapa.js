@@ -617,11 +617,17 @@ async function initializeMap() {
 }
 
 function updateActiveUnits() {
-    routes.forEach(route => {
-        const units = Math.floor(Math.random() * 5) + 1;
+    routes.forEach(async route => {
         const element = document.getElementById(`route-units-${route.id}`);
-        if (element) {
-            element.textContent = `${units} ${units === 1 ? 'unidad' : 'unidades'}`;
+        if (!element) return;
+        try {
+            // Unidades con posición reciente (GET /rutas/{id}/unidades)
+            const response = await fetch(`http://127.0.0.1:8000/rutas/${route.id}/unidades`);
+            if (!response.ok) return;
+            const { unidades } = await response.json();
+            element.textContent = `${unidades} ${unidades === 1 ? 'unidad' : 'unidades'}`;
+        } catch (error) {
+            console.error('Error cargando unidades de la ruta', route.id, error);
         }
     });
 }
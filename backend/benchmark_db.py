@@ -0,0 +1,111 @@
+"""
+Benchmark de peticiones concurrentes: sesión síncrona vs. sesión asíncrona
+Monta la misma consulta (una página de usuarios) en dos endpoints dentro de
+una app en proceso y mide cuántas peticiones por segundo atiende cada uno con
+N clientes simultáneos:
+
+    /antes    async def + Session síncrona (get_db): cada consulta bloquea el event loop
+    /despues  async def + AsyncSession (get_async_db): el loop atiende otras peticiones mientras espera
+
+Usa la base de datos configurada en .env (requiere init_db.py). Con
+--espera-ms se simula la latencia de red de un servidor MySQL remoto en cada
+petición: time.sleep() en /antes (como pymysql, que bloquea mientras espera el
+socket) y asyncio.sleep() en /despues (como aiomysql, que cede el loop).
+
+Con más clientes que conexiones en el pool (DB_POOL_SIZE + DB_MAX_OVERFLOW,
+15 por defecto) /antes se traba: la petición que espera una conexión bloquea
+el loop y las que tienen una no pueden terminar para devolverla, hasta el
+timeout del pool.
+
+Uso:
+    python benchmark_db.py
+    python benchmark_db.py --peticiones 2000 --concurrencia 10 --espera-ms 5
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import get_async_db, get_db
+from models import Usuario
+
+# Forzar UTF-8 en Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Usuarios por petición (igual que una página de GET /auth/users)
+TAMANO_PAGINA = 50
+
+def crear_app(espera_s: float) -> FastAPI:
+    """App con la misma consulta servida por los dos caminos"""
+    app = FastAPI()
+    consulta = select(Usuario).order_by(Usuario.id).limit(TAMANO_PAGINA)
+
+    @app.get("/antes")
+    async def antes(db: Session = Depends(get_db)):
+        time.sleep(espera_s)
+        return len(db.execute(consulta).scalars().all())
+
+    @app.get("/despues")
+    async def despues(db: AsyncSession = Depends(get_async_db)):
+        await asyncio.sleep(espera_s)
+        return len((await db.execute(consulta)).scalars().all())
+
+    return app
+
+async def medir(app: FastAPI, ruta: str, peticiones: int, concurrencia: int) -> float:
+    """Peticiones por segundo con `concurrencia` clientes simultáneos"""
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark") as cliente:
+        await cliente.get(ruta)  # Calentar el pool de conexiones
+
+        pendientes = iter(range(peticiones))
+
+        async def cliente_simultaneo():
+            for _ in pendientes:
+                respuesta = await cliente.get(ruta)
+                respuesta.raise_for_status()
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente_simultaneo() for _ in range(concurrencia)))
+        return peticiones / (time.perf_counter() - inicio)
+
+async def ejecutar(args) -> int:
+    app = crear_app(args.espera_ms / 1000)
+    resultados = {}
+    for ruta in ("/antes", "/despues"):
+        try:
+            resultados[ruta] = await medir(app, ruta, args.peticiones, args.concurrencia)
+        except Exception as e:
+            print(f"❌ [ERROR] {ruta}: {str(e)}")
+            return 1
+        print(f"[OK] {ruta:<9} {resultados[ruta]:8.1f} peticiones/s")
+
+    print()
+    print(f"✅ Sesión asíncrona: {resultados['/despues'] / resultados['/antes']:.1f}x peticiones/s")
+    return 0
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Comparar sesión síncrona y asíncrona con peticiones concurrentes")
+    parser.add_argument("--peticiones", type=int, default=1000, help="Peticiones por endpoint")
+    parser.add_argument("--concurrencia", type=int, default=10, help="Clientes simultáneos")
+    parser.add_argument("--espera-ms", type=float, default=0,
+                        help="Latencia de red simulada por petición")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("   ViajeroApp - Benchmark sesión síncrona vs. asíncrona")
+    print("=" * 60)
+    print(f"Peticiones: {args.peticiones}  Concurrencia: {args.concurrencia}  Espera: {args.espera_ms} ms")
+    print()
+    return asyncio.run(ejecutar(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Micro-benchmark de la serialización rápida (serializacion.py) por endpoint
+Para cada listado monta la misma lista de filas (salida de to_dict()) en dos
+rutas de una app en proceso:
+
+    /antes    [Esquema.model_validate(fila)] + response_model (camino anterior)
+    /despues  serializador(List[Esquema]).respuesta(filas)
+
+Comprueba que los dos cuerpos son idénticos byte a byte y mide cuántas
+respuestas por segundo genera cada uno.
+
+Por defecto genera las filas en una base SQLite en memoria (--filas por
+endpoint); con --db usa las de la base de datos configurada en .env.
+
+Uso:
+    python benchmark_json.py
+    python benchmark_json.py --filas 2000 --repeticiones 50
+    python benchmark_json.py --db
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import cache
+from consultas import query_buses
+from database import Base
+from models import (
+    Bus, Horario, ParadaBus, Usuario, Notificacion, Favorito, ViajePlaneado,
+    ZonaBus, TipoHorario, EstadoBus, TipoNotificacion
+)
+from schemas import (
+    BusResponse, ParadaBusResponse, ParadaBusCercanaResponse, UsuarioResponse,
+    NotificacionResponse, FavoritoResponse, FavoritoCercanoResponse, ViajeResponse
+)
+from serializacion import serializador
+
+# Forzar UTF-8 en Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+def _con_distancia(filas):
+    return [{**fila, "distancia_km": round(i * 0.137, 3)} for i, fila in enumerate(filas)]
+
+# (endpoint, esquema de la respuesta, filas de to_dict() a partir de la sesión y el límite)
+ENDPOINTS = [
+    ("GET /buses", BusResponse,
+     lambda db, n: [b.to_dict() for b in query_buses(db).limit(n)]),
+    ("GET /paradas-buses", ParadaBusResponse,
+     lambda db, n: [p.to_dict() for p in db.query(ParadaBus).limit(n)]),
+    ("GET /paradas-buses/cercanas", ParadaBusCercanaResponse,
+     lambda db, n: _con_distancia(p.to_dict() for p in db.query(ParadaBus).limit(n))),
+    ("GET /auth/users", UsuarioResponse,
+     lambda db, n: [u.to_dict() for u in db.query(Usuario).limit(n)]),
+    ("GET /notificaciones/usuario/{id}", NotificacionResponse,
+     lambda db, n: [x.to_dict() for x in db.query(Notificacion).limit(n)]),
+    ("GET /favoritos/usuario/{id}", FavoritoResponse,
+     lambda db, n: [f.to_dict() for f in db.query(Favorito).limit(n)]),
+    ("GET /favoritos/usuario/{id}/cercanos", FavoritoCercanoResponse,
+     lambda db, n: _con_distancia(f.to_dict() for f in db.query(Favorito).limit(n))),
+    ("GET /viajes/usuario/{id}", ViajeResponse,
+     lambda db, n: [v.to_dict() for v in db.query(ViajePlaneado).limit(n)]),
+]
+
+def generar_datos(db, filas: int):
+    """Filas de ejemplo con textos no ASCII, coordenadas y valores nulos"""
+    ahora = datetime.now()
+    usuarios = [
+        Usuario(nombre=f"Usuario Peña {i}", email=f"usuario{i}@viajero.ni", password_hash="x",
+                foto_perfil=None if i % 3 else "https://viajero.ni/f.png", ultimo_acceso=ahora - timedelta(hours=i))
+        for i in range(filas)
+    ]
+    db.add_all(usuarios)
+    db.flush()
+    for i in range(filas):
+        bus = Bus(nombre_transporte=f"Transportes Ñandú {i}", zona=ZonaBus.SUR if i % 2 else ZonaBus.NORTE)
+        bus.horarios = [
+            Horario(tipo=TipoHorario.SALIDA if j % 2 else TipoHorario.ENTRADA, destino_procedencia="Estelí",
+                    hora=f"{1 + j}:{(i * 7) % 60:02d} {'am' if j < 6 else 'pm'}", estado=EstadoBus.GREEN)
+            for j in range(8)
+        ]
+        lat, lng = 12.1 + i * 0.00731, -86.25 - i * 0.00417
+        db.add_all([
+            bus,
+            ParadaBus(nombre=f"Parada {i} – Rotonda", lat=lat, lng=lng, zona=ZonaBus.SUR,
+                      descripcion=None if i % 2 else "Frente al parque"),
+            Notificacion(usuario_id=usuarios[0].id, tipo=TipoNotificacion.INFO, titulo="Cambio de horario",
+                         mensaje=f"La salida {i} a León se adelanta 15 min 🚌"),
+            Favorito(usuario_id=usuarios[0].id, lugar_nombre=f"Café {i}", lat=lat, lng=lng,
+                     tags=json.dumps({"tipo": "café", "puntos": i}) if i % 2 else None),
+            ViajePlaneado(usuario_id=usuarios[0].id, origen_nombre="Casa", origen_lat=lat, origen_lng=lng,
+                          destino_nombre="Mercado Oriental", destino_lat=12.13, destino_lng=-86.24,
+                          distancia_km=i * 0.5, tiempo_estimado="45 min", costo_estimado=12 + i,
+                          numero_buses=1 + i % 3, fecha_viaje=ahora if i % 2 else None),
+        ])
+    db.commit()
+
+def crear_app(esquema, filas) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/antes", response_model=List[esquema])
+    async def antes():
+        return [esquema.model_validate(fila) for fila in filas]
+
+    @app.get("/despues", response_model=List[esquema])
+    async def despues():
+        return serializador(List[esquema]).respuesta(filas)
+
+    return app
+
+async def medir(app: FastAPI, repeticiones: int):
+    """Cuerpos de /antes y /despues y respuestas por segundo de cada uno"""
+    transporte = httpx.ASGITransport(app=app)
+    resultado = {}
+    async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark") as cliente:
+        for ruta in ("/antes", "/despues"):
+            cuerpo = (await cliente.get(ruta)).content
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                await cliente.get(ruta)
+            resultado[ruta] = (cuerpo, repeticiones / (time.perf_counter() - inicio))
+    return resultado
+
+async def ejecutar(db, args) -> int:
+    errores = 0
+    for endpoint, esquema, cargar in ENDPOINTS:
+        filas = cargar(db, args.filas)
+        if not filas:
+            print(f"⚠ {endpoint}: sin filas, se omite")
+            continue
+        resultado = await medir(crear_app(esquema, filas), args.repeticiones)
+        (antes, por_segundo_antes), (despues, por_segundo_despues) = resultado["/antes"], resultado["/despues"]
+        if antes != despues:
+            errores += 1
+            print(f"❌ [ERROR] {endpoint}: las respuestas son distintas")
+            continue
+        print(f"[OK] {endpoint:<38} {len(filas):>5} filas {len(antes) / 1024:8.1f} KB  "
+              f"{por_segundo_antes:7.1f} -> {por_segundo_despues:7.1f} resp/s  "
+              f"({por_segundo_despues / por_segundo_antes:.1f}x)")
+
+    print()
+    if errores:
+        print(f"❌ {errores} endpoints con respuestas distintas")
+        return 1
+    print("✅ Respuestas idénticas byte a byte en todos los endpoints")
+    return 0
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Comparar la serialización con response_model y la rápida")
+    parser.add_argument("--filas", type=int, default=500, help="Filas por endpoint")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Respuestas medidas por camino")
+    parser.add_argument("--db", action="store_true", help="Usar la base de datos configurada en .env")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("   ViajeroApp - Benchmark de serialización JSON")
+    print("=" * 60)
+    print(f"Codificador: {'orjson' if cache.orjson is not None else 'json'}  "
+          f"Filas: {args.filas}  Repeticiones: {args.repeticiones}")
+    print()
+
+    if args.db:
+        from database import SessionLocal
+        db = SessionLocal()
+    else:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        generar_datos(db, args.filas)
+    try:
+        return asyncio.run(ejecutar(db, args))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
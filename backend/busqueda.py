@@ -0,0 +1,157 @@
+"""
+Índice de búsqueda de rutas en memoria
+Índice de trigramas sobre nombre y número de cada ruta y los nombres de sus
+paradas. Normaliza tildes y mayúsculas ("jinotéga" == "Jinotega"), ordena los
+resultados por relevancia y devuelve coincidencias livianas (sin geometría).
+
+El índice se construye desde la base de datos en la primera búsqueda y se
+vuelve a construir cuando cambia la versión de las rutas (versiones.py), así
+que también refleja las escrituras atendidas por otros workers.
+"""
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Ruta, Parada
+from versiones import RUTAS, leer_version
+
+# Fracción mínima de trigramas de la búsqueda que debe tener un campo
+SIMILITUD_MINIMA = 0.5
+
+# Peso de cada tipo de campo en el puntaje
+PESOS = {"name": 1.0, "number": 1.0, "parada": 0.8}
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes y con separadores simples ("Jinotéga-Norte" -> "jinotega norte")"""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", sin_tildes.lower()).strip()
+
+
+def trigramas(normalizado: str) -> Set[str]:
+    """Trigramas de cada palabra con relleno (como pg_trgm): "ruta" -> {"  r", " ru", "rut", "uta", "ta "}"""
+    resultado = set()
+    for palabra in normalizado.split():
+        relleno = f"  {palabra} "
+        for i in range(len(relleno) - 2):
+            resultado.add(relleno[i:i + 3])
+    return resultado
+
+
+class _Campo:
+    """Texto indexado de una ruta"""
+    __slots__ = ("tipo", "original", "normalizado", "trigramas")
+
+    def __init__(self, tipo: str, original: str):
+        self.tipo = tipo
+        self.original = original
+        self.normalizado = normalizar(original)
+        self.trigramas = trigramas(self.normalizado)
+
+
+class IndiceBusqueda:
+    """Índice invertido trigrama -> IDs de ruta"""
+
+    def __init__(self):
+        self.version: Optional[int] = None  # Versión de las rutas cargada (None = sin cargar)
+        self._rutas: Dict[int, Tuple[dict, List[_Campo]]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Mantenimiento ----------
+
+    @staticmethod
+    def _agregar(rutas: Dict[int, Tuple[dict, List[_Campo]]], postings: Dict[str, Set[int]],
+                 ruta_id: int, resumen: dict, paradas: List[str]):
+        campos = [_Campo("name", resumen["name"]), _Campo("number", resumen["number"])]
+        campos.extend(_Campo("parada", nombre) for nombre in paradas)
+        rutas[ruta_id] = (resumen, campos)
+        for campo in campos:
+            for trigrama in campo.trigramas:
+                postings.setdefault(trigrama, set()).add(ruta_id)
+
+    def reconstruir(self, db: Session, version: Optional[int] = None):
+        """Cargar todas las rutas con dos consultas livianas (sin geometría)"""
+        paradas: Dict[int, List[str]] = {}
+        for ruta_id, nombre in db.query(Parada.ruta_id, Parada.name).order_by(Parada.ruta_id, Parada.order):
+            paradas.setdefault(ruta_id, []).append(nombre)
+
+        rutas: Dict[int, Tuple[dict, List[_Campo]]] = {}
+        postings: Dict[str, Set[int]] = {}
+        for ruta_id, name, number, visible in db.query(Ruta.id, Ruta.name, Ruta.number, Ruta.visible):
+            resumen = {"id": ruta_id, "name": name, "number": number, "visible": visible}
+            self._agregar(rutas, postings, ruta_id, resumen, paradas.get(ruta_id, []))
+        # Las búsquedas en curso siguen con los diccionarios anteriores
+        with self._lock:
+            self._rutas, self._postings = rutas, postings
+            self.version = version
+
+    def sincronizar(self, db: Session):
+        """Reconstruir si cambiaron las rutas desde la última carga (en este u otro worker)"""
+        version = leer_version(db, RUTAS).numero
+        if self.version is None or version > self.version:
+            self.reconstruir(db, version)
+
+    # ---------- Consultas ----------
+
+    def buscar(self, termino: str, limite: int = 20) -> List[dict]:
+        """Rutas que coinciden con `termino`, ordenadas por puntaje descendente"""
+        consulta = normalizar(termino)
+        if not consulta:
+            return []
+        trigramas_consulta = trigramas(consulta)
+        minimo = max(1, math.ceil(len(trigramas_consulta) * SIMILITUD_MINIMA))
+
+        # Candidatos: rutas que comparten suficientes trigramas con la búsqueda
+        rutas, postings = self._rutas, self._postings
+        conteo: Dict[int, int] = {}
+        for trigrama in trigramas_consulta:
+            for ruta_id in postings.get(trigrama, ()):
+                conteo[ruta_id] = conteo.get(ruta_id, 0) + 1
+
+        resultados = []
+        for ruta_id, comunes in conteo.items():
+            if comunes < minimo:
+                continue
+            entrada = rutas.get(ruta_id)
+            if entrada is None:
+                continue
+            resultado = self._puntuar(consulta, trigramas_consulta, *entrada)
+            if resultado is not None:
+                resultados.append(resultado)
+
+        resultados.sort(key=lambda r: (-r["score"], r["name"]))
+        return resultados[:limite]
+
+    def _puntuar(self, consulta: str, trigramas_consulta: Set[str], resumen: dict,
+                 campos: List[_Campo]) -> Optional[dict]:
+        mejor = 0.0
+        coincidencia = None
+        paradas = []
+
+        for campo in campos:
+            similitud = len(trigramas_consulta & campo.trigramas) / len(trigramas_consulta)
+            if consulta in campo.normalizado:
+                similitud = 1.0 + (0.5 if campo.normalizado.startswith(consulta) else 0.0)
+            if similitud < SIMILITUD_MINIMA:
+                continue
+            puntaje = similitud * PESOS[campo.tipo]
+            if campo.tipo == "parada":
+                paradas.append(campo.original)
+            if puntaje > mejor:
+                mejor = puntaje
+                coincidencia = campo.tipo
+
+        if coincidencia is None:
+            return None
+        return {**resumen, "score": round(mejor, 3), "coincidencia": coincidencia, "paradas": paradas}
+
+
+indice_rutas = IndiceBusqueda()
@@ -0,0 +1,121 @@
+"""
+Cache de respuestas pre-codificadas
+Guarda el JSON ya serializado de los endpoints de lectura más usados, ligado a
+la versión de la colección en la base de datos (versiones.py). Los routers
+guardan un Precomprimido (compresion.py): los bytes y sus versiones gzip/br,
+que se descartan junto con la entrada cuando cambia la versión.
+
+El cache vive en memoria del proceso, pero como la versión se lee de la base
+de datos en cada petición, una escritura atendida por cualquier worker
+invalida las copias de todos.
+"""
+import json
+import re
+import threading
+from typing import Any, Dict, Hashable, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+# Máximo de entradas de colección (combinaciones de parámetros) por versión
+MAX_COLECCIONES = 64
+
+
+# Números que orjson escribe distinto que json.dumps: exponentes (1e16 / 1e+16,
+# 1.5e-7 / 1.5e-07) y 0.00001 / 1e-05. Si aparece algo así (también dentro de
+# un texto) se vuelve a codificar con json para mantener los mismos bytes.
+# Antes de la expresión regular se buscan subcadenas, mucho más rápido
+_NUMERO_DISTINTO = re.compile(rb"\de-?\d|0\.0000\d")
+_PISTAS_NUMERO = (b"0.0000", b"e-") + tuple(b"e%d" % d for d in range(10))
+
+
+def _numeros_distintos(datos: bytes) -> bool:
+    return any(pista in datos for pista in _PISTAS_NUMERO) and _NUMERO_DISTINTO.search(datos) is not None
+
+
+def encode_json(data: Any) -> bytes:
+    """Codificar a JSON con el mismo formato que usa JSONResponse de FastAPI"""
+    if orjson is not None:
+        try:
+            datos = orjson.dumps(data)
+        except TypeError:  # Enteros de más de 64 bits, claves no str, tipos no JSON
+            pass
+        else:
+            if not _numeros_distintos(datos):
+                return datos
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class CacheVersionado:
+    """
+    Cache de cuerpos JSON con dos tipos de entradas:
+
+    - Elementos (p. ej. una ruta por ID), cada uno con varias variantes de formato.
+    - Colecciones (p. ej. una página del listado).
+
+    Todas las entradas corresponden a `version`. Quien lee pasa la versión que
+    leyó de la base de datos antes de consultar los datos: si es más nueva, el
+    cache descarta todo y la adopta; si es más vieja (la petición empezó antes
+    de una escritura) no se usa ni se guarda nada.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._elementos: Dict[Hashable, Dict[Hashable, Any]] = {}
+        self._colecciones: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def _vigente(self, version: int) -> bool:
+        if version > self.version:
+            with self._lock:
+                if version > self.version:
+                    self.version = version
+                    self._elementos = {}
+                    self._colecciones = {}
+        return version == self.version
+
+    def get_elemento(self, clave: Hashable, version: int, variante: Hashable = None) -> Optional[Any]:
+        """Obtener el cuerpo cacheado de un elemento (None si no existe)"""
+        if not self._vigente(version):
+            return None
+        variantes = self._elementos.get(clave)
+        if variantes is None:
+            return None
+        return variantes.get(variante)
+
+    def set_elemento(self, clave: Hashable, datos: Any, version: int, variante: Hashable = None):
+        """Guardar un elemento generado a partir de la versión indicada"""
+        with self._lock:
+            if version != self.version:
+                return
+            self._elementos.setdefault(clave, {})[variante] = datos
+
+    def get_coleccion(self, clave: Hashable, version: int) -> Optional[Any]:
+        """
+        Obtener una colección cacheada: el cuerpo o una tupla con el cuerpo y
+        sus metadatos (p. ej. el cursor de la página siguiente)
+        """
+        if not self._vigente(version):
+            return None
+        return self._colecciones.get(clave)
+
+    def set_coleccion(self, clave: Hashable, datos: Any, version: int):
+        """Guardar una colección generada a partir de la versión indicada"""
+        with self._lock:
+            if version != self.version:
+                return
+            if len(self._colecciones) >= MAX_COLECCIONES:
+                self._colecciones.clear()
+            self._colecciones[clave] = datos
+
+
+# Cache de la red de rutas (GET /rutas y GET /rutas/{id})
+cache_rutas = CacheVersionado()
@@ -0,0 +1,211 @@
+"""
+Carga masiva de horarios (temporada completa)
+Recibe filas planas (transporte, zona, tipo, destino_procedencia, hora,
+estado), valida cada una y hace upsert de buses y horarios en una sola
+transacción con INSERT por lotes:
+
+- Buses por (nombre_transporte, zona): se crean los que no existen. Los
+  nombres se comparan sin mayúsculas, tildes ni espacios en los extremos,
+  como la collation de MySQL del índice único ("transportes unidos" es el
+  mismo bus que "Transportes Unidos").
+- Horarios por (bus, tipo, minuto_del_dia): se insertan o se actualizan
+  destino_procedencia, hora y estado.
+
+En MySQL se usa INSERT ... ON DUPLICATE KEY UPDATE y en SQLite
+INSERT ... ON CONFLICT, ambos sobre los índices únicos de models.py. Con
+otros motores se busca cada fila por su clave y se actualiza o inserta
+(una consulta por fila: correcto pero más lento).
+"""
+import unicodedata
+from typing import Any, Dict, Iterable, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import and_, func, insert, select, tuple_, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Bus, EstadoBus, Horario, TipoHorario, ZonaBus, minutos_desde_hora
+from schemas import HorarioMasivo
+
+# Filas por ejecución del INSERT
+TAMANO_LOTE = 1000
+
+
+class ErroresCarga(Exception):
+    """Filas inválidas: no se escribió nada"""
+
+    def __init__(self, errores: List[Dict[str, Any]]):
+        super().__init__(f"{len(errores)} filas con errores")
+        self.errores = errores
+
+
+def clave_transporte(nombre: str) -> str:
+    """Nombre de transporte para comparar: sin espacios en los extremos, mayúsculas ni tildes"""
+    descompuesto = unicodedata.normalize("NFKD", nombre.strip())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def _mensaje(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(c) for c in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"]
+        for e in error.errors()
+    )
+
+
+def validar_filas(filas: Iterable[dict]) -> Tuple[List[Tuple[int, HorarioMasivo]], List[Dict[str, Any]]]:
+    """
+    Validar cada fila (numeradas desde 1)
+    Devuelve (filas válidas, errores) con errores como {"fila", "error"}
+    """
+    validas, errores = [], []
+    vistas: Dict[Tuple[str, str, str, int], int] = {}
+    for numero, datos in enumerate(filas, start=1):
+        try:
+            fila = HorarioMasivo.model_validate(datos)
+        except ValidationError as e:
+            errores.append({"fila": numero, "error": _mensaje(e)})
+            continue
+
+        minuto = minutos_desde_hora(fila.hora)
+        if minuto is None:
+            errores.append({"fila": numero, "error": f"hora: Hora inválida '{fila.hora}'"})
+            continue
+
+        clave = (clave_transporte(fila.transporte), fila.zona.value, fila.tipo.value, minuto)
+        if clave in vistas:
+            errores.append({"fila": numero, "error": f"Horario repetido (igual a la fila {vistas[clave]})"})
+            continue
+        vistas[clave] = numero
+        validas.append((numero, fila))
+    return validas, errores
+
+
+def _upsert(db: Session, tabla, filas: List[dict], claves: List[str], actualizar: List[str]):
+    """
+    INSERT que actualiza `actualizar` (o no hace nada) si la clave ya existe
+    La sentencia se compila una vez y se ejecuta por lotes con executemany:
+    PyMySQL agrupa cada lote en un único INSERT multi-fila.
+    """
+    dialecto = db.get_bind().dialect.name
+    # onupdate de updated_at no aplica a la parte UPDATE del upsert
+    con_fecha = bool(actualizar) and "updated_at" in tabla.c
+    if dialecto == "mysql":
+        sentencia = mysql.insert(tabla)
+        # Sin columnas que actualizar, reasignar la clave deja la fila igual
+        valores = {c: sentencia.inserted[c] for c in actualizar or claves[:1]}
+        if con_fecha:
+            valores["updated_at"] = func.now()
+        sentencia = sentencia.on_duplicate_key_update(valores)
+    elif dialecto == "sqlite":
+        sentencia = sqlite.insert(tabla)
+        if actualizar:
+            valores = {c: sentencia.excluded[c] for c in actualizar}
+            if con_fecha:
+                valores["updated_at"] = func.now()
+            sentencia = sentencia.on_conflict_do_update(index_elements=claves, set_=valores)
+        else:
+            sentencia = sentencia.on_conflict_do_nothing(index_elements=claves)
+    else:
+        _upsert_por_fila(db, tabla, filas, claves, actualizar, con_fecha)
+        return
+
+    for i in range(0, len(filas), TAMANO_LOTE):
+        db.execute(sentencia, filas[i:i + TAMANO_LOTE])
+
+
+def _upsert_por_fila(db: Session, tabla, filas: List[dict], claves: List[str], actualizar: List[str],
+                     con_fecha: bool):
+    """Respaldo para motores sin upsert en SQLAlchemy: SELECT por clave y UPDATE o INSERT"""
+    for fila in filas:
+        condicion = and_(*(tabla.c[clave] == fila[clave] for clave in claves))
+        if db.execute(select(tabla.c[claves[0]]).where(condicion)).first() is None:
+            db.execute(insert(tabla).values(fila))
+        elif actualizar:
+            valores = {c: fila[c] for c in actualizar}
+            if con_fecha:
+                valores["updated_at"] = func.now()
+            db.execute(update(tabla).where(condicion).values(valores))
+
+
+def cargar_horarios(db: Session, filas: Iterable[dict], parcial: bool = False) -> Dict[str, Any]:
+    """
+    Validar e importar un horario completo
+
+    - parcial=False: si alguna fila es inválida no se escribe nada (ErroresCarga)
+    - parcial=True: se importan las filas válidas y se informan las demás
+
+    Devuelve un resumen con buses creados, horarios insertados/actualizados y errores.
+    La transacción se confirma aquí; en caso de error se revierte completa.
+    """
+    validas, errores = validar_filas(filas)
+    if errores and not parcial:
+        raise ErroresCarga(errores)
+
+    resumen = {
+        "filas": len(validas) + len(errores),
+        "buses_creados": 0,
+        "horarios_insertados": 0,
+        "horarios_actualizados": 0,
+        "zonas": [],
+        "errores": errores,
+    }
+    if not validas:
+        return resumen
+
+    try:
+        # Buses: crear los que falten y resolver todos los IDs con una consulta.
+        # La base devuelve los nombres como están guardados, que pueden diferir
+        # del archivo en mayúsculas o tildes: todo se indexa por clave_transporte
+        claves_bus: Dict[Tuple[str, ZonaBus], str] = {}  # clave -> primer nombre escrito en el archivo
+        for _, fila in validas:
+            claves_bus.setdefault((clave_transporte(fila.transporte), ZonaBus(fila.zona.value)), fila.transporte.strip())
+        buses = {}
+        for bus_id, nombre, zona in db.execute(
+            select(Bus.id, Bus.nombre_transporte, Bus.zona).where(
+                tuple_(Bus.nombre_transporte, Bus.zona).in_([(n, z) for (_, z), n in claves_bus.items()])
+            )
+        ):
+            buses[(clave_transporte(nombre), zona)] = bus_id
+        nuevos = [{"nombre_transporte": n, "zona": z, "activo": True}
+                  for (clave, z), n in claves_bus.items() if (clave, z) not in buses]
+        if nuevos:
+            _upsert(db, Bus.__table__, nuevos, ["nombre_transporte", "zona"], [])
+            for bus_id, nombre, zona in db.execute(
+                select(Bus.id, Bus.nombre_transporte, Bus.zona).where(
+                    tuple_(Bus.nombre_transporte, Bus.zona).in_([(n["nombre_transporte"], n["zona"]) for n in nuevos])
+                )
+            ):
+                buses[(clave_transporte(nombre), zona)] = bus_id
+        resumen["buses_creados"] = len(nuevos)
+
+        horarios = [
+            {
+                "bus_id": buses[(clave_transporte(fila.transporte), ZonaBus(fila.zona.value))],
+                "tipo": TipoHorario(fila.tipo.value),
+                "destino_procedencia": fila.destino_procedencia,
+                "hora": fila.hora,
+                "minuto_del_dia": minutos_desde_hora(fila.hora),
+                "estado": EstadoBus(fila.estado.value),
+            }
+            for _, fila in validas
+        ]
+
+        # Contar cuáles ya existían antes del upsert
+        existentes = set(db.execute(
+            select(Horario.bus_id, Horario.tipo, Horario.minuto_del_dia).where(
+                Horario.bus_id.in_(set(buses.values()))
+            )
+        ).all())
+        actualizados = sum(1 for h in horarios if (h["bus_id"], h["tipo"], h["minuto_del_dia"]) in existentes)
+
+        _upsert(db, Horario.__table__, horarios, ["bus_id", "tipo", "minuto_del_dia"],
+                ["destino_procedencia", "hora", "estado"])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    resumen["horarios_insertados"] = len(horarios) - actualizados
+    resumen["horarios_actualizados"] = actualizados
+    resumen["zonas"] = sorted({z.value for _, z in claves_bus})
+    return resumen
@@ -0,0 +1,244 @@
+"""
+Compresión de respuestas (gzip y, si está instalado el paquete brotli, br)
+La codificación se negocia con Accept-Encoding. Las respuestas de menos de
+COMPRESION_MINIMA bytes se envían sin comprimir: con cuerpos chicos la
+cabecera y el tiempo de CPU cuestan más de lo que se ahorra.
+
+- CompresionMiddleware comprime al vuelo las respuestas JSON/NDJSON/texto.
+  Los streams (StreamingResponse) se comprimen por partes a medida que se
+  generan, sin juntar el cuerpo completo en memoria.
+- Precomprimido guarda un cuerpo ya codificado junto con sus versiones
+  comprimidas. Los caches (cache_rutas, tableros, teselas) guardan este objeto
+  en la entrada de su versión, así una petición repetida no vuelve a
+  comprimir los mismos bytes; respuesta_precomprimida() elige la variante y
+  el middleware la deja pasar tal cual. También responde las peticiones
+  condicionales con los validadores de la versión del cuerpo (ver condicional.py).
+"""
+import gzip
+import zlib
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+from condicional import CACHE_CONTROL_CATALOGO, agregar_validadores, etag_codificado, respuesta_no_modificada
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+
+# Preferidas en caso de empate de calidad (q) en Accept-Encoding
+CODIFICACIONES = (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+# Tipos de contenido que vale la pena comprimir
+TIPOS_COMPRIMIBLES = ("application/json", "application/geo+json", "application/x-ndjson", "text/")
+
+# En streams se fuerza la salida del compresor cada tantos bytes de entrada
+# para que el cliente reciba las filas sin esperar a que se llene su buffer
+BYTES_POR_FLUSH = 16 * 1024
+
+# Los cuerpos precomprimidos se comprimen una vez por versión: se puede usar
+# un nivel más alto que al vuelo
+NIVEL_PRECOMPRIMIDO_GZIP = 9
+NIVEL_PRECOMPRIMIDO_BROTLI = 9
+
+
+def elegir_codificacion(accept_encoding: str) -> Optional[str]:
+    """Codificación soportada con mayor calidad en Accept-Encoding (None = sin comprimir)"""
+    calidades: Dict[str, float] = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.partition(";")
+        nombre = nombre.strip()
+        if not nombre:
+            continue
+        calidad = 1.0
+        parametro = parametros.strip()
+        if parametro.startswith("q="):
+            try:
+                calidad = float(parametro[2:])
+            except ValueError:
+                calidad = 0.0
+        calidades[nombre] = calidad
+
+    mejor, mejor_calidad = None, 0.0
+    for codificacion in CODIFICACIONES:
+        calidad = calidades.get(codificacion, calidades.get("*", 0.0))
+        if calidad > mejor_calidad:
+            mejor, mejor_calidad = codificacion, calidad
+    return mejor
+
+
+def comprimir(datos: bytes, codificacion: str, precomprimido: bool = False) -> bytes:
+    """Comprimir un cuerpo completo"""
+    if codificacion == BROTLI:
+        nivel = NIVEL_PRECOMPRIMIDO_BROTLI if precomprimido else settings.COMPRESION_NIVEL_BROTLI
+        return brotli.compress(datos, quality=nivel)
+    nivel = NIVEL_PRECOMPRIMIDO_GZIP if precomprimido else settings.COMPRESION_NIVEL_GZIP
+    return gzip.compress(datos, compresslevel=nivel, mtime=0)
+
+
+class _Compresor:
+    """Compresión incremental de un stream"""
+
+    def __init__(self, codificacion: str):
+        if codificacion == BROTLI:
+            self._brotli = brotli.Compressor(quality=settings.COMPRESION_NIVEL_BROTLI)
+        else:
+            self._brotli = None
+            self._gzip = zlib.compressobj(settings.COMPRESION_NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self._sin_flush = 0
+
+    def comprimir(self, datos: bytes) -> bytes:
+        self._sin_flush += len(datos)
+        forzar = self._sin_flush >= BYTES_POR_FLUSH
+        if forzar:
+            self._sin_flush = 0
+        if self._brotli is not None:
+            salida = self._brotli.process(datos)
+            return salida + self._brotli.flush() if forzar else salida
+        salida = self._gzip.compress(datos)
+        return salida + self._gzip.flush(zlib.Z_SYNC_FLUSH) if forzar else salida
+
+    def terminar(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._gzip.flush()
+
+
+class Precomprimido:
+    """
+    Cuerpo ya codificado y sus versiones comprimidas. Cada codificación se
+    calcula la primera vez que un cliente la pide y queda guardada mientras
+    el objeto siga en su cache (es decir, mientras no cambie la versión).
+    `etag` y `modificado` son los validadores de la versión de la que salió
+    el cuerpo (condicional.validadores_version); sin ellos no se responde 304
+    """
+
+    __slots__ = ("datos", "etag", "modificado", "_comprimidos")
+
+    def __init__(self, datos: bytes, etag: Optional[str] = None, modificado: Optional[datetime] = None):
+        self.datos = datos
+        self.etag = etag
+        self.modificado = modificado
+        self._comprimidos: Dict[str, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self.datos)
+
+    def variante(self, codificacion: Optional[str]) -> bytes:
+        """Bytes para la codificación (None = sin comprimir)"""
+        if codificacion is None or len(self.datos) < settings.COMPRESION_MINIMA:
+            return self.datos
+        comprimido = self._comprimidos.get(codificacion)
+        if comprimido is None:
+            # Si dos peticiones llegan a la vez ambas comprimen y guardan el mismo resultado
+            comprimido = comprimir(self.datos, codificacion, precomprimido=True)
+            self._comprimidos[codificacion] = comprimido
+        return comprimido
+
+
+def respuesta_precomprimida(request: Request, cuerpo: Precomprimido,
+                            media_type: str = "application/json",
+                            cache_control: str = CACHE_CONTROL_CATALOGO) -> Response:
+    """
+    Response con la variante de `cuerpo` que acepta el cliente, o 304 si el
+    cliente ya la tiene (If-None-Match / If-Modified-Since)
+    """
+    codificacion = elegir_codificacion(request.headers.get("accept-encoding", ""))
+    if len(cuerpo) < settings.COMPRESION_MINIMA:
+        codificacion = None
+    etag = cuerpo.etag
+    if etag is not None and codificacion:
+        etag = etag_codificado(etag, codificacion)
+
+    respuesta = None
+    if etag is not None:
+        respuesta = respuesta_no_modificada(request, etag, cuerpo.modificado, cache_control)
+    if respuesta is None:
+        respuesta = Response(content=cuerpo.variante(codificacion), media_type=media_type)
+        if codificacion:
+            respuesta.headers["Content-Encoding"] = codificacion
+        if etag is not None:
+            agregar_validadores(respuesta, etag, cuerpo.modificado, cache_control)
+    if len(cuerpo) >= settings.COMPRESION_MINIMA:
+        respuesta.headers["Vary"] = "Accept-Encoding"
+    return respuesta
+
+
+def _comprimible(headers: MutableHeaders, status_code: int) -> bool:
+    if status_code < 200 or status_code in (204, 304):
+        return False
+    if "content-encoding" in headers:  # Ya comprimida (respuesta_precomprimida)
+        return False
+    tipo = headers.get("content-type", "")
+    return tipo.startswith(TIPOS_COMPRIMIBLES)
+
+
+class CompresionMiddleware:
+    """Middleware ASGI que comprime las respuestas según Accept-Encoding"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compresor: Optional[_Compresor] = None
+        directo = False
+
+        async def enviar(mensaje):
+            nonlocal inicio, compresor, directo
+            if mensaje["type"] == "http.response.start":
+                inicio = mensaje  # Se envía con la primera parte del cuerpo
+                return
+            if mensaje["type"] != "http.response.body" or directo:
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+
+            if compresor is None:
+                headers = MutableHeaders(raw=inicio["headers"])
+                if not _comprimible(headers, inicio["status"]) or (not mas and len(cuerpo) < settings.COMPRESION_MINIMA):
+                    directo = True
+                    await send(inicio)
+                    await send(mensaje)
+                    return
+                headers["Content-Encoding"] = codificacion
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["ETag"] = etag_codificado(headers["etag"], codificacion)
+                if not mas:
+                    # Cuerpo completo en un solo mensaje: se comprime entero
+                    datos = comprimir(cuerpo, codificacion)
+                    headers["Content-Length"] = str(len(datos))
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": datos})
+                    return
+                if "content-length" in headers:
+                    del headers["content-length"]
+                compresor = _Compresor(codificacion)
+                await send(inicio)
+
+            datos = compresor.comprimir(cuerpo)
+            if not mas:
+                await send({"type": "http.response.body", "body": datos + compresor.terminar()})
+            elif datos:
+                await send({"type": "http.response.body", "body": datos, "more_body": True})
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,127 @@
+"""
+GET condicional (ETag / Last-Modified / 304)
+Los catálogos (rutas, horarios, buses, usuarios) se vuelven a pedir en cada
+visita y cada vez que la app vuelve a primer plano. Con estas cabeceras el
+cliente guarda la respuesta y la revalida: si no cambió, recibe un 304 sin
+cuerpo.
+
+Los validadores salen de la versión de las colecciones en la base de datos
+(versiones.py), que se incrementa dentro de cada transacción que escribe:
+
+- ETag: hash de los números de versión y de los parámetros que cambian la
+  representación. Es la misma en todos los workers y cambia con cualquier
+  escritura, aunque ocurra en el mismo segundo que la anterior.
+- Last-Modified: hora de la última escritura, estrictamente creciente con la
+  versión. Si quedó adelantada respecto del reloj (varias escrituras por
+  segundo) se omite, y el cliente revalida solo con la ETag.
+
+Revalidar cuesta una búsqueda por clave primaria, sin cargar las filas. Los
+cuerpos cacheados (Precomprimido de compresion.py) guardan los validadores
+de la versión con la que se generaron.
+
+Las ETags son fuertes; la respuesta comprimida lleva el sufijo de su
+codificación ("abc-gzip") porque sus bytes son otros, y al comparar
+If-None-Match se ignora ese sufijo.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from versiones import Version
+
+# El cliente guarda la respuesta pero la revalida antes de cada uso
+CACHE_CONTROL_CATALOGO = "no-cache"
+# Igual, pero solo en el dispositivo (datos de un usuario)
+CACHE_CONTROL_PRIVADO = "private, no-cache"
+
+_SUFIJOS_CODIFICACION = ("-gzip", "-br")
+
+
+def etag_de_bytes(datos: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(datos, digest_size=16).hexdigest()
+
+
+def calcular_etag(*partes) -> str:
+    """ETag a partir de valores que identifican la versión (contadores, fechas, parámetros)"""
+    return etag_de_bytes("\x00".join(map(repr, partes)).encode("utf-8"))
+
+
+def etag_codificado(etag: str, codificacion: str) -> str:
+    """ETag de la variante comprimida: '"abc"' -> '"abc-gzip"'"""
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{codificacion}"'
+    return etag
+
+
+def _normalizar(etag: str) -> str:
+    """Comparación débil (RFC 9110): sin W/ ni sufijo de codificación"""
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    for sufijo in _SUFIJOS_CODIFICACION:
+        if etag.endswith(sufijo + '"'):
+            return etag[:-len(sufijo) - 1] + '"'
+    return etag
+
+
+def _en_segundos(fecha: datetime) -> datetime:
+    """Las cabeceras HTTP tienen precisión de segundos; las fechas sin zona se toman como UTC"""
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def no_modificado(request: Request, etag: str, modificado: Optional[datetime] = None) -> bool:
+    """
+    El cliente ya tiene esta versión. If-None-Match tiene prioridad: si está
+    presente, If-Modified-Since se ignora
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etiqueta = _normalizar(etag)
+        return any(_normalizar(e) == etiqueta for e in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modificado is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        return _en_segundos(modificado) <= desde
+    return False
+
+
+def agregar_validadores(response: Response, etag: str, modificado: Optional[datetime] = None,
+                        cache_control: str = CACHE_CONTROL_CATALOGO) -> Response:
+    """Cabeceras ETag, Last-Modified y Cache-Control de la respuesta"""
+    response.headers["ETag"] = etag
+    if modificado is not None and modificado <= datetime.now(timezone.utc):
+        response.headers["Last-Modified"] = format_datetime(_en_segundos(modificado), usegmt=True)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def respuesta_no_modificada(request: Request, etag: str, modificado: Optional[datetime] = None,
+                            cache_control: str = CACHE_CONTROL_CATALOGO) -> Optional[Response]:
+    """304 con los validadores si el cliente ya tiene esta versión, si no None"""
+    if not no_modificado(request, etag, modificado):
+        return None
+    return agregar_validadores(Response(status_code=304), etag, modificado, cache_control)
+
+
+def validadores_version(versiones: Iterable[Version], *partes) -> Tuple[str, Optional[datetime]]:
+    """
+    ETag y Last-Modified a partir de las versiones leídas con
+    versiones.leer_versiones() y de los parámetros que cambian la representación
+    """
+    versiones = tuple(versiones)
+    fechas = [v.modificado for v in versiones if v.modificado is not None]
+    return calcular_etag(*(v.numero for v in versiones), *partes), max(fechas) if fechas else None
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     # Database settings
@@ -9,13 +9,39 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = ""
     DB_NAME: str = "viajero_app"
 
+    # Pool de conexiones (por engine y por worker de uvicorn; ver GET /internal/metrics/db)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # Segundos esperando una conexión libre antes de fallar
+    DB_POOL_RECYCLE: int = 3600  # Segundos antes de reemplazar una conexión (wait_timeout de MySQL)
+
+    # Réplica de lectura: mismo usuario y base de datos (vacío = todo va al primario)
+    DB_REPLICA_HOST: str = ""
+    DB_REPLICA_PORT: int = 3306
+
     # Server settings
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
 
+    # Compresión de respuestas (gzip; br si está instalado brotli)
+    COMPRESION_MINIMA: int = 1024  # Bytes: las respuestas más chicas se envían sin comprimir
+    COMPRESION_NIVEL_GZIP: int = 6
+    COMPRESION_NIVEL_BROTLI: int = 4
+
     # CORS settings
     ALLOWED_ORIGINS: str = "http://localhost:*,file://*"
 
+    # Routing settings: extracto .osm para calcular la geometría de las rutas
+    # (vacío = el desktop sigue enviando routeGeometry calculada por su cuenta)
+    OSM_GRAFO_PATH: str = ""
+
+    # Métricas internas: GET /internal/metrics/db solo se registra si hay token,
+    # y se pide con la cabecera Authorization: Bearer <token>
+    METRICAS_TOKEN: str = ""
+
+    # Spatial settings: usar columnas POINT + SPATIAL INDEX (requiere migrar_espacial.py)
+    GEOMETRIA_ESPACIAL: bool = False
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -24,6 +50,22 @@ class Settings(BaseSettings):
     def database_url(self) -> str:
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def async_database_url(self) -> str:
+        return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
+    @property
+    def replica_database_url(self) -> Optional[str]:
+        if not self.DB_REPLICA_HOST:
+            return None
+        return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_REPLICA_HOST}:{self.DB_REPLICA_PORT}/{self.DB_NAME}"
+
+    @property
+    def async_replica_database_url(self) -> Optional[str]:
+        if not self.DB_REPLICA_HOST:
+            return None
+        return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_REPLICA_HOST}:{self.DB_REPLICA_PORT}/{self.DB_NAME}"
+
     @property
     def cors_origins(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
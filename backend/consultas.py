@@ -0,0 +1,50 @@
+"""
+Capa de consultas compartida por los routers
+Cada función arma la consulta de un endpoint declarando cómo se cargan las
+relaciones que usa su respuesta (to_dict), para que un listado ejecute un
+número fijo de consultas sin importar cuántas filas devuelva.
+"""
+from sqlalchemy.orm import Session, selectinload, contains_eager
+
+from models import Ruta, Bus, Horario, TipoHorario
+
+
+def query_rutas(db: Session):
+    """
+    Rutas con sus paradas
+    Ruta.to_dict() recorre `paradas`: se cargan con un único SELECT ... IN
+    """
+    return db.query(Ruta).options(selectinload(Ruta.paradas))
+
+
+def query_buses(db: Session):
+    """
+    Buses con sus horarios
+    Bus.to_dict() recorre `horarios` y cada Horario.to_dict() usa `bus`,
+    que se resuelve desde el identity map sin consultas adicionales
+    """
+    return db.query(Bus).options(selectinload(Bus.horarios))
+
+
+def query_horarios_zona(db: Session, zona: str, tipo: TipoHorario):
+    """
+    Horarios de una zona y tipo (salida/entrada) de buses activos
+    El JOIN con buses ya se necesita para filtrar, así que se reutiliza
+    para poblar `Horario.bus` (contains_eager)
+    """
+    return db.query(Horario).join(Horario.bus).options(
+        contains_eager(Horario.bus)
+    ).filter(
+        Bus.zona == zona,
+        Horario.tipo == tipo,
+        Bus.activo == True
+    )
+
+
+def query_proyectada(db: Session, proyeccion, campos):
+    """
+    Consulta para una proyección de campos (fields=/exclude=)
+    Solo lee las columnas de los campos pedidos y carga las relaciones
+    únicamente si se pidieron (ver proyeccion.py)
+    """
+    return db.query(proyeccion.modelo).options(*proyeccion.opciones(campos))
@@ -1,26 +1,125 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from config import settings
+from metricas_db import PoolAsyncMedido, PoolMedido
+
+# Tamaño y reciclado del pool (config.py); pool_logging_name identifica el pool en /internal/metrics/db
+def _opciones_pool(nombre: str) -> dict:
+    return dict(
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_logging_name=nombre,
+    )
 
 # Crear engine de base de datos
 engine = create_engine(
     settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=3600,
+    poolclass=PoolMedido,
+    **_opciones_pool("primario"),
     echo=False  # Cambiar a True para debug
 )
 
-# Crear sesión
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engine asíncrono (aiomysql) para los endpoints que consultan la base de datos
+# en cada petición: mientras espera a MySQL el event loop sigue atendiendo otras
+# peticiones. El engine síncrono queda para scripts (init_db.py, importar_horarios.py)
+# y para los módulos que mantienen estructuras en memoria (cache.py, tableros.py, eta.py).
+# Los endpoints que usan la sesión síncrona se declaran con `def`, no `async def`:
+# FastAPI los ejecuta en su threadpool y no bloquean el event loop
+async_engine = create_async_engine(
+    settings.async_database_url,
+    poolclass=PoolAsyncMedido,
+    **_opciones_pool("primario_async"),
+    echo=False
+)
+
+# Réplica de lectura opcional (DB_REPLICA_HOST), para las sesiones de los GET
+# (síncronas y asíncronas). Las estructuras en memoria que se reconstruyen desde
+# la réplica quedan marcadas con la versión que leyeron (versiones.py) y solo
+# avanzan a versiones más nuevas: una réplica atrasada no las hace retroceder
+replica_engine = create_engine(
+    settings.replica_database_url,
+    poolclass=PoolMedido,
+    **_opciones_pool("replica"),
+    echo=False
+) if settings.replica_database_url else None
+
+async_replica_engine = create_async_engine(
+    settings.async_replica_database_url,
+    poolclass=PoolAsyncMedido,
+    **_opciones_pool("replica_async"),
+    echo=False
+) if settings.async_replica_database_url else None
+
+# Claves de session.info
+SOLO_LECTURA = "solo_lectura"
+USAR_PRIMARIO = "usar_primario"
+
+# Peticiones que pueden leer de la réplica
+METODOS_LECTURA = ("GET", "HEAD")
+
+class SesionEnrutada(Session):
+    """
+    Sesión que lee de la réplica si se marcó como de solo lectura
+    Al escribir (flush o INSERT/UPDATE/DELETE directo) queda fijada al primario
+    por el resto de la sesión, así lee lo que acaba de escribir.
+    """
+
+    def _engines(self):
+        """(primario, réplica o None)"""
+        replica = async_replica_engine.sync_engine if async_replica_engine is not None else None
+        return async_engine.sync_engine, replica
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if clause is not None and clause.is_dml:
+            self.info[USAR_PRIMARIO] = True
+        primario, replica = self._engines()
+        if replica is not None and self.info.get(SOLO_LECTURA) and not self.info.get(USAR_PRIMARIO):
+            return replica
+        return primario
+
+class SesionEnrutadaSync(SesionEnrutada):
+    """SesionEnrutada sobre los engines síncronos (SessionLocal / get_db)"""
+
+    def _engines(self):
+        return self.bind or engine, replica_engine
+
+@event.listens_for(SesionEnrutada, "before_flush")
+def _fijar_primario(session, flush_context, instances):
+    session.info[USAR_PRIMARIO] = True
+
+def usar_primario(db):
+    """Enviar al primario el resto de las consultas de la sesión (p. ej. un GET que no tolera atraso)"""
+    db.info[USAR_PRIMARIO] = True
+
+# Crear sesión. Sin marcarla como de solo lectura (scripts, tareas de fondo) usa el primario
+SessionLocal = sessionmaker(class_=SesionEnrutadaSync, autocommit=False, autoflush=False, bind=engine)
+
+# expire_on_commit=False: después de commit los objetos se siguen leyendo sin
+# otra consulta (en una sesión asíncrona no hay carga perezosa implícita)
+AsyncSessionLocal = async_sessionmaker(sync_session_class=SesionEnrutada, autoflush=False, expire_on_commit=False)
 
 # Base para los modelos
 Base = declarative_base()
 
 # Dependencia para obtener la sesión de base de datos
-def get_db():
+# Los GET leen de la réplica, si está configurada
+def get_db(request: Request):
     db = SessionLocal()
+    db.info[SOLO_LECTURA] = request.method in METODOS_LECTURA
     try:
         yield db
     finally:
         db.close()
+
+# Dependencia para obtener la sesión asíncrona (usar con await db.execute(select(...)))
+# Los GET leen de la réplica, si está configurada
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        db.info[SOLO_LECTURA] = request.method in METODOS_LECTURA
+        yield db
@@ -0,0 +1,358 @@
+"""
+Motor de enrutamiento vial sobre un grafo OSM local
+Reemplaza las llamadas del desktop a OSRM/Mapbox públicos: carga un extracto
+de OpenStreetMap (.osm XML) en arreglos compactos (formato CSR) y calcula el
+camino más rápido entre varias paradas con A*.
+
+Para extractos .osm.pbf convertir antes a XML, por ejemplo:
+    osmium cat jinotega.osm.pbf -o jinotega.osm
+
+El grafo compilado se guarda junto al extracto (`<archivo>.grafo`) y se
+reutiliza mientras el extracto no cambie.
+"""
+import heapq
+import math
+import os
+import re
+import struct
+import threading
+import xml.etree.ElementTree as ET
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Velocidades por tipo de vía (km/h) cuando la vía no tiene `maxspeed`
+VELOCIDADES = {
+    "motorway": 90, "motorway_link": 60,
+    "trunk": 70, "trunk_link": 50,
+    "primary": 60, "primary_link": 45,
+    "secondary": 50, "secondary_link": 40,
+    "tertiary": 40, "tertiary_link": 35,
+    "unclassified": 30,
+    "residential": 25,
+    "living_street": 10,
+    "service": 15,
+    "road": 30,
+    "track": 15,
+}
+
+# Tope de velocidad de cualquier arista: la heurística de A* divide la
+# distancia en línea recta por esta velocidad y debe ser una cota inferior
+VELOCIDAD_MAXIMA = max(VELOCIDADES.values())
+
+KM_POR_MILLA = 1.609344
+
+# maxspeed: "60", "60 km/h", "30 mph", "30mph" (otros valores como "none" o "RU:urban" se ignoran)
+_MAXSPEED = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(km/h|kmh|kph|mph)?\s*$")
+
+RADIO_TIERRA_M = 6371008.8
+
+# Tamaño de celda (grados) del índice para ubicar el nodo más cercano a una parada
+TAMANO_CELDA = 0.005
+
+# Distancia máxima (m) entre una parada y el nodo vial al que se ajusta
+DISTANCIA_AJUSTE_MAXIMA = 1000.0
+
+_MAGIA = b"VGRAFO01"
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distancia en metros entre dos puntos"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RADIO_TIERRA_M * math.asin(math.sqrt(a))
+
+
+class RutaNoEncontrada(Exception):
+    """No existe un camino vial entre dos paradas consecutivas"""
+
+
+def _velocidad(etiquetas: Dict[str, str]) -> Optional[float]:
+    """Velocidad (km/h) de una vía transitable por buses, None si no lo es"""
+    tipo = etiquetas.get("highway")
+    if tipo not in VELOCIDADES:
+        return None
+    if etiquetas.get("access") in ("no", "private"):
+        return None
+    velocidad = float(VELOCIDADES[tipo])
+    coincidencia = _MAXSPEED.match(etiquetas.get("maxspeed", ""))
+    if coincidencia:
+        maxspeed = float(coincidencia.group(1))
+        if coincidencia.group(2) == "mph":
+            maxspeed *= KM_POR_MILLA
+        if maxspeed > 0:  # 0 es un error de etiquetado, no una vía cerrada
+            velocidad = maxspeed
+    return min(velocidad, float(VELOCIDAD_MAXIMA))
+
+
+def _sentido(etiquetas: Dict[str, str]) -> int:
+    """1 = ambos sentidos, 0 = solo hacia adelante, -1 = solo en reversa"""
+    oneway = etiquetas.get("oneway", "")
+    if oneway in ("yes", "true", "1"):
+        return 0
+    if oneway == "-1":
+        return -1
+    if etiquetas.get("junction") == "roundabout" and oneway != "no":
+        return 0
+    return 1
+
+
+class GrafoVial:
+    """
+    Grafo dirigido en arreglos compactos:
+    - lat/lng por nodo (float64)
+    - aristas en formato CSR: `inicio[n]..inicio[n+1]` indexa `destino`,
+      `segundos` (peso) y `metros` de las aristas salientes del nodo n
+    """
+
+    def __init__(self, lat: array, lng: array, inicio: array, destino: array,
+                 segundos: array, metros: array):
+        self.lat = lat
+        self.lng = lng
+        self.inicio = inicio
+        self.destino = destino
+        self.segundos = segundos
+        self.metros = metros
+        self._celdas = self._indexar_celdas()
+
+    @property
+    def total_nodos(self) -> int:
+        return len(self.lat)
+
+    @property
+    def total_aristas(self) -> int:
+        return len(self.destino)
+
+    # ---------- Construcción ----------
+
+    @classmethod
+    def desde_osm(cls, ruta_archivo: str) -> "GrafoVial":
+        """Leer un extracto .osm (XML) y construir el grafo vial"""
+        coordenadas: Dict[int, Tuple[float, float]] = {}
+        vias: List[Tuple[List[int], float, int]] = []
+
+        for _, elemento in ET.iterparse(ruta_archivo, events=("end",)):
+            if elemento.tag == "node":
+                coordenadas[int(elemento.get("id"))] = (float(elemento.get("lat")), float(elemento.get("lon")))
+                elemento.clear()
+            elif elemento.tag == "way":
+                etiquetas = {t.get("k"): t.get("v") for t in elemento.iter("tag")}
+                velocidad = _velocidad(etiquetas)
+                if velocidad is not None:
+                    nodos = [int(nd.get("ref")) for nd in elemento.iter("nd")]
+                    vias.append((nodos, velocidad, _sentido(etiquetas)))
+                elemento.clear()
+
+        # Solo se conservan los nodos usados por vías transitables
+        indices: Dict[int, int] = {}
+        lat, lng = array("d"), array("d")
+        aristas: List[Tuple[int, int, float, float]] = []
+
+        def indice(osm_id):
+            if osm_id not in indices:
+                indices[osm_id] = len(lat)
+                la, ln = coordenadas[osm_id]
+                lat.append(la)
+                lng.append(ln)
+            return indices[osm_id]
+
+        for nodos, velocidad, sentido in vias:
+            nodos = [n for n in nodos if n in coordenadas]
+            metros_por_segundo = velocidad / 3.6
+            for a, b in zip(nodos, nodos[1:]):
+                ia, ib = indice(a), indice(b)
+                metros = haversine_m(lat[ia], lng[ia], lat[ib], lng[ib])
+                segundos = metros / metros_por_segundo
+                if sentido >= 0:
+                    aristas.append((ia, ib, segundos, metros))
+                if sentido != 0:
+                    aristas.append((ib, ia, segundos, metros))
+
+        aristas.sort(key=lambda arista: arista[0])
+        inicio = array("I", [0]) * (len(lat) + 1)
+        destino, segundos, metros = array("I"), array("f"), array("f")
+        for origen, fin, seg, met in aristas:
+            inicio[origen + 1] += 1
+            destino.append(fin)
+            segundos.append(seg)
+            metros.append(met)
+        for n in range(len(lat)):
+            inicio[n + 1] += inicio[n]
+
+        return cls(lat, lng, inicio, destino, segundos, metros)
+
+    def guardar(self, ruta_archivo: str):
+        """Guardar el grafo compilado en binario"""
+        with open(ruta_archivo, "wb") as f:
+            f.write(_MAGIA)
+            f.write(struct.pack("<II", self.total_nodos, self.total_aristas))
+            for arreglo in (self.lat, self.lng, self.inicio, self.destino, self.segundos, self.metros):
+                arreglo.tofile(f)
+
+    @classmethod
+    def desde_binario(cls, ruta_archivo: str) -> "GrafoVial":
+        """Cargar un grafo compilado con `guardar`"""
+        with open(ruta_archivo, "rb") as f:
+            if f.read(len(_MAGIA)) != _MAGIA:
+                raise ValueError(f"{ruta_archivo} no es un grafo compilado")
+            total_nodos, total_aristas = struct.unpack("<II", f.read(8))
+            arreglos = []
+            for tipo, cantidad in (("d", total_nodos), ("d", total_nodos), ("I", total_nodos + 1),
+                                   ("I", total_aristas), ("f", total_aristas), ("f", total_aristas)):
+                arreglo = array(tipo)
+                arreglo.fromfile(f, cantidad)
+                arreglos.append(arreglo)
+        return cls(*arreglos)
+
+    @classmethod
+    def cargar(cls, ruta_osm: str) -> "GrafoVial":
+        """Cargar el grafo compilado si está al día; si no, compilarlo desde el extracto"""
+        ruta_binario = ruta_osm + ".grafo"
+        if os.path.exists(ruta_binario) and os.path.getmtime(ruta_binario) >= os.path.getmtime(ruta_osm):
+            return cls.desde_binario(ruta_binario)
+        grafo = cls.desde_osm(ruta_osm)
+        try:
+            grafo.guardar(ruta_binario)
+        except OSError:
+            pass  # Sin permisos de escritura: se recompila en el próximo arranque
+        return grafo
+
+    # ---------- Consultas ----------
+
+    def _indexar_celdas(self) -> Dict[Tuple[int, int], List[int]]:
+        celdas: Dict[Tuple[int, int], List[int]] = {}
+        for n in range(self.total_nodos):
+            if self.inicio[n + 1] > self.inicio[n]:
+                clave = (int(self.lat[n] // TAMANO_CELDA), int(self.lng[n] // TAMANO_CELDA))
+                celdas.setdefault(clave, []).append(n)
+        return celdas
+
+    def nodo_cercano(self, lat: float, lng: float) -> Optional[int]:
+        """Nodo con aristas salientes más cercano al punto (None si está demasiado lejos)"""
+        fila, columna = int(lat // TAMANO_CELDA), int(lng // TAMANO_CELDA)
+        # Lado más corto de la celda en metros: el de longitud, que se achica con cos(lat)
+        lado_celda = TAMANO_CELDA * 110540 * math.cos(math.radians(lat))
+        radio_maximo = int(DISTANCIA_AJUSTE_MAXIMA / lado_celda) + 1
+        mejor, mejor_distancia = None, DISTANCIA_AJUSTE_MAXIMA
+
+        for radio in range(radio_maximo + 1):
+            for df in range(-radio, radio + 1):
+                for dc in range(-radio, radio + 1):
+                    if max(abs(df), abs(dc)) != radio:
+                        continue
+                    for n in self._celdas.get((fila + df, columna + dc), ()):
+                        distancia = haversine_m(lat, lng, self.lat[n], self.lng[n])
+                        if distancia < mejor_distancia:
+                            mejor, mejor_distancia = n, distancia
+            # Lo encontrado en este anillo ya es más cercano que cualquier celda más lejana
+            if mejor is not None and mejor_distancia <= radio * lado_celda:
+                break
+        return mejor
+
+    def a_estrella(self, origen: int, destino: int) -> List[int]:
+        """Camino más rápido entre dos nodos (lista de nodos)"""
+        if origen == destino:
+            return [origen]
+
+        lat_destino, lng_destino = self.lat[destino], self.lng[destino]
+        velocidad_maxima = VELOCIDAD_MAXIMA / 3.6
+        lat, lng = self.lat, self.lng
+        inicio, destinos, segundos = self.inicio, self.destino, self.segundos
+
+        def heuristica(n):
+            return haversine_m(lat[n], lng[n], lat_destino, lng_destino) / velocidad_maxima
+
+        costo = {origen: 0.0}
+        previo = {origen: -1}
+        abiertos = [(heuristica(origen), 0.0, origen)]
+        cerrados = set()
+
+        while abiertos:
+            _, g, n = heapq.heappop(abiertos)
+            if n == destino:
+                camino = []
+                while n != -1:
+                    camino.append(n)
+                    n = previo[n]
+                return camino[::-1]
+            if n in cerrados:
+                continue
+            cerrados.add(n)
+
+            for i in range(inicio[n], inicio[n + 1]):
+                vecino = destinos[i]
+                nuevo = g + segundos[i]
+                if nuevo < costo.get(vecino, math.inf):
+                    costo[vecino] = nuevo
+                    previo[vecino] = n
+                    heapq.heappush(abiertos, (nuevo + heuristica(vecino), nuevo, vecino))
+
+        raise RutaNoEncontrada("No existe un camino entre las paradas")
+
+    def _arista(self, a: int, b: int) -> Tuple[float, float]:
+        """(segundos, metros) de la arista más rápida a -> b"""
+        mejor = (math.inf, 0.0)
+        for i in range(self.inicio[a], self.inicio[a + 1]):
+            if self.destino[i] == b and self.segundos[i] < mejor[0]:
+                mejor = (self.segundos[i], self.metros[i])
+        return mejor
+
+    def calcular_ruta(self, puntos: Sequence[Tuple[float, float]]) -> dict:
+        """
+        Recorrido vial que pasa por todos los puntos (lat, lng) en orden
+
+        Devuelve el mismo formato que guarda el desktop:
+        routeGeometry ([[lng, lat], ...]), distance (km) y duration (minutos)
+        """
+        nodos = []
+        for i, (lat, lng) in enumerate(puntos):
+            nodo = self.nodo_cercano(lat, lng)
+            if nodo is None:
+                raise RutaNoEncontrada(f"La parada {i + 1} está a más de {DISTANCIA_AJUSTE_MAXIMA:.0f} m de una vía")
+            nodos.append(nodo)
+
+        camino = [nodos[0]]
+        for a, b in zip(nodos, nodos[1:]):
+            camino.extend(self.a_estrella(a, b)[1:])
+
+        segundos = metros = 0.0
+        for a, b in zip(camino, camino[1:]):
+            seg, met = self._arista(a, b)
+            segundos += seg
+            metros += met
+
+        return {
+            "routeGeometry": [[round(self.lng[n], 6), round(self.lat[n], 6)] for n in camino],
+            "distance": round(metros / 1000, 2),
+            "duration": round(segundos / 60),
+        }
+
+
+_grafo: Optional[GrafoVial] = None
+_fallo_carga = False
+_lock = threading.Lock()
+
+
+def obtener_grafo() -> Optional[GrafoVial]:
+    """
+    Grafo configurado en OSM_GRAFO_PATH (se carga una sola vez), None si no
+    hay o si no se pudo cargar
+
+    La primera carga lee y compila el extracto: se hace al iniciar la app
+    (main.lifespan) y, si no, en un hilo (run_in_threadpool), nunca en el
+    event loop. Un extracto ilegible no se vuelve a intentar en cada petición.
+    """
+    global _grafo, _fallo_carga
+    if _grafo is None and not _fallo_carga:
+        from config import settings
+        if not settings.OSM_GRAFO_PATH:
+            return None
+        with _lock:
+            if _grafo is None and not _fallo_carga:
+                try:
+                    _grafo = GrafoVial.cargar(settings.OSM_GRAFO_PATH)
+                except (OSError, ValueError, EOFError, struct.error, ET.ParseError, KeyError) as e:
+                    _fallo_carga = True
+                    print(f"⚠ No se pudo cargar el grafo vial {settings.OSM_GRAFO_PATH}: {e}")
+    return _grafo
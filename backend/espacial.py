@@ -0,0 +1,101 @@
+"""
+Columnas espaciales de MySQL para búsquedas por radio
+Con GEOMETRIA_ESPACIAL=true cada tabla con coordenadas tiene además una
+columna POINT SRID 4326 con SPATIAL INDEX (ver migrar_espacial.py). La columna
+es generada (STORED) a partir de lat/lng, así que MySQL la mantiene
+sincronizada en cada INSERT/UPDATE sin cambios en los modelos.
+
+`cercanos` empuja el filtro por radio a MySQL (MBRContains + ST_Distance_Sphere)
+cuando el modo está activo; en otro caso (o con SQLite) filtra por una caja
+de lat/lng en SQL y calcula la distancia exacta en Python.
+"""
+import math
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Query, Session
+
+from config import settings
+from enrutamiento import haversine_m
+
+SRID = 4326
+
+# Tabla -> columnas espaciales (columna POINT, columna lat, columna lng)
+COLUMNAS_ESPACIALES = {
+    "paradas_buses": [("ubicacion", "lat", "lng")],
+    "paradas": [("ubicacion", "lat", "lng")],
+    "favoritos": [("ubicacion", "lat", "lng")],
+    "viajes_planeados": [
+        ("origen_ubicacion", "origen_lat", "origen_lng"),
+        ("destino_ubicacion", "destino_lat", "destino_lng"),
+    ],
+}
+
+
+def ddl_columna(tabla: str, columna: str, lat: str, lng: str) -> List[str]:
+    """Sentencias para agregar la columna POINT generada y su SPATIAL INDEX"""
+    return [
+        f"ALTER TABLE `{tabla}` ADD COLUMN `{columna}` POINT SRID {SRID} "
+        f"GENERATED ALWAYS AS (ST_SRID(POINT(`{lng}`, `{lat}`), {SRID})) STORED NOT NULL",
+        f"ALTER TABLE `{tabla}` ADD SPATIAL INDEX `sx_{tabla}_{columna}` (`{columna}`)",
+    ]
+
+
+def modo_espacial(db: Session) -> bool:
+    """Usar las columnas espaciales: activado en la configuración y base MySQL"""
+    return settings.GEOMETRIA_ESPACIAL and db.get_bind().dialect.name == "mysql"
+
+
+def caja_envolvente(lat: float, lng: float, radio_m: float) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lng_min, lng_max) que contiene el círculo del radio"""
+    delta_lat = math.degrees(radio_m / 6371008.8)
+    coseno = math.cos(math.radians(min(abs(lat) + delta_lat, 89.9)))
+    delta_lng = min(delta_lat / coseno, 180.0)
+    return lat - delta_lat, lat + delta_lat, lng - delta_lng, lng + delta_lng
+
+
+def _punto(lat: float, lng: float):
+    return func.ST_SRID(func.Point(lng, lat), SRID)
+
+
+def _poligono(lat_min: float, lat_max: float, lng_min: float, lng_max: float):
+    anillo = [(lng_min, lat_min), (lng_max, lat_min), (lng_max, lat_max), (lng_min, lat_max), (lng_min, lat_min)]
+    wkt = "POLYGON((" + ",".join(f"{x} {y}" for x, y in anillo) + "))"
+    return func.ST_GeomFromText(wkt, SRID, "axis-order=long-lat")
+
+
+def cercanos(db: Session, query: Query, columna_lat, columna_lng, lat: float, lng: float,
+             radio_m: float, limit: Optional[int] = None,
+             columna: str = "ubicacion") -> List[Tuple[object, float]]:
+    """
+    Filas de `query` a menos de radio_m del punto, ordenadas por distancia:
+    lista de (fila, metros)
+
+    - columna_lat/columna_lng: columnas del modelo (p. ej. Favorito.lat)
+    - columna: nombre de la columna POINT de la tabla (COLUMNAS_ESPACIALES)
+    """
+    lat_min, lat_max, lng_min, lng_max = caja_envolvente(lat, lng, radio_m)
+
+    if modo_espacial(db):
+        ubicacion = literal_column(f"`{columna_lat.table.name}`.`{columna}`")
+        distancia = func.ST_Distance_Sphere(ubicacion, _punto(lat, lng))
+        query = query.add_columns(distancia).filter(
+            func.MBRContains(_poligono(lat_min, lat_max, lng_min, lng_max), ubicacion),
+            distancia <= radio_m
+        ).order_by(distancia)
+        if limit is not None:
+            query = query.limit(limit)
+        return [(fila, float(metros)) for fila, metros in query]
+
+    # Sin columnas espaciales: caja en SQL (usa índices de lat/lng si existen) y distancia exacta en Python
+    filas = query.filter(
+        columna_lat.between(lat_min, lat_max),
+        columna_lng.between(lng_min, lng_max)
+    ).all()
+    resultado = []
+    for fila in filas:
+        metros = haversine_m(lat, lng, getattr(fila, columna_lat.key), getattr(fila, columna_lng.key))
+        if metros <= radio_m:
+            resultado.append((fila, metros))
+    resultado.sort(key=lambda r: r[1])
+    return resultado[:limit] if limit is not None else resultado
@@ -0,0 +1,288 @@
+"""
+Tiempos estimados de llegada (ETA) a las paradas
+Cada ruta se guarda como una línea con referencia lineal (metros acumulados
+desde el inicio de su geometría) y cada parada con su posición sobre ella:
+las paradas de la ruta y las paradas de buses que quedan a menos de
+DISTANCIA_PARADA_BUS de la línea.
+
+En cada ping aceptado (POST /vehicles/positions) se proyecta la posición del
+vehículo sobre su ruta, se actualiza su velocidad (promedio móvil del avance
+sobre la línea) y se recalcula la llegada a las paradas que le quedan por
+delante. Las llegadas quedan en una tabla en memoria por parada, así que
+consultar el ETA de una parada es una búsqueda en un diccionario.
+
+El modelo de rutas se reconstruye cuando cambia la versión de las rutas o de
+las paradas de buses en la base de datos (versiones.py); el estado de cada
+vehículo se vuelve a calcular desde su historial reciente (vehiculos.py).
+"""
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from consultas import query_rutas
+from espacial import caja_envolvente
+from indice_espacial import indice_paradas
+from planificador import VELOCIDAD_BUS_KMH
+from vehiculos import SEGUNDOS_ACTIVO, Ping, Vehiculo
+from versiones import PARADAS_BUSES, RUTAS, leer_versiones
+
+RADIO_TIERRA_M = 6371008.8
+
+# Paradas de buses a esta distancia de la línea de una ruta se consideran servidas por ella
+DISTANCIA_PARADA_BUS = 75  # m
+
+# Un vehículo más lejos que esto de su ruta no se proyecta (desvío o ruta equivocada)
+DISTANCIA_MAXIMA_RUTA = 300  # m
+
+# Un retroceso mayor sobre la línea se toma como un viaje nuevo desde el inicio
+RETROCESO_NUEVO_VIAJE = 300  # m
+
+# Segmentos alrededor del último proyectado que se revisan antes de recorrer toda la línea
+VENTANA_SEGMENTOS = 25
+
+# Velocidad: promedio móvil exponencial del avance, acotado
+PESO_VELOCIDAD = 0.3
+VELOCIDAD_MINIMA = 5 / 3.6  # m/s
+VELOCIDAD_MAXIMA = 90 / 3.6  # m/s
+
+# Las llegadas se siguen mostrando hasta este tiempo después de la hora estimada
+SEGUNDOS_GRACIA = 60
+
+Clave = Tuple[str, int]  # ("parada", id) o ("parada_bus", id)
+
+
+class LineaRuta:
+    """Geometría de una ruta en metros (plano local) con distancia acumulada por vértice"""
+
+    def __init__(self, ruta_id: int, coordenadas: List[List[float]], velocidad: float):
+        self.ruta_id = ruta_id
+        self.velocidad = velocidad  # m/s por defecto para la ruta
+        lat0 = sum(c[1] for c in coordenadas) / len(coordenadas)
+        self._kx = math.radians(1) * RADIO_TIERRA_M * math.cos(math.radians(lat0))
+        self._ky = math.radians(1) * RADIO_TIERRA_M
+        self.x = array("d", (c[0] * self._kx for c in coordenadas))
+        self.y = array("d", (c[1] * self._ky for c in coordenadas))
+        self.acumulada = array("d", [0.0])
+        for i in range(1, len(coordenadas)):
+            self.acumulada.append(self.acumulada[-1] + math.hypot(self.x[i] - self.x[i - 1], self.y[i] - self.y[i - 1]))
+        self.largo = self.acumulada[-1]
+        # Paradas ordenadas por avance: (metros, clave)
+        self.avances = array("d")
+        self.claves: List[Clave] = []
+
+    def _proyectar_en(self, px: float, py: float, desde: int, hasta: int) -> Tuple[float, float, int]:
+        mejor = (math.inf, 0.0, desde)
+        for i in range(desde, hasta):
+            ax, ay = self.x[i], self.y[i]
+            dx, dy = self.x[i + 1] - ax, self.y[i + 1] - ay
+            largo2 = dx * dx + dy * dy
+            t = 0.0 if largo2 == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / largo2))
+            distancia = math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+            if distancia < mejor[0]:
+                mejor = (distancia, self.acumulada[i] + t * (self.acumulada[i + 1] - self.acumulada[i]), i)
+        return mejor
+
+    def proyectar(self, lat: float, lng: float, segmento: Optional[int] = None) -> Tuple[float, float, int]:
+        """
+        (distancia a la línea en m, avance en m, segmento) del punto más cercano
+        Con `segmento` (el del ping anterior) se busca primero en su vecindad.
+        """
+        px, py = lng * self._kx, lat * self._ky
+        segmentos = len(self.x) - 1
+        if segmentos < 1:
+            return math.hypot(px - self.x[0], py - self.y[0]), 0.0, 0
+        if segmento is not None:
+            cercano = self._proyectar_en(px, py, max(0, segmento - 2), min(segmentos, segmento + VENTANA_SEGMENTOS))
+            if cercano[0] <= DISTANCIA_PARADA_BUS:
+                return cercano
+        return self._proyectar_en(px, py, 0, segmentos)
+
+    def agregar_parada(self, clave: Clave, avance: float):
+        i = bisect_right(self.avances, avance)
+        self.avances.insert(i, avance)
+        self.claves.insert(i, clave)
+
+
+class EstadoVehiculo:
+    """Última proyección y velocidad estimada de un vehículo sobre su ruta"""
+
+    __slots__ = ("ruta_id", "segmento", "avance", "momento", "velocidad", "claves")
+
+    def __init__(self, ruta_id: int):
+        self.ruta_id = ruta_id
+        self.segmento: Optional[int] = None
+        self.avance: Optional[float] = None
+        self.momento = 0.0
+        self.velocidad: Optional[float] = None
+        self.claves: List[Clave] = []
+
+
+class MotorEta:
+    """Modelo de rutas y tabla de llegadas por parada"""
+
+    def __init__(self):
+        self.version: Optional[Tuple[int, int]] = None
+        self._lineas: Dict[int, LineaRuta] = {}
+        self._vehiculos: Dict[str, EstadoVehiculo] = {}
+        # Parada -> vehículo -> (llegada, ruta_id, metros restantes, momento del ping)
+        self._llegadas: Dict[Clave, Dict[str, Tuple[float, int, float, float]]] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Modelo ----------
+
+    def _construir(self, db: Session, version: Tuple[int, int]):
+        lineas = {}
+        for ruta in query_rutas(db).all():
+            if not ruta.visible:
+                continue
+            paradas = sorted(ruta.paradas, key=lambda p: p.order)
+            coordenadas = ruta.coordenadas() or [[p.lng, p.lat] for p in paradas]
+            if len(coordenadas) < 2:
+                continue
+            velocidad = VELOCIDAD_BUS_KMH / 3.6
+            if ruta.distance and ruta.duration:
+                velocidad = max(VELOCIDAD_MINIMA, ruta.distance * 1000 / (ruta.duration * 60))
+            linea = LineaRuta(ruta.id, coordenadas, velocidad)
+            if linea.largo == 0:
+                continue
+
+            segmento = None
+            for parada in paradas:
+                _, avance, segmento = linea.proyectar(parada.lat, parada.lng, segmento)
+                linea.agregar_parada(("parada", parada.id), avance)
+
+            # Candidatas: paradas de buses en la caja de la ruta ampliada por el margen
+            lats = [c[1] for c in coordenadas]
+            lngs = [c[0] for c in coordenadas]
+            lat_extrema = max(lats, key=abs)  # Donde un metro abarca más longitud
+            _, lat_tope, _, lng_margen = caja_envolvente(lat_extrema, 0.0, DISTANCIA_PARADA_BUS)
+            lat_margen = lat_tope - lat_extrema
+            for parada_id, lat, lng, _ in indice_paradas.en_caja(
+                min(lats) - lat_margen, max(lats) + lat_margen, min(lngs) - lng_margen, max(lngs) + lng_margen
+            ):
+                distancia, avance, _ = linea.proyectar(lat, lng)
+                if distancia <= DISTANCIA_PARADA_BUS:
+                    linea.agregar_parada(("parada_bus", parada_id), avance)
+            lineas[ruta.id] = linea
+
+        self._lineas = lineas
+        self._vehiculos = {}
+        self._llegadas = {}
+        self.version = version
+
+    def actualizar_modelo(self, db: Session):
+        """Reconstruir el modelo si cambiaron las rutas o las paradas de buses"""
+        indice_paradas.sincronizar(db)
+        version = tuple(v.numero for v in leer_versiones(db, RUTAS, PARADAS_BUSES))
+        if self._mas_nueva(version):
+            with self._lock:
+                if self._mas_nueva(version):
+                    self._construir(db, version)
+
+    def _mas_nueva(self, version: Tuple[int, int]) -> bool:
+        # Una lectura de la réplica puede traer una versión anterior a la cargada:
+        # solo se avanza, si no se perdería el estado de los vehículos en cada alternancia
+        return self.version is None or any(n > v for n, v in zip(version, self.version))
+
+    # ---------- Pings ----------
+
+    def _avanzar(self, estado: EstadoVehiculo, linea: LineaRuta, ping: Ping) -> bool:
+        """Proyectar el ping y actualizar la velocidad; False si quedó lejos de la ruta"""
+        distancia, avance, segmento = linea.proyectar(ping.lat, ping.lng, estado.segmento)
+        if distancia > DISTANCIA_MAXIMA_RUTA:
+            return False
+
+        if estado.avance is not None and estado.avance - avance > RETROCESO_NUEVO_VIAJE:
+            estado.avance = None
+
+        instantanea = None
+        if estado.avance is not None and ping.momento - estado.momento >= 1:
+            # Retrocesos pequeños son ruido del GPS: cuentan como detenido
+            instantanea = max(0.0, avance - estado.avance) / (ping.momento - estado.momento)
+        elif ping.velocidad is not None:
+            instantanea = ping.velocidad / 3.6
+
+        if instantanea is not None:
+            instantanea = min(instantanea, VELOCIDAD_MAXIMA)
+            estado.velocidad = instantanea if estado.velocidad is None else (
+                PESO_VELOCIDAD * instantanea + (1 - PESO_VELOCIDAD) * estado.velocidad
+            )
+        estado.segmento, estado.momento = segmento, ping.momento
+        estado.avance = avance if estado.avance is None else max(avance, estado.avance)
+        return True
+
+    def _recalcular_llegadas(self, vehiculo_id: str, estado: EstadoVehiculo, linea: LineaRuta):
+        for clave in estado.claves:
+            llegadas = self._llegadas.get(clave)
+            if llegadas is not None:
+                llegadas.pop(vehiculo_id, None)
+        estado.claves = []
+
+        velocidad = max(VELOCIDAD_MINIMA, estado.velocidad if estado.velocidad is not None else linea.velocidad)
+        for i in range(bisect_right(linea.avances, estado.avance), len(linea.claves)):
+            clave = linea.claves[i]
+            metros = linea.avances[i] - estado.avance
+            self._llegadas.setdefault(clave, {})[vehiculo_id] = (
+                estado.momento + metros / velocidad, linea.ruta_id, metros, estado.momento
+            )
+            estado.claves.append(clave)
+
+    def procesar(self, db: Session, vehiculos: Iterable[Vehiculo]):
+        """
+        Actualizar las llegadas de los vehículos que acaban de recibir pings
+        Puede reconstruir el modelo desde la base de datos: llamar fuera del
+        event loop (endpoint `def` o run_in_threadpool)
+        """
+        self.actualizar_modelo(db)
+        with self._lock:
+            for vehiculo in vehiculos:
+                linea = self._lineas.get(vehiculo.ruta_id)
+                estado = self._vehiculos.get(vehiculo.id)
+                if estado is None or estado.ruta_id != vehiculo.ruta_id:
+                    estado = self._vehiculos[vehiculo.id] = EstadoVehiculo(vehiculo.ruta_id)
+                if linea is None:
+                    continue
+
+                # Estado nuevo (o modelo reconstruido): recorrer el historial; si no, solo lo nuevo
+                pings = [p for p in list(vehiculo.historial) if p.momento > estado.momento]
+                en_ruta = False
+                for ping in pings:
+                    en_ruta = self._avanzar(estado, linea, ping)
+                if en_ruta:
+                    self._recalcular_llegadas(vehiculo.id, estado, linea)
+
+    # ---------- Lecturas ----------
+
+    def sirve(self, ruta_id: int, clave: Clave) -> bool:
+        """La parada está sobre la línea de la ruta en el modelo vigente"""
+        linea = self._lineas.get(ruta_id)
+        return linea is not None and clave in linea.claves
+
+    def llegadas(self, clave: Clave, limite: int = 10, ruta_id: Optional[int] = None) -> List[dict]:
+        """Próximas llegadas estimadas a la parada (solo de `ruta_id` si se indica), la más cercana primero"""
+        ahora = time.time()
+        registradas = self._llegadas.get(clave)
+        if not registradas:
+            return []
+        resultado = [
+            {
+                "vehiculo": vehiculo_id,
+                "ruta_id": ruta,
+                "minutos": max(0, round((llegada - ahora) / 60, 1)),
+                "distancia_m": round(metros),
+                "segundos_desde_posicion": round(ahora - momento, 1),
+            }
+            for vehiculo_id, (llegada, ruta, metros, momento) in list(registradas.items())
+            if llegada >= ahora - SEGUNDOS_GRACIA and ahora - momento <= SEGUNDOS_ACTIVO
+            and (ruta_id is None or ruta == ruta_id)
+        ]
+        resultado.sort(key=lambda r: r["minutos"])
+        return resultado[:limite]
+
+
+motor_eta = MotorEta()
@@ -0,0 +1,167 @@
+"""
+Canal de eventos en tiempo real por zona (pub/sub en memoria)
+Los endpoints que modifican horarios o buses publican solo los campos que
+cambiaron; cada conexión suscrita (/ws/buses/{zona}) recibe el evento ya
+codificado una sola vez para todos.
+
+Cada suscripción tiene una cola acotada. Publicar nunca espera a un cliente
+lento: si su cola está llena se descartan sus eventos pendientes y se le
+deja un único evento "resync" para que vuelva a pedir el tablero completo.
+
+El canal vive en memoria del proceso: cada worker publica el detalle de las
+escrituras que recibió. Para las que recibieron otros workers, vigilar()
+revisa cada pocos segundos la versión de buses y horarios (versiones.py); si
+avanzó por escrituras ajenas, las conexiones reciben "resync".
+"""
+import asyncio
+from typing import Dict, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+import database
+from cache import encode_json
+from versiones import BUSES, al_confirmar, leer_version
+
+# Eventos pendientes por conexión antes de considerarla atrasada
+MAX_PENDIENTES = 64
+
+# Segundos entre revisiones de la versión de buses y horarios
+INTERVALO_VERSION = 2.0
+
+EVENTO_RESYNC = encode_json({"evento": "resync"}).decode()
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión"""
+
+    __slots__ = ("zona", "cola", "descartados")
+
+    def __init__(self, zona: str, max_pendientes: int):
+        self.zona = zona
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=max_pendientes)
+        self.descartados = 0
+
+    def entregar(self, mensaje: str):
+        try:
+            self.cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            # Cliente lento: sus eventos pendientes ya no sirven, que recargue el tablero
+            while not self.cola.empty():
+                self.cola.get_nowait()
+                self.descartados += 1
+            self.cola.put_nowait(EVENTO_RESYNC)
+
+    async def siguiente(self) -> str:
+        return await self.cola.get()
+
+
+class CanalEventos:
+    """
+    Suscripciones por zona. suscribir y cancelar se llaman desde el event
+    loop; publicar también desde los hilos donde corren los endpoints `def`
+    (las colas de asyncio solo se tocan desde el loop)
+    """
+
+    def __init__(self, max_pendientes: int = MAX_PENDIENTES):
+        self.max_pendientes = max_pendientes
+        self._suscripciones: Dict[str, Set[Suscripcion]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.version: Optional[int] = None  # Última versión de buses revisada
+        self._propias: Set[int] = set()  # Versiones escritas por este proceso (ya publicadas)
+
+    def suscribir(self, zona: str) -> Suscripcion:
+        suscripcion = Suscripcion(zona, self.max_pendientes)
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:  # Fuera de un loop (pruebas): se entrega en el mismo hilo
+            pass
+        self._suscripciones.setdefault(zona, set()).add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion):
+        suscripciones = self._suscripciones.get(suscripcion.zona)
+        if suscripciones is not None:
+            suscripciones.discard(suscripcion)
+            if not suscripciones:
+                del self._suscripciones[suscripcion.zona]
+
+    def publicar(self, zona: str, evento: dict) -> int:
+        """Encolar el evento para todas las conexiones de la zona; devuelve cuántas lo recibieron"""
+        suscripciones = self._suscripciones.get(zona)
+        if not suscripciones:
+            return 0
+        mensaje = encode_json(evento).decode()
+        if self._loop is None or self._en_loop():
+            self._entregar(zona, mensaje)
+        else:
+            self._loop.call_soon_threadsafe(self._entregar, zona, mensaje)
+        return len(suscripciones)
+
+    def _en_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _entregar(self, zona: str, mensaje: str):
+        for suscripcion in list(self._suscripciones.get(zona, ())):
+            suscripcion.entregar(mensaje)
+
+    def total_suscripciones(self, zona: Optional[str] = None) -> int:
+        if zona is not None:
+            return len(self._suscripciones.get(zona, ()))
+        return sum(len(s) for s in self._suscripciones.values())
+
+    # ---------- Escrituras de otros workers ----------
+
+    def registrar_propia(self, version: int):
+        """Versión confirmada por este proceso (se puede llamar desde otro hilo)"""
+        self._propias.add(version)
+
+    def revisar(self, version: int) -> bool:
+        """
+        Comparar con la versión vigente en la base de datos; si avanzó por
+        escrituras que no pasaron por este proceso, enviar "resync" a todas las
+        conexiones. Devuelve True si se envió
+        """
+        anterior = self.version
+        if anterior is not None and version <= anterior:
+            return False
+        self.version = version
+        # list(): registrar_propia puede agregar desde otro hilo mientras tanto
+        vistas = {v for v in list(self._propias) if v <= version}
+        self._propias.difference_update(vistas)
+        if anterior is None or sum(1 for v in vistas if v > anterior) == version - anterior:
+            return False
+        for zona in list(self._suscripciones):
+            self.publicar(zona, {"evento": "resync"})
+        return True
+
+    async def vigilar(self, intervalo: float = INTERVALO_VERSION):
+        """Tarea de fondo (lifespan de main.py) que revisa la versión periódicamente"""
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                version = await run_in_threadpool(_version_buses)
+            except Exception:
+                continue  # Base de datos no disponible: se reintenta en la próxima vuelta
+            self.revisar(version)
+
+
+def _version_buses() -> int:
+    with database.SessionLocal() as db:
+        return leer_version(db, BUSES).numero
+
+
+def diferencias(antes: dict, despues: dict) -> dict:
+    """Campos de `despues` con valor distinto al de `antes`"""
+    return {campo: valor for campo, valor in despues.items() if antes.get(campo) != valor}
+
+
+canal_eventos = CanalEventos()
+
+
+@al_confirmar
+def _registrar_escritura(versiones: Dict[str, int]):
+    if BUSES in versiones:
+        canal_eventos.registrar_propia(versiones[BUSES])
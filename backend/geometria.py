@@ -0,0 +1,114 @@
+"""
+Codificación compacta de geometrías de rutas
+Las coordenadas ([lng, lat], el mismo orden que routeGeometry) se guardan como
+enteros int32 de punto fijo (micro-grados, ~0.1 m de precisión) intercalados
+en little-endian: 8 bytes por punto en lugar de ~20 caracteres de JSON.
+
+También permite generar Google Encoded Polyline directamente desde el binario,
+sin pasar por listas de floats, para los clientes que lo saben decodificar.
+"""
+import sys
+from array import array
+from typing import List, Sequence
+
+# Factor de punto fijo: 1e-6 grados por unidad
+ESCALA = 1_000_000
+
+# Precisión estándar de Google Encoded Polyline (5 decimales)
+PRECISION_POLYLINE = 5
+
+
+def codificar_geometria(coordenadas: Sequence[Sequence[float]]) -> bytes:
+    """
+    Convertir [[lng, lat], ...] al formato binario de punto fijo
+    Si un punto trae más componentes (altura de GeoJSON) se ignoran
+    """
+    valores = array("i")
+    for punto in coordenadas:
+        valores.append(round(punto[0] * ESCALA))
+        valores.append(round(punto[1] * ESCALA))
+    if sys.byteorder == "big":
+        valores.byteswap()
+    return valores.tobytes()
+
+
+def _enteros(datos: bytes):
+    """
+    Vista int32 sobre el binario sin copiarlo (memoryview.cast)
+    En plataformas big-endian hace falta una copia para invertir los bytes
+    """
+    if sys.byteorder == "big":
+        valores = array("i")
+        valores.frombytes(datos)
+        valores.byteswap()
+        return valores
+    return memoryview(datos).cast("i")
+
+
+def decodificar_geometria(datos: bytes) -> List[List[float]]:
+    """Convertir el binario de punto fijo a [[lng, lat], ...]"""
+    valores = _enteros(datos)
+    return [
+        [valores[i] / ESCALA, valores[i + 1] / ESCALA]
+        for i in range(0, len(valores), 2)
+    ]
+
+
+def _codificar_valor(valor: int, partes: List[str]):
+    """Codificar un entero (delta) según el algoritmo de Encoded Polyline"""
+    valor = ~(valor << 1) if valor < 0 else valor << 1
+    while valor >= 0x20:
+        partes.append(chr((0x20 | (valor & 0x1F)) + 63))
+        valor >>= 5
+    partes.append(chr(valor + 63))
+
+
+def binario_a_polyline(datos: bytes) -> str:
+    """
+    Generar Google Encoded Polyline (orden lat, lng; precisión 5) a partir
+    del binario de punto fijo
+    """
+    valores = _enteros(datos)
+    divisor = ESCALA // 10 ** PRECISION_POLYLINE
+    partes: List[str] = []
+    prev_lat = prev_lng = 0
+
+    for i in range(0, len(valores), 2):
+        # Redondeo "half up" entero, igual que Math.round del algoritmo original
+        lng = (2 * valores[i] + divisor) // (2 * divisor)
+        lat = (2 * valores[i + 1] + divisor) // (2 * divisor)
+        _codificar_valor(lat - prev_lat, partes)
+        _codificar_valor(lng - prev_lng, partes)
+        prev_lat, prev_lng = lat, lng
+
+    return "".join(partes)
+
+
+def codificar_polyline(coordenadas: Sequence[Sequence[float]]) -> str:
+    """Generar Google Encoded Polyline a partir de [[lng, lat], ...]"""
+    return binario_a_polyline(codificar_geometria(coordenadas))
+
+
+def decodificar_polyline(polyline: str) -> List[List[float]]:
+    """Convertir Google Encoded Polyline a [[lng, lat], ...]"""
+    coordenadas = []
+    factor = 10 ** PRECISION_POLYLINE
+    indice = lat = lng = 0
+
+    while indice < len(polyline):
+        deltas = []
+        for _ in range(2):
+            resultado = desplazamiento = 0
+            while True:
+                byte = ord(polyline[indice]) - 63
+                indice += 1
+                resultado |= (byte & 0x1F) << desplazamiento
+                desplazamiento += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(resultado >> 1) if resultado & 1 else resultado >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        coordenadas.append([lng / factor, lat / factor])
+
+    return coordenadas
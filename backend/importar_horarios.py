@@ -0,0 +1,95 @@
+"""
+Script para cargar un horario completo desde un archivo CSV o JSON
+Usa la misma carga masiva que POST /buses/horarios/bulk (carga_masiva.py):
+valida todas las filas y hace upsert de buses y horarios en una sola
+transacción.
+
+Formato CSV (con encabezado):
+    transporte,zona,tipo,destino_procedencia,hora,estado
+    Transportes Unidos,sur,salida,Managua,5:30 am,green
+
+Formato JSON: lista de filas con los mismos campos (o {"horarios": [...]}).
+
+Uso:
+    python importar_horarios.py horarios.csv
+    python importar_horarios.py horarios.json --parcial
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+
+from database import SessionLocal
+from carga_masiva import ErroresCarga, cargar_horarios
+
+# Forzar UTF-8 en Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Errores que se muestran en consola
+MAX_ERRORES_MOSTRADOS = 20
+
+def leer_filas(ruta: str):
+    """Filas del archivo como diccionarios (CSV o JSON según la extensión)"""
+    if ruta.lower().endswith(".json"):
+        with open(ruta, encoding="utf-8") as archivo:
+            datos = json.load(archivo)
+        return datos["horarios"] if isinstance(datos, dict) else datos
+
+    with open(ruta, encoding="utf-8-sig", newline="") as archivo:
+        # Las celdas vacías se omiten para que apliquen los valores por defecto (p. ej. estado)
+        return [{k: v for k, v in fila.items() if v not in ("", None)} for fila in csv.DictReader(archivo)]
+
+def mostrar_errores(errores):
+    for error in errores[:MAX_ERRORES_MOSTRADOS]:
+        print(f"  ⚠ Fila {error['fila']}: {error['error']}")
+    if len(errores) > MAX_ERRORES_MOSTRADOS:
+        print(f"  ... y {len(errores) - MAX_ERRORES_MOSTRADOS} errores más")
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Cargar horarios de buses desde CSV o JSON")
+    parser.add_argument("archivo", help="Archivo .csv o .json")
+    parser.add_argument("--parcial", action="store_true",
+                        help="Cargar las filas válidas aunque haya filas con errores")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("   ViajeroApp - Carga masiva de horarios")
+    print("=" * 60)
+
+    try:
+        filas = leer_filas(args.archivo)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ [ERROR] No se pudo leer '{args.archivo}': {str(e)}")
+        return 1
+    print(f"Archivo: {args.archivo} ({len(filas)} filas)")
+    print()
+
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    try:
+        resumen = cargar_horarios(db, filas, parcial=args.parcial)
+    except ErroresCarga as e:
+        print(f"❌ [ERROR] {len(e.errores)} filas con errores, no se cargó nada (use --parcial para cargar el resto):")
+        mostrar_errores(e.errores)
+        return 1
+    except Exception as e:
+        print(f"❌ [ERROR] Error al cargar horarios: {str(e)}")
+        return 1
+    finally:
+        db.close()
+
+    print(f"[OK] Buses creados: {resumen['buses_creados']}")
+    print(f"[OK] Horarios insertados: {resumen['horarios_insertados']}")
+    print(f"[OK] Horarios actualizados: {resumen['horarios_actualizados']}")
+    if resumen["errores"]:
+        print(f"⚠ {len(resumen['errores'])} filas omitidas:")
+        mostrar_errores(resumen["errores"])
+    print()
+    print(f"✅ Carga completada en {time.perf_counter() - inicio:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
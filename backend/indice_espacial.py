@@ -0,0 +1,319 @@
+"""
+Índice espacial en memoria para búsquedas de paradas cercanas
+Divide el mapa en una grilla de celdas fijas (en grados): una búsqueda solo
+recorre las celdas alrededor del punto, por lo que el costo depende de la
+densidad local de paradas y no del total de paradas cargadas.
+
+Las distancias devueltas son haversine exactas (metros).
+
+Las búsquedas por lote (muchos puntos a la vez) calculan todas las distancias
+con NumPy en una sola pasada vectorizada; sin NumPy se resuelven punto por
+punto con la grilla.
+"""
+import math
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+from enrutamiento import haversine_m
+from models import ParadaBus
+from versiones import PARADAS_BUSES, leer_version
+
+# Tamaño de celda en grados (~550 m de alto)
+TAMANO_CELDA = 0.005
+
+METROS_POR_GRADO_LAT = 110540
+METROS_POR_GRADO_LNG = 111320
+
+RADIO_TIERRA_M = 6371008.8
+
+# Máximo de distancias (puntos x paradas) que se calculan a la vez en un lote
+MAX_ELEMENTOS_LOTE = 2_000_000
+
+# Con más puntos indexados que esto, un lote se resuelve con la grilla (costo sublineal por punto)
+MAX_PUNTOS_VECTORIZADO = 20_000
+
+
+class _Grilla:
+    """
+    Contenido del índice. cargar() arma una grilla nueva y la reemplaza con
+    una sola asignación: las consultas (que no toman el lock) leen la grilla
+    vigente una vez y nunca ven una carga a medias
+    """
+    __slots__ = ("puntos", "celdas", "limites", "matriz")
+
+    def __init__(self):
+        self.puntos: Dict[Hashable, Tuple[float, float, Any]] = {}
+        self.celdas: Dict[Tuple[int, int], Set[Hashable]] = {}
+        self.limites: Optional[Tuple[int, int, int, int]] = None  # filas y columnas extremas ocupadas
+        self.matriz = None  # (claves, datos, lat y lng en radianes) para búsquedas por lote
+
+    def agregar(self, clave: Hashable, celda: Tuple[int, int], lat: float, lng: float, datos: Any):
+        self.matriz = None
+        self.puntos[clave] = (lat, lng, datos)
+        self.celdas.setdefault(celda, set()).add(clave)
+        fila, columna = celda
+        if self.limites is None:
+            self.limites = (fila, fila, columna, columna)
+        else:
+            f0, f1, c0, c1 = self.limites
+            self.limites = (min(f0, fila), max(f1, fila), min(c0, columna), max(c1, columna))
+
+    def quitar(self, clave: Hashable, celda_de: Callable[[float, float], Tuple[int, int]]):
+        punto = self.puntos.pop(clave, None)
+        if punto is None:
+            return
+        self.matriz = None
+        celda = celda_de(punto[0], punto[1])
+        claves = self.celdas.get(celda)
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self.celdas[celda]
+
+
+class IndiceEspacial:
+    """Grilla celda -> IDs con los datos de cada punto"""
+
+    def __init__(self, tamano_celda: float = TAMANO_CELDA):
+        self.tamano_celda = tamano_celda
+        self._grilla = _Grilla()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._grilla.puntos)
+
+    def __contains__(self, clave: Hashable) -> bool:
+        return clave in self._grilla.puntos
+
+    def _celda(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.tamano_celda)), int(math.floor(lng / self.tamano_celda))
+
+    # ---------- Mantenimiento ----------
+
+    def insertar(self, clave: Hashable, lat: float, lng: float, datos: Any = None):
+        """Agregar o mover un punto"""
+        with self._lock:
+            self._grilla.quitar(clave, self._celda)
+            self._grilla.agregar(clave, self._celda(lat, lng), lat, lng, datos)
+
+    def eliminar(self, clave: Hashable):
+        with self._lock:
+            self._grilla.quitar(clave, self._celda)
+
+    def cargar(self, puntos):
+        """Reemplazar todo el contenido por (clave, lat, lng, datos)"""
+        grilla = _Grilla()
+        for clave, lat, lng, datos in puntos:
+            grilla.agregar(clave, self._celda(lat, lng), lat, lng, datos)
+        with self._lock:
+            self._grilla = grilla
+
+    # ---------- Consultas ----------
+
+    def en_caja(self, lat_min: float, lat_max: float, lng_min: float, lng_max: float) -> List[Tuple[Hashable, float, float, Any]]:
+        """Puntos dentro de un rectángulo: (clave, lat, lng, datos)"""
+        grilla = self._grilla
+        f0, c0 = self._celda(lat_min, lng_min)
+        f1, c1 = self._celda(lat_max, lng_max)
+        if (f1 - f0 + 1) * (c1 - c0 + 1) > len(grilla.celdas):
+            # Rectángulo grande: recorrer las celdas ocupadas en lugar de todas las del rectángulo
+            celdas = [c for c in tuple(grilla.celdas) if f0 <= c[0] <= f1 and c0 <= c[1] <= c1]
+        else:
+            celdas = [(f, c) for f in range(f0, f1 + 1) for c in range(c0, c1 + 1)]
+
+        resultado = []
+        for celda in celdas:
+            for clave in tuple(grilla.celdas.get(celda, ())):
+                punto = grilla.puntos.get(clave)
+                if punto is not None and lat_min <= punto[0] <= lat_max and lng_min <= punto[1] <= lng_max:
+                    resultado.append((clave, punto[0], punto[1], punto[2]))
+        return resultado
+
+    def _lado_minimo(self, lat: float, anillo: int) -> float:
+        """Lado más corto (m) de una celda hasta `anillo` celdas del punto"""
+        lat_extrema = min(abs(lat) + (anillo + 1) * self.tamano_celda, 89.9)
+        return self.tamano_celda * min(
+            METROS_POR_GRADO_LAT,
+            METROS_POR_GRADO_LNG * math.cos(math.radians(lat_extrema))
+        )
+
+    def cercanos(self, lat: float, lng: float, radio_m: Optional[float] = None,
+                 k: Optional[int] = None,
+                 filtro: Optional[Callable[[Any], bool]] = None) -> List[Tuple[float, Hashable, Any]]:
+        """
+        Puntos ordenados por distancia: (metros, clave, datos)
+
+        - radio_m: solo puntos dentro del radio
+        - k: como máximo los k más cercanos
+        Se recorren anillos de celdas alrededor del punto y se corta cuando
+        ninguna celda más lejana puede tener un punto más cercano que los ya
+        encontrados (o fuera del radio).
+        """
+        if radio_m is None and k is None:
+            raise ValueError("Se requiere radio_m o k")
+
+        grilla = self._grilla
+        if grilla.limites is None:
+            return []
+        fila, columna = self._celda(lat, lng)
+        f0, f1, c0, c1 = grilla.limites
+        ultimo_anillo = max(abs(fila - f0), abs(fila - f1), abs(columna - c0), abs(columna - c1))
+        encontrados: List[Tuple[float, Hashable, Any]] = []
+        anillo = 0
+
+        while anillo <= ultimo_anillo:
+            if (2 * anillo + 1) ** 2 > 4 * len(grilla.celdas):
+                # Punto lejos de las paradas: recorrer todas sale más barato que seguir con anillos vacíos
+                return self._lineal(grilla, lat, lng, radio_m, k, filtro)
+            for df in range(-anillo, anillo + 1):
+                paso = 1 if abs(df) == anillo else 2 * anillo
+                for dc in range(-anillo, anillo + 1, max(paso, 1)):
+                    claves = grilla.celdas.get((fila + df, columna + dc))
+                    if not claves:
+                        continue
+                    for clave in tuple(claves):
+                        punto = grilla.puntos.get(clave)
+                        if punto is None:
+                            continue
+                        if filtro is not None and not filtro(punto[2]):
+                            continue
+                        distancia = haversine_m(lat, lng, punto[0], punto[1])
+                        if radio_m is None or distancia <= radio_m:
+                            encontrados.append((distancia, clave, punto[2]))
+
+            # Todo lo que está fuera de los anillos recorridos queda al menos a esta distancia
+            cota = anillo * self._lado_minimo(lat, anillo)
+            if radio_m is not None and cota > radio_m:
+                break
+            if k is not None and len(encontrados) >= k:
+                encontrados.sort(key=lambda e: e[0])
+                del encontrados[k:]
+                if encontrados[-1][0] <= cota:
+                    break
+            anillo += 1
+
+        encontrados.sort(key=lambda e: e[0])
+        return encontrados[:k] if k is not None else encontrados
+
+    def _arreglos(self, grilla: _Grilla):
+        """Coordenadas de todos los puntos como arreglos NumPy (se regeneran tras cada cambio)"""
+        matriz = grilla.matriz
+        if matriz is None:
+            with self._lock:
+                items = list(grilla.puntos.items())
+            claves = [clave for clave, _ in items]
+            datos = [punto[2] for _, punto in items]
+            lat = np.radians(np.fromiter((punto[0] for _, punto in items), dtype=np.float64, count=len(items)))
+            lng = np.radians(np.fromiter((punto[1] for _, punto in items), dtype=np.float64, count=len(items)))
+            matriz = (claves, datos, lat, lng)
+            grilla.matriz = matriz
+        return matriz
+
+    def cercanos_lote(self, puntos: Sequence[Tuple[float, float]], k: int,
+                      radio_m: Optional[float] = None,
+                      filtro: Optional[Callable[[Any], bool]] = None) -> List[List[Tuple[float, Hashable, Any]]]:
+        """Los k más cercanos (opcionalmente dentro de radio_m) para cada punto, en el mismo orden"""
+        grilla = self._grilla
+        if np is None or not grilla.puntos or len(grilla.puntos) > MAX_PUNTOS_VECTORIZADO:
+            return [self.cercanos(lat, lng, radio_m=radio_m, k=k, filtro=filtro) for lat, lng in puntos]
+
+        claves, datos, lat_p, lng_p = self._arreglos(grilla)
+        if filtro is not None:
+            seleccion = np.fromiter((filtro(d) for d in datos), dtype=bool, count=len(datos))
+            indices_validos = np.nonzero(seleccion)[0]
+            lat_p, lng_p = lat_p[indices_validos], lng_p[indices_validos]
+        else:
+            indices_validos = np.arange(len(claves))
+
+        total = len(indices_validos)
+        if total == 0:
+            return [[] for _ in puntos]
+        k = min(k, total)
+        cos_p = np.cos(lat_p)
+        originales = indices_validos.tolist()
+
+        consulta = np.radians(np.asarray(puntos, dtype=np.float64).reshape(-1, 2))
+        por_bloque = max(1, MAX_ELEMENTOS_LOTE // total)
+        resultado = []
+
+        for inicio in range(0, len(consulta), por_bloque):
+            bloque = consulta[inicio:inicio + por_bloque]
+            lat_q, lng_q = bloque[:, 0:1], bloque[:, 1:2]
+            # Haversine de todos los puntos del bloque contra todas las paradas
+            a = (np.sin((lat_p - lat_q) / 2) ** 2
+                 + np.cos(lat_q) * cos_p * np.sin((lng_p - lng_q) / 2) ** 2)
+            distancias = 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+            if k < total:
+                mejores = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+            else:
+                mejores = np.broadcast_to(np.arange(total), (len(bloque), total))
+            distancias_mejores = np.take_along_axis(distancias, mejores, axis=1)
+            orden = np.argsort(distancias_mejores, axis=1)
+            mejores = np.take_along_axis(mejores, orden, axis=1)
+            distancias_mejores = np.take_along_axis(distancias_mejores, orden, axis=1)
+
+            for fila_indices, fila_distancias in zip(mejores.tolist(), distancias_mejores.tolist()):
+                aciertos = []
+                for i, distancia in zip(fila_indices, fila_distancias):
+                    if radio_m is not None and distancia > radio_m:
+                        break
+                    original = originales[i]
+                    aciertos.append((distancia, claves[original], datos[original]))
+                resultado.append(aciertos)
+
+        return resultado
+
+    @staticmethod
+    def _lineal(grilla: _Grilla, lat, lng, radio_m, k, filtro) -> List[Tuple[float, Hashable, Any]]:
+        encontrados = []
+        for clave, (plat, plng, datos) in tuple(grilla.puntos.items()):
+            if filtro is not None and not filtro(datos):
+                continue
+            distancia = haversine_m(lat, lng, plat, plng)
+            if radio_m is None or distancia <= radio_m:
+                encontrados.append((distancia, clave, datos))
+        encontrados.sort(key=lambda e: e[0])
+        return encontrados[:k] if k is not None else encontrados
+
+
+class IndiceParadasBus(IndiceEspacial):
+    """
+    Paradas de buses activas, con el diccionario to_dict() de cada una
+    Se recarga cuando cambia la versión de las paradas en la base de datos
+    (versiones.py), también si la escritura la atendió otro worker.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.version: Optional[int] = None  # Versión de paradas_buses cargada (None = sin cargar)
+        self._recarga = threading.Lock()
+
+    def reconstruir(self, db: Session, version: Optional[int] = None):
+        """Cargar todas las paradas activas"""
+        paradas = db.query(ParadaBus).filter(ParadaBus.activa == True).all()
+        self.cargar((p.id, p.lat, p.lng, p.to_dict()) for p in paradas)
+        self.version = version
+
+    def sincronizar(self, db: Session, version: Optional[int] = None):
+        """
+        Recargar si cambiaron las paradas desde la última carga
+        `version`: versión de paradas_buses ya leída por quien llama; al volver,
+        el índice tiene al menos esa versión
+        """
+        if version is None:
+            version = leer_version(db, PARADAS_BUSES).numero
+        if self.version is None or version > self.version:
+            with self._recarga:
+                if self.version is None or version > self.version:
+                    self.reconstruir(db, version)
+
+
+indice_paradas = IndiceParadasBus()
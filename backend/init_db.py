@@ -7,7 +7,7 @@ from sqlalchemy import create_engine, text
 from database import Base, engine
 from models import (
     Usuario, Ruta, Parada, Bus, Horario, ParadaBus,
-    Favorito, ViajePlaneado, EstadisticaUsuario, Notificacion
+    Favorito, ViajePlaneado, EstadisticaUsuario, Notificacion, PosicionVehiculo
 )
 from config import settings
 
@@ -74,6 +74,7 @@ def main():
         print("  ✓ viajes_planeados")
         print("  ✓ estadisticas_usuarios")
         print("  ✓ notificaciones")
+        print("  ✓ posiciones_vehiculos")
         print()
 
         print("=" * 60)
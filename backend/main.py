@@ -5,10 +5,19 @@ FastAPI application para gestión de rutas, buses, usuarios y viajes
 Autor: Claude Code
 Versión: 2.0.0
 """
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from database import engine, Base, SessionLocal
 from config import settings
+from compresion import CompresionMiddleware
+from enrutamiento import obtener_grafo
+from eventos import canal_eventos
+from vehiculos import escribir_pendientes, flota
+from versiones import asegurar_versiones
 
 # Importar routers
 from routers import auth, buses, favoritos, estadisticas, notificaciones
@@ -21,6 +30,30 @@ import models
 # Crear las tablas en la base de datos
 Base.metadata.create_all(bind=engine)
 
+# Filas de versión de cada colección (ver versiones.py)
+with SessionLocal() as db:
+    asegurar_versiones(db)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Tareas de fondo mientras el servidor está activo"""
+    # Grafo vial (OSM_GRAFO_PATH) cargado antes de la primera petición
+    await run_in_threadpool(obtener_grafo)
+    # Avisar a los WebSocket de este worker las escrituras atendidas por otros
+    vigilancia = asyncio.create_task(canal_eventos.vigilar())
+    # Historial de posiciones de vehículos aunque dejen de llegar pings
+    escritura = asyncio.create_task(flota.escribir_periodicamente())
+    try:
+        yield
+    finally:
+        vigilancia.cancel()
+        escritura.cancel()
+        # Los pings que quedan en memoria se perderían al terminar el proceso
+        try:
+            await run_in_threadpool(escribir_pendientes, True)
+        except Exception as e:
+            print(f"⚠ No se pudieron guardar las posiciones pendientes: {e}")
+
 # Crear la aplicación FastAPI
 app = FastAPI(
     title="ViajeroApp API",
@@ -68,7 +101,8 @@ app = FastAPI(
     """,
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configurar CORS para permitir acceso desde desktop y mobile
@@ -78,8 +112,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],  # Cursor de paginación (ver paginacion.py) y GET condicional
 )
 
+# Comprimir las respuestas con gzip/br según Accept-Encoding (ver compresion.py)
+app.add_middleware(CompresionMiddleware)
+
 # ==================== INCLUIR ROUTERS ====================
 
 # Autenticación y usuarios
@@ -103,6 +141,23 @@ app.include_router(estadisticas.router)
 # Notificaciones
 app.include_router(notificaciones.router)
 
+# Teselas del mapa
+from routers import teselas
+app.include_router(teselas.router)
+
+# Cambios de estado en tiempo real (WebSocket)
+from routers import tiempo_real
+app.include_router(tiempo_real.router)
+
+# Posiciones de vehículos en vivo
+from routers import vehiculos
+app.include_router(vehiculos.router)
+
+# Métricas internas (pool de conexiones), solo con METRICAS_TOKEN configurado
+if settings.METRICAS_TOKEN:
+    from routers import interno
+    app.include_router(interno.router)
+
 # ==================== ENDPOINTS RAÍZ ====================
 
 @app.get("/", tags=["Root"])
@@ -131,7 +186,10 @@ async def root():
                 "POST /rutas": "Crear ruta",
                 "PUT /rutas/{id}": "Actualizar ruta",
                 "DELETE /rutas/{id}": "Eliminar ruta",
-                "GET /rutas/search/{term}": "Buscar rutas"
+                "GET /rutas/search/{term}": "Buscar rutas",
+                "POST /rutas/compute-geometry": "Calcular geometría por calles",
+                "GET /rutas/{id}/unidades": "Unidades activas en la ruta y su posición",
+                "GET /rutas/{id}/paradas/{parada_id}/eta": "Llegadas estimadas a una parada de la ruta"
             },
             "Buses y Horarios": {
                 "GET /buses": "Obtener todos los buses",
@@ -139,8 +197,10 @@ async def root():
                 "PUT /buses/{id}": "Actualizar bus",
                 "DELETE /buses/{id}": "Eliminar bus",
                 "POST /buses/{id}/horarios": "Agregar horario a bus",
+                "POST /buses/horarios/bulk": "Carga masiva de horarios",
                 "GET /buses/{zona}/salidas": "Salidas de zona (sur/norte)",
                 "GET /buses/{zona}/entradas": "Entradas de zona",
+                "GET /buses/{zona}/proximas": "Próximos horarios de zona",
                 "PUT /buses/horarios/{id}": "Actualizar horario",
                 "DELETE /buses/horarios/{id}": "Eliminar horario"
             },
@@ -148,16 +208,20 @@ async def root():
                 "GET /paradas-buses": "Obtener paradas",
                 "POST /paradas-buses": "Crear parada",
                 "GET /paradas-buses/cercanas": "Paradas cercanas a ubicación",
+                "POST /paradas-buses/cercanas/batch": "Paradas cercanas a varios puntos",
+                "GET /paradas-buses/{id}/eta": "Llegadas estimadas de unidades a la parada",
                 "PUT /paradas-buses/{id}": "Actualizar parada",
                 "DELETE /paradas-buses/{id}": "Eliminar parada"
             },
             "Favoritos": {
                 "GET /favoritos/usuario/{id}": "Favoritos de usuario",
+                "GET /favoritos/usuario/{id}/cercanos": "Favoritos cercanos a ubicación",
                 "POST /favoritos/usuario/{id}": "Agregar favorito",
                 "DELETE /favoritos/{id}": "Eliminar favorito"
             },
             "Viajes": {
                 "GET /viajes/usuario/{id}": "Viajes de usuario",
+                "GET /viajes/planificar": "Planificar viaje en bus",
                 "POST /viajes/usuario/{id}": "Crear viaje planeado",
                 "PUT /viajes/{id}": "Actualizar viaje (completar)",
                 "DELETE /viajes/{id}": "Eliminar viaje"
@@ -173,6 +237,18 @@ async def root():
                 "PUT /notificaciones/{id}/leer": "Marcar como leída",
                 "DELETE /notificaciones/{id}": "Eliminar notificación",
                 "POST /notificaciones/broadcast": "Enviar a todos los usuarios"
+            },
+            "Teselas": {
+                "GET /tiles/{z}/{x}/{y}": "Rutas y paradas de una tesela del mapa (GeoJSON)"
+            },
+            "Tiempo Real": {
+                "WS /ws/buses/{zona}": "Cambios de estado de buses y horarios de la zona"
+            },
+            "Vehículos": {
+                "POST /vehicles/positions": "Registrar posiciones de vehículos (por lotes)"
+            },
+            "Interno": {
+                "GET /internal/metrics/db": "Uso y tiempos de espera del pool de conexiones (requiere METRICAS_TOKEN)"
             }
         }
     }
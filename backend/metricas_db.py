@@ -0,0 +1,104 @@
+"""
+Métricas del pool de conexiones
+Los engines de database.py usan una subclase de su pool que mide cuánto tarda
+cada checkout (esperar una conexión libre, abrir una nueva y el pre-ping).
+Junto con las conexiones en uso se publican en GET /internal/metrics/db para
+dimensionar DB_POOL_SIZE / DB_MAX_OVERFLOW con datos.
+
+Nota: los contadores son del proceso; con varios workers cada uno tiene su
+propio pool y sus propias métricas.
+"""
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Límites superiores (ms) de los intervalos del histograma de espera
+LIMITES_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class MetricasPool:
+    """Contadores de checkouts de un pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.histograma = [0] * (len(LIMITES_MS) + 1)
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos: float, timeout: bool = False):
+        milisegundos = segundos * 1000
+        intervalo = next((i for i, limite in enumerate(LIMITES_MS) if milisegundos <= limite), len(LIMITES_MS))
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+            self.histograma[intervalo] += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            total = self.checkouts + self.timeouts
+            etiquetas = [f"<={limite}" for limite in LIMITES_MS] + [f">{LIMITES_MS[-1]}"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "espera_promedio_ms": round(self.espera_total * 1000 / total, 3) if total else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+                "espera_histograma_ms": dict(zip(etiquetas, self.histograma)),
+            }
+
+
+_metricas: Dict[str, MetricasPool] = {}
+_lock = threading.Lock()
+
+
+def metricas(nombre: str) -> MetricasPool:
+    """Contadores del pool con ese nombre (pool_logging_name del engine)"""
+    with _lock:
+        return _metricas.setdefault(nombre, MetricasPool())
+
+
+class _CheckoutMedido:
+    """Mide connect(); el nombre sobrevive a engine.dispose(), que recrea el pool"""
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super().connect()
+        except exc.TimeoutError:
+            metricas(self.logging_name).registrar(time.perf_counter() - inicio, timeout=True)
+            raise
+        metricas(self.logging_name).registrar(time.perf_counter() - inicio)
+        return conexion
+
+
+class PoolMedido(_CheckoutMedido, QueuePool):
+    pass
+
+
+class PoolAsyncMedido(_CheckoutMedido, AsyncAdaptedQueuePool):
+    pass
+
+
+def estado_pool(engine) -> dict:
+    """Conexiones en uso/libres del engine (síncrono o asíncrono) y sus métricas de espera"""
+    pool = getattr(engine, "sync_engine", engine).pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    estado = {
+        "tamano": pool.size(),
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "timeout_s": pool.timeout(),
+    }
+    if isinstance(pool, _CheckoutMedido):
+        estado.update(metricas(pool.logging_name).to_dict())
+    return estado
@@ -0,0 +1,62 @@
+"""
+Script de migración a columnas espaciales (MySQL 8)
+Agrega a paradas, paradas de buses, favoritos y viajes planeados una columna
+POINT SRID 4326 generada a partir de lat/lng, con su SPATIAL INDEX.
+
+Después de migrar, activar GEOMETRIA_ESPACIAL=true en .env para que las
+búsquedas por radio usen los índices espaciales (ver espacial.py).
+
+Uso:
+    python migrar_espacial.py
+"""
+import sys
+from sqlalchemy import text
+from database import engine
+from config import settings
+from espacial import COLUMNAS_ESPACIALES, ddl_columna
+
+# Forzar UTF-8 en Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+def agregar_columnas():
+    """Agregar cada columna espacial que todavía no exista"""
+    with engine.connect() as conn:
+        for tabla, columnas in COLUMNAS_ESPACIALES.items():
+            for columna, lat, lng in columnas:
+                result = conn.execute(
+                    text(
+                        "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+                        "WHERE TABLE_SCHEMA = :db AND TABLE_NAME = :tabla AND COLUMN_NAME = :columna"
+                    ),
+                    {"db": settings.DB_NAME, "tabla": tabla, "columna": columna}
+                )
+
+                if result.fetchone():
+                    print(f"[OK] Columna '{tabla}.{columna}' ya existe")
+                    continue
+
+                for sentencia in ddl_columna(tabla, columna, lat, lng):
+                    conn.execute(text(sentencia))
+                conn.commit()
+                print(f"[OK] Columna '{tabla}.{columna}' e índice espacial creados")
+
+def main():
+    """Función principal"""
+    print("=" * 60)
+    print("   ViajeroApp - Migración a columnas espaciales")
+    print("=" * 60)
+    print(f"Base de datos: {settings.DB_NAME}")
+    print()
+
+    try:
+        agregar_columnas()
+        print()
+        print("✅ Migración completada. Activar GEOMETRIA_ESPACIAL=true en .env")
+        return 0
+    except Exception as e:
+        print(f"❌ [ERROR] Error en la migración: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Script de migración de geometrías de rutas
+Agrega la columna binaria `rutas.geometria` y convierte las geometrías JSON
+existentes (`rutas.route_geometry`) al formato int32 de punto fijo.
+
+Uso:
+    python migrar_geometria.py               # Migrar y conservar el JSON original
+    python migrar_geometria.py --limpiar     # Migrar y vaciar route_geometry
+"""
+import sys
+import json
+from sqlalchemy import text
+from database import engine, SessionLocal
+from models import Ruta
+from config import settings
+from geometria import codificar_geometria
+
+# Forzar UTF-8 en Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Rutas convertidas por commit
+TAMANO_LOTE = 200
+
+def agregar_columna():
+    """Agregar la columna `geometria` si todavía no existe"""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(
+                "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+                "WHERE TABLE_SCHEMA = :db AND TABLE_NAME = 'rutas' AND COLUMN_NAME = 'geometria'"
+            ),
+            {"db": settings.DB_NAME}
+        )
+
+        if not result.fetchone():
+            conn.execute(text("ALTER TABLE rutas ADD COLUMN geometria MEDIUMBLOB NULL"))
+            conn.commit()
+            print("[OK] Columna 'rutas.geometria' creada")
+        else:
+            print("[OK] Columna 'rutas.geometria' ya existe")
+
+def convertir_geometrias(limpiar: bool):
+    """Convertir route_geometry (JSON) a geometria (binario) por lotes"""
+    db = SessionLocal()
+    convertidas = 0
+    try:
+        while True:
+            rutas = db.query(Ruta).filter(
+                Ruta.geometria == None,
+                Ruta.route_geometry != None
+            ).order_by(Ruta.id).limit(TAMANO_LOTE).all()
+
+            if not rutas:
+                break
+
+            for ruta in rutas:
+                coordenadas = json.loads(ruta.route_geometry)
+                ruta.geometria = codificar_geometria(coordenadas) if coordenadas else b""
+                if limpiar:
+                    ruta.route_geometry = None
+
+            db.commit()
+            convertidas += len(rutas)
+            print(f"  ... {convertidas} rutas convertidas")
+
+        print(f"[OK] {convertidas} geometrías migradas a formato binario")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """Función principal"""
+    limpiar = "--limpiar" in sys.argv
+
+    print("=" * 60)
+    print("   ViajeroApp - Migración de geometrías de rutas")
+    print("=" * 60)
+    print(f"Base de datos: {settings.DB_NAME}")
+    print()
+
+    try:
+        print("Paso 1: Agregando columna binaria...")
+        agregar_columna()
+        print()
+
+        print("Paso 2: Convirtiendo geometrías...")
+        convertir_geometrias(limpiar)
+        print()
+
+        print("✅ Migración completada exitosamente")
+        return 0
+
+    except Exception as e:
+        print(f"❌ [ERROR] Error durante la migración: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Script de migración de horarios
+Agrega la columna `horarios.minuto_del_dia`, la calcula a partir de `hora`
+("HH:MM am/pm") para los horarios existentes y crea el índice
+(tipo, minuto_del_dia) usado por GET /buses/{zona}/proximas, junto con los
+índices únicos de buses (nombre, zona) y horarios (bus, tipo, minuto) que usa
+la carga masiva.
+
+Antes de crear los índices únicos se depuran los duplicados que los harían
+fallar: los buses con el mismo nombre y zona se unen en el de menor ID (sus
+horarios pasan a ese bus) y de los horarios repetidos de un bus, tipo y
+minuto se conserva el último cargado (mayor ID). Cada cambio se informa.
+
+Uso:
+    python migrar_horarios.py
+"""
+import sys
+from sqlalchemy import func, text
+from database import engine, SessionLocal
+from models import Bus, Horario, minutos_desde_hora
+from config import settings
+from migrar_indices import crear_indices_faltantes
+
+# Forzar UTF-8 en Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Horarios actualizados por commit
+TAMANO_LOTE = 500
+
+def agregar_columna():
+    """Agregar la columna `minuto_del_dia` si todavía no existe"""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(
+                "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+                "WHERE TABLE_SCHEMA = :db AND TABLE_NAME = 'horarios' AND COLUMN_NAME = 'minuto_del_dia'"
+            ),
+            {"db": settings.DB_NAME}
+        )
+
+        if not result.fetchone():
+            conn.execute(text("ALTER TABLE horarios ADD COLUMN minuto_del_dia INT NULL AFTER hora"))
+            conn.commit()
+            print("[OK] Columna 'horarios.minuto_del_dia' creada")
+        else:
+            print("[OK] Columna 'horarios.minuto_del_dia' ya existe")
+
+def calcular_minutos():
+    """Calcular minuto_del_dia de los horarios que no lo tienen, por lotes"""
+    db = SessionLocal()
+    actualizados = 0
+    invalidos = 0
+    ultimo_id = 0
+    try:
+        while True:
+            filas = db.query(Horario.id, Horario.hora).filter(
+                Horario.minuto_del_dia == None,
+                Horario.id > ultimo_id
+            ).order_by(Horario.id).limit(TAMANO_LOTE).all()
+
+            if not filas:
+                break
+
+            cambios = []
+            for horario_id, hora in filas:
+                minuto = minutos_desde_hora(hora)
+                if minuto is None:
+                    invalidos += 1
+                    print(f"  ⚠ Horario {horario_id}: hora '{hora}' no reconocida")
+                else:
+                    cambios.append({"id": horario_id, "minuto_del_dia": minuto})
+
+            if cambios:
+                db.bulk_update_mappings(Horario, cambios)
+            db.commit()
+            actualizados += len(cambios)
+            ultimo_id = filas[-1][0]
+
+        print(f"[OK] {actualizados} horarios actualizados ({invalidos} con hora no reconocida)")
+    finally:
+        db.close()
+
+def depurar_duplicados():
+    """Unir buses repetidos y eliminar horarios repetidos (claves de los índices únicos)"""
+    db = SessionLocal()
+    try:
+        buses_unidos = 0
+        grupos = db.query(Bus.nombre_transporte, Bus.zona, func.min(Bus.id)).group_by(
+            Bus.nombre_transporte, Bus.zona
+        ).having(func.count(Bus.id) > 1).all()
+        for nombre, zona, conservado in grupos:
+            repetidos = [bus_id for (bus_id,) in db.query(Bus.id).filter(
+                Bus.nombre_transporte == nombre, Bus.zona == zona, Bus.id != conservado
+            )]
+            db.query(Horario).filter(Horario.bus_id.in_(repetidos)).update(
+                {Horario.bus_id: conservado}, synchronize_session=False
+            )
+            db.query(Bus).filter(Bus.id.in_(repetidos)).delete(synchronize_session=False)
+            buses_unidos += len(repetidos)
+            print(f"  ⚠ Bus '{nombre}' ({zona.value}): buses {repetidos} unidos al {conservado}")
+
+        # Después de unir los buses: sus horarios pueden haber quedado repetidos
+        horarios_eliminados = 0
+        grupos = db.query(Horario.bus_id, Horario.tipo, Horario.minuto_del_dia, func.max(Horario.id)).filter(
+            Horario.minuto_del_dia != None
+        ).group_by(Horario.bus_id, Horario.tipo, Horario.minuto_del_dia).having(func.count(Horario.id) > 1).all()
+        for bus_id, tipo, minuto, conservado in grupos:
+            eliminados = db.query(Horario).filter(
+                Horario.bus_id == bus_id, Horario.tipo == tipo, Horario.minuto_del_dia == minuto,
+                Horario.id != conservado
+            ).delete(synchronize_session=False)
+            horarios_eliminados += eliminados
+            print(f"  ⚠ Bus {bus_id}, {tipo.value} de las {minuto // 60:02d}:{minuto % 60:02d}: "
+                  f"{eliminados} horarios repetidos eliminados (se conserva el {conservado})")
+
+        db.commit()
+        print(f"[OK] {buses_unidos} buses repetidos unidos, {horarios_eliminados} horarios repetidos eliminados")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """Función principal"""
+    print("=" * 60)
+    print("   ViajeroApp - Migración de horarios")
+    print("=" * 60)
+    print(f"Base de datos: {settings.DB_NAME}")
+    print()
+
+    try:
+        print("Paso 1: Agregando columna minuto_del_dia...")
+        agregar_columna()
+        print()
+
+        print("Paso 2: Calculando minutos de los horarios existentes...")
+        calcular_minutos()
+        print()
+
+        print("Paso 3: Depurando buses y horarios repetidos...")
+        depurar_duplicados()
+        print()
+
+        print("Paso 4: Creando índices...")
+        crear_indices_faltantes()
+        print()
+
+        print("✅ Migración completada")
+        return 0
+    except Exception as e:
+        print(f"❌ [ERROR] Error en la migración: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
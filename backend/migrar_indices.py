@@ -0,0 +1,52 @@
+"""
+Script para crear los índices declarados en los modelos que falten en la base
+`Base.metadata.create_all` solo crea índices junto con tablas nuevas: en una
+base existente los índices agregados después hay que crearlos con este script.
+"""
+import sys
+from sqlalchemy import inspect
+from database import Base, engine
+import models  # Registrar los modelos en Base.metadata
+from config import settings
+
+# Forzar UTF-8 en Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+def crear_indices_faltantes():
+    """Crear cada índice de los modelos que todavía no exista en su tabla"""
+    inspector = inspect(engine)
+    tablas_existentes = set(inspector.get_table_names())
+    creados = 0
+
+    for tabla in Base.metadata.sorted_tables:
+        if tabla.name not in tablas_existentes:
+            continue
+
+        existentes = {indice["name"] for indice in inspector.get_indexes(tabla.name)}
+        for indice in tabla.indexes:
+            if indice.name in existentes:
+                continue
+            indice.create(bind=engine)
+            creados += 1
+            print(f"[OK] Índice '{indice.name}' creado en '{tabla.name}'")
+
+    print(f"[OK] {creados} índices creados")
+
+def main():
+    """Función principal"""
+    print("=" * 60)
+    print("   ViajeroApp - Migración de índices")
+    print("=" * 60)
+    print(f"Base de datos: {settings.DB_NAME}")
+    print()
+
+    try:
+        crear_indices_faltantes()
+        return 0
+    except Exception as e:
+        print(f"❌ [ERROR] Error creando índices: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
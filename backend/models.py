@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, Text, ForeignKey, Enum, LargeBinary, Index
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from database import Base
+from geometria import codificar_geometria, decodificar_geometria, binario_a_polyline
+from simplificacion import geometrias_multinivel
 import json
 import enum
+import re
 
 # ==================== ENUMS ====================
 
@@ -30,6 +33,29 @@ class TipoNotificacion(str, enum.Enum):
     ALERT = "alert"
     SUCCESS = "success"
 
+# ==================== UTILIDADES ====================
+
+_PATRON_HORA = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*(am|pm)?\s*$", re.IGNORECASE)
+
+def minutos_desde_hora(hora):
+    """
+    Minutos desde la medianoche de una hora "HH:MM am/pm" (o "HH:MM" de 24 horas)
+    Devuelve None si la hora no se puede interpretar
+    """
+    coincidencia = _PATRON_HORA.match(hora or "")
+    if not coincidencia:
+        return None
+    horas, minutos, periodo = int(coincidencia.group(1)), int(coincidencia.group(2)), coincidencia.group(3)
+    if minutos > 59:
+        return None
+    if periodo:
+        if not 1 <= horas <= 12:
+            return None
+        horas = horas % 12 + (12 if periodo.lower() == "pm" else 0)
+    elif horas > 23:
+        return None
+    return horas * 60 + minutos
+
 # ==================== MODELOS ====================
 
 class Usuario(Base):
@@ -85,14 +111,45 @@ class Ruta(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     distance = Column(Float, nullable=True)  # Distancia en km
     duration = Column(Integer, nullable=True)  # Duración en minutos
-    route_geometry = Column(Text, nullable=True)  # JSON string de coordenadas
+    route_geometry = Column(Text, nullable=True)  # JSON string de coordenadas (formato anterior)
+    geometria = Column(LargeBinary(16777215), nullable=True)  # Coordenadas int32 de punto fijo (ver geometria.py)
 
     # Relación con paradas
     paradas = relationship("Parada", back_populates="ruta", cascade="all, delete-orphan")
 
-    def to_dict(self):
-        """Convertir el modelo a diccionario para JSON"""
-        return {
+    def set_coordenadas(self, coordenadas):
+        """Guardar la geometría en formato binario (None o lista vacía la borra)"""
+        self.geometria = codificar_geometria(coordenadas) if coordenadas else None
+        self.route_geometry = None
+
+    def geometria_binaria(self, tolerancia=0):
+        """Geometría en binario de punto fijo, simplificada si se pide una tolerancia (m)"""
+        geometria = self.geometria
+        if not geometria and self.route_geometry:
+            geometria = codificar_geometria(json.loads(self.route_geometry))
+        if not geometria:
+            return b""
+        return geometrias_multinivel.obtener(self.id, geometria, tolerancia)
+
+    def coordenadas(self, tolerancia=0):
+        """Geometría como [[lng, lat], ...], admite filas aún no migradas"""
+        if not tolerancia and not self.geometria and self.route_geometry:
+            return json.loads(self.route_geometry)
+        geometria = self.geometria_binaria(tolerancia)
+        return decodificar_geometria(geometria) if geometria else []
+
+    def polyline(self, tolerancia=0):
+        """Geometría como Google Encoded Polyline"""
+        return binario_a_polyline(self.geometria_binaria(tolerancia))
+
+    def to_dict(self, formato_geometria="coordenadas", tolerancia=0):
+        """
+        Convertir el modelo a diccionario para JSON
+
+        - **formato_geometria**: "coordenadas" (routeGeometry) o "polyline" (routePolyline)
+        - **tolerancia**: nivel de simplificación en metros (0 = geometría completa)
+        """
+        data = {
             "id": self.id,
             "name": self.name,
             "number": self.number,
@@ -103,9 +160,13 @@ class Ruta(Base):
             "createdAt": self.created_at.strftime("%d/%m/%Y") if self.created_at else None,
             "distance": str(self.distance) if self.distance else None,
             "duration": self.duration,
-            "routeGeometry": json.loads(self.route_geometry) if self.route_geometry else [],
-            "paradas": [parada.to_dict() for parada in self.paradas]
         }
+        if formato_geometria == "polyline":
+            data["routePolyline"] = self.polyline(tolerancia)
+        else:
+            data["routeGeometry"] = self.coordenadas(tolerancia)
+        data["paradas"] = [parada.to_dict() for parada in self.paradas]
+        return data
 
 class Parada(Base):
     """
@@ -146,6 +207,11 @@ class Bus(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Clave natural para la carga masiva de horarios (carga_masiva.py)
+        Index("uq_buses_nombre_zona", "nombre_transporte", "zona", unique=True),
+    )
+
     # Relaciones
     horarios = relationship("Horario", back_populates="bus", cascade="all, delete-orphan")
 
@@ -172,13 +238,26 @@ class Horario(Base):
     tipo = Column(Enum(TipoHorario), nullable=False)  # salida o entrada
     destino_procedencia = Column(String(100), nullable=False)  # Destino (salida) o Procedencia (entrada)
     hora = Column(String(10), nullable=False)  # Formato: "HH:MM am/pm"
+    minuto_del_dia = Column(Integer, nullable=True)  # `hora` en minutos desde la medianoche (para ordenar/filtrar)
     estado = Column(Enum(EstadoBus), default=EstadoBus.GREEN)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_horarios_tipo_minuto", "tipo", "minuto_del_dia"),
+        # Un bus no tiene dos salidas (o entradas) a la misma hora; clave de la carga masiva
+        Index("uq_horarios_bus_tipo_minuto", "bus_id", "tipo", "minuto_del_dia", unique=True),
+    )
+
     # Relación con bus
     bus = relationship("Bus", back_populates="horarios")
 
+    @validates("hora")
+    def _sincronizar_minuto(self, key, hora):
+        """Mantener minuto_del_dia al día en cada escritura de `hora`"""
+        self.minuto_del_dia = minutos_desde_hora(hora)
+        return hora
+
     def to_dict(self):
         """Convertir horario a diccionario"""
         return {
@@ -257,6 +336,10 @@ class ViajePlaneado(Base):
     Historial de viajes que los usuarios han planeado
     """
     __tablename__ = "viajes_planeados"
+    __table_args__ = (
+        # Paginación por cursor del historial de cada usuario
+        Index("ix_viajes_usuario_created_id", "usuario_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False)
@@ -336,6 +419,10 @@ class Notificacion(Base):
     Notificaciones enviadas a usuarios
     """
     __tablename__ = "notificaciones"
+    __table_args__ = (
+        # Paginación por cursor de las notificaciones de cada usuario (y globales con usuario_id NULL)
+        Index("ix_notificaciones_usuario_created_id", "usuario_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=True)  # Null = notificación global
@@ -359,3 +446,25 @@ class Notificacion(Base):
             "leida": self.leida,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
+
+class PosicionVehiculo(Base):
+    """
+    Modelo de Posición de Vehículo
+    Historial de pings de los vehículos, solo inserción y por lotes (ver vehiculos.py).
+    Coordenadas en enteros de punto fijo (millonésimas de grado, como geometria.py)
+    """
+    __tablename__ = "posiciones_vehiculos"
+    __table_args__ = (
+        Index("ix_posiciones_vehiculo_registrado", "vehiculo", "registrado_en"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    vehiculo = Column(String(50), nullable=False)
+    ruta_id = Column(Integer, nullable=False)  # Sin FK: el historial se conserva aunque se elimine la ruta
+    lat_e6 = Column(Integer, nullable=False)
+    lng_e6 = Column(Integer, nullable=False)
+    velocidad = Column(Float, nullable=True)  # km/h informada por el vehículo
+    registrado_en = Column(DateTime, nullable=False)  # Momento del ping (no de la escritura)
+
+# Tabla de versiones por colección y eventos de escritura que la incrementan (ver versiones.py)
+import versiones
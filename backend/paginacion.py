@@ -0,0 +1,158 @@
+"""
+Paginación por cursor (keyset)
+En lugar de OFFSET, cada página continúa desde la clave de la última fila de
+la página anterior, así la página N cuesta lo mismo que la primera.
+
+El cursor es opaco para el cliente (JSON en base64 url-safe) y viaja en la
+cabecera `X-Next-Cursor`; el cuerpo de la respuesta sigue siendo una lista.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, and_, or_, select, union_all
+from sqlalchemy.orm import aliased
+
+# Cabecera con el cursor de la página siguiente (ausente en la última página)
+CABECERA_CURSOR = "X-Next-Cursor"
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    """Convertir los valores de la clave de orden a un cursor opaco"""
+    serializables = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    crudo = json.dumps(serializables, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str, columnas: Sequence) -> List[Any]:
+    """Recuperar los valores de la clave de orden; 400 si el cursor no es válido"""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valores, list) or len(valores) != len(columnas):
+            raise ValueError("Cantidad de valores incorrecta")
+        if any(isinstance(valor, (list, dict)) for valor in valores):
+            raise ValueError("Los valores del cursor deben ser escalares")
+        return [
+            datetime.fromisoformat(valor) if isinstance(columna.type, DateTime) and valor is not None else valor
+            for columna, valor in zip(columnas, valores)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+
+
+def _despues_de(columnas: Sequence, valores: Sequence[Any], descendente: bool):
+    """
+    Condición "fila posterior al cursor" expandida:
+    (a > x) OR (a = x AND b > y) ...  (con < si el orden es descendente)
+    """
+    condiciones = []
+    for i, columna in enumerate(columnas):
+        iguales = [columnas[j] == valores[j] for j in range(i)]
+        comparacion = columna < valores[i] if descendente else columna > valores[i]
+        condiciones.append(and_(*iguales, comparacion))
+    return or_(*condiciones)
+
+
+def _consulta_pagina(query, columnas: Sequence, cursor: Optional[str], limit: int, descendente: bool,
+                     saltar: int = 0):
+    """Filtro del cursor, orden y límite (sirve para Query y para select())"""
+    if cursor:
+        if saltar:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="skip no se puede combinar con cursor"
+            )
+        valores = decodificar_cursor(cursor, columnas)
+        query = query.filter(_despues_de(columnas, valores, descendente))
+
+    orden = [columna.desc() if descendente else columna.asc() for columna in columnas]
+    query = query.order_by(*orden).limit(limit + 1)
+    # `skip` (obsoleto) se mantiene para los clientes que todavía paginan con OFFSET
+    return query.offset(saltar) if saltar else query
+
+
+def _cortar_pagina(filas: list, columnas: Sequence, limit: int) -> Tuple[list, Optional[str]]:
+    """Se pide una fila de más: si llegó, hay página siguiente"""
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        siguiente = codificar_cursor([getattr(ultima, columna.key) for columna in columnas])
+
+    return filas, siguiente
+
+
+def paginar(query, columnas: Sequence, cursor: Optional[str], limit: int,
+            descendente: bool = False, saltar: int = 0) -> Tuple[list, Optional[str]]:
+    """
+    Obtener una página de `query` ordenada por `columnas`
+
+    Las columnas deben identificar cada fila de forma única (terminar en el
+    ID) y estar cubiertas por un índice. Devuelve (filas, cursor_siguiente).
+    `saltar` es el OFFSET del parámetro obsoleto `skip` (solo sin cursor); el
+    cursor devuelto sirve igual para seguir desde esa página.
+    """
+    filas = _consulta_pagina(query, columnas, cursor, limit, descendente, saltar).all()
+    return _cortar_pagina(filas, columnas, limit)
+
+
+async def paginar_async(db, consulta, columnas: Sequence, cursor: Optional[str], limit: int,
+                        descendente: bool = False, saltar: int = 0) -> Tuple[list, Optional[str]]:
+    """Igual que paginar() para una sesión asíncrona y un select() de una entidad"""
+    resultado = await db.execute(_consulta_pagina(consulta, columnas, cursor, limit, descendente, saltar))
+    return _cortar_pagina(list(resultado.scalars().all()), columnas, limit)
+
+
+async def paginar_union_async(db, entidad, consultas: Sequence, columnas: Sequence, cursor: Optional[str],
+                              limit: int, descendente: bool = False) -> Tuple[list, Optional[str]]:
+    """
+    Igual que paginar_async() para filas de `entidad` que cumplen cualquiera de
+    varias consultas (en lugar de un OR entre ellas)
+
+    Un OR sobre la primera columna de un índice no se resuelve como un solo
+    rango ordenado y obliga a ordenar todas las filas que coinciden. Cada
+    consulta se pagina por separado (su propio rango del índice, con límite)
+    y se unen con UNION ALL: las consultas no deben tener filas en común.
+    """
+    ramas = [select(_consulta_pagina(c, columnas, cursor, limit, descendente).subquery()) for c in consultas]
+    fila = aliased(entidad, union_all(*ramas).subquery())
+    externas = [getattr(fila, columna.key) for columna in columnas]
+    orden = [columna.desc() if descendente else columna.asc() for columna in externas]
+    resultado = await db.execute(select(fila).order_by(*orden).limit(limit + 1))
+    return _cortar_pagina(list(resultado.scalars().all()), columnas, limit)
+
+
+def recorrer_por_lotes(construir_query: Callable[[], Any], columnas: Sequence,
+                       tamano_lote: int) -> Iterator[list]:
+    """
+    Recorrer todas las filas de la consulta en páginas keyset consecutivas
+
+    Cada lote es una consulta completa (con sus selectinload) que se lee
+    entera antes de pasar al siguiente, así no queda un cursor abierto en el
+    servidor mientras se ejecutan las consultas de las relaciones.
+    """
+    valores = None
+    while True:
+        query = construir_query()
+        if valores is not None:
+            query = query.filter(_despues_de(columnas, valores, False))
+        filas = query.order_by(*[columna.asc() for columna in columnas]).limit(tamano_lote).all()
+        if not filas:
+            return
+        valores = [getattr(filas[-1], columna.key) for columna in columnas]
+        yield filas
+        if len(filas) < tamano_lote:
+            return
+
+
+def agregar_cursor(response: Response, siguiente: Optional[str]):
+    """Agregar la cabecera con el cursor de la página siguiente, si la hay"""
+    if siguiente:
+        response.headers[CABECERA_CURSOR] = siguiente
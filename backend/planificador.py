@@ -0,0 +1,360 @@
+"""
+Planificador de viajes en transporte público (RAPTOR)
+Arma un modelo de frecuencias a partir de las rutas visibles (start_time,
+end_time, frequency y paradas ordenadas) y responde consultas
+origen/destino/hora con itinerarios de uno o varios buses.
+
+El modelo se guarda en arreglos en memoria y se reconstruye cuando cambia
+la versión de las rutas en la base de datos (versiones.py: cualquier alta,
+edición o baja de una ruta, en este u otro worker).
+Los tiempos internos son segundos desde la medianoche.
+"""
+import math
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from consultas import query_rutas
+from enrutamiento import haversine_m
+from indice_espacial import IndiceEspacial
+from versiones import RUTAS, leer_version
+
+# Velocidad promedio del bus si la ruta no tiene duración (igual que viajar.js)
+VELOCIDAD_BUS_KMH = 35
+
+# Caminata
+VELOCIDAD_CAMINATA = 1.25  # m/s (4.5 km/h)
+RADIO_CAMINATA = 800  # m desde el origen / hasta el destino
+RADIO_TRANSBORDO = 300  # m entre paradas de distintas rutas
+
+# Tarifa simulada (mismas constantes que Movil/js/viajar/viajar.js)
+TARIFA_BASE = 10  # C$
+PRECIO_POR_KM = 2.5  # C$
+
+MAX_TRANSBORDOS = 3
+
+INF = math.inf
+
+
+def parsear_hora(hora: str) -> Optional[int]:
+    """'HH:MM' (o 'HH:MM:SS') a segundos desde la medianoche"""
+    try:
+        partes = [int(p) for p in hora.strip().split(":")]
+    except (AttributeError, ValueError):
+        return None
+    if len(partes) < 2 or not (0 <= partes[0] <= 24 and 0 <= partes[1] < 60):
+        return None
+    return partes[0] * 3600 + partes[1] * 60 + (partes[2] if len(partes) > 2 else 0)
+
+
+def formatear_hora(segundos: float) -> str:
+    minutos = int(round(segundos / 60))
+    return f"{(minutos // 60) % 24:02d}:{minutos % 60:02d}"
+
+
+def formatear_duracion(minutos: int) -> str:
+    """Mismo formato que calculateTravelTime de viajar.js"""
+    if minutos < 60:
+        return f"{minutos} min"
+    horas, resto = divmod(minutos, 60)
+    return f"{horas}h {resto}min" if resto else f"{horas}h"
+
+
+def calcular_costo(distancia_km: float) -> float:
+    """Tarifa de un tramo en bus, redondeada a múltiplos de 5"""
+    return float(round((TARIFA_BASE + distancia_km * PRECIO_POR_KM) / 5) * 5)
+
+
+class Planificador:
+    """
+    Red de transporte en arreglos:
+    - Paradas: lat/lng, ruta a la que pertenecen y su posición en ella
+    - Rutas: paradas en orden, segundos desde la primera parada hasta cada
+      una, metros acumulados, primera/última salida y frecuencia
+    - Transbordos: paradas a distancia caminable de cada parada
+    """
+
+    def __init__(self, rutas, version: int = 0):
+        self.version = version
+        self.lat, self.lng = array("d"), array("d")
+        self.parada_ruta, self.parada_pos = array("i"), array("i")
+        self.parada_nombre: List[str] = []
+
+        self.ruta_info: List[Tuple[int, str, str]] = []
+        self.ruta_paradas: List[array] = []
+        self.ruta_offsets: List[array] = []
+        self.ruta_metros: List[array] = []
+        self.ruta_inicio, self.ruta_fin, self.ruta_frecuencia = array("i"), array("i"), array("i")
+
+        for ruta in rutas:
+            self._agregar_ruta(ruta)
+
+        self._indice = IndiceEspacial()
+        self._indice.cargar((s, self.lat[s], self.lng[s], None) for s in range(len(self.lat)))
+
+        self.transbordos: List[List[Tuple[int, float]]] = [
+            [(t, segundos) for t, segundos in self.cercanas(self.lat[s], self.lng[s], RADIO_TRANSBORDO)
+             if self.parada_ruta[t] != self.parada_ruta[s]]
+            for s in range(len(self.lat))
+        ]
+
+    @property
+    def total_paradas(self) -> int:
+        return len(self.lat)
+
+    @property
+    def total_rutas(self) -> int:
+        return len(self.ruta_info)
+
+    def _agregar_ruta(self, ruta):
+        paradas = sorted(ruta.paradas, key=lambda p: p.order)
+        inicio, fin = parsear_hora(ruta.start_time), parsear_hora(ruta.end_time)
+        if not ruta.visible or len(paradas) < 2 or inicio is None or fin is None or not ruta.frequency:
+            return
+        if fin < inicio:
+            fin += 24 * 3600  # Servicio que cruza la medianoche
+
+        metros = array("d", [0.0])
+        for a, b in zip(paradas, paradas[1:]):
+            metros.append(metros[-1] + haversine_m(a.lat, a.lng, b.lat, b.lng))
+
+        # Tiempo entre paradas proporcional a la distancia
+        total = metros[-1]
+        if ruta.duration and total > 0:
+            offsets = array("i", (int(m / total * ruta.duration * 60) for m in metros))
+        else:
+            offsets = array("i", (int(m / (VELOCIDAD_BUS_KMH / 3.6)) for m in metros))
+
+        r = len(self.ruta_info)
+        indices = array("i")
+        for pos, parada in enumerate(paradas):
+            indices.append(len(self.lat))
+            self.lat.append(parada.lat)
+            self.lng.append(parada.lng)
+            self.parada_ruta.append(r)
+            self.parada_pos.append(pos)
+            self.parada_nombre.append(parada.name)
+
+        self.ruta_info.append((ruta.id, ruta.number, ruta.name))
+        self.ruta_paradas.append(indices)
+        self.ruta_offsets.append(offsets)
+        self.ruta_metros.append(metros)
+        self.ruta_inicio.append(inicio)
+        self.ruta_fin.append(fin)
+        self.ruta_frecuencia.append(ruta.frequency * 60)
+
+    # ---------- Búsqueda espacial ----------
+
+    def cercanas(self, lat: float, lng: float, radio_m: float) -> List[Tuple[int, float]]:
+        """Paradas a menos de radio_m con su tiempo de caminata (segundos)"""
+        return [(s, distancia / VELOCIDAD_CAMINATA)
+                for distancia, s, _ in self._indice.cercanos(lat, lng, radio_m=radio_m)]
+
+    # ---------- RAPTOR ----------
+
+    def _proxima_salida(self, r: int, pos: int, desde: float) -> Optional[int]:
+        """Hora de salida (desde la primera parada) del primer bus que pasa por pos después de `desde`"""
+        inicio, frecuencia = self.ruta_inicio[r], self.ruta_frecuencia[r]
+        espera = desde - inicio - self.ruta_offsets[r][pos]
+        salida = inicio + max(0, math.ceil(espera / frecuencia)) * frecuencia
+        return salida if salida <= self.ruta_fin[r] else None
+
+    def planificar(self, origen: Tuple[float, float], destino: Tuple[float, float], hora: int,
+                   max_transbordos: int = MAX_TRANSBORDOS) -> List[dict]:
+        """
+        Itinerarios Pareto-óptimos (hora de llegada vs. número de buses)
+        saliendo del origen a la hora indicada (segundos desde la medianoche)
+        """
+        n = self.total_paradas
+        acceso = self.cercanas(origen[0], origen[1], RADIO_CAMINATA)
+        egreso = self.cercanas(destino[0], destino[1], RADIO_CAMINATA)
+
+        itinerarios = []
+        directo = haversine_m(origen[0], origen[1], destino[0], destino[1])
+        mejor_llegada = INF
+        if directo <= RADIO_CAMINATA:
+            mejor_llegada = hora + directo / VELOCIDAD_CAMINATA
+            itinerarios.append(self._itinerario_caminando(origen, destino, hora, mejor_llegada, directo))
+
+        if not acceso or not egreso:
+            return itinerarios
+
+        # Etiquetas por ronda k (= número de buses): llegada en bus y llegada final (bus o caminata)
+        llegada_bus = [[INF] * n]
+        llegada = [[INF] * n]
+        padre_bus: List[Dict[int, Tuple[int, int]]] = [{}]  # parada -> (parada donde subió, salida del bus)
+        padre_caminata: List[Dict[int, int]] = [{}]  # parada -> parada desde la que se caminó
+        mejor = [INF] * n
+
+        marcadas = set()
+        for s, segundos in acceso:
+            if hora + segundos < llegada[0][s]:
+                llegada[0][s] = mejor[s] = hora + segundos
+                marcadas.add(s)
+
+        for k in range(1, max_transbordos + 2):
+            anterior = llegada[k - 1]
+            llegada_bus.append([INF] * n)
+            llegada.append([INF] * n)
+            padre_bus.append({})
+            padre_caminata.append({})
+            actual_bus, actual = llegada_bus[k], llegada[k]
+
+            # Rutas a recorrer desde la primera parada marcada de cada una
+            cola: Dict[int, int] = {}
+            for s in marcadas:
+                r, pos = self.parada_ruta[s], self.parada_pos[s]
+                if pos < cola.get(r, len(self.ruta_paradas[r])):
+                    cola[r] = pos
+            marcadas = set()
+
+            for r, desde_pos in cola.items():
+                paradas, offsets = self.ruta_paradas[r], self.ruta_offsets[r]
+                salida, subida = None, -1
+                for pos in range(desde_pos, len(paradas)):
+                    s = paradas[pos]
+                    if salida is not None:
+                        t = salida + offsets[pos]
+                        if t < mejor[s] and t < mejor_llegada:
+                            actual_bus[s] = actual[s] = mejor[s] = t
+                            padre_bus[k][s] = (subida, salida)
+                            marcadas.add(s)
+                    if anterior[s] < INF and (salida is None or anterior[s] <= salida + offsets[pos]):
+                        nueva = self._proxima_salida(r, pos, anterior[s])
+                        if nueva is not None and (salida is None or nueva < salida):
+                            salida, subida = nueva, s
+
+            # Transbordos a pie desde las paradas a las que se llegó en bus
+            for s in list(marcadas):
+                base = actual_bus[s]
+                for t, segundos in self.transbordos[s]:
+                    if base + segundos < mejor[t] and base + segundos < mejor_llegada:
+                        actual[t] = mejor[t] = base + segundos
+                        padre_caminata[k][t] = s
+                        marcadas.add(t)
+
+            # Llegada al destino bajando del bus y caminando
+            mejor_ronda, parada_final = INF, -1
+            for s, segundos in egreso:
+                if actual_bus[s] + segundos < mejor_ronda:
+                    mejor_ronda, parada_final = actual_bus[s] + segundos, s
+            if mejor_ronda < mejor_llegada:
+                mejor_llegada = mejor_ronda
+                itinerarios.append(self._reconstruir(
+                    k, parada_final, origen, destino, hora, mejor_ronda,
+                    llegada, llegada_bus, padre_bus, padre_caminata
+                ))
+
+            if not marcadas:
+                break
+
+        itinerarios.sort(key=lambda i: (i["llegada"], i["numero_buses"]))
+        return itinerarios
+
+    # ---------- Itinerarios ----------
+
+    def _punto(self, s: int, segundos: float) -> dict:
+        return {"name": self.parada_nombre[s], "lat": self.lat[s], "lng": self.lng[s], "hora": formatear_hora(segundos)}
+
+    def _reconstruir(self, k, parada_final, origen, destino, hora, llegada_destino,
+                     llegada, llegada_bus, padre_bus, padre_caminata) -> dict:
+        tramos = []
+        s = parada_final
+        tramos.append(self._tramo_caminata(
+            {"lat": self.lat[s], "lng": self.lng[s], "hora": formatear_hora(llegada_bus[k][s])},
+            {"lat": destino[0], "lng": destino[1], "hora": formatear_hora(llegada_destino)},
+            llegada_destino - llegada_bus[k][s]
+        ))
+
+        # Al destino se camina desde la bajada del bus (llegada_bus): en la parada
+        # final no se sigue padre_caminata aunque haya una llegada a pie más temprana
+        while k > 0:
+            subida, salida = padre_bus[k][s]
+            r = self.parada_ruta[s]
+            pos_subida, pos_bajada = self.parada_pos[subida], self.parada_pos[s]
+            ruta_id, numero, nombre = self.ruta_info[r]
+            metros = self.ruta_metros[r][pos_bajada] - self.ruta_metros[r][pos_subida]
+            tramos.append({
+                "tipo": "bus",
+                "ruta_id": ruta_id,
+                "ruta_numero": numero,
+                "ruta_nombre": nombre,
+                "subir": self._punto(subida, salida + self.ruta_offsets[r][pos_subida]),
+                "bajar": self._punto(s, llegada_bus[k][s]),
+                "paradas": pos_bajada - pos_subida,
+                "distancia_km": round(metros / 1000, 2),
+                "costo": calcular_costo(metros / 1000),
+            })
+            s = subida
+            k -= 1
+            # A la parada de subida se pudo llegar a pie desde la bajada del bus anterior
+            if s in padre_caminata[k] and llegada[k][s] < llegada_bus[k][s]:
+                desde = padre_caminata[k][s]
+                tramos.append(self._tramo_caminata(
+                    self._punto(desde, llegada_bus[k][desde]), self._punto(s, llegada[k][s]),
+                    llegada[k][s] - llegada_bus[k][desde]
+                ))
+                s = desde
+
+        tramos.append(self._tramo_caminata(
+            {"lat": origen[0], "lng": origen[1], "hora": formatear_hora(hora)},
+            self._punto(s, llegada[0][s]),
+            llegada[0][s] - hora
+        ))
+        tramos.reverse()
+        tramos = [t for t in tramos if t["tipo"] == "bus" or t["minutos"] > 0]
+        return self._resumen(tramos, hora, llegada_destino)
+
+    @staticmethod
+    def _tramo_caminata(desde: dict, hasta: dict, segundos: float) -> dict:
+        return {
+            "tipo": "caminar",
+            "desde": desde,
+            "hasta": hasta,
+            "minutos": int(round(segundos / 60)),
+            "distancia_km": round(segundos * VELOCIDAD_CAMINATA / 1000, 2),
+        }
+
+    def _itinerario_caminando(self, origen, destino, hora, llegada_destino, metros) -> dict:
+        tramo = self._tramo_caminata(
+            {"lat": origen[0], "lng": origen[1], "hora": formatear_hora(hora)},
+            {"lat": destino[0], "lng": destino[1], "hora": formatear_hora(llegada_destino)},
+            metros / VELOCIDAD_CAMINATA
+        )
+        return self._resumen([tramo], hora, llegada_destino)
+
+    @staticmethod
+    def _resumen(tramos: List[dict], hora: float, llegada_destino: float) -> dict:
+        """Itinerario con los mismos campos que se guardan en ViajePlaneado"""
+        minutos = int(round((llegada_destino - hora) / 60))
+        buses = [t for t in tramos if t["tipo"] == "bus"]
+        return {
+            "salida": formatear_hora(hora),
+            "llegada": formatear_hora(llegada_destino),
+            "duracion_minutos": minutos,
+            "tiempo_estimado": formatear_duracion(minutos),
+            "numero_buses": len(buses),
+            "distancia_km": round(sum(t["distancia_km"] for t in tramos), 2),
+            "costo_estimado": sum(t["costo"] for t in buses),
+            "tramos": tramos,
+        }
+
+
+_planificador: Optional[Planificador] = None
+_lock = threading.Lock()
+
+
+def obtener_planificador(db: Session) -> Planificador:
+    """Planificador de la versión vigente de las rutas (se reconstruye tras cada escritura)"""
+    global _planificador
+    version = leer_version(db, RUTAS).numero
+    plan = _planificador
+    if plan is None or plan.version < version:
+        with _lock:
+            plan = _planificador
+            if plan is None or plan.version < version:
+                plan = Planificador(query_rutas(db).all(), version)
+                _planificador = plan
+    return plan
@@ -0,0 +1,125 @@
+"""
+Proyección de campos (sparse fieldsets) para los listados
+Permite pedir solo algunos campos con `fields=id,name,number` o quitar campos
+pesados con `exclude=routeGeometry,paradas`. Los campos no pedidos no se leen
+de MySQL (load_only) ni se serializan. `id` se devuelve siempre: identifica la
+fila para el cliente y es la clave del cursor de paginación.
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import load_only, selectinload
+
+from models import Ruta, Bus, Usuario
+
+# Campo de la API -> (columnas del modelo que necesita, función que obtiene el valor)
+Campos = Dict[str, Tuple[Tuple[str, ...], Callable]]
+
+
+def _fecha_iso(valor):
+    return valor.isoformat() if valor else None
+
+
+class Proyeccion:
+    """Campos disponibles de un modelo y cómo cargarlos/serializarlos"""
+
+    def __init__(self, modelo, campos: Campos, relaciones: Optional[Dict[str, Callable]] = None):
+        self.modelo = modelo
+        self.campos = campos
+        self.relaciones = relaciones or {}
+
+    def resolver(self, fields: Optional[str], exclude: Optional[str],
+                 por_defecto: Optional[Sequence[str]] = None) -> Optional[List[str]]:
+        """
+        Lista ordenada de campos a devolver, o None si no se pidió proyección
+        (en ese caso el endpoint usa su respuesta completa habitual)
+        """
+        if not fields and not exclude:
+            return None
+
+        base = list(por_defecto or self.campos)
+        if fields:
+            pedidos = self._parsear(fields)
+            seleccion = [campo for campo in self.campos if campo in pedidos]
+        else:
+            seleccion = base
+
+        if exclude:
+            excluidos = self._parsear(exclude)
+            seleccion = [campo for campo in seleccion if campo not in excluidos]
+
+        if "id" not in seleccion:
+            seleccion.insert(0, "id")
+        return seleccion
+
+    def _parsear(self, valor: str) -> set:
+        nombres = {nombre.strip() for nombre in valor.split(",") if nombre.strip()}
+        desconocidos = nombres - set(self.campos)
+        if desconocidos:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campos desconocidos: {', '.join(sorted(desconocidos))}. "
+                       f"Disponibles: {', '.join(self.campos)}"
+            )
+        return nombres
+
+    def opciones(self, campos: Sequence[str]) -> list:
+        """Opciones de carga: solo las columnas necesarias y las relaciones pedidas"""
+        columnas = {"id"}
+        for campo in campos:
+            columnas.update(self.campos[campo][0])
+        opciones = [load_only(*(getattr(self.modelo, nombre) for nombre in sorted(columnas)))]
+        opciones.extend(self.relaciones[campo]() for campo in campos if campo in self.relaciones)
+        return opciones
+
+    def serializar(self, obj, campos: Sequence[str], **contexto) -> dict:
+        """Diccionario con los campos pedidos, en el mismo formato que to_dict()"""
+        return {campo: self.campos[campo][1](obj, **contexto) for campo in campos}
+
+
+PROYECCION_RUTA = Proyeccion(
+    Ruta,
+    {
+        "id": ((), lambda r, **_: r.id),
+        "name": (("name",), lambda r, **_: r.name),
+        "number": (("number",), lambda r, **_: r.number),
+        "startTime": (("start_time",), lambda r, **_: r.start_time),
+        "endTime": (("end_time",), lambda r, **_: r.end_time),
+        "frequency": (("frequency",), lambda r, **_: str(r.frequency)),
+        "visible": (("visible",), lambda r, **_: r.visible),
+        "createdAt": (("created_at",), lambda r, **_: r.created_at.strftime("%d/%m/%Y") if r.created_at else None),
+        "distance": (("distance",), lambda r, **_: str(r.distance) if r.distance else None),
+        "duration": (("duration",), lambda r, **_: r.duration),
+        "routeGeometry": (("geometria", "route_geometry"), lambda r, nivel=0, **_: r.coordenadas(nivel)),
+        "routePolyline": (("geometria", "route_geometry"), lambda r, nivel=0, **_: r.polyline(nivel)),
+        "paradas": ((), lambda r, **_: [parada.to_dict() for parada in r.paradas]),
+    },
+    relaciones={"paradas": lambda: selectinload(Ruta.paradas)},
+)
+
+PROYECCION_BUS = Proyeccion(
+    Bus,
+    {
+        "id": ((), lambda b, **_: b.id),
+        "nombre_transporte": (("nombre_transporte",), lambda b, **_: b.nombre_transporte),
+        "zona": (("zona",), lambda b, **_: b.zona.value),
+        "activo": (("activo",), lambda b, **_: b.activo),
+        "created_at": (("created_at",), lambda b, **_: _fecha_iso(b.created_at)),
+        "horarios": (("nombre_transporte",), lambda b, **_: [horario.to_dict() for horario in b.horarios]),
+    },
+    relaciones={"horarios": lambda: selectinload(Bus.horarios)},
+)
+
+PROYECCION_USUARIO = Proyeccion(
+    Usuario,
+    {
+        "id": ((), lambda u, **_: u.id),
+        "nombre": (("nombre",), lambda u, **_: u.nombre),
+        "email": (("email",), lambda u, **_: u.email),
+        "foto_perfil": (("foto_perfil",), lambda u, **_: u.foto_perfil),
+        "created_at": (("created_at",), lambda u, **_: _fecha_iso(u.created_at)),
+        "updated_at": (("updated_at",), lambda u, **_: _fecha_iso(u.updated_at)),
+        "ultimo_acceso": (("ultimo_acceso",), lambda u, **_: _fecha_iso(u.ultimo_acceso)),
+        "activo": (("activo",), lambda u, **_: u.activo),
+    },
+)
@@ -2,23 +2,33 @@
 Router de Autenticación
 Endpoints para registro, login y gestión de usuarios
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
-from database import get_db
+from database import get_async_db
 from models import Usuario, EstadisticaUsuario
 from schemas import (
     UsuarioCreate, UsuarioUpdate, UsuarioUpdatePassword, UsuarioResponse,
     LoginRequest, LoginResponse, MessageResponse
 )
 from auth_utils import hash_password, verify_password
+from paginacion import paginar_async, agregar_cursor
+from serializacion import serializador
+from condicional import CACHE_CONTROL_PRIVADO, agregar_validadores, respuesta_no_modificada, validadores_version
+from versiones import USUARIOS, leer_versiones_async
+from proyeccion import PROYECCION_USUARIO
+from consultas import query_proyectada
+from streaming import quiere_stream, respuesta_ndjson
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
 
 @router.post("/register", response_model=LoginResponse, status_code=status.HTTP_201_CREATED)
-async def register(usuario_data: UsuarioCreate, db: Session = Depends(get_db)):
+async def register(usuario_data: UsuarioCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Registrar un nuevo usuario
 
@@ -30,7 +40,7 @@ async def register(usuario_data: UsuarioCreate, db: Session = Depends(get_db)):
         LoginResponse con los datos del usuario creado
     """
     # Verificar si el email ya existe
-    existing_user = db.query(Usuario).filter(Usuario.email == usuario_data.email).first()
+    existing_user = await db.scalar(select(Usuario).where(Usuario.email == usuario_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -50,14 +60,14 @@ async def register(usuario_data: UsuarioCreate, db: Session = Depends(get_db)):
         )
 
         db.add(nuevo_usuario)
-        db.flush()  # Para obtener el ID
+        await db.flush()  # Para obtener el ID
 
         # Crear estadísticas iniciales para el usuario
         estadisticas = EstadisticaUsuario(usuario_id=nuevo_usuario.id)
         db.add(estadisticas)
 
-        db.commit()
-        db.refresh(nuevo_usuario)
+        await db.commit()
+        await db.refresh(nuevo_usuario)
 
         return LoginResponse(
             message="Usuario registrado exitosamente",
@@ -65,14 +75,14 @@ async def register(usuario_data: UsuarioCreate, db: Session = Depends(get_db)):
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al registrar usuario: {str(e)}"
         )
 
 @router.post("/login", response_model=LoginResponse)
-async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
+async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Iniciar sesión
 
@@ -83,7 +93,7 @@ async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
         LoginResponse con los datos del usuario
     """
     # Buscar usuario por email
-    usuario = db.query(Usuario).filter(Usuario.email == credentials.email).first()
+    usuario = await db.scalar(select(Usuario).where(Usuario.email == credentials.email))
 
     if not usuario:
         raise HTTPException(
@@ -105,9 +115,10 @@ async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
             detail="Usuario desactivado. Contacta al administrador"
         )
 
-    # Actualizar último acceso
+    # Actualizar último acceso (no cambia la versión de usuarios, ver versiones.ATRIBUTOS_SIN_VERSION)
     usuario.ultimo_acceso = datetime.now()
-    db.commit()
+    await db.commit()
+    await db.refresh(usuario)  # updated_at lo calcula la base de datos
 
     return LoginResponse(
         message="Login exitoso",
@@ -115,27 +126,36 @@ async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
     )
 
 @router.get("/users/{usuario_id}", response_model=UsuarioResponse)
-async def get_usuario(usuario_id: int, db: Session = Depends(get_db)):
+async def get_usuario(usuario_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Obtener información de un usuario por ID
 
     - **usuario_id**: ID del usuario
+
+    Responde 304 con If-None-Match / If-Modified-Since si no cambió ningún usuario
     """
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    etag, modificado = validadores_version(await leer_versiones_async(db, USUARIOS), usuario_id)
+    existe = (await db.execute(select(Usuario.id).where(Usuario.id == usuario_id))).first()
 
-    if not usuario:
+    if existe is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Usuario con ID {usuario_id} no encontrado"
         )
 
-    return UsuarioResponse.model_validate(usuario.to_dict())
+    no_modificada = respuesta_no_modificada(request, etag, modificado, CACHE_CONTROL_PRIVADO)
+    if no_modificada is not None:
+        return no_modificada
+
+    usuario = await db.get(Usuario, usuario_id)
+    respuesta = serializador(UsuarioResponse).respuesta(usuario.to_dict())
+    return agregar_validadores(respuesta, etag, modificado, CACHE_CONTROL_PRIVADO)
 
 @router.put("/users/{usuario_id}", response_model=MessageResponse)
 async def update_usuario(
     usuario_id: int,
     usuario_data: UsuarioUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Actualizar información de un usuario
@@ -143,7 +163,7 @@ async def update_usuario(
     - **usuario_id**: ID del usuario
     - Todos los campos son opcionales
     """
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
 
     if not usuario:
         raise HTTPException(
@@ -157,7 +177,7 @@ async def update_usuario(
 
         # Verificar email único si se está actualizando
         if "email" in update_data and update_data["email"] != usuario.email:
-            existing_user = db.query(Usuario).filter(Usuario.email == update_data["email"]).first()
+            existing_user = await db.scalar(select(Usuario).where(Usuario.email == update_data["email"]))
             if existing_user:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -167,7 +187,7 @@ async def update_usuario(
         for key, value in update_data.items():
             setattr(usuario, key, value)
 
-        db.commit()
+        await db.commit()
 
         return MessageResponse(
             message="Usuario actualizado exitosamente",
@@ -177,7 +197,7 @@ async def update_usuario(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al actualizar usuario: {str(e)}"
@@ -187,7 +207,7 @@ async def update_usuario(
 async def change_password(
     usuario_id: int,
     password_data: UsuarioUpdatePassword,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Cambiar contraseña de un usuario
@@ -196,7 +216,7 @@ async def change_password(
     - **password_actual**: Contraseña actual
     - **password_nueva**: Nueva contraseña
     """
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
 
     if not usuario:
         raise HTTPException(
@@ -216,7 +236,7 @@ async def change_password(
         nuevo_hash = hash_password(password_data.password_nueva)
         usuario.password_hash = nuevo_hash
 
-        db.commit()
+        await db.commit()
 
         return MessageResponse(
             message="Contraseña actualizada exitosamente",
@@ -224,7 +244,7 @@ async def change_password(
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al cambiar contraseña: {str(e)}"
@@ -232,28 +252,72 @@ async def change_password(
 
 @router.get("/users", response_model=List[UsuarioResponse])
 async def get_all_usuarios(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    skip: int = Query(0, ge=0, deprecated=True),
     activos_solo: bool = False,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener lista de usuarios (para administración)
 
-    - **skip**: Registros a omitir (paginación)
+    - **cursor**: Cursor de la cabecera X-Next-Cursor de la página anterior
     - **limit**: Máximo de registros a devolver
+    - **skip**: Obsoleto, usar cursor. Registros a omitir (no se combina con cursor)
     - **activos_solo**: Si es True, solo devuelve usuarios activos
+    - **fields** / **exclude**: Campos a devolver u omitir, separados por coma (ej: exclude=foto_perfil)
+    - **stream**: Enviar todos los usuarios como NDJSON (también con `Accept: application/x-ndjson`),
+      sin paginar
+
+    Responde 304 con If-None-Match / If-Modified-Since si no cambió ningún usuario
     """
-    query = db.query(Usuario)
+    campos = PROYECCION_USUARIO.resolver(
+        fields, exclude,
+        por_defecto=[campo for campo in UsuarioResponse.model_fields if campo in PROYECCION_USUARIO.campos]
+    )
 
+    if quiere_stream(request, stream):
+        # El stream lee con su propia sesión síncrona en un hilo (ver streaming.py)
+        def construir(sesion: Session):
+            query = sesion.query(Usuario) if campos is None else query_proyectada(sesion, PROYECCION_USUARIO, campos)
+            if activos_solo:
+                query = query.filter(Usuario.activo == True)
+            return query
+
+        # Sin proyección se envían los mismos campos que UsuarioResponse
+        campos_stream = campos or [campo for campo in UsuarioResponse.model_fields if campo in PROYECCION_USUARIO.campos]
+        return respuesta_ndjson(
+            construir, lambda usuario: PROYECCION_USUARIO.serializar(usuario, campos_stream), [Usuario.id]
+        )
+
+    etag, modificado = validadores_version(
+        await leer_versiones_async(db, USUARIOS), cursor, limit, skip, activos_solo, campos
+    )
+    no_modificada = respuesta_no_modificada(request, etag, modificado, CACHE_CONTROL_PRIVADO)
+    if no_modificada is not None:
+        return no_modificada
+
+    consulta = select(Usuario)
+    if campos is not None:
+        consulta = consulta.options(*PROYECCION_USUARIO.opciones(campos))
     if activos_solo:
-        query = query.filter(Usuario.activo == True)
+        consulta = consulta.where(Usuario.activo == True)
+
+    usuarios, siguiente = await paginar_async(db, consulta, [Usuario.id], cursor, limit, saltar=skip)
 
-    usuarios = query.offset(skip).limit(limit).all()
-    return [UsuarioResponse.model_validate(u.to_dict()) for u in usuarios]
+    if campos is not None:
+        respuesta = JSONResponse(content=[PROYECCION_USUARIO.serializar(u, campos) for u in usuarios])
+    else:
+        respuesta = serializador(List[UsuarioResponse]).respuesta([u.to_dict() for u in usuarios])
+    agregar_cursor(respuesta, siguiente)
+    return agregar_validadores(respuesta, etag, modificado, CACHE_CONTROL_PRIVADO)
 
 @router.delete("/users/{usuario_id}", response_model=MessageResponse)
-async def delete_usuario(usuario_id: int, db: Session = Depends(get_db)):
+async def delete_usuario(usuario_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Eliminar (desactivar) un usuario
 
@@ -261,7 +325,7 @@ async def delete_usuario(usuario_id: int, db: Session = Depends(get_db)):
 
     Nota: Los usuarios no se eliminan físicamente, solo se desactivan
     """
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
 
     if not usuario:
         raise HTTPException(
@@ -271,7 +335,7 @@ async def delete_usuario(usuario_id: int, db: Session = Depends(get_db)):
 
     try:
         usuario.activo = False
-        db.commit()
+        await db.commit()
 
         return MessageResponse(
             message="Usuario desactivado exitosamente",
@@ -279,7 +343,7 @@ async def delete_usuario(usuario_id: int, db: Session = Depends(get_db)):
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al desactivar usuario: {str(e)}"
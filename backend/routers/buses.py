@@ -2,42 +2,90 @@
 Router de Buses y Horarios
 Endpoints para gestión de buses, horarios y paradas de buses
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from database import get_db
-from models import Bus, Horario, ParadaBus, ZonaBus, TipoHorario, EstadoBus
+from models import Bus, Horario, ParadaBus, ZonaBus, TipoHorario, EstadoBus, minutos_desde_hora
 from schemas import (
     BusCreate, BusUpdate, BusResponse,
-    HorarioCreate, HorarioUpdate, HorarioResponse,
-    ParadaBusCreate, ParadaBusUpdate, ParadaBusResponse,
+    HorarioCreate, HorarioUpdate, HorarioResponse, TipoHorarioEnum,
+    CargaHorariosRequest, CargaHorariosResponse, EtaParadaResponse,
+    ParadaBusCreate, ParadaBusUpdate, ParadaBusResponse, ParadaBusCercanaResponse,
+    CercanasLoteRequest,
     MessageResponse
 )
+from consultas import query_buses, query_proyectada
+from proyeccion import PROYECCION_BUS
+from streaming import quiere_stream, respuesta_ndjson
+from indice_espacial import indice_paradas
+from cache import encode_json
+from compresion import respuesta_precomprimida
+from condicional import agregar_validadores, respuesta_no_modificada, validadores_version
+from versiones import BUSES, leer_versiones
+from serializacion import serializador
+from tableros import tableros
+from eventos import canal_eventos, diferencias
+from carga_masiva import ErroresCarga, cargar_horarios
+from eta import motor_eta
 
 router = APIRouter(prefix="/buses", tags=["Buses y Horarios"])
 
 # ==================== BUSES ====================
 
 @router.get("/", response_model=List[BusResponse])
-async def get_all_buses(
+def get_all_buses(
+    request: Request,
     zona: str = None,
     activos_solo: bool = True,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    stream: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Obtener todos los buses con sus horarios"""
-    query = db.query(Bus)
-
-    if zona:
-        query = query.filter(Bus.zona == zona)
-    if activos_solo:
-        query = query.filter(Bus.activo == True)
-
-    buses = query.all()
-    return [BusResponse.model_validate(bus.to_dict()) for bus in buses]
+    """
+    Obtener todos los buses con sus horarios
+
+    - **fields** / **exclude**: Campos a devolver u omitir, separados por coma (ej: exclude=horarios)
+    - **stream**: Enviar como NDJSON (también con `Accept: application/x-ndjson`)
+
+    Responde 304 con If-None-Match / If-Modified-Since si no cambiaron buses ni horarios
+    """
+    campos = PROYECCION_BUS.resolver(fields, exclude)
+
+    def construir(sesion):
+        query = query_buses(sesion) if campos is None else query_proyectada(sesion, PROYECCION_BUS, campos)
+        if zona:
+            query = query.filter(Bus.zona == zona)
+        if activos_solo:
+            query = query.filter(Bus.activo == True)
+        return query
+
+    if quiere_stream(request, stream):
+        if campos is None:
+            return respuesta_ndjson(construir, lambda bus: bus.to_dict(), [Bus.id])
+        return respuesta_ndjson(construir, lambda bus: PROYECCION_BUS.serializar(bus, campos), [Bus.id])
+
+    # Versión leída antes que las filas: si hay una escritura entre medio, la
+    # próxima revalidación no coincide y el cliente recibe los datos nuevos
+    etag, modificado = validadores_version(leer_versiones(db, BUSES), zona, activos_solo, campos)
+    no_modificada = respuesta_no_modificada(request, etag, modificado)
+    if no_modificada is not None:
+        return no_modificada
+
+    buses = construir(db).all()
+    if campos is not None:
+        respuesta = JSONResponse(content=[PROYECCION_BUS.serializar(bus, campos) for bus in buses])
+    else:
+        respuesta = serializador(List[BusResponse]).respuesta([bus.to_dict() for bus in buses])
+    return agregar_validadores(respuesta, etag, modificado)
 
 @router.post("/", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def create_bus(bus_data: BusCreate, db: Session = Depends(get_db)):
+def create_bus(bus_data: BusCreate, db: Session = Depends(get_db)):
     """Crear un nuevo bus"""
     try:
         nuevo_bus = Bus(**bus_data.model_dump())
@@ -46,6 +94,12 @@ async def create_bus(bus_data: BusCreate, db: Session = Depends(get_db)):
         db.refresh(nuevo_bus)
 
         return MessageResponse(message="Bus creado exitosamente", id=nuevo_bus.id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ya existe un bus con ese nombre en la zona"
+        )
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -53,24 +107,38 @@ async def create_bus(bus_data: BusCreate, db: Session = Depends(get_db)):
             detail=f"Error al crear bus: {str(e)}"
         )
 
+def _datos_bus(bus: Bus) -> dict:
+    """Campos del bus que se notifican (sin horarios)"""
+    return {"nombre_transporte": bus.nombre_transporte, "zona": bus.zona.value, "activo": bus.activo}
+
 @router.put("/{bus_id}", response_model=MessageResponse)
-async def update_bus(bus_id: int, bus_data: BusUpdate, db: Session = Depends(get_db)):
+def update_bus(bus_id: int, bus_data: BusUpdate, db: Session = Depends(get_db)):
     """Actualizar un bus"""
     bus = db.query(Bus).filter(Bus.id == bus_id).first()
     if not bus:
         raise HTTPException(status_code=404, detail="Bus no encontrado")
 
     try:
+        zona_anterior = bus.zona
+        antes = _datos_bus(bus)
         for key, value in bus_data.model_dump(exclude_unset=True).items():
             setattr(bus, key, value)
         db.commit()
+
+        cambios = diferencias(antes, _datos_bus(bus))
+        if cambios:
+            for zona in {zona_anterior.value, bus.zona.value}:
+                canal_eventos.publicar(zona, {"evento": "bus", "id": bus_id, "cambios": cambios})
         return MessageResponse(message="Bus actualizado exitosamente", id=bus_id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya existe un bus con ese nombre en la zona")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.delete("/{bus_id}", response_model=MessageResponse)
-async def delete_bus(bus_id: int, db: Session = Depends(get_db)):
+def delete_bus(bus_id: int, db: Session = Depends(get_db)):
     """Eliminar un bus"""
     bus = db.query(Bus).filter(Bus.id == bus_id).first()
     if not bus:
@@ -87,7 +155,7 @@ async def delete_bus(bus_id: int, db: Session = Depends(get_db)):
 # ==================== HORARIOS ====================
 
 @router.post("/{bus_id}/horarios", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def add_horario(bus_id: int, horario_data: HorarioCreate, db: Session = Depends(get_db)):
+def add_horario(bus_id: int, horario_data: HorarioCreate, db: Session = Depends(get_db)):
     """Agregar un horario a un bus"""
     bus = db.query(Bus).filter(Bus.id == bus_id).first()
     if not bus:
@@ -100,50 +168,113 @@ async def add_horario(bus_id: int, horario_data: HorarioCreate, db: Session = De
         db.refresh(nuevo_horario)
 
         return MessageResponse(message="Horario agregado exitosamente", id=nuevo_horario.id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="El bus ya tiene un horario de ese tipo a esa hora")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-@router.get("/{zona}/salidas", response_model=List[HorarioResponse])
-async def get_salidas(zona: str, db: Session = Depends(get_db)):
-    """Obtener salidas de una zona específica"""
-    horarios = db.query(Horario).join(Bus).filter(
-        Bus.zona == zona,
-        Horario.tipo == TipoHorario.SALIDA,
-        Bus.activo == True
-    ).all()
+@router.post("/horarios/bulk", response_model=CargaHorariosResponse)
+def cargar_horarios_masivo(datos: CargaHorariosRequest, db: Session = Depends(get_db)):
+    """
+    Cargar un horario completo (p. ej. una temporada) en una sola transacción
 
-    return [HorarioResponse.model_validate(h.to_dict()) for h in horarios]
+    Cada fila: `transporte`, `zona`, `tipo`, `destino_procedencia`, `hora`, `estado` (opcional).
+    Los buses se identifican por (transporte, zona) y se crean si no existen; los
+    horarios por (bus, tipo, hora) y se insertan o actualizan.
 
-@router.get("/{zona}/entradas", response_model=List[HorarioResponse])
-async def get_entradas(zona: str, db: Session = Depends(get_db)):
-    """Obtener entradas de una zona específica"""
-    horarios = db.query(Horario).join(Bus).filter(
-        Bus.zona == zona,
-        Horario.tipo == TipoHorario.ENTRADA,
-        Bus.activo == True
-    ).all()
+    - **parcial**: false (por defecto) no escribe nada si alguna fila es inválida (400 con
+      la lista de errores); true importa las filas válidas e informa las demás
+    """
+    try:
+        resumen = cargar_horarios(db, datos.horarios, datos.parcial)
+    except ErroresCarga as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Hay filas con errores, no se cargó ningún horario", "errores": e.errores}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al cargar horarios: {str(e)}"
+        )
 
-    return [HorarioResponse.model_validate(h.to_dict()) for h in horarios]
+    if resumen["zonas"]:
+        for zona in resumen["zonas"]:
+            canal_eventos.publicar(zona, {"evento": "resync"})
+    return resumen
+
+def _respuesta_tablero(request: Request, db: Session, zona: str, tipo: TipoHorario) -> Response:
+    tablero = tableros.obtener(db, zona, tipo)
+    if tablero is None:
+        return Response(content=b"[]", media_type="application/json")
+    return respuesta_precomprimida(request, tablero.cuerpo)
+
+@router.get("/{zona}/salidas", response_model=List[HorarioResponse])
+def get_salidas(zona: str, request: Request, db: Session = Depends(get_db)):
+    """Obtener salidas de una zona específica, ordenadas por hora (tablero en memoria)"""
+    return _respuesta_tablero(request, db, zona, TipoHorario.SALIDA)
+
+@router.get("/{zona}/entradas", response_model=List[HorarioResponse])
+def get_entradas(zona: str, request: Request, db: Session = Depends(get_db)):
+    """Obtener entradas de una zona específica, ordenadas por hora (tablero en memoria)"""
+    return _respuesta_tablero(request, db, zona, TipoHorario.ENTRADA)
+
+@router.get("/{zona}/proximas")
+def get_proximas(
+    zona: str,
+    desde: Optional[str] = None,
+    n: int = Query(5, ge=1, le=50),
+    tipo: TipoHorarioEnum = TipoHorarioEnum.SALIDA,
+    db: Session = Depends(get_db)
+):
+    """
+    Obtener los próximos horarios de una zona, ordenados por hora
+
+    - **desde**: Hora de referencia HH:MM o "HH:MM am/pm" (por defecto la hora actual)
+    - **n**: Cantidad de horarios
+    - **tipo**: salida (por defecto) o entrada
+
+    Cada horario incluye `minutos_restantes` hasta su hora
+    """
+    if desde is None:
+        ahora = datetime.now()
+        minuto = ahora.hour * 60 + ahora.minute
+    else:
+        minuto = minutos_desde_hora(desde)
+        if minuto is None:
+            raise HTTPException(status_code=400, detail="Hora inválida, use el formato HH:MM")
+
+    tablero = tableros.obtener(db, zona, TipoHorario(tipo.value))
+    return tablero.proximos(minuto, n) if tablero else []
 
 @router.put("/horarios/{horario_id}", response_model=MessageResponse)
-async def update_horario(horario_id: int, horario_data: HorarioUpdate, db: Session = Depends(get_db)):
+def update_horario(horario_id: int, horario_data: HorarioUpdate, db: Session = Depends(get_db)):
     """Actualizar un horario (especialmente el estado)"""
     horario = db.query(Horario).filter(Horario.id == horario_id).first()
     if not horario:
         raise HTTPException(status_code=404, detail="Horario no encontrado")
 
     try:
+        antes = horario.to_dict()
         for key, value in horario_data.model_dump(exclude_unset=True).items():
             setattr(horario, key, value)
         db.commit()
+
+        cambios = diferencias(antes, horario.to_dict())
+        if cambios:
+            canal_eventos.publicar(horario.bus.zona.value, {"evento": "horario", "id": horario_id, "cambios": cambios})
         return MessageResponse(message="Horario actualizado exitosamente", id=horario_id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="El bus ya tiene un horario de ese tipo a esa hora")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.delete("/horarios/{horario_id}", response_model=MessageResponse)
-async def delete_horario(horario_id: int, db: Session = Depends(get_db)):
+def delete_horario(horario_id: int, db: Session = Depends(get_db)):
     """Eliminar un horario"""
     horario = db.query(Horario).filter(Horario.id == horario_id).first()
     if not horario:
@@ -162,20 +293,34 @@ async def delete_horario(horario_id: int, db: Session = Depends(get_db)):
 router_paradas = APIRouter(prefix="/paradas-buses", tags=["Paradas de Buses"])
 
 @router_paradas.get("/", response_model=List[ParadaBusResponse])
-async def get_all_paradas(zona: str = None, activas_solo: bool = True, db: Session = Depends(get_db)):
-    """Obtener todas las paradas de buses"""
-    query = db.query(ParadaBus)
+def get_all_paradas(
+    request: Request,
+    zona: str = None,
+    activas_solo: bool = True,
+    stream: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Obtener todas las paradas de buses
+
+    - **stream**: Enviar como NDJSON (también con `Accept: application/x-ndjson`)
+    """
+    def construir(sesion):
+        query = sesion.query(ParadaBus)
+        if zona:
+            query = query.filter(ParadaBus.zona == zona)
+        if activas_solo:
+            query = query.filter(ParadaBus.activa == True)
+        return query
 
-    if zona:
-        query = query.filter(ParadaBus.zona == zona)
-    if activas_solo:
-        query = query.filter(ParadaBus.activa == True)
+    if quiere_stream(request, stream):
+        return respuesta_ndjson(construir, lambda parada: parada.to_dict(), [ParadaBus.id])
 
-    paradas = query.all()
-    return [ParadaBusResponse.model_validate(p.to_dict()) for p in paradas]
+    paradas = construir(db).all()
+    return serializador(List[ParadaBusResponse]).respuesta([p.to_dict() for p in paradas])
 
 @router_paradas.post("/", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def create_parada(parada_data: ParadaBusCreate, db: Session = Depends(get_db)):
+def create_parada(parada_data: ParadaBusCreate, db: Session = Depends(get_db)):
     """Crear una nueva parada de bus"""
     try:
         nueva_parada = ParadaBus(**parada_data.model_dump())
@@ -188,23 +333,89 @@ async def create_parada(parada_data: ParadaBusCreate, db: Session = Depends(get_
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-@router_paradas.get("/cercanas")
-async def get_paradas_cercanas(lat: float, lng: float, radio_km: float = 1.0, db: Session = Depends(get_db)):
-    """Obtener paradas cercanas a una ubicación (búsqueda simple)"""
-    paradas = db.query(ParadaBus).filter(ParadaBus.activa == True).all()
-
-    # Filtro simple por distancia aproximada
-    paradas_cercanas = []
-    for parada in paradas:
-        dist_lat = abs(parada.lat - lat)
-        dist_lng = abs(parada.lng - lng)
-        if dist_lat < (radio_km / 111) and dist_lng < (radio_km / 111):
-            paradas_cercanas.append(ParadaBusResponse.model_validate(parada.to_dict()))
+@router_paradas.get("/cercanas", response_model=List[ParadaBusCercanaResponse])
+def get_paradas_cercanas(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radio_km: Optional[float] = Query(None, gt=0, le=100),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    zona: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Obtener paradas cercanas a una ubicación, de la más cercana a la más lejana
+
+    - **radio_km**: Radio de búsqueda (por defecto 1 km si no se envía `limit`)
+    - **limit**: Devolver como máximo las N paradas más cercanas (sin `radio_km`
+      busca las N más cercanas a cualquier distancia)
+    - **zona**: Filtrar por zona
+
+    Cada parada incluye `distancia_km` (haversine) al punto consultado.
+    """
+    indice_paradas.sincronizar(db)
+
+    if radio_km is None and limit is None:
+        radio_km = 1.0
+
+    cercanas = indice_paradas.cercanos(
+        lat, lng,
+        radio_m=radio_km * 1000 if radio_km is not None else None,
+        k=limit,
+        filtro=(lambda parada: parada["zona"] == zona) if zona else None
+    )
+    return serializador(List[ParadaBusCercanaResponse]).respuesta(
+        [{**parada, "distancia_km": round(distancia / 1000, 3)} for distancia, _, parada in cercanas]
+    )
+
+@router_paradas.post("/cercanas/batch")
+def get_paradas_cercanas_lote(datos: CercanasLoteRequest, db: Session = Depends(get_db)):
+    """
+    Obtener las k paradas más cercanas a cada punto de una lista (hasta 5000)
+
+    - **k**: Paradas por punto
+    - **radio_km**: Descartar paradas más lejanas (opcional)
+    - **zona**: Filtrar por zona (opcional)
+
+    Devuelve un elemento por punto, en el mismo orden, con sus paradas
+    ordenadas por distancia (cada una con `distancia_km`)
+    """
+    indice_paradas.sincronizar(db)
+
+    zona = datos.zona.value if datos.zona else None
+    puntos = [(p.lat, p.lng) for p in datos.puntos]
+    resultados = indice_paradas.cercanos_lote(
+        puntos,
+        datos.k,
+        datos.radio_km * 1000 if datos.radio_km is not None else None,
+        (lambda parada: parada["zona"] == zona) if zona else None
+    )
+
+    contenido = [
+        {
+            "lat": lat,
+            "lng": lng,
+            "paradas": [{**parada, "distancia_km": round(distancia / 1000, 3)} for distancia, _, parada in aciertos]
+        }
+        for (lat, lng), aciertos in zip(puntos, resultados)
+    ]
+    return Response(content=encode_json(contenido), media_type="application/json")
+
+@router_paradas.get("/{parada_id}/eta", response_model=EtaParadaResponse)
+def get_eta_parada(parada_id: int, limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    """
+    Próximas llegadas estimadas de vehículos a la parada
+
+    Calculadas con las posiciones en vivo (POST /vehicles/positions) de los vehículos
+    cuyas rutas pasan por la parada; la más cercana primero.
+    """
+    indice_paradas.sincronizar(db)
+    if parada_id not in indice_paradas:
+        raise HTTPException(status_code=404, detail="Parada no encontrada")
 
-    return paradas_cercanas
+    return {"parada_id": parada_id, "llegadas": motor_eta.llegadas(("parada_bus", parada_id), limit)}
 
 @router_paradas.put("/{parada_id}", response_model=MessageResponse)
-async def update_parada(parada_id: int, parada_data: ParadaBusUpdate, db: Session = Depends(get_db)):
+def update_parada(parada_id: int, parada_data: ParadaBusUpdate, db: Session = Depends(get_db)):
     """Actualizar una parada de bus"""
     parada = db.query(ParadaBus).filter(ParadaBus.id == parada_id).first()
     if not parada:
@@ -220,7 +431,7 @@ async def update_parada(parada_id: int, parada_data: ParadaBusUpdate, db: Sessio
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router_paradas.delete("/{parada_id}", response_model=MessageResponse)
-async def delete_parada(parada_id: int, db: Session = Depends(get_db)):
+def delete_parada(parada_id: int, db: Session = Depends(get_db)):
     """Eliminar una parada de bus"""
     parada = db.query(ParadaBus).filter(ParadaBus.id == parada_id).first()
     if not parada:
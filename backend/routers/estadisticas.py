@@ -3,11 +3,11 @@ Router de Estadísticas
 Endpoints para gestión y consulta de estadísticas de usuarios
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
-from database import get_db
+from database import get_async_db
 from models import EstadisticaUsuario, Usuario, ViajePlaneado, Ruta, Bus
 from schemas import EstadisticaUsuarioResponse, ActualizarEstadisticaRequest, DashboardStats, MessageResponse
 
@@ -16,21 +16,21 @@ router = APIRouter(prefix="/stats", tags=["Estadísticas"])
 # ==================== ESTADÍSTICAS DE USUARIO ====================
 
 @router.get("/usuario/{usuario_id}", response_model=EstadisticaUsuarioResponse)
-async def get_estadisticas_usuario(usuario_id: int, db: Session = Depends(get_db)):
+async def get_estadisticas_usuario(usuario_id: int, db: AsyncSession = Depends(get_async_db)):
     """Obtener estadísticas de un usuario"""
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     # Buscar o crear estadísticas
-    stats = db.query(EstadisticaUsuario).filter(EstadisticaUsuario.usuario_id == usuario_id).first()
+    stats = await db.scalar(select(EstadisticaUsuario).where(EstadisticaUsuario.usuario_id == usuario_id))
 
     if not stats:
         # Crear estadísticas si no existen
         stats = EstadisticaUsuario(usuario_id=usuario_id)
         db.add(stats)
-        db.commit()
-        db.refresh(stats)
+        await db.commit()
+        await db.refresh(stats)
 
     return EstadisticaUsuarioResponse.model_validate(stats.to_dict())
 
@@ -38,14 +38,14 @@ async def get_estadisticas_usuario(usuario_id: int, db: Session = Depends(get_db
 async def registrar_viaje_completado(
     usuario_id: int,
     viaje_data: ActualizarEstadisticaRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Registrar un viaje completado y actualizar estadísticas"""
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    stats = db.query(EstadisticaUsuario).filter(EstadisticaUsuario.usuario_id == usuario_id).first()
+    stats = await db.scalar(select(EstadisticaUsuario).where(EstadisticaUsuario.usuario_id == usuario_id))
 
     if not stats:
         stats = EstadisticaUsuario(usuario_id=usuario_id)
@@ -63,7 +63,7 @@ async def registrar_viaje_completado(
         if viaje_data.nuevo_lugar:
             stats.lugares_visitados += 1
 
-        db.commit()
+        await db.commit()
 
         return MessageResponse(
             message="Estadísticas actualizadas exitosamente",
@@ -71,41 +71,41 @@ async def registrar_viaje_completado(
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 # ==================== ESTADÍSTICAS GLOBALES (DASHBOARD) ====================
 
 @router.get("/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(db: Session = Depends(get_db)):
+async def get_dashboard_stats(db: AsyncSession = Depends(get_async_db)):
     """Obtener estadísticas generales para el dashboard de administración"""
     try:
         # Total de usuarios
-        total_usuarios = db.query(func.count(Usuario.id)).scalar()
+        total_usuarios = await db.scalar(select(func.count(Usuario.id)))
 
         # Total de rutas
-        total_rutas = db.query(func.count(Ruta.id)).scalar()
+        total_rutas = await db.scalar(select(func.count(Ruta.id)))
 
         # Total de buses
-        total_buses = db.query(func.count(Bus.id)).scalar()
+        total_buses = await db.scalar(select(func.count(Bus.id)))
 
         # Viajes creados hoy
         hoy = datetime.now().date()
-        total_viajes_hoy = db.query(func.count(ViajePlaneado.id)).filter(
+        total_viajes_hoy = await db.scalar(select(func.count(ViajePlaneado.id)).where(
             func.date(ViajePlaneado.created_at) == hoy
-        ).scalar()
+        ))
 
         # Usuarios activos este mes (que han iniciado sesión)
         inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        usuarios_activos_mes = db.query(func.count(Usuario.id)).filter(
+        usuarios_activos_mes = await db.scalar(select(func.count(Usuario.id)).where(
             Usuario.ultimo_acceso >= inicio_mes
-        ).scalar()
+        ))
 
         # Distancia total recorrida este mes
-        distancia_total_mes = db.query(func.sum(ViajePlaneado.distancia_km)).filter(
+        distancia_total_mes = await db.scalar(select(func.sum(ViajePlaneado.distancia_km)).where(
             ViajePlaneado.created_at >= inicio_mes,
             ViajePlaneado.completado == True
-        ).scalar() or 0.0
+        )) or 0.0
 
         return DashboardStats(
             total_usuarios=total_usuarios or 0,
@@ -2,37 +2,67 @@
 Router de Favoritos y Viajes
 Endpoints para gestión de lugares favoritos y viajes planeados
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 import json
 
-from database import get_db
+from database import get_db, get_async_db
 from models import Favorito, ViajePlaneado, Usuario
 from schemas import (
-    FavoritoCreate, FavoritoResponse,
+    FavoritoCreate, FavoritoResponse, FavoritoCercanoResponse,
     ViajeCreate, ViajeUpdate, ViajeResponse,
     MessageResponse
 )
+from paginacion import paginar_async, agregar_cursor
+from serializacion import serializador
+from espacial import cercanos
+from planificador import obtener_planificador, MAX_TRANSBORDOS, parsear_hora
 
 router = APIRouter(prefix="/favoritos", tags=["Favoritos y Viajes"])
 
 # ==================== FAVORITOS ====================
 
 @router.get("/usuario/{usuario_id}", response_model=List[FavoritoResponse])
-async def get_favoritos_usuario(usuario_id: int, db: Session = Depends(get_db)):
+async def get_favoritos_usuario(usuario_id: int, db: AsyncSession = Depends(get_async_db)):
     """Obtener todos los favoritos de un usuario"""
+    usuario = await db.get(Usuario, usuario_id)
+    if not usuario:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    favoritos = await db.scalars(select(Favorito).where(Favorito.usuario_id == usuario_id))
+    return serializador(List[FavoritoResponse]).respuesta([f.to_dict() for f in favoritos])
+
+@router.get("/usuario/{usuario_id}/cercanos", response_model=List[FavoritoCercanoResponse])
+def get_favoritos_cercanos(
+    usuario_id: int,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radio_km: float = Query(1.0, gt=0, le=100),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Obtener los favoritos de un usuario cerca de una ubicación, del más cercano
+    al más lejano, con `distancia_km`
+    """
     usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    favoritos = db.query(Favorito).filter(Favorito.usuario_id == usuario_id).all()
-    return [FavoritoResponse.model_validate(f.to_dict()) for f in favoritos]
+    query = db.query(Favorito).filter(Favorito.usuario_id == usuario_id)
+    favoritos = cercanos(db, query, Favorito.lat, Favorito.lng, lat, lng, radio_km * 1000, limit)
+    return serializador(List[FavoritoCercanoResponse]).respuesta(
+        [{**f.to_dict(), "distancia_km": round(metros / 1000, 3)} for f, metros in favoritos]
+    )
 
 @router.post("/usuario/{usuario_id}", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def add_favorito(usuario_id: int, favorito_data: FavoritoCreate, db: Session = Depends(get_db)):
+async def add_favorito(usuario_id: int, favorito_data: FavoritoCreate, db: AsyncSession = Depends(get_async_db)):
     """Agregar un lugar a favoritos"""
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
@@ -44,27 +74,26 @@ async def add_favorito(usuario_id: int, favorito_data: FavoritoCreate, db: Sessi
 
         nuevo_favorito = Favorito(usuario_id=usuario_id, **data)
         db.add(nuevo_favorito)
-        db.commit()
-        db.refresh(nuevo_favorito)
+        await db.commit()
 
         return MessageResponse(message="Favorito agregado exitosamente", id=nuevo_favorito.id)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.delete("/{favorito_id}", response_model=MessageResponse)
-async def delete_favorito(favorito_id: int, db: Session = Depends(get_db)):
+async def delete_favorito(favorito_id: int, db: AsyncSession = Depends(get_async_db)):
     """Eliminar un favorito"""
-    favorito = db.query(Favorito).filter(Favorito.id == favorito_id).first()
+    favorito = await db.get(Favorito, favorito_id)
     if not favorito:
         raise HTTPException(status_code=404, detail="Favorito no encontrado")
 
     try:
-        db.delete(favorito)
-        db.commit()
+        await db.delete(favorito)
+        await db.commit()
         return MessageResponse(message="Favorito eliminado exitosamente", id=favorito_id)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 # ==================== VIAJES PLANEADOS ====================
@@ -75,66 +104,108 @@ router_viajes = APIRouter(prefix="/viajes", tags=["Viajes Planeados"])
 async def get_viajes_usuario(
     usuario_id: int,
     solo_completados: bool = False,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Obtener todos los viajes planeados de un usuario"""
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    """
+    Obtener los viajes planeados de un usuario, del más reciente al más antiguo
+
+    - **cursor**: Cursor de la cabecera X-Next-Cursor de la página anterior
+    - **limit**: Máximo de viajes a devolver
+    """
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    query = db.query(ViajePlaneado).filter(ViajePlaneado.usuario_id == usuario_id)
+    consulta = select(ViajePlaneado).where(ViajePlaneado.usuario_id == usuario_id)
 
     if solo_completados:
-        query = query.filter(ViajePlaneado.completado == True)
-
-    viajes = query.order_by(ViajePlaneado.created_at.desc()).all()
-    return [ViajeResponse.model_validate(v.to_dict()) for v in viajes]
+        consulta = consulta.where(ViajePlaneado.completado == True)
+
+    viajes, siguiente = await paginar_async(
+        db, consulta, [ViajePlaneado.created_at, ViajePlaneado.id], cursor, limit, descendente=True
+    )
+    respuesta = serializador(List[ViajeResponse]).respuesta([v.to_dict() for v in viajes])
+    agregar_cursor(respuesta, siguiente)
+    return respuesta
+
+@router_viajes.get("/planificar")
+def planificar_viaje(
+    origen_lat: float = Query(..., ge=-90, le=90),
+    origen_lng: float = Query(..., ge=-180, le=180),
+    destino_lat: float = Query(..., ge=-90, le=90),
+    destino_lng: float = Query(..., ge=-180, le=180),
+    hora: Optional[str] = None,
+    max_transbordos: int = Query(MAX_TRANSBORDOS, ge=0, le=5),
+    db: Session = Depends(get_db)
+):
+    """
+    Planificar un viaje en bus entre dos puntos
+
+    - **hora**: Hora de salida HH:MM (por defecto la hora actual)
+    - **max_transbordos**: Máximo de cambios de bus
+
+    Devuelve los itinerarios más rápidos para cada número de buses, con
+    tiempo_estimado, costo_estimado y numero_buses listos para guardar el viaje
+    """
+    if hora is None:
+        ahora = datetime.now()
+        segundos = ahora.hour * 3600 + ahora.minute * 60
+    else:
+        segundos = parsear_hora(hora)
+        if segundos is None:
+            raise HTTPException(status_code=400, detail="Hora inválida, use el formato HH:MM")
+
+    planificador = obtener_planificador(db)
+    return planificador.planificar(
+        (origen_lat, origen_lng), (destino_lat, destino_lng), segundos, max_transbordos
+    )
 
 @router_viajes.post("/usuario/{usuario_id}", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def create_viaje(usuario_id: int, viaje_data: ViajeCreate, db: Session = Depends(get_db)):
+async def create_viaje(usuario_id: int, viaje_data: ViajeCreate, db: AsyncSession = Depends(get_async_db)):
     """Crear un nuevo viaje planeado"""
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     try:
         nuevo_viaje = ViajePlaneado(usuario_id=usuario_id, **viaje_data.model_dump())
         db.add(nuevo_viaje)
-        db.commit()
-        db.refresh(nuevo_viaje)
+        await db.commit()
 
         return MessageResponse(message="Viaje planeado creado exitosamente", id=nuevo_viaje.id)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router_viajes.put("/{viaje_id}", response_model=MessageResponse)
-async def update_viaje(viaje_id: int, viaje_data: ViajeUpdate, db: Session = Depends(get_db)):
+async def update_viaje(viaje_id: int, viaje_data: ViajeUpdate, db: AsyncSession = Depends(get_async_db)):
     """Actualizar un viaje (marcar como completado)"""
-    viaje = db.query(ViajePlaneado).filter(ViajePlaneado.id == viaje_id).first()
+    viaje = await db.get(ViajePlaneado, viaje_id)
     if not viaje:
         raise HTTPException(status_code=404, detail="Viaje no encontrado")
 
     try:
         for key, value in viaje_data.model_dump(exclude_unset=True).items():
             setattr(viaje, key, value)
-        db.commit()
+        await db.commit()
         return MessageResponse(message="Viaje actualizado exitosamente", id=viaje_id)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router_viajes.delete("/{viaje_id}", response_model=MessageResponse)
-async def delete_viaje(viaje_id: int, db: Session = Depends(get_db)):
+async def delete_viaje(viaje_id: int, db: AsyncSession = Depends(get_async_db)):
     """Eliminar un viaje planeado"""
-    viaje = db.query(ViajePlaneado).filter(ViajePlaneado.id == viaje_id).first()
+    viaje = await db.get(ViajePlaneado, viaje_id)
     if not viaje:
         raise HTTPException(status_code=404, detail="Viaje no encontrado")
 
     try:
-        db.delete(viaje)
-        db.commit()
+        await db.delete(viaje)
+        await db.commit()
         return MessageResponse(message="Viaje eliminado exitosamente", id=viaje_id)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
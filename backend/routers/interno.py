@@ -0,0 +1,45 @@
+"""
+Router Interno
+Métricas de operación. Solo se registra si METRICAS_TOKEN está configurado y
+cada petición debe traer `Authorization: Bearer <METRICAS_TOKEN>`
+"""
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+import database
+from config import settings
+from metricas_db import estado_pool
+
+
+def verificar_token(request: Request):
+    """401 si falta el token de métricas o no coincide"""
+    esquema, _, token = request.headers.get("authorization", "").partition(" ")
+    if (not settings.METRICAS_TOKEN or esquema.lower() != "bearer"
+            or not secrets.compare_digest(token.encode(), settings.METRICAS_TOKEN.encode())):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de métricas inválido",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+router = APIRouter(prefix="/internal", tags=["Interno"], dependencies=[Depends(verificar_token)])
+
+
+@router.get("/metrics/db")
+async def get_metricas_db():
+    """
+    Estado de los pools de conexiones de este worker
+
+    Por pool: conexiones en uso, libres y de overflow, checkouts, timeouts
+    (agotado DB_POOL_TIMEOUT) y tiempo de espera por checkout (promedio,
+    máximo e histograma en ms). Esperas altas con `en_uso` igual a tamaño +
+    overflow indican que el pool es chico para la carga.
+    """
+    engines = {"primario": database.engine, "primario_async": database.async_engine}
+    if database.replica_engine is not None:
+        engines["replica"] = database.replica_engine
+    if database.async_replica_engine is not None:
+        engines["replica_async"] = database.async_replica_engine
+    return {nombre: estado_pool(engine) for nombre, engine in engines.items()}
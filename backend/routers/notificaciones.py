@@ -2,13 +2,16 @@
 Router de Notificaciones
 Endpoints para gestión de notificaciones
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from database import get_db
+from database import get_async_db
 from models import Notificacion, Usuario
 from schemas import NotificacionCreate, NotificacionResponse, MarcarLeidaRequest, MessageResponse
+from paginacion import paginar_union_async, agregar_cursor
+from serializacion import serializador
 
 router = APIRouter(prefix="/notificaciones", tags=["Notificaciones"])
 
@@ -18,90 +21,102 @@ router = APIRouter(prefix="/notificaciones", tags=["Notificaciones"])
 async def get_notificaciones_usuario(
     usuario_id: int,
     solo_no_leidas: bool = False,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Obtener notificaciones de un usuario"""
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    """
+    Obtener notificaciones de un usuario (incluye las globales), de la más reciente a la más antigua
+
+    - **cursor**: Cursor de la cabecera X-Next-Cursor de la página anterior
+    - **limit**: Máximo de notificaciones a devolver
+    """
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    query = db.query(Notificacion).filter(
-        (Notificacion.usuario_id == usuario_id) | (Notificacion.usuario_id == None)
-    )
+    # Las del usuario y las globales son dos rangos de ix_notificaciones_usuario_created_id
+    consultas = [
+        select(Notificacion).where(Notificacion.usuario_id == usuario_id),
+        select(Notificacion).where(Notificacion.usuario_id == None),
+    ]
 
     if solo_no_leidas:
-        query = query.filter(Notificacion.leida == False)
+        consultas = [consulta.where(Notificacion.leida == False) for consulta in consultas]
 
-    notificaciones = query.order_by(Notificacion.created_at.desc()).all()
-    return [NotificacionResponse.model_validate(n.to_dict()) for n in notificaciones]
+    notificaciones, siguiente = await paginar_union_async(
+        db, Notificacion, consultas, [Notificacion.created_at, Notificacion.id], cursor, limit, descendente=True
+    )
+    respuesta = serializador(List[NotificacionResponse]).respuesta([n.to_dict() for n in notificaciones])
+    agregar_cursor(respuesta, siguiente)
+    return respuesta
 
 @router.post("/", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def create_notificacion(notif_data: NotificacionCreate, db: Session = Depends(get_db)):
+async def create_notificacion(notif_data: NotificacionCreate, db: AsyncSession = Depends(get_async_db)):
     """Crear una notificación (puede ser para un usuario específico o global)"""
     # Si es para un usuario específico, verificar que exista
     if notif_data.usuario_id:
-        usuario = db.query(Usuario).filter(Usuario.id == notif_data.usuario_id).first()
+        usuario = await db.get(Usuario, notif_data.usuario_id)
         if not usuario:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     try:
         nueva_notif = Notificacion(**notif_data.model_dump())
         db.add(nueva_notif)
-        db.commit()
-        db.refresh(nueva_notif)
+        await db.commit()
 
         return MessageResponse(message="Notificación creada exitosamente", id=nueva_notif.id)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.put("/{notif_id}/leer", response_model=MessageResponse)
 async def marcar_como_leida(
     notif_id: int,
     data: MarcarLeidaRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Marcar una notificación como leída o no leída"""
-    notif = db.query(Notificacion).filter(Notificacion.id == notif_id).first()
+    notif = await db.get(Notificacion, notif_id)
     if not notif:
         raise HTTPException(status_code=404, detail="Notificación no encontrada")
 
     try:
         notif.leida = data.leida
-        db.commit()
+        await db.commit()
         return MessageResponse(
             message=f"Notificación marcada como {'leída' if data.leida else 'no leída'}",
             id=notif_id
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.delete("/{notif_id}", response_model=MessageResponse)
-async def delete_notificacion(notif_id: int, db: Session = Depends(get_db)):
+async def delete_notificacion(notif_id: int, db: AsyncSession = Depends(get_async_db)):
     """Eliminar una notificación"""
-    notif = db.query(Notificacion).filter(Notificacion.id == notif_id).first()
+    notif = await db.get(Notificacion, notif_id)
     if not notif:
         raise HTTPException(status_code=404, detail="Notificación no encontrada")
 
     try:
-        db.delete(notif)
-        db.commit()
+        await db.delete(notif)
+        await db.commit()
         return MessageResponse(message="Notificación eliminada exitosamente", id=notif_id)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.post("/broadcast", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def broadcast_notificacion(notif_data: NotificacionCreate, db: Session = Depends(get_db)):
+async def broadcast_notificacion(notif_data: NotificacionCreate, db: AsyncSession = Depends(get_async_db)):
     """Enviar notificación a todos los usuarios activos"""
     try:
-        usuarios_activos = db.query(Usuario).filter(Usuario.activo == True).all()
+        usuarios_activos = await db.scalars(select(Usuario.id).where(Usuario.activo == True))
 
         count = 0
-        for usuario in usuarios_activos:
+        for usuario_id in usuarios_activos:
             nueva_notif = Notificacion(
-                usuario_id=usuario.id,
+                usuario_id=usuario_id,
                 tipo=notif_data.tipo,
                 titulo=notif_data.titulo,
                 mensaje=notif_data.mensaje
@@ -109,12 +124,12 @@ async def broadcast_notificacion(notif_data: NotificacionCreate, db: Session = D
             db.add(nueva_notif)
             count += 1
 
-        db.commit()
+        await db.commit()
 
         return MessageResponse(
             message=f"Notificación enviada a {count} usuarios",
             id=count
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -2,53 +2,194 @@
 Router de Rutas
 Endpoints para gestión de rutas de buses (existentes del sistema original)
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import json
+from typing import Optional
 
 from database import get_db
 from models import Ruta, Parada
-from schemas import RutaCreate, RutaUpdate, MessageResponse
+from schemas import (
+    RutaCreate, RutaUpdate, MessageResponse, FormatoGeometriaEnum,
+    CalcularGeometriaRequest, GeometriaCalculadaResponse, UnidadesRutaResponse,
+    EtaParadaResponse
+)
+from cache import cache_rutas, encode_json
+from versiones import RUTAS, leer_version
+from compresion import Precomprimido, respuesta_precomprimida
+from condicional import respuesta_no_modificada, validadores_version
+from consultas import query_rutas, query_proyectada
+from proyeccion import PROYECCION_RUTA
+from simplificacion import geometrias_multinivel, resolver_nivel
+from busqueda import indice_rutas
+from paginacion import paginar, agregar_cursor
+from streaming import quiere_stream, respuesta_ndjson
+from enrutamiento import obtener_grafo, RutaNoEncontrada
+from vehiculos import flota
+from eta import motor_eta
 
 router = APIRouter(prefix="", tags=["Rutas"])
 
+def _geometria_vial(paradas) -> Optional[dict]:
+    """
+    Geometría, distancia y duración por calles entre las paradas, o None si no
+    hay grafo configurado o no se encontró camino (la ruta se guarda sin geometría)
+    """
+    if len(paradas) < 2:
+        return None
+    grafo = obtener_grafo()
+    if grafo is None:
+        return None
+    try:
+        return grafo.calcular_ruta([(p.lat, p.lng) for p in paradas])
+    except RutaNoEncontrada:
+        return None
+
 @router.get("/rutas")
-async def get_all_rutas(
-    skip: int = 0,
-    limit: int = 100,
+def get_all_rutas(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    skip: int = Query(0, ge=0, deprecated=True),
+    formato: FormatoGeometriaEnum = FormatoGeometriaEnum.COORDENADAS,
+    zoom: Optional[float] = Query(None, ge=0, le=22),
+    tolerancia: Optional[float] = Query(None, ge=0),
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    stream: bool = False,
     db: Session = Depends(get_db)
 ):
     """
     Obtener todas las rutas
 
-    - **skip**: Número de registros a omitir (para paginación)
+    - **cursor**: Cursor de la cabecera X-Next-Cursor de la página anterior
     - **limit**: Número máximo de registros a devolver
+    - **skip**: Obsoleto, usar cursor. Registros a omitir (no se combina con cursor)
+    - **formato**: "coordenadas" (routeGeometry) o "polyline" (routePolyline, más liviano)
+    - **zoom**: Zoom del mapa, elige la geometría simplificada adecuada
+    - **tolerancia**: Alternativa a zoom, error máximo permitido en metros
+    - **fields**: Campos a devolver separados por coma (ej: id,name,number,frequency)
+    - **exclude**: Campos a omitir separados por coma (ej: routeGeometry,paradas)
+    - **stream**: Enviar todas las rutas como NDJSON (también con `Accept: application/x-ndjson`),
+      sin paginar
+
+    La respuesta se sirve desde el cache mientras no cambie la red de rutas;
+    con If-None-Match / If-Modified-Since se responde 304 leyendo solo la versión
+    de las rutas (una consulta por clave primaria), sin cargar las rutas
     """
-    rutas = db.query(Ruta).offset(skip).limit(limit).all()
-    return [ruta.to_dict() for ruta in rutas]
+    nivel = resolver_nivel(zoom, tolerancia)
+    geometria_omitida = "routeGeometry" if formato == FormatoGeometriaEnum.POLYLINE else "routePolyline"
+    campos = PROYECCION_RUTA.resolver(
+        fields, exclude,
+        por_defecto=[campo for campo in PROYECCION_RUTA.campos if campo != geometria_omitida]
+    )
+
+    if quiere_stream(request, stream):
+        if campos is None:
+            return respuesta_ndjson(
+                query_rutas,
+                lambda ruta: ruta.to_dict(formato.value, nivel),
+                [Ruta.id]
+            )
+        return respuesta_ndjson(
+            lambda sesion: query_proyectada(sesion, PROYECCION_RUTA, campos),
+            lambda ruta: PROYECCION_RUTA.serializar(ruta, campos, nivel=nivel),
+            [Ruta.id]
+        )
+    clave = (cursor, limit, skip, formato.value, nivel, tuple(campos) if campos is not None else None)
+    version = leer_version(db, RUTAS)
+    etag, modificado = validadores_version((version,), *clave)
+    no_modificada = respuesta_no_modificada(request, etag, modificado)
+    if no_modificada is not None:
+        # Sin generar el cuerpo aunque este worker no lo tenga en cache
+        no_modificada.headers["Vary"] = "Accept-Encoding"
+        return no_modificada
+
+    entrada = cache_rutas.get_coleccion(clave, version.numero)
+    if entrada is None:
+        if campos is None:
+            rutas, siguiente = paginar(query_rutas(db), [Ruta.id], cursor, limit, saltar=skip)
+            filas = [ruta.to_dict(formato.value, nivel) for ruta in rutas]
+        else:
+            rutas, siguiente = paginar(query_proyectada(db, PROYECCION_RUTA, campos), [Ruta.id], cursor, limit,
+                                       saltar=skip)
+            filas = [PROYECCION_RUTA.serializar(ruta, campos, nivel=nivel) for ruta in rutas]
+        entrada = (Precomprimido(encode_json(filas), etag, modificado), siguiente)
+        cache_rutas.set_coleccion(clave, entrada, version.numero)
+
+    cuerpo, siguiente = entrada
+    response = respuesta_precomprimida(request, cuerpo)
+    agregar_cursor(response, siguiente)
+    return response
 
 @router.get("/rutas/{ruta_id}")
-async def get_ruta_by_id(
+def get_ruta_by_id(
     ruta_id: int,
+    request: Request,
+    formato: FormatoGeometriaEnum = FormatoGeometriaEnum.COORDENADAS,
+    zoom: Optional[float] = Query(None, ge=0, le=22),
+    tolerancia: Optional[float] = Query(None, ge=0),
     db: Session = Depends(get_db)
 ):
     """
     Obtener una ruta específica por ID
 
     - **ruta_id**: ID de la ruta a buscar
+    - **formato**: "coordenadas" (routeGeometry) o "polyline" (routePolyline)
+    - **zoom** / **tolerancia**: Nivel de detalle de la geometría (ver GET /rutas)
+
+    Responde 304 con If-None-Match / If-Modified-Since si la ruta no cambió
     """
-    ruta = db.query(Ruta).filter(Ruta.id == ruta_id).first()
+    variante = (formato.value, resolver_nivel(zoom, tolerancia))
+    version = leer_version(db, RUTAS)
+    cuerpo = cache_rutas.get_elemento(ruta_id, version.numero, variante)
 
-    if not ruta:
+    if cuerpo is None:
+        ruta = query_rutas(db).filter(Ruta.id == ruta_id).first()
+
+        if not ruta:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Ruta con ID {ruta_id} no encontrada"
+            )
+
+        cuerpo = Precomprimido(encode_json(ruta.to_dict(*variante)), *validadores_version((version,), ruta_id, *variante))
+        cache_rutas.set_elemento(ruta_id, cuerpo, version.numero, variante)
+
+    return respuesta_precomprimida(request, cuerpo)
+
+@router.get("/rutas/{ruta_id}/unidades", response_model=UnidadesRutaResponse)
+async def get_unidades_ruta(ruta_id: int):
+    """
+    Unidades (vehículos) activas en la ruta y su última posición
+
+    Cuenta los vehículos con una posición en los últimos 2 minutos
+    (POST /vehicles/positions). Se responde desde memoria, sin consultar la base de datos.
+    """
+    vehiculos = flota.unidades(ruta_id)
+    return {"ruta_id": ruta_id, "unidades": len(vehiculos), "vehiculos": vehiculos}
+
+@router.get("/rutas/{ruta_id}/paradas/{parada_id}/eta", response_model=EtaParadaResponse)
+def get_eta_parada_ruta(
+    ruta_id: int,
+    parada_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Próximas llegadas estimadas de las unidades de la ruta a una de sus paradas
+    """
+    motor_eta.actualizar_modelo(db)
+    if not motor_eta.sirve(ruta_id, ("parada", parada_id)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Ruta con ID {ruta_id} no encontrada"
+            detail=f"Parada {parada_id} no encontrada en la ruta {ruta_id}"
         )
 
-    return ruta.to_dict()
+    return {"parada_id": parada_id, "llegadas": motor_eta.llegadas(("parada", parada_id), limit, ruta_id)}
 
 @router.post("/rutas", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-async def create_ruta(
+def create_ruta(
     ruta_data: RutaCreate,
     db: Session = Depends(get_db)
 ):
@@ -65,8 +206,18 @@ async def create_ruta(
     - **visible**: Visibilidad de la ruta (opcional, default: true)
     - **distance**: Distancia en km (opcional)
     - **duration**: Duración en minutos (opcional)
-    - **routeGeometry**: Geometría de la ruta como lista de coordenadas (opcional)
+    - **routeGeometry**: Geometría de la ruta como lista de coordenadas (opcional;
+      si se omite y hay grafo OSM configurado se calcula en el servidor)
     """
+    if ruta_data.routeGeometry is None:
+        calculada = _geometria_vial(ruta_data.paradas)
+        if calculada:
+            ruta_data.routeGeometry = calculada["routeGeometry"]
+            if ruta_data.distance is None:
+                ruta_data.distance = calculada["distance"]
+            if ruta_data.duration is None:
+                ruta_data.duration = calculada["duration"]
+
     try:
         # Crear la ruta
         nueva_ruta = Ruta(
@@ -77,9 +228,9 @@ async def create_ruta(
             frequency=ruta_data.frequency,
             visible=ruta_data.visible,
             distance=ruta_data.distance,
-            duration=ruta_data.duration,
-            route_geometry=json.dumps(ruta_data.routeGeometry) if ruta_data.routeGeometry else None
+            duration=ruta_data.duration
         )
+        nueva_ruta.set_coordenadas(ruta_data.routeGeometry)
 
         db.add(nueva_ruta)
         db.flush()  # Para obtener el ID antes de commit
@@ -97,6 +248,7 @@ async def create_ruta(
 
         db.commit()
         db.refresh(nueva_ruta)
+        geometrias_multinivel.precalcular(nueva_ruta.id, nueva_ruta.geometria_binaria())
 
         return MessageResponse(
             message="Ruta creada exitosamente",
@@ -110,8 +262,32 @@ async def create_ruta(
             detail=f"Error al crear la ruta: {str(e)}"
         )
 
+@router.post("/rutas/compute-geometry", response_model=GeometriaCalculadaResponse)
+async def compute_geometry(datos: CalcularGeometriaRequest):
+    """
+    Calcular la geometría por calles que une las paradas en orden
+
+    Usa el grafo vial local (OSM_GRAFO_PATH) en lugar de servicios de
+    enrutamiento externos. Devuelve routeGeometry ([lng, lat]), distance (km)
+    y duration (minutos), listos para crear o actualizar una ruta.
+    """
+    grafo = await run_in_threadpool(obtener_grafo)
+    if grafo is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El cálculo de rutas no está configurado o no se pudo cargar el grafo (OSM_GRAFO_PATH)"
+        )
+
+    try:
+        return await run_in_threadpool(grafo.calcular_ruta, [(p.lat, p.lng) for p in datos.paradas])
+    except RutaNoEncontrada as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.put("/rutas/{ruta_id}", response_model=MessageResponse)
-async def update_ruta(
+def update_ruta(
     ruta_id: int,
     ruta_data: RutaUpdate,
     db: Session = Depends(get_db)
@@ -121,6 +297,8 @@ async def update_ruta(
 
     - **ruta_id**: ID de la ruta a actualizar
     - Todos los campos son opcionales
+    - Si cambian las paradas sin routeGeometry y hay grafo OSM configurado,
+      la geometría, distancia y duración se recalculan en el servidor
     """
     ruta = db.query(Ruta).filter(Ruta.id == ruta_id).first()
 
@@ -130,10 +308,17 @@ async def update_ruta(
             detail=f"Ruta con ID {ruta_id} no encontrada"
         )
 
-    try:
-        # Actualizar campos de la ruta
-        update_data = ruta_data.model_dump(exclude_unset=True, by_alias=True)
+    # Actualizar campos de la ruta
+    update_data = ruta_data.model_dump(exclude_unset=True, by_alias=True)
+
+    if ruta_data.paradas is not None and "routeGeometry" not in update_data:
+        calculada = _geometria_vial(ruta_data.paradas)
+        if calculada:
+            update_data["routeGeometry"] = calculada["routeGeometry"]
+            update_data.setdefault("distance", calculada["distance"])
+            update_data.setdefault("duration", calculada["duration"])
 
+    try:
         # Manejar paradas si se proporcionan
         if "paradas" in update_data:
             # Eliminar paradas antiguas
@@ -151,9 +336,10 @@ async def update_ruta(
                 )
                 db.add(nueva_parada)
 
-        # Actualizar routeGeometry si se proporciona
-        if "routeGeometry" in update_data:
-            update_data["route_geometry"] = json.dumps(update_data.pop("routeGeometry"))
+        # Actualizar routeGeometry si se proporciona (se guarda en binario)
+        geometria_nueva = "routeGeometry" in update_data
+        if geometria_nueva:
+            ruta.set_coordenadas(update_data.pop("routeGeometry"))
 
         # Mapear campos con alias
         field_mapping = {
@@ -168,6 +354,8 @@ async def update_ruta(
                 setattr(ruta, db_field, value)
 
         db.commit()
+        if geometria_nueva:
+            geometrias_multinivel.precalcular(ruta_id, ruta.geometria_binaria())
 
         return MessageResponse(
             message="Ruta actualizada exitosamente",
@@ -182,7 +370,7 @@ async def update_ruta(
         )
 
 @router.delete("/rutas/{ruta_id}", response_model=MessageResponse)
-async def delete_ruta(
+def delete_ruta(
     ruta_id: int,
     db: Session = Depends(get_db)
 ):
@@ -202,6 +390,7 @@ async def delete_ruta(
     try:
         db.delete(ruta)
         db.commit()
+        geometrias_multinivel.descartar(ruta_id)
 
         return MessageResponse(
             message="Ruta eliminada exitosamente",
@@ -216,18 +405,20 @@ async def delete_ruta(
         )
 
 @router.get("/rutas/search/{search_term}")
-async def search_rutas(
+def search_rutas(
     search_term: str,
+    limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
     """
-    Buscar rutas por nombre o número
+    Buscar rutas por nombre, número o nombre de parada
+
+    - **search_term**: Término de búsqueda (no distingue tildes ni mayúsculas)
+    - **limit**: Número máximo de resultados
 
-    - **search_term**: Término de búsqueda
+    Devuelve coincidencias livianas ordenadas por relevancia (sin geometría):
+    id, name, number, visible, score, coincidencia y paradas que coinciden
     """
-    rutas = db.query(Ruta).filter(
-        (Ruta.name.like(f"%{search_term}%")) |
-        (Ruta.number.like(f"%{search_term}%"))
-    ).all()
+    indice_rutas.sincronizar(db)
 
-    return [ruta.to_dict() for ruta in rutas]
+    return indice_rutas.buscar(search_term, limit)
@@ -0,0 +1,39 @@
+"""
+Router de Teselas
+Endpoint de teselas GeoJSON con las rutas y paradas visibles en cada área del mapa
+"""
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, status
+from sqlalchemy.orm import Session
+
+from compresion import respuesta_precomprimida
+from database import get_db
+from teselas import cache_teselas
+
+router = APIRouter(prefix="/tiles", tags=["Teselas"])
+
+MEDIA_GEOJSON = "application/geo+json"
+
+@router.get("/{z}/{x}/{y}")
+def get_tesela(
+    request: Request,
+    z: int = Path(..., ge=0, le=22),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Obtener una tesela (esquema XYZ, como las de OpenStreetMap)
+
+    Devuelve un FeatureCollection GeoJSON con:
+    - Líneas de las rutas visibles recortadas a la tesela y simplificadas según el zoom
+      (`tipo: "ruta"`)
+    - Paradas de esas rutas (`tipo: "parada"`)
+    - Paradas de buses activas (`tipo: "parada_bus"`)
+    """
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"La tesela {z}/{x}/{y} no existe"
+        )
+
+    return respuesta_precomprimida(request, cache_teselas.obtener(db, z, x, y), media_type=MEDIA_GEOJSON)
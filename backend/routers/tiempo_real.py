@@ -0,0 +1,44 @@
+"""
+Router de Tiempo Real
+WebSocket con los cambios de estado de buses y horarios de una zona
+"""
+import anyio
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+
+from eventos import canal_eventos
+from models import ZonaBus
+
+router = APIRouter(prefix="/ws", tags=["Tiempo Real"])
+
+
+@router.websocket("/buses/{zona}")
+async def ws_buses(websocket: WebSocket, zona: str):
+    """
+    Cambios de horarios y buses de una zona, como mensajes JSON:
+
+    - `{"evento": "horario", "id": 1, "cambios": {"estado": "yellow"}}`
+    - `{"evento": "bus", "id": 1, "cambios": {"activo": false}}`
+    - `{"evento": "resync"}`: se perdieron eventos, recargar /buses/{zona}/salidas y /entradas
+    """
+    if zona not in {z.value for z in ZonaBus}:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    suscripcion = canal_eventos.suscribir(zona)
+    try:
+        async with anyio.create_task_group() as tareas:
+            async def emitir():
+                while True:
+                    await websocket.send_text(await suscripcion.siguiente())
+
+            tareas.start_soon(emitir)
+            # El cliente no envía nada; leer solo sirve para enterarse de la desconexión
+            try:
+                while True:
+                    await websocket.receive_text()
+            except WebSocketDisconnect:
+                pass
+            tareas.cancel_scope.cancel()
+    finally:
+        canal_eventos.cancelar(suscripcion)
@@ -0,0 +1,37 @@
+"""
+Router de Vehículos
+Recepción de posiciones en vivo de los vehículos (pings por lotes)
+"""
+import time
+
+from fastapi import APIRouter, BackgroundTasks, Depends
+from sqlalchemy.orm import Session
+
+from database import get_db
+from eta import motor_eta
+from schemas import PosicionesRequest, PosicionesResponse
+from vehiculos import Ping, escribir_pendientes, flota
+
+router = APIRouter(prefix="/vehicles", tags=["Vehículos"])
+
+
+@router.post("/positions", response_model=PosicionesResponse)
+def registrar_posiciones(datos: PosicionesRequest, tareas: BackgroundTasks, db: Session = Depends(get_db)):
+    """
+    Registrar posiciones de vehículos (uno o varios pings por petición)
+
+    Las posiciones quedan disponibles de inmediato en GET /rutas/{id}/unidades y
+    recalculan las llegadas estimadas a las paradas siguientes (GET /paradas-buses/{id}/eta).
+    El historial se escribe en la base de datos por lotes, no en cada petición.
+    Se descartan los pings con `momento` más de 30 segundos en el futuro.
+    """
+    ahora = time.time()
+    aceptadas, actualizados = flota.registrar(
+        (p.vehiculo, p.ruta_id, Ping(p.momento.timestamp() if p.momento else ahora, p.lat, p.lng, p.velocidad))
+        for p in datos.posiciones
+    )
+    motor_eta.procesar(db, actualizados)
+    if flota.debe_escribir():
+        # Sesión propia: corre después de enviar la respuesta, cuando get_db ya cerró la suya
+        tareas.add_task(escribir_pendientes)
+    return PosicionesResponse(aceptadas=aceptadas, descartadas=len(datos.posiciones) - aceptadas)
@@ -21,6 +21,11 @@ class ZonaBusEnum(str, Enum):
     SUR = "sur"
     NORTE = "norte"
 
+class FormatoGeometriaEnum(str, Enum):
+    """Formato de la geometría de una ruta en las respuestas"""
+    COORDENADAS = "coordenadas"  # routeGeometry: [[lng, lat], ...]
+    POLYLINE = "polyline"        # routePolyline: Google Encoded Polyline
+
 class TipoNotificacionEnum(str, Enum):
     """Tipo de notificación"""
     INFO = "info"
@@ -120,6 +125,14 @@ class RutaUpdate(BaseModel):
     class Config:
         populate_by_name = True
 
+class CalcularGeometriaRequest(BaseModel):
+    paradas: List[ParadaBase] = Field(..., min_length=2)
+
+class GeometriaCalculadaResponse(BaseModel):
+    routeGeometry: List[List[float]]  # [[lng, lat], ...]
+    distance: float  # km
+    duration: int  # minutos
+
 class RutaResponse(BaseModel):
     id: int
     name: str
@@ -131,7 +144,8 @@ class RutaResponse(BaseModel):
     createdAt: Optional[str]
     distance: Optional[str]
     duration: Optional[int]
-    routeGeometry: List[List[float]]
+    routeGeometry: Optional[List[List[float]]] = None
+    routePolyline: Optional[str] = None  # Solo con formato=polyline
     paradas: List[ParadaResponse]
 
     class Config:
@@ -176,14 +190,42 @@ class HorarioUpdate(BaseModel):
     hora: Optional[str] = Field(None, pattern=r'^\d{1,2}:\d{2}\s(am|pm)$')
     estado: Optional[EstadoBusEnum] = None
 
-class HorarioResponse(HorarioBase):
-    """Schema de respuesta de horario"""
+class HorarioResponse(BaseModel):
+    """Schema de respuesta de horario (Horario.to_dict)"""
     id: int
     transporte: Optional[str] = None
+    tipo: TipoHorarioEnum
+    destino: Optional[str] = None  # Salidas
+    procedencia: Optional[str] = None  # Entradas
+    hora: str
+    estado: EstadoBusEnum
 
     class Config:
         from_attributes = True
 
+class HorarioMasivo(HorarioBase):
+    """Fila de una carga masiva de horarios: el bus se identifica por nombre y zona"""
+    transporte: str = Field(..., min_length=1, max_length=100)
+    zona: ZonaBusEnum
+
+class CargaHorariosRequest(BaseModel):
+    """Schema para cargar un horario completo (las filas se validan una por una)"""
+    horarios: List[Dict[str, Any]] = Field(..., min_length=1, max_length=50000)
+    parcial: bool = False  # Importar las filas válidas aunque haya errores
+
+class ErrorFilaResponse(BaseModel):
+    fila: int
+    error: str
+
+class CargaHorariosResponse(BaseModel):
+    """Resumen de una carga masiva de horarios"""
+    filas: int
+    buses_creados: int
+    horarios_insertados: int
+    horarios_actualizados: int
+    zonas: List[str]
+    errores: List[ErrorFilaResponse]
+
 class BusResponse(BusBase):
     """Schema de respuesta de bus"""
     id: int
@@ -225,6 +267,22 @@ class ParadaBusResponse(ParadaBusBase):
     class Config:
         from_attributes = True
 
+class ParadaBusCercanaResponse(ParadaBusResponse):
+    """Schema de parada de bus con su distancia al punto consultado"""
+    distancia_km: float
+
+class PuntoBase(BaseModel):
+    """Schema de coordenadas"""
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+
+class CercanasLoteRequest(BaseModel):
+    """Schema para buscar las paradas más cercanas a muchos puntos"""
+    puntos: List[PuntoBase] = Field(..., min_length=1, max_length=5000)
+    k: int = Field(3, ge=1, le=50)
+    radio_km: Optional[float] = Field(None, gt=0, le=100)
+    zona: Optional[ZonaBusEnum] = None
+
 # ==================== SCHEMAS DE FAVORITOS ====================
 
 class FavoritoBase(BaseModel):
@@ -248,6 +306,10 @@ class FavoritoResponse(FavoritoBase):
     class Config:
         from_attributes = True
 
+class FavoritoCercanoResponse(FavoritoResponse):
+    """Schema de favorito con su distancia al punto consultado"""
+    distancia_km: float
+
 # ==================== SCHEMAS DE VIAJES ====================
 
 class OrigenDestinoBase(BaseModel):
@@ -315,6 +377,52 @@ class ActualizarEstadisticaRequest(BaseModel):
     costo: float = Field(..., gt=0)
     nuevo_lugar: bool = False
 
+# ==================== SCHEMAS DE VEHÍCULOS ====================
+
+class PingVehiculo(BaseModel):
+    """Posición informada por un vehículo"""
+    vehiculo: str = Field(..., min_length=1, max_length=50)
+    ruta_id: int
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    velocidad: Optional[float] = Field(None, ge=0, le=200)  # km/h
+    momento: Optional[datetime] = None  # Por defecto, la hora de recepción
+
+class PosicionesRequest(BaseModel):
+    """Lote de pings de uno o varios vehículos"""
+    posiciones: List[PingVehiculo] = Field(..., min_length=1, max_length=5000)
+
+class PosicionesResponse(BaseModel):
+    aceptadas: int
+    descartadas: int  # Repetidas o más viejas que la última del vehículo
+
+class UnidadResponse(BaseModel):
+    """Última posición de un vehículo activo"""
+    vehiculo: str
+    ruta_id: int
+    lat: float
+    lng: float
+    velocidad: Optional[float] = None
+    momento: str
+    segundos: float  # Antigüedad de la posición
+
+class UnidadesRutaResponse(BaseModel):
+    ruta_id: int
+    unidades: int
+    vehiculos: List[UnidadResponse]
+
+class LlegadaEstimadaResponse(BaseModel):
+    """Llegada estimada de un vehículo a una parada"""
+    vehiculo: str
+    ruta_id: int
+    minutos: float
+    distancia_m: int  # Metros por recorrer sobre la ruta
+    segundos_desde_posicion: float  # Antigüedad de la posición usada
+
+class EtaParadaResponse(BaseModel):
+    parada_id: int
+    llegadas: List[LlegadaEstimadaResponse]
+
 # ==================== SCHEMAS DE NOTIFICACIONES ====================
 
 class NotificacionBase(BaseModel):
@@ -0,0 +1,144 @@
+"""
+Serialización rápida de respuestas
+El camino normal de un listado es to_dict() -> Esquema.model_validate() ->
+FastAPI vuelve a validar con response_model -> jsonable_encoder -> json.dumps.
+Para los listados grandes, serializador(List[Esquema]) genera una sola vez, a
+partir de los campos del esquema de schemas.py, una función que convierte la
+salida de to_dict() directamente en lo que emitiría response_model (mismas
+claves, mismo orden, int -> float en campos float, enums como su valor) y la
+codifica con encode_json (orjson si está instalado).
+
+La respuesta es byte a byte igual a la de response_model; benchmark_json.py
+lo comprueba y mide la diferencia por endpoint. No se revalidan las
+restricciones de los campos (ge/le, min_length...): los datos vienen de la
+base de datos, no del cliente.
+"""
+import typing
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+
+from fastapi import Response
+from pydantic import BaseModel, EmailStr
+
+from cache import encode_json
+
+_NINGUNO = type(None)
+
+
+def _identidad(valor):
+    return valor
+
+
+def _a_bool(valor):
+    return valor if type(valor) is bool else bool(valor)
+
+
+def _a_float(valor):
+    return valor if type(valor) is float else float(valor)
+
+
+def _a_int(valor):
+    return valor if type(valor) is int else int(valor)
+
+
+def _a_valor_enum(valor):
+    return valor.value if isinstance(valor, Enum) else valor
+
+
+def _opcional(convertir: Callable) -> Callable:
+    return lambda valor: None if valor is None else convertir(valor)
+
+
+def _lista(convertir: Callable) -> Callable:
+    if convertir is _identidad:
+        return list
+    return lambda valores: [convertir(valor) for valor in valores]
+
+
+def _compilar(tipo) -> Callable:
+    """Función de conversión para una anotación de schemas.py"""
+    origen = typing.get_origin(tipo)
+    argumentos = typing.get_args(tipo)
+
+    if origen is typing.Union:
+        opciones = [a for a in argumentos if a is not _NINGUNO]
+        if len(opciones) != 1:
+            raise TypeError(f"Unión no soportada en serialización rápida: {tipo}")
+        convertir = _compilar(opciones[0])
+        return convertir if convertir is _identidad else _opcional(convertir)
+    if origen in (list, List):
+        return _lista(_compilar(argumentos[0]) if argumentos else _identidad)
+    if origen in (dict, Dict):
+        return _identidad  # Diccionarios libres (tags): se envían tal cual
+
+    if isinstance(tipo, type):
+        if issubclass(tipo, BaseModel):
+            return _compilar_modelo(tipo)
+        if issubclass(tipo, Enum):
+            return _a_valor_enum
+        if issubclass(tipo, bool):
+            return _a_bool
+        if issubclass(tipo, str):
+            return _identidad
+        if issubclass(tipo, float):
+            return _a_float
+        if issubclass(tipo, int):
+            return _a_int
+    if tipo is Any or tipo is EmailStr:
+        return _identidad
+    # Fechas, Decimal, etc. tienen su propio formato en Pydantic: no se imitan aquí
+    raise TypeError(f"Tipo no soportado en serialización rápida: {tipo}")
+
+
+@lru_cache(maxsize=None)
+def _compilar_modelo(modelo: type) -> Callable[[dict], dict]:
+    """
+    Genera el código de la conversión de un diccionario de to_dict() al
+    diccionario de salida del esquema, p. ej. para HorarioResponse:
+
+        def convertir(d):
+            return {"tipo": c0(d["tipo"]), "destino_procedencia": d["destino_procedencia"], ...}
+    """
+    entorno: Dict[str, Any] = {}
+    partes = []
+    for i, (nombre, campo) in enumerate(modelo.model_fields.items()):
+        clave = campo.alias or nombre
+        convertir = _compilar(campo.annotation)
+        valor = "d[%r]" % clave
+        if convertir is not _identidad:
+            entorno[f"c{i}"] = convertir
+            valor = f"c{i}({valor})"
+        if not campo.is_required():
+            # Campo ausente en to_dict(): valor por defecto del esquema (copiado, como Pydantic)
+            entorno[f"f{i}"] = campo
+            valor = f"({valor} if {clave!r} in d else f{i}.get_default(call_default_factory=True))"
+        partes.append(f"{clave!r}: {valor}")
+
+    codigo = "def convertir(d):\n    return {" + ", ".join(partes) + "}\n"
+    exec(compile(codigo, f"<serializador {modelo.__name__}>", "exec"), entorno)
+    return entorno["convertir"]
+
+
+class Serializador:
+    """Convierte la salida de to_dict() al JSON de un esquema de respuesta"""
+
+    def __init__(self, tipo):
+        self.tipo = tipo
+        self.convertir = _compilar(tipo)
+
+    def datos(self, valor) -> Any:
+        """Estructura lista para JSON, igual a la que produce response_model"""
+        return self.convertir(valor)
+
+    def codificar(self, valor) -> bytes:
+        return encode_json(self.convertir(valor))
+
+    def respuesta(self, valor, status_code: int = 200) -> Response:
+        return Response(content=self.codificar(valor), status_code=status_code, media_type="application/json")
+
+
+@lru_cache(maxsize=None)
+def serializador(tipo) -> Serializador:
+    """Serializador del tipo de respuesta (p. ej. List[BusResponse]), generado una vez"""
+    return Serializador(tipo)
@@ -0,0 +1,137 @@
+"""
+Geometrías de rutas en varios niveles de detalle
+Simplifica las geometrías con Douglas-Peucker a tolerancias fijas (en metros)
+para que los mapas con poco zoom descarguen solo los puntos que se ven.
+
+Los niveles se precalculan al crear/actualizar una ruta y se guardan en
+memoria en el mismo formato binario de geometria.py.
+"""
+import math
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from geometria import codificar_geometria, decodificar_geometria
+
+# Tolerancias precalculadas en metros (0 = geometría completa)
+NIVELES_TOLERANCIA = (0, 2, 8, 32, 128, 512)
+
+# Latitud de referencia para convertir zoom a metros por pixel (Jinotega)
+LATITUD_REFERENCIA = 13.09
+
+# Metros por pixel en el ecuador con zoom 0 (tiles de 256 px)
+METROS_POR_PIXEL_Z0 = 156543.03
+
+METROS_POR_GRADO_LAT = 110540.0
+METROS_POR_GRADO_LNG = 111320.0
+
+
+def simplificar(coordenadas: Sequence[Sequence[float]], tolerancia_m: float) -> List[List[float]]:
+    """
+    Douglas-Peucker iterativo sobre [[lng, lat], ...]
+    Las distancias se calculan en una proyección equirectangular local (metros)
+    """
+    n = len(coordenadas)
+    if tolerancia_m <= 0 or n <= 2:
+        return [list(c) for c in coordenadas]
+
+    lat0 = math.radians(sum(c[1] for c in coordenadas) / n)
+    escala_x = METROS_POR_GRADO_LNG * math.cos(lat0)
+    xs = [c[0] * escala_x for c in coordenadas]
+    ys = [c[1] * METROS_POR_GRADO_LAT for c in coordenadas]
+
+    conservar = [False] * n
+    conservar[0] = conservar[n - 1] = True
+    tolerancia2 = tolerancia_m * tolerancia_m
+    pila = [(0, n - 1)]
+
+    while pila:
+        inicio, fin = pila.pop()
+        ax, ay = xs[inicio], ys[inicio]
+        dx, dy = xs[fin] - ax, ys[fin] - ay
+        largo2 = dx * dx + dy * dy
+        max_dist2 = -1.0
+        indice = -1
+
+        for i in range(inicio + 1, fin):
+            px, py = xs[i] - ax, ys[i] - ay
+            if largo2 == 0:
+                dist2 = px * px + py * py
+            else:
+                t = max(0.0, min(1.0, (px * dx + py * dy) / largo2))
+                ex, ey = px - t * dx, py - t * dy
+                dist2 = ex * ex + ey * ey
+            if dist2 > max_dist2:
+                max_dist2 = dist2
+                indice = i
+
+        if max_dist2 > tolerancia2:
+            conservar[indice] = True
+            pila.append((inicio, indice))
+            pila.append((indice, fin))
+
+    return [list(coordenadas[i]) for i in range(n) if conservar[i]]
+
+
+def tolerancia_para_zoom(zoom: float) -> float:
+    """Metros que ocupa un pixel con el zoom dado (en la latitud de referencia)"""
+    return METROS_POR_PIXEL_Z0 * math.cos(math.radians(LATITUD_REFERENCIA)) / (2 ** zoom)
+
+
+def resolver_nivel(zoom: Optional[float] = None, tolerancia: Optional[float] = None) -> int:
+    """
+    Elegir el nivel precalculado para un zoom o una tolerancia en metros:
+    el de mayor tolerancia que no la supere. Sin parámetros devuelve 0 (completa)
+    """
+    if tolerancia is None:
+        if zoom is None:
+            return 0
+        tolerancia = tolerancia_para_zoom(zoom)
+
+    nivel = 0
+    for valor in NIVELES_TOLERANCIA:
+        if valor <= tolerancia:
+            nivel = valor
+    return nivel
+
+
+class GeometriasMultinivel:
+    """
+    Niveles simplificados por ruta, guardados como binario de punto fijo
+    Cada entrada recuerda el CRC de la geometría de origen, así una ruta
+    modificada desde otro proceso se recalcula en lugar de servir datos viejos
+    """
+
+    def __init__(self):
+        self._niveles: Dict[int, Tuple[int, Dict[int, bytes]]] = {}
+        self._lock = threading.Lock()
+
+    def precalcular(self, ruta_id: int, geometria: bytes) -> Dict[int, bytes]:
+        """Calcular y guardar todos los niveles de una ruta"""
+        coordenadas = decodificar_geometria(geometria) if geometria else []
+        niveles = {
+            tolerancia: codificar_geometria(simplificar(coordenadas, tolerancia))
+            for tolerancia in NIVELES_TOLERANCIA if tolerancia > 0
+        }
+        with self._lock:
+            self._niveles[ruta_id] = (zlib.crc32(geometria or b""), niveles)
+        return niveles
+
+    def obtener(self, ruta_id: int, geometria: bytes, tolerancia: int) -> bytes:
+        """Geometría binaria de la ruta en el nivel pedido"""
+        if tolerancia <= 0 or not geometria:
+            return geometria
+        entrada = self._niveles.get(ruta_id)
+        if entrada is None or entrada[0] != zlib.crc32(geometria):
+            niveles = self.precalcular(ruta_id, geometria)
+        else:
+            niveles = entrada[1]
+        return niveles[tolerancia]
+
+    def descartar(self, ruta_id: int):
+        """Eliminar los niveles de una ruta borrada"""
+        with self._lock:
+            self._niveles.pop(ruta_id, None)
+
+
+geometrias_multinivel = GeometriasMultinivel()
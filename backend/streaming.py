@@ -0,0 +1,62 @@
+"""
+Respuestas en streaming (NDJSON) para colecciones grandes
+Con `Accept: application/x-ndjson` o `?stream=1` los listados se envían una
+fila por línea a medida que se leen de la base de datos, en lugar de
+construir la lista completa en memoria antes de responder.
+
+Las filas se leen en lotes con paginación keyset (paginacion.py) y no con
+yield_per: yield_per deja abierto un cursor del servidor (SSCursor en
+pymysql) y las consultas de selectinload de las relaciones no se pueden
+ejecutar en la misma conexión hasta que termine. Cada lote carga sus
+relaciones con su propio SELECT ... IN y se suelta de la sesión al enviarse.
+"""
+from typing import Callable, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+import database
+from cache import encode_json
+from paginacion import recorrer_por_lotes
+
+MEDIA_NDJSON = "application/x-ndjson"
+
+# Filas que se leen de la base de datos por lote
+TAMANO_LOTE = 500
+
+
+def quiere_stream(request: Request, stream: bool = False) -> bool:
+    """El cliente pidió NDJSON por parámetro o por cabecera Accept"""
+    return stream or MEDIA_NDJSON in request.headers.get("accept", "")
+
+
+def respuesta_ndjson(construir_query: Callable[[Session], object],
+                     serializar: Callable[[object], dict],
+                     columnas: Sequence,
+                     tamano_lote: Optional[int] = None) -> StreamingResponse:
+    """
+    StreamingResponse que recorre la consulta por lotes y escribe cada fila
+    como una línea JSON
+
+    `columnas` es la clave de orden de los lotes (única y con índice, como en
+    paginacion.paginar); `construir_query` no debe ordenar.
+
+    El generador abre su propia sesión: la sesión de la petición (get_db)
+    puede cerrarse antes de que termine de enviarse el cuerpo. Todos los
+    lotes se leen en la misma transacción.
+    """
+    tamano_lote = tamano_lote or TAMANO_LOTE
+
+    def generar():
+        db = database.SessionLocal()
+        db.info[database.SOLO_LECTURA] = True  # Solo se usa en GET: lee de la réplica si hay
+        try:
+            for lote in recorrer_por_lotes(lambda: construir_query(db), columnas, tamano_lote):
+                for fila in lote:
+                    yield encode_json(serializar(fila)) + b"\n"
+                db.expunge_all()  # El identity map no crece con cada lote
+        finally:
+            db.close()
+
+    return StreamingResponse(generar(), media_type=MEDIA_NDJSON)
@@ -0,0 +1,79 @@
+"""
+Tableros de salidas y entradas por zona
+Cada tablero (zona, tipo) se guarda en memoria ya codificado en JSON (y
+comprimido, ver compresion.py), junto con sus horas ordenadas para responder "próximas salidas" con bisect. Las
+lecturas solo consultan la versión de buses y horarios (versiones.py): si
+cambió desde que se armó el tablero, en este u otro worker, se vuelve a armar.
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from cache import encode_json
+from compresion import Precomprimido
+from condicional import validadores_version
+from consultas import query_horarios_zona
+from models import Horario, TipoHorario, ZonaBus
+from versiones import BUSES, SIN_ESCRITURAS, Version, leer_version
+
+MINUTOS_DIA = 24 * 60
+
+
+class Tablero:
+    """Horarios de una zona y tipo ordenados por hora"""
+
+    def __init__(self, horarios: List[dict], minutos: List[Optional[int]], version: Version = SIN_ESCRITURAS,
+                 *partes):
+        self.version = version.numero
+        self.horarios = horarios
+        # `partes`: zona y tipo, para que cada tablero tenga su propia ETag
+        self.cuerpo = Precomprimido(encode_json(horarios), *validadores_version((version,), *partes))
+        # Solo los horarios con hora reconocida participan de `proximos`
+        validos = [(m, h) for m, h in zip(minutos, horarios) if m is not None]
+        self.minutos = [m for m, _ in validos]
+        self._ordenados = [h for _, h in validos]
+
+    def proximos(self, desde: int, n: int) -> List[dict]:
+        """Los n horarios siguientes a `desde`, continuando al día siguiente si hace falta"""
+        total = len(self.minutos)
+        inicio = bisect_left(self.minutos, desde)
+        resultado = []
+        for i in range(min(n, total)):
+            horario = self._ordenados[(inicio + i) % total]
+            minutos = self.minutos[(inicio + i) % total]
+            resultado.append({**horario, "minutos_restantes": (minutos - desde) % MINUTOS_DIA})
+        return resultado
+
+
+class TablerosHorarios:
+    """Tablero por (zona, tipo), cargado la primera vez y recalculado al cambiar la versión"""
+
+    def __init__(self):
+        self._tableros: Dict[Tuple[ZonaBus, TipoHorario], Tablero] = {}
+        self._lock = threading.Lock()
+
+    def _construir(self, db: Session, zona: ZonaBus, tipo: TipoHorario, version: Version) -> Tablero:
+        horarios = query_horarios_zona(db, zona, tipo).order_by(Horario.minuto_del_dia, Horario.id).all()
+        return Tablero([h.to_dict() for h in horarios], [h.minuto_del_dia for h in horarios],
+                       version, zona.value, tipo.value)
+
+    def obtener(self, db: Session, zona: str, tipo: TipoHorario) -> Optional[Tablero]:
+        """Tablero de la zona (None si la zona no existe)"""
+        try:
+            zona = ZonaBus(zona)
+        except ValueError:
+            return None
+        version = leer_version(db, BUSES)
+        tablero = self._tableros.get((zona, tipo))
+        if tablero is None or tablero.version < version.numero:
+            with self._lock:
+                tablero = self._tableros.get((zona, tipo))
+                if tablero is None or tablero.version < version.numero:
+                    tablero = self._construir(db, zona, tipo, version)
+                    self._tableros[(zona, tipo)] = tablero
+        return tablero
+
+
+tableros = TablerosHorarios()
@@ -0,0 +1,231 @@
+"""
+Teselas GeoJSON de la red (rutas y paradas) para los mapas
+Cada tesela z/x/y (esquema XYZ de OpenStreetMap) contiene solo lo que se ve
+en ella: las líneas de las rutas visibles recortadas al área de la tesela y
+simplificadas según el zoom (niveles de simplificacion.py), las paradas de
+esas rutas y las paradas de buses activas.
+
+Las teselas se guardan ya codificadas (y comprimidas, ver compresion.py) en
+memoria, ligadas a la versión de la red (versiones de las rutas y de las
+paradas de buses en la base de datos, ver versiones.py): una escritura en
+rutas o paradas, en cualquier worker, descarta todas las teselas generadas.
+"""
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from cache import encode_json
+from compresion import Precomprimido
+from condicional import validadores_version
+from consultas import query_rutas
+from geometria import decodificar_geometria
+from indice_espacial import IndiceEspacial, indice_paradas
+from simplificacion import geometrias_multinivel, resolver_nivel
+from versiones import PARADAS_BUSES, RUTAS, Version, leer_versiones
+
+# Margen alrededor de cada tesela (fracción del ancho) para que las líneas no se corten en los bordes
+MARGEN = 1 / 64
+
+# Máximo de teselas guardadas por versión de la red
+MAX_TESELAS = 4096
+
+Caja = Tuple[float, float, float, float]  # (lng_min, lat_min, lng_max, lat_max)
+
+
+def caja_tesela(z: int, x: int, y: int, margen: float = MARGEN) -> Caja:
+    """Límites geográficos de la tesela (con margen)"""
+    n = 2 ** z
+    def lng(xt):
+        return xt / n * 360.0 - 180.0
+    def lat(yt):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * yt / n))))
+    return lng(x - margen), lat(y + 1 + margen), lng(x + 1 + margen), lat(y - margen)
+
+
+def decimales_para_zoom(z: int) -> int:
+    """Decimales suficientes para no perder precisión visible (un pixel de 256)"""
+    grados_por_pixel = 360.0 / (256 * 2 ** z)
+    return max(0, min(6, math.ceil(-math.log10(grados_por_pixel))))
+
+
+def _recortar_segmento(a, b, caja: Caja):
+    """Liang-Barsky: parte del segmento a-b dentro de la caja (o None)"""
+    x0, y0 = a[0], a[1]
+    dx, dy = b[0] - x0, b[1] - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - caja[0]), (dx, caja[2] - x0), (-dy, y0 - caja[1]), (dy, caja[3] - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return None
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return None
+            t1 = min(t1, t)
+    inicio = a if t0 == 0 else (x0 + t0 * dx, y0 + t0 * dy)
+    fin = b if t1 == 1 else (x0 + t1 * dx, y0 + t1 * dy)
+    return inicio, fin
+
+
+def recortar_linea(coordenadas: Sequence[Sequence[float]], caja: Caja) -> List[List[Sequence[float]]]:
+    """Partes de la línea [[lng, lat], ...] que quedan dentro de la caja"""
+    partes, actual = [], []
+    for a, b in zip(coordenadas, coordenadas[1:]):
+        segmento = _recortar_segmento(a, b, caja)
+        if segmento is None:
+            if len(actual) > 1:
+                partes.append(actual)
+            actual = []
+            continue
+        inicio, fin = segmento
+        if not actual or actual[-1] != inicio:
+            if len(actual) > 1:
+                partes.append(actual)
+            actual = [inicio]
+        actual.append(fin)
+        if fin is not b:  # La línea sale de la caja
+            partes.append(actual)
+            actual = []
+    if len(actual) > 1:
+        partes.append(actual)
+    return partes
+
+
+def _caja_de(coordenadas) -> Caja:
+    lngs = [c[0] for c in coordenadas]
+    lats = [c[1] for c in coordenadas]
+    return min(lngs), min(lats), max(lngs), max(lats)
+
+
+def _se_cruzan(a: Caja, b: Caja) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class _RutaTesela:
+    """Geometría de una ruta visible con su caja y sus niveles ya decodificados"""
+
+    def __init__(self, ruta, geometria: bytes):
+        self.id = ruta.id
+        self.name = ruta.name
+        self.number = ruta.number
+        self.geometria = geometria
+        self.caja = _caja_de(decodificar_geometria(geometria))
+        self._niveles: Dict[int, List[List[float]]] = {}
+
+    def coordenadas(self, nivel: int) -> List[List[float]]:
+        coordenadas = self._niveles.get(nivel)
+        if coordenadas is None:
+            coordenadas = decodificar_geometria(geometrias_multinivel.obtener(self.id, self.geometria, nivel))
+            self._niveles[nivel] = coordenadas
+        return coordenadas
+
+
+class FuenteTeselas:
+    """Rutas visibles y sus paradas de una versión de las rutas"""
+
+    def __init__(self, rutas, version: int):
+        self.version = version
+        self.rutas: List[_RutaTesela] = []
+        self.paradas = IndiceEspacial()
+        puntos = []
+        for ruta in rutas:
+            if not ruta.visible:
+                continue
+            geometria = ruta.geometria_binaria()
+            if geometria:
+                self.rutas.append(_RutaTesela(ruta, geometria))
+            for parada in ruta.paradas:
+                puntos.append((parada.id, parada.lat, parada.lng, (ruta.id, parada.name)))
+        self.paradas.cargar(puntos)
+
+    def generar(self, z: int, x: int, y: int) -> bytes:
+        """FeatureCollection GeoJSON de la tesela"""
+        caja = caja_tesela(z, x, y)
+        nivel = resolver_nivel(zoom=z)
+        decimales = decimales_para_zoom(z)
+
+        def redondear(c):
+            return [round(c[0], decimales), round(c[1], decimales)]
+
+        features = []
+        for ruta in self.rutas:
+            if not _se_cruzan(ruta.caja, caja):
+                continue
+            partes = recortar_linea(ruta.coordenadas(nivel), caja)
+            if not partes:
+                continue
+            lineas = [[redondear(c) for c in parte] for parte in partes]
+            geometria = (
+                {"type": "LineString", "coordinates": lineas[0]} if len(lineas) == 1
+                else {"type": "MultiLineString", "coordinates": lineas}
+            )
+            features.append({
+                "type": "Feature",
+                "geometry": geometria,
+                "properties": {"tipo": "ruta", "id": ruta.id, "name": ruta.name, "number": ruta.number},
+            })
+
+        lng_min, lat_min, lng_max, lat_max = caja
+        for parada_id, lat, lng, (ruta_id, nombre) in self.paradas.en_caja(lat_min, lat_max, lng_min, lng_max):
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": redondear((lng, lat))},
+                "properties": {"tipo": "parada", "id": parada_id, "ruta_id": ruta_id, "name": nombre},
+            })
+
+        for parada_id, lat, lng, datos in indice_paradas.en_caja(lat_min, lat_max, lng_min, lng_max):
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": redondear((lng, lat))},
+                "properties": {"tipo": "parada_bus", "id": parada_id, "nombre": datos["nombre"], "zona": datos["zona"]},
+            })
+
+        return encode_json({"type": "FeatureCollection", "features": features})
+
+
+class CacheTeselas:
+    """Teselas codificadas de la versión vigente de la red"""
+
+    def __init__(self):
+        self._fuente: Optional[FuenteTeselas] = None
+        # Versiones de la red (rutas, paradas de buses) de las teselas guardadas
+        self._versiones: Optional[Tuple[Version, Version]] = None
+        self._teselas: Dict[Tuple[int, int, int], Precomprimido] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, db: Session, z: int, x: int, y: int) -> Precomprimido:
+        # Primero las versiones y después el índice sincronizado a esa versión (o una
+        # posterior): una tesela nunca lleva una versión más nueva que sus paradas
+        rutas, paradas = leer_versiones(db, RUTAS, PARADAS_BUSES)
+        indice_paradas.sincronizar(db, paradas.numero)
+        vigentes = self._versiones
+        if vigentes is None or rutas.numero > vigentes[0].numero or paradas.numero > vigentes[1].numero:
+            with self._lock:
+                vigentes = self._versiones
+                if vigentes is None or rutas.numero > vigentes[0].numero or paradas.numero > vigentes[1].numero:
+                    if self._fuente is None or self._fuente.version != rutas.numero:
+                        self._fuente = FuenteTeselas(query_rutas(db).all(), rutas.numero)
+                    self._teselas = {}
+                    self._versiones = (rutas, paradas)
+
+        # Fuente, teselas y versiones del mismo estado: cada tesela lleva los
+        # validadores de la versión de la que salió, aunque la petición sea de una anterior
+        with self._lock:
+            fuente, teselas, versiones = self._fuente, self._teselas, self._versiones
+        cuerpo = teselas.get((z, x, y))
+        if cuerpo is None:
+            cuerpo = Precomprimido(fuente.generar(z, x, y), *validadores_version(versiones, z, x, y))
+            if len(teselas) >= MAX_TESELAS:
+                teselas.clear()
+            teselas[(z, x, y)] = cuerpo
+        return cuerpo
+
+
+cache_teselas = CacheTeselas()
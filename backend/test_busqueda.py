@@ -0,0 +1,74 @@
+"""
+Pruebas del índice de búsqueda de rutas (busqueda.py) sobre SQLite en memoria,
+no requiere MySQL:
+    python -m pytest test_busqueda.py
+"""
+from busqueda import IndiceBusqueda, normalizar, trigramas
+from models import Parada, Ruta
+from test_consultas import crear_sesion
+
+
+def crear_indice():
+    engine, db = crear_sesion()
+    for numero, nombre, paradas in (
+        ("101", "Jinotega - Managua", ["Terminal Norte", "Sébaco"]),
+        ("102", "Managua - Matagalpa", ["Ciudad Darío", "San Isidro"]),
+        ("7", "Circuito La Fundadora", ["Parque Central", "Mercado Municipal"]),
+    ):
+        ruta = Ruta(name=nombre, number=numero, start_time="06:00", end_time="18:00", frequency=30)
+        ruta.paradas = [Parada(name=p, lat=13.09, lng=-86.0, order=i) for i, p in enumerate(paradas)]
+        db.add(ruta)
+    db.commit()
+    indice = IndiceBusqueda()
+    indice.sincronizar(db)
+    return indice, db
+
+
+def nombres(resultados):
+    return [r["name"] for r in resultados]
+
+
+def test_normalizacion_y_trigramas():
+    assert normalizar("  Jinotéga-NORTE ") == "jinotega norte"
+    assert normalizar(None) == ""
+    assert trigramas("ruta") == {"  r", " ru", "rut", "uta", "ta "}
+    assert trigramas("a b") == {"  a", " a ", "  b", " b "}
+
+
+def test_sin_tildes_ni_mayusculas():
+    indice, _ = crear_indice()
+    assert nombres(indice.buscar("JINOTEGA")) == ["Jinotega - Managua"]
+    resultado, = indice.buscar("sebaco")
+    assert resultado["coincidencia"] == "parada"
+    assert resultado["paradas"] == ["Sébaco"]
+    assert "routeGeometry" not in resultado
+
+
+def test_tolera_errores_de_escritura():
+    indice, _ = crear_indice()
+    assert nombres(indice.buscar("jinoteca")) == ["Jinotega - Managua"]
+    assert nombres(indice.buscar("fundadroa")) == ["Circuito La Fundadora"]
+    assert indice.buscar("xyzw") == []
+    assert indice.buscar("  ") == []
+
+
+def test_orden_por_relevancia():
+    indice, _ = crear_indice()
+    # Prefijo del nombre antes que coincidencia en medio del nombre
+    assert nombres(indice.buscar("managua")) == ["Managua - Matagalpa", "Jinotega - Managua"]
+    # Nombre o número antes que parada
+    assert indice.buscar("101")[0]["coincidencia"] == "number"
+    assert len(indice.buscar("managua", limite=1)) == 1
+
+
+def test_refleja_escrituras_por_version():
+    indice, db = crear_indice()
+    version = indice.version
+    db.query(Ruta).filter(Ruta.number == "7").one().name = "Circuito El Dorado"
+    db.commit()
+    assert indice.buscar("dorado") == []  # Todavía no sincronizado
+
+    indice.sincronizar(db)
+    assert indice.version > version
+    assert nombres(indice.buscar("dorado")) == ["Circuito El Dorado"]
+    assert indice.buscar("fundadora") == []
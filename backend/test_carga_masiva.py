@@ -0,0 +1,107 @@
+"""
+Pruebas de la carga masiva de horarios (carga_masiva.py)
+Usa una base de datos SQLite en memoria, no requiere MySQL:
+    python -m pytest test_carga_masiva.py
+"""
+import pytest
+
+from models import Bus, Horario, EstadoBus
+from carga_masiva import ErroresCarga, cargar_horarios
+from test_consultas import contar_consultas, crear_sesion
+
+
+def fila(transporte="Transportes Unidos", zona="sur", tipo="salida", hora="5:30 am", **extra):
+    return {"transporte": transporte, "zona": zona, "tipo": tipo,
+            "destino_procedencia": "Managua", "hora": hora, **extra}
+
+
+def test_crea_buses_y_actualiza_horarios_existentes():
+    engine, db = crear_sesion()
+    resumen = cargar_horarios(db, [fila(), fila(hora="6:00 am"), fila(transporte="Otro", zona="norte")])
+    assert resumen["buses_creados"] == 2
+    assert resumen["horarios_insertados"] == 3
+
+    # La misma salida con otro formato de hora se actualiza en lugar de duplicarse
+    resumen = cargar_horarios(db, [fila(hora="05:30 am", estado="red"), fila(hora="7:00 am")])
+    assert resumen["buses_creados"] == 0
+    assert resumen["horarios_actualizados"] == 1
+    assert resumen["horarios_insertados"] == 1
+
+    db.expire_all()
+    assert db.query(Bus).count() == 2
+    assert db.query(Horario).count() == 4
+    horario = db.query(Horario).join(Horario.bus).filter(
+        Bus.nombre_transporte == "Transportes Unidos", Horario.minuto_del_dia == 330
+    ).one()
+    assert horario.estado == EstadoBus.RED
+
+
+def test_filas_invalidas_no_escriben_nada():
+    engine, db = crear_sesion()
+    filas = [fila(), fila(zona="oeste"), fila(hora="13:00 pm"), fila()]
+    with pytest.raises(ErroresCarga) as error:
+        cargar_horarios(db, filas)
+    assert [e["fila"] for e in error.value.errores] == [2, 3, 4]
+    assert db.query(Horario).count() == 0
+
+    resumen = cargar_horarios(db, filas, parcial=True)
+    assert resumen["horarios_insertados"] == 1
+    assert len(resumen["errores"]) == 3
+
+
+def test_consultas_no_dependen_de_la_cantidad_de_filas():
+    def consultas(cantidad):
+        engine, db = crear_sesion()
+        filas = [
+            fila(transporte=f"Bus {i % 20}", hora=f"{1 + (i // 60) % 12}:{i % 60:02d} am")
+            for i in range(cantidad)
+        ]
+        with contar_consultas(engine) as sentencias:
+            cargar_horarios(db, filas)
+        return len(sentencias)
+
+    assert consultas(100) == consultas(600)
+
+
+def test_respaldo_fila_por_fila(monkeypatch):
+    """Motores sin upsert nativo: mismo resultado buscando cada fila por su clave"""
+    engine, db = crear_sesion()
+    monkeypatch.setattr(engine.dialect, "name", "otro")
+    cargar_horarios(db, [fila(), fila(hora="6:00 am")])
+    resumen = cargar_horarios(db, [fila(hora="05:30 am", estado="red"), fila(transporte="Otro")])
+    assert resumen["buses_creados"] == 1
+    assert resumen["horarios_actualizados"] == 1
+    assert resumen["horarios_insertados"] == 1
+
+    db.expire_all()
+    assert db.query(Bus).count() == 2
+    assert db.query(Horario).count() == 3
+    horario = db.query(Horario).join(Horario.bus).filter(
+        Bus.nombre_transporte == "Transportes Unidos", Horario.minuto_del_dia == 330
+    ).one()
+    assert horario.estado == EstadoBus.RED
+
+
+def test_nombres_con_otras_mayusculas_o_tildes(monkeypatch):
+    """En MySQL el índice único ignora mayúsculas y tildes: se emula con COLLATE NOCASE"""
+    monkeypatch.setattr(Bus.__table__.c.nombre_transporte.type, "collation", "NOCASE")
+    engine, db = crear_sesion()
+    cargar_horarios(db, [fila()])
+
+    resumen = cargar_horarios(db, [
+        fila(transporte="transportes unidos", hora="6:00 am"),
+        fila(transporte=" TRANSPORTES UNIDOS ", hora="7:00 am"),
+        fila(transporte="Expréss Sur", hora="8:00 am"),
+        fila(transporte="express sur", hora="9:00 am"),
+    ])
+    assert resumen["buses_creados"] == 1
+    assert resumen["horarios_insertados"] == 4
+
+    db.expire_all()
+    assert sorted(b.nombre_transporte for b in db.query(Bus)) == ["Expréss Sur", "Transportes Unidos"]
+    assert db.query(Horario).count() == 5
+
+    # La misma salida escrita con otro nombre es una fila repetida
+    with pytest.raises(ErroresCarga) as error:
+        cargar_horarios(db, [fila(), fila(transporte="transportes unidos")])
+    assert [e["fila"] for e in error.value.errores] == [2]
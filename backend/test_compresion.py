@@ -0,0 +1,90 @@
+"""
+Pruebas de la compresión de respuestas (compresion.py)
+No requiere MySQL:
+    python -m pytest test_compresion.py
+"""
+import gzip
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from compresion import CompresionMiddleware, Precomprimido, elegir_codificacion, respuesta_precomprimida
+from condicional import validadores_version
+from versiones import Version
+
+FILA = b'{"name":"Ruta 1","routeGeometry":[[-86.25,12.13],[-86.26,12.14]]}\n'
+CUERPO = Precomprimido(FILA * 200, *validadores_version([Version(3, datetime(2026, 1, 1, tzinfo=timezone.utc))]))
+
+
+def crear_cliente() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompresionMiddleware)
+
+    @app.get("/grande")
+    async def grande():
+        return Response(content=FILA * 200, media_type="application/json")
+
+    @app.get("/chica")
+    async def chica():
+        return Response(content=FILA, media_type="application/json")
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse((FILA for _ in range(2000)), media_type="application/x-ndjson")
+
+    @app.get("/precomprimida")
+    async def precomprimida(request: Request):
+        return respuesta_precomprimida(request, CUERPO)
+
+    return TestClient(app)
+
+
+def get_crudo(cliente: TestClient, ruta: str, accept_encoding: str, encabezados: dict = None):
+    """Respuesta y cuerpo tal como se envió (sin descomprimir)"""
+    encabezados = {"Accept-Encoding": accept_encoding, **(encabezados or {})}
+    with cliente.stream("GET", ruta, headers=encabezados) as respuesta:
+        return respuesta, b"".join(respuesta.iter_raw())
+
+
+def test_negociacion_accept_encoding():
+    assert elegir_codificacion("gzip, deflate") == "gzip"
+    assert elegir_codificacion("gzip;q=0, deflate") is None
+    assert elegir_codificacion("identity") is None
+    assert elegir_codificacion("*;q=0.5") == elegir_codificacion("gzip")
+    assert elegir_codificacion("") is None
+
+
+def test_comprime_segun_tamano_y_accept_encoding():
+    cliente = crear_cliente()
+    respuesta, cuerpo = get_crudo(cliente, "/grande", "gzip")
+    assert respuesta.headers["content-encoding"] == "gzip"
+    assert respuesta.headers["vary"] == "Accept-Encoding"
+    assert int(respuesta.headers["content-length"]) == len(cuerpo)
+    assert gzip.decompress(cuerpo) == FILA * 200
+
+    respuesta, cuerpo = get_crudo(cliente, "/chica", "gzip")
+    assert "content-encoding" not in respuesta.headers
+    assert cuerpo == FILA
+
+    respuesta, cuerpo = get_crudo(cliente, "/grande", "identity")
+    assert "content-encoding" not in respuesta.headers
+    assert cuerpo == FILA * 200
+
+
+def test_stream_comprimido_por_partes():
+    respuesta, cuerpo = get_crudo(crear_cliente(), "/stream", "gzip")
+    assert respuesta.headers["content-encoding"] == "gzip"
+    assert "content-length" not in respuesta.headers
+    assert gzip.decompress(cuerpo) == FILA * 2000
+
+
+def test_precomprimido_se_comprime_una_vez():
+    cliente = crear_cliente()
+    _, primero = get_crudo(cliente, "/precomprimida", "gzip")
+    _, segundo = get_crudo(cliente, "/precomprimida", "gzip")
+    assert primero == segundo
+    assert CUERPO.variante("gzip") is CUERPO.variante("gzip")
+    assert gzip.decompress(primero) == CUERPO.datos
+    assert get_crudo(cliente, "/precomprimida", "identity")[1] == CUERPO.datos
@@ -0,0 +1,80 @@
+"""
+Pruebas del GET condicional (condicional.py)
+Usa una base de datos SQLite en memoria, no requiere MySQL:
+    python -m pytest test_condicional.py
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from fastapi.responses import Response
+
+from models import EstadoBus, Horario
+from condicional import agregar_validadores, validadores_version
+from versiones import BUSES, Version, leer_versiones
+from test_compresion import CUERPO, crear_cliente, get_crudo
+from test_consultas import contar_consultas, crear_sesion, poblar
+
+
+def test_if_none_match_responde_304_por_codificacion():
+    cliente = crear_cliente()
+    respuesta, _ = get_crudo(cliente, "/precomprimida", "gzip")
+    etag = respuesta.headers["etag"]
+    assert etag.endswith('-gzip"')
+    assert respuesta.headers["cache-control"] == "no-cache"
+
+    respuesta, cuerpo = get_crudo(cliente, "/precomprimida", "gzip", {"If-None-Match": f'"otra", {etag}'})
+    assert respuesta.status_code == 304 and cuerpo == b""
+    assert respuesta.headers["etag"] == etag
+
+    # La variante sin comprimir tiene otra ETag pero es la misma versión
+    respuesta, _ = get_crudo(cliente, "/precomprimida", "identity", {"If-None-Match": etag})
+    assert respuesta.status_code == 304
+    assert respuesta.headers["etag"] == CUERPO.etag
+
+    respuesta, _ = get_crudo(cliente, "/precomprimida", "gzip", {"If-None-Match": '"otra"'})
+    assert respuesta.status_code == 200
+
+
+def test_if_modified_since():
+    cliente = crear_cliente()
+    antes = format_datetime(CUERPO.modificado - timedelta(seconds=5), usegmt=True)
+    despues = format_datetime(CUERPO.modificado + timedelta(seconds=5), usegmt=True)
+    assert get_crudo(cliente, "/precomprimida", "gzip", {"If-Modified-Since": despues})[0].status_code == 304
+    assert get_crudo(cliente, "/precomprimida", "gzip", {"If-Modified-Since": antes})[0].status_code == 200
+    assert get_crudo(cliente, "/precomprimida", "gzip", {"If-Modified-Since": "ayer"})[0].status_code == 200
+    # If-None-Match tiene prioridad sobre If-Modified-Since
+    encabezados = {"If-None-Match": '"otra"', "If-Modified-Since": despues}
+    assert get_crudo(cliente, "/precomprimida", "gzip", encabezados)[0].status_code == 200
+
+
+def test_validadores_de_la_version_en_la_base():
+    engine, db = crear_sesion()
+    poblar(db, 3)
+
+    def validadores():
+        with contar_consultas(engine) as sentencias:
+            resultado = validadores_version(leer_versiones(db, BUSES), "sur")
+        assert len(sentencias) == 1
+        return resultado
+
+    etag, modificado = validadores()
+    assert validadores() == (etag, modificado)
+    assert validadores_version(leer_versiones(db, BUSES), "norte")[0] != etag
+
+    # Dos escrituras en el mismo segundo dan validadores distintos
+    db.get(Horario, 1).estado = EstadoBus.RED
+    db.commit()
+    etag_modificado, modificado_2 = validadores()
+    assert etag_modificado != etag and modificado_2 > modificado
+
+    db.delete(db.get(Horario, 2))
+    db.commit()
+    assert validadores()[0] != etag_modificado
+
+
+def test_last_modified_adelantado_se_omite():
+    futuro = Version(7, datetime.now(timezone.utc) + timedelta(seconds=30))
+    etag, modificado = validadores_version([futuro])
+    respuesta = agregar_validadores(Response(), etag, modificado)
+    assert respuesta.headers["etag"] == etag
+    assert "last-modified" not in respuesta.headers
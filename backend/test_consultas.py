@@ -0,0 +1,181 @@
+"""
+Pruebas de la capa de consultas (consultas.py)
+Verifica que los listados ejecuten un número fijo de consultas sin importar
+cuántas filas devuelvan (sin consultas N+1 por relaciones lazy).
+
+Usa una base de datos SQLite en memoria, no requiere MySQL:
+    python -m pytest test_consultas.py
+"""
+from contextlib import contextmanager
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base, get_db
+from models import Ruta, Parada, Bus, Horario, ZonaBus, TipoHorario
+from consultas import query_rutas, query_buses, query_horarios_zona
+
+
+def crear_sesion():
+    """Crear una sesión sobre una base SQLite en memoria con todas las tablas"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine)()
+
+
+@contextmanager
+def contar_consultas(engine):
+    """Contar las sentencias SQL ejecutadas dentro del bloque"""
+    sentencias = []
+
+    def registrar(conn, cursor, statement, *args):
+        sentencias.append(statement)
+
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        yield sentencias
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+
+
+def poblar(db, cantidad):
+    """Crear `cantidad` rutas y buses, cada uno con varias paradas/horarios"""
+    for i in range(cantidad):
+        ruta = Ruta(name=f"Ruta {i}", number=str(i), start_time="06:00",
+                    end_time="18:00", frequency=15)
+        ruta.paradas = [
+            Parada(name=f"Parada {i}-{j}", lat=13.09 + j * 0.001, lng=-86.0, order=j)
+            for j in range(3)
+        ]
+        bus = Bus(nombre_transporte=f"Transporte {i}", zona=ZonaBus.SUR, activo=True)
+        bus.horarios = [
+            Horario(tipo=tipo, destino_procedencia="Managua", hora=f"{j + 1}:00 am")
+            for j in range(2)
+            for tipo in (TipoHorario.SALIDA, TipoHorario.ENTRADA)
+        ]
+        db.add_all([ruta, bus])
+    db.commit()
+
+
+def consultas_por_listado(cantidad, listar):
+    """Número de consultas que ejecuta `listar` con `cantidad` filas en la base"""
+    engine, db = crear_sesion()
+    try:
+        poblar(db, cantidad)
+        db.expire_all()
+        with contar_consultas(engine) as sentencias:
+            listar(db)
+        return len(sentencias)
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def listar_rutas(db):
+    return [ruta.to_dict() for ruta in query_rutas(db).all()]
+
+
+def listar_buses(db):
+    return [bus.to_dict() for bus in query_buses(db).filter(Bus.activo == True).all()]
+
+
+def listar_salidas(db):
+    return [h.to_dict() for h in query_horarios_zona(db, ZonaBus.SUR, TipoHorario.SALIDA).all()]
+
+
+def test_rutas_consultas_constantes():
+    assert consultas_por_listado(1, listar_rutas) == 2
+    assert consultas_por_listado(25, listar_rutas) == 2
+
+
+def test_buses_consultas_constantes():
+    assert consultas_por_listado(1, listar_buses) == 2
+    assert consultas_por_listado(25, listar_buses) == 2
+
+
+def test_horarios_zona_una_consulta():
+    assert consultas_por_listado(1, listar_salidas) == 1
+    assert consultas_por_listado(25, listar_salidas) == 1
+
+
+def test_horarios_incluyen_transporte():
+    engine, db = crear_sesion()
+    try:
+        poblar(db, 2)
+        salidas = listar_salidas(db)
+        assert len(salidas) == 4
+        assert all(h["transporte"].startswith("Transporte") for h in salidas)
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_get_buses_con_horarios():
+    """Regresión: GET /buses respondía 500 si algún bus tenía horarios (HorarioResponse)"""
+    from routers import buses
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    db = Sesion()
+    poblar(db, 2)
+    db.close()
+
+    def get_db_prueba():
+        sesion = Sesion()
+        try:
+            yield sesion
+        finally:
+            sesion.close()
+
+    app = FastAPI()
+    app.include_router(buses.router)
+    app.dependency_overrides[get_db] = get_db_prueba
+    try:
+        respuesta = TestClient(app).get("/buses/")
+        assert respuesta.status_code == 200
+        horarios = respuesta.json()[0]["horarios"]
+        assert {h["tipo"] for h in horarios} == {"salida", "entrada"}
+        for horario in horarios:
+            campo = "destino" if horario["tipo"] == "salida" else "procedencia"
+            assert horario[campo] == "Managua"
+            assert horario["transporte"] == "Transporte 0"
+    finally:
+        engine.dispose()
+
+
+def test_stream_ndjson_por_lotes(monkeypatch):
+    """El stream lee por páginas keyset: cada lote con sus relaciones, sin filas repetidas"""
+    import json
+
+    import database
+    import streaming
+    from routers import rutas
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    db = Sesion()
+    poblar(db, 7)
+    db.close()
+    monkeypatch.setattr(database, "SessionLocal", Sesion)
+    monkeypatch.setattr(streaming, "TAMANO_LOTE", 3)
+
+    app = FastAPI()
+    app.include_router(rutas.router)
+    try:
+        with contar_consultas(engine) as sentencias:
+            respuesta = TestClient(app).get("/rutas/", params={"stream": 1})
+        assert respuesta.status_code == 200
+        assert respuesta.headers["content-type"] == "application/x-ndjson"
+        filas = [json.loads(linea) for linea in respuesta.text.splitlines()]
+        assert [fila["name"] for fila in filas] == [f"Ruta {i}" for i in range(7)]
+        assert all(len(fila["paradas"]) == 3 for fila in filas)
+        # 3 lotes (3 + 3 + 1), cada uno con su consulta de rutas y la de paradas
+        assert len([s for s in sentencias if "FROM rutas" in s]) == 3
+        assert len([s for s in sentencias if "FROM paradas" in s]) == 3
+    finally:
+        engine.dispose()
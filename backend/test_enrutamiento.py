@@ -0,0 +1,107 @@
+"""
+Pruebas del motor de enrutamiento vial (enrutamiento.py) sobre un extracto
+OSM mínimo escrito en un directorio temporal, no requiere MySQL:
+    python -m pytest test_enrutamiento.py
+"""
+import pytest
+from pydantic import ValidationError
+
+import enrutamiento
+from config import settings
+from enrutamiento import VELOCIDAD_MAXIMA, GrafoVial, RutaNoEncontrada, _velocidad
+from schemas import CalcularGeometriaRequest
+
+# A(0) ---- residencial directa ---- D(3)
+#  \                               /
+#   B(1) ------- primaria ------ C(2)        E(4) aislado
+EXTRACTO = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="10" lat="13.0900" lon="-86.0000"/>
+  <node id="11" lat="13.0880" lon="-86.0000"/>
+  <node id="12" lat="13.0880" lon="-85.9900"/>
+  <node id="13" lat="13.0900" lon="-85.9900"/>
+  <node id="14" lat="13.1000" lon="-85.9000"/>
+  <node id="15" lat="13.1001" lon="-85.9000"/>
+  <way id="1"><nd ref="10"/><nd ref="11"/><nd ref="12"/><nd ref="13"/><tag k="highway" v="primary"/><tag k="maxspeed" v="200"/></way>
+  <way id="2"><nd ref="10"/><nd ref="13"/><tag k="highway" v="residential"/></way>
+  <way id="3"><nd ref="14"/><nd ref="15"/><tag k="highway" v="service"/></way>
+</osm>
+"""
+
+
+@pytest.fixture
+def grafo(tmp_path):
+    ruta = tmp_path / "prueba.osm"
+    ruta.write_text(EXTRACTO, encoding="utf-8")
+    return GrafoVial.desde_osm(str(ruta))
+
+
+def test_velocidad_de_la_via():
+    assert _velocidad({"highway": "residential"}) == 25
+    assert _velocidad({"highway": "primary", "maxspeed": "40"}) == 40
+    assert _velocidad({"highway": "primary", "maxspeed": "40 km/h"}) == 40
+    assert _velocidad({"highway": "primary", "maxspeed": "30 mph"}) == pytest.approx(48.28, abs=0.01)
+    assert _velocidad({"highway": "primary", "maxspeed": "30mph"}) == pytest.approx(48.28, abs=0.01)
+    # Valores que no sirven: se usa la velocidad del tipo de vía
+    assert _velocidad({"highway": "primary", "maxspeed": "0"}) == 60
+    assert _velocidad({"highway": "primary", "maxspeed": "none"}) == 60
+    # Nunca más que VELOCIDAD_MAXIMA (cota de la heurística de A*)
+    assert _velocidad({"highway": "motorway", "maxspeed": "120"}) == VELOCIDAD_MAXIMA
+    assert _velocidad({"highway": "motorway", "maxspeed": "100 mph"}) == VELOCIDAD_MAXIMA
+    assert _velocidad({"highway": "footway"}) is None
+    assert _velocidad({"highway": "primary", "access": "private"}) is None
+
+
+def test_aristas_no_superan_velocidad_maxima(grafo):
+    for i in range(grafo.total_aristas):
+        assert grafo.metros[i] / grafo.segundos[i] <= VELOCIDAD_MAXIMA / 3.6 + 1e-3
+
+
+def test_a_estrella_camino_mas_rapido(grafo):
+    # La primaria es más larga pero más rápida que la residencial directa
+    assert grafo.a_estrella(0, 3) == [0, 1, 2, 3]
+    assert grafo.a_estrella(3, 0) == [3, 2, 1, 0]
+    assert grafo.a_estrella(2, 2) == [2]
+    with pytest.raises(RutaNoEncontrada):
+        grafo.a_estrella(0, 4)
+
+
+def test_calcular_ruta(grafo):
+    ruta = grafo.calcular_ruta([(13.0901, -86.0001), (13.0899, -85.9899)])
+    assert ruta["routeGeometry"][0] == [-86.0, 13.09]
+    assert ruta["routeGeometry"][-1] == [-85.99, 13.09]
+    assert len(ruta["routeGeometry"]) == 4
+    assert ruta["distance"] == pytest.approx(1.53, abs=0.02)
+
+
+def test_nodo_cercano_en_longitud_a_latitud_alta(tmp_path):
+    # A 60° una celda mide la mitad en longitud que en latitud: un nodo a 900 m
+    # al este queda a más anillos de los que alcanzan para 1000 m en latitud
+    ruta = tmp_path / "norte.osm"
+    ruta.write_text("""<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="20" lat="60.0000" lon="10.0000"/>
+  <node id="21" lat="60.0010" lon="10.0000"/>
+  <way id="4"><nd ref="20"/><nd ref="21"/><tag k="highway" v="residential"/></way>
+</osm>
+""", encoding="utf-8")
+    grafo = GrafoVial.desde_osm(str(ruta))
+    assert grafo.nodo_cercano(60.0, 9.9838) == 0
+    assert grafo.nodo_cercano(60.0, 9.9800) is None
+
+
+def test_calcular_geometria_pide_dos_paradas():
+    parada = {"name": "A", "lat": 13.09, "lng": -86.0}
+    assert len(CalcularGeometriaRequest(paradas=[parada, parada]).paradas) == 2
+    with pytest.raises(ValidationError):
+        CalcularGeometriaRequest(paradas=[parada])
+
+
+def test_extracto_ilegible_sin_grafo(tmp_path, monkeypatch):
+    ruta = tmp_path / "roto.osm"
+    ruta.write_text("<osm><node", encoding="utf-8")
+    monkeypatch.setattr(settings, "OSM_GRAFO_PATH", str(ruta))
+    monkeypatch.setattr(enrutamiento, "_grafo", None)
+    monkeypatch.setattr(enrutamiento, "_fallo_carga", False)
+    assert enrutamiento.obtener_grafo() is None
+    assert enrutamiento._fallo_carga
@@ -0,0 +1,81 @@
+"""
+Pruebas de las búsquedas por radio (espacial.py) sin MySQL
+Con SQLite se usa el camino de respaldo: caja de lat/lng en SQL y distancia
+haversine en Python. Debe devolver lo mismo que un recorrido completo.
+
+    python -m pytest test_espacial.py
+"""
+import random
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from enrutamiento import haversine_m
+from espacial import caja_envolvente, cercanos, ddl_columna, modo_espacial
+from models import Favorito, Usuario
+
+
+def crear_sesion():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def poblar(db, cantidad, lat_centro=13.09, lng_centro=-86.0):
+    usuario = Usuario(nombre="Prueba", email="prueba@viajero.app", password_hash="x")
+    db.add(usuario)
+    db.flush()
+    aleatorio = random.Random(7)
+    for i in range(cantidad):
+        db.add(Favorito(
+            usuario_id=usuario.id,
+            lugar_nombre=f"Lugar {i}",
+            lat=lat_centro + aleatorio.uniform(-0.05, 0.05),
+            lng=lng_centro + aleatorio.uniform(-0.05, 0.05),
+        ))
+    db.commit()
+    return usuario
+
+
+def test_sqlite_usa_respaldo():
+    assert not modo_espacial(crear_sesion())
+
+
+def test_radio_igual_a_recorrido_completo():
+    db = crear_sesion()
+    poblar(db, 300)
+    punto, radio = (13.09, -86.0), 2500
+
+    resultado = cercanos(db, db.query(Favorito), Favorito.lat, Favorito.lng, *punto, radio)
+
+    esperado = sorted(
+        (haversine_m(*punto, f.lat, f.lng), f.id) for f in db.query(Favorito)
+        if haversine_m(*punto, f.lat, f.lng) <= radio
+    )
+    assert [f.id for f, _ in resultado] == [i for _, i in esperado]
+    assert all(a[1] <= b[1] for a, b in zip(resultado, resultado[1:]))
+
+
+def test_limit_devuelve_los_mas_cercanos():
+    db = crear_sesion()
+    poblar(db, 100)
+    todos = cercanos(db, db.query(Favorito), Favorito.lat, Favorito.lng, 13.09, -86.0, 5000)
+    primeros = cercanos(db, db.query(Favorito), Favorito.lat, Favorito.lng, 13.09, -86.0, 5000, limit=5)
+    assert primeros == todos[:5]
+
+
+def test_caja_envolvente_contiene_el_circulo_lejos_del_ecuador():
+    lat, lng, radio = 60.0, 10.0, 10000
+    lat_min, lat_max, lng_min, lng_max = caja_envolvente(lat, lng, radio)
+    # Puntos a la distancia del radio hacia el este y el norte quedan dentro de la caja
+    assert haversine_m(lat, lng, lat, lng_max) >= radio
+    assert haversine_m(lat, lng, lat_max, lng) >= radio
+    assert lng_max - lng > lat_max - lat
+
+
+def test_ddl_columna_generada_con_indice_espacial():
+    sentencias = ddl_columna("favoritos", "ubicacion", "lat", "lng")
+    assert "POINT SRID 4326" in sentencias[0]
+    assert "ST_SRID(POINT(`lng`, `lat`), 4326)" in sentencias[0]
+    assert sentencias[1].startswith("ALTER TABLE `favoritos` ADD SPATIAL INDEX")
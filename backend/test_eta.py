@@ -0,0 +1,108 @@
+"""
+Pruebas de los tiempos estimados de llegada (eta.py) sobre SQLite en memoria,
+no requiere MySQL:
+    python -m pytest test_eta.py
+"""
+import time
+
+import pytest
+
+import eta
+from eta import LineaRuta, MotorEta
+from indice_espacial import IndiceParadasBus
+from models import Parada, Ruta
+from test_consultas import crear_sesion
+from vehiculos import Ping, Vehiculo
+
+LAT = 13.09
+# Línea recta hacia el este de unos 1084 m, con una parada cada ~325 m
+LNGS_PARADAS = [-86.0, -85.997, -85.994, -85.991]
+METROS_POR_MILESIMA = 1e-3 * LineaRuta(0, [[0, LAT], [1, LAT]], 1).largo
+
+
+@pytest.fixture
+def motor(monkeypatch):
+    monkeypatch.setattr(eta, "indice_paradas", IndiceParadasBus())
+    engine, db = crear_sesion()
+    ruta = Ruta(name="Este", number="1", start_time="06:00", end_time="18:00", frequency=15)
+    ruta.set_coordenadas([[-86.0, LAT], [-85.99, LAT]])
+    ruta.paradas = [Parada(name=f"P{i}", lat=LAT, lng=lng, order=i) for i, lng in enumerate(LNGS_PARADAS)]
+    db.add(ruta)
+    db.commit()
+    motor = MotorEta()
+    yield motor, db, ruta.id
+    db.close()
+    engine.dispose()
+
+
+def ping(vehiculo: Vehiculo, momento: float, milesimas: float, lat: float = LAT):
+    """Ping a `milesimas` de grado al este del inicio de la ruta"""
+    vehiculo.historial.append(Ping(momento, lat, -86.0 + milesimas * 1e-3, None))
+
+
+def test_proyeccion_sobre_la_linea():
+    linea = LineaRuta(1, [[-86.0, LAT], [-85.995, LAT], [-85.99, LAT]], 10.0)
+    # ~55 m al norte del punto medio de la línea
+    distancia, avance, segmento = linea.proyectar(LAT + 0.0005, -85.995)
+    assert distancia == pytest.approx(55.3, abs=0.5)
+    assert avance == pytest.approx(linea.largo / 2, abs=0.5)
+    assert segmento in (0, 1)
+    # Antes del inicio: se proyecta sobre el primer vértice
+    assert linea.proyectar(LAT, -86.001)[1] == 0.0
+
+
+def test_llegadas_segun_avance_y_velocidad(motor):
+    motor, db, ruta_id = motor
+    ahora = time.time()
+    vehiculo = Vehiculo("A", ruta_id)
+    ping(vehiculo, ahora - 60, 0.5)
+    ping(vehiculo, ahora, 3.5)  # 3 milésimas (~325 m) en 60 s
+    motor.procesar(db, [vehiculo])
+
+    velocidad = 3 * METROS_POR_MILESIMA / 60
+    assert motor._vehiculos["A"].velocidad == pytest.approx(velocidad, rel=0.01)
+
+    paradas = [p.id for p in db.query(Parada).order_by(Parada.order)]
+    # Las paradas 0 y 1 ya quedaron atrás
+    assert motor.llegadas(("parada", paradas[0])) == []
+    assert motor.llegadas(("parada", paradas[1])) == []
+    for orden in (2, 3):
+        llegada, = motor.llegadas(("parada", paradas[orden]))
+        metros = (orden * 3 - 3.5) * METROS_POR_MILESIMA
+        assert llegada["vehiculo"] == "A"
+        assert llegada["distancia_m"] == pytest.approx(metros, abs=2)
+        assert llegada["minutos"] == pytest.approx(metros / velocidad / 60, abs=0.1)
+
+
+def test_retroceso_grande_es_un_viaje_nuevo(motor):
+    motor, db, ruta_id = motor
+    ahora = time.time()
+    vehiculo = Vehiculo("A", ruta_id)
+    ping(vehiculo, ahora - 120, 8.0)
+    ping(vehiculo, ahora - 60, 9.5)
+    motor.procesar(db, [vehiculo])
+    primera = db.query(Parada).filter(Parada.order == 0).one().id
+    assert motor.llegadas(("parada", primera)) == []
+
+    # Retroceso pequeño (ruido del GPS): no retrocede, cuenta como detenido
+    velocidad = motor._vehiculos["A"].velocidad
+    ping(vehiculo, ahora - 30, 9.0)
+    motor.procesar(db, [vehiculo])
+    assert motor._vehiculos["A"].avance == pytest.approx(9.5 * METROS_POR_MILESIMA, abs=1)
+    assert motor._vehiculos["A"].velocidad == pytest.approx(velocidad * (1 - eta.PESO_VELOCIDAD))
+
+    # Vuelve al inicio de la ruta: más de RETROCESO_NUEVO_VIAJE atrás
+    ping(vehiculo, ahora, 0.2)
+    motor.procesar(db, [vehiculo])
+    assert motor._vehiculos["A"].avance == pytest.approx(0.2 * METROS_POR_MILESIMA, abs=1)
+    segunda = db.query(Parada).filter(Parada.order == 1).one().id
+    assert [l["vehiculo"] for l in motor.llegadas(("parada", segunda))] == ["A"]
+
+
+def test_ping_lejos_de_la_ruta_se_ignora(motor):
+    motor, db, ruta_id = motor
+    vehiculo = Vehiculo("A", ruta_id)
+    ping(vehiculo, time.time(), 5.0, lat=LAT + 0.01)  # ~1 km al norte
+    motor.procesar(db, [vehiculo])
+    ultima = db.query(Parada).filter(Parada.order == 3).one().id
+    assert motor.llegadas(("parada", ultima)) == []
@@ -0,0 +1,138 @@
+"""
+Pruebas del canal de eventos por zona (eventos.py) y del WebSocket
+/ws/buses/{zona} (routers/tiempo_real.py). Usa SQLite en memoria, no
+requiere MySQL:
+    python -m pytest test_eventos.py
+"""
+import asyncio
+import time
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.websockets import WebSocketDisconnect
+
+from database import Base, get_db
+from eventos import EVENTO_RESYNC, CanalEventos
+from models import Bus, Horario, TipoHorario, ZonaBus
+
+
+def pendientes(suscripcion):
+    mensajes = []
+    while not suscripcion.cola.empty():
+        mensajes.append(orjson.loads(suscripcion.cola.get_nowait()))
+    return mensajes
+
+
+def test_filtra_por_zona():
+    canal = CanalEventos()
+    sur, norte = canal.suscribir("sur"), canal.suscribir("norte")
+    otro_sur = canal.suscribir("sur")
+    assert canal.publicar("sur", {"evento": "bus", "id": 1}) == 2
+    assert canal.publicar("este", {"evento": "bus", "id": 2}) == 0
+    assert pendientes(sur) == pendientes(otro_sur) == [{"evento": "bus", "id": 1}]
+    assert pendientes(norte) == []
+
+    canal.cancelar(otro_sur)
+    canal.cancelar(otro_sur)  # Dos veces no falla
+    assert canal.total_suscripciones("sur") == 1
+    assert canal.publicar("sur", {"evento": "bus", "id": 3}) == 1
+    canal.cancelar(sur)
+    assert canal.total_suscripciones() == 1
+
+
+def test_cliente_lento_recibe_resync():
+    canal = CanalEventos(max_pendientes=3)
+    lento, rapido = canal.suscribir("sur"), canal.suscribir("sur")
+    for i in range(5):
+        canal.publicar("sur", {"evento": "horario", "id": i})
+        if i < 4:
+            pendientes(rapido)  # Este cliente lee a tiempo
+
+    # La cuarta no entró: se descartan las 3 pendientes y queda un resync, luego siguen llegando eventos
+    assert pendientes(lento) == [{"evento": "resync"}, {"evento": "horario", "id": 4}]
+    assert lento.descartados == 3
+    assert pendientes(rapido) == [{"evento": "horario", "id": 4}]
+    assert rapido.descartados == 0
+
+    # Un cliente que no lee nunca no acumula más de max_pendientes
+    for i in range(100):
+        canal.publicar("sur", {"evento": "horario", "id": i})
+    assert lento.cola.qsize() <= 3
+    assert lento.cola.get_nowait() == EVENTO_RESYNC
+
+
+def test_publicar_desde_otro_hilo():
+    async def probar():
+        canal = CanalEventos()
+        suscripcion = canal.suscribir("sur")
+        loop = asyncio.get_running_loop()
+        # Como un endpoint `def` en el threadpool
+        await loop.run_in_executor(None, canal.publicar, "sur", {"evento": "bus", "id": 1})
+        return await asyncio.wait_for(suscripcion.siguiente(), 1)
+
+    assert orjson.loads(asyncio.run(probar())) == {"evento": "bus", "id": 1}
+
+
+# ---------- WebSocket ----------
+
+def esperar(condicion, limite=2.0):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "tiempo de espera agotado"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    from routers import buses, tiempo_real
+
+    canal = CanalEventos()
+    monkeypatch.setattr(tiempo_real, "canal_eventos", canal)
+    monkeypatch.setattr(buses, "canal_eventos", canal)
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    with Sesion() as db:
+        bus = Bus(nombre_transporte="Transporte", zona=ZonaBus.SUR, activo=True)
+        bus.horarios = [Horario(tipo=TipoHorario.SALIDA, destino_procedencia="Managua", hora="5:00 am")]
+        db.add(bus)
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(buses.router)
+    app.include_router(tiempo_real.router)
+
+    def get_db_prueba():
+        with Sesion() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_db_prueba
+    return TestClient(app), canal
+
+
+def test_websocket_recibe_eventos_de_su_zona(cliente):
+    cliente, canal = cliente
+    with cliente.websocket_connect("/ws/buses/sur") as ws:
+        esperar(lambda: canal.total_suscripciones("sur") == 1)
+        canal.publicar("norte", {"evento": "bus", "id": 9})
+        # Un cambio de estado hecho por la API llega con solo los campos cambiados
+        assert cliente.put("/buses/horarios/1", json={"estado": "yellow"}).status_code == 200
+        assert ws.receive_json() == {"evento": "horario", "id": 1, "cambios": {"estado": "yellow"}}
+
+    # Al cerrar se cancela la suscripción
+    esperar(lambda: canal.total_suscripciones() == 0)
+
+
+def test_websocket_zona_invalida(cliente):
+    cliente, canal = cliente
+    with pytest.raises(WebSocketDisconnect) as error:
+        with cliente.websocket_connect("/ws/buses/oeste") as ws:
+            ws.receive_text()
+    assert error.value.code == 1008
+    assert canal.total_suscripciones() == 0
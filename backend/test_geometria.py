@@ -0,0 +1,42 @@
+"""
+Pruebas de la codificación de geometrías (geometria.py), no requiere MySQL:
+    python -m pytest test_geometria.py
+"""
+import pytest
+
+from geometria import (
+    binario_a_polyline, codificar_geometria, codificar_polyline, decodificar_geometria, decodificar_polyline
+)
+
+RUTA = [[-86.005123, 13.091234], [-85.998765, 13.095678], [-85.990001, 13.1], [180.0, -90.0]]
+
+
+def test_ida_y_vuelta_binario():
+    datos = codificar_geometria(RUTA)
+    assert len(datos) == 8 * len(RUTA)  # Dos int32 por punto
+    assert decodificar_geometria(datos) == RUTA
+    # Más decimales que la escala: se redondea al micro-grado
+    assert decodificar_geometria(codificar_geometria([[-86.0000004, 13.0000006]])) == [[-86.0, 13.000001]]
+    assert decodificar_geometria(codificar_geometria([])) == []
+
+
+def test_altura_se_ignora():
+    """Regresión: [lng, lat, alt] de GeoJSON fallaba al desempaquetar"""
+    assert codificar_geometria([[-86.0, 13.09, 850.5], [-85.99, 13.1, 900]]) == \
+        codificar_geometria([[-86.0, 13.09], [-85.99, 13.1]])
+    assert codificar_polyline([[-120.2, 38.5, 10.0]]) == codificar_polyline([[-120.2, 38.5]])
+
+
+def test_polyline_ejemplo_de_google():
+    # Ejemplo de la documentación del algoritmo (puntos en lat, lng)
+    coordenadas = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    assert codificar_polyline(coordenadas) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert decodificar_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@") == coordenadas
+
+
+def test_polyline_desde_binario():
+    datos = codificar_geometria(RUTA[:3])
+    decodificada = decodificar_polyline(binario_a_polyline(datos))
+    for (lng, lat), (lng_original, lat_original) in zip(decodificada, RUTA):
+        assert lng == pytest.approx(lng_original, abs=1e-5)
+        assert lat == pytest.approx(lat_original, abs=1e-5)
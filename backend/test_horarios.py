@@ -0,0 +1,150 @@
+"""
+Pruebas de las horas de los horarios: minutos_desde_hora (models.py),
+GET /buses/{zona}/proximas y la depuración de repetidos de
+migrar_horarios.py. Usa SQLite en memoria, no requiere MySQL:
+    python -m pytest test_horarios.py
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import migrar_horarios
+from database import Base, get_db
+from models import Bus, Horario, TipoHorario, ZonaBus, minutos_desde_hora
+from tableros import TablerosHorarios
+
+
+@pytest.mark.parametrize("hora, minutos", [
+    ("12:00 am", 0),
+    ("12:30 am", 30),
+    ("12:00 pm", 12 * 60),
+    ("12:30 pm", 12 * 60 + 30),
+    ("1:05 am", 65),
+    ("11:59 pm", 23 * 60 + 59),
+    ("5:30am", 330),
+    ("  5:30   PM ", 17 * 60 + 30),
+    ("05:30 Pm", 17 * 60 + 30),
+    ("0:00", 0),
+    ("17:45", 17 * 60 + 45),
+    ("23:59", 23 * 60 + 59),
+])
+def test_horas_validas(hora, minutos):
+    assert minutos_desde_hora(hora) == minutos
+
+
+@pytest.mark.parametrize("hora", [
+    None, "", "abc", "5", "5:3", "5 30", "5:30 a.m.", "5:30 xm", "24:00", "5:60",
+    "0:30 am", "13:00 pm", "123:00", "5:30:00", "-1:00",
+])
+def test_horas_invalidas(hora):
+    assert minutos_desde_hora(hora) is None
+
+
+# ---------- GET /buses/{zona}/proximas ----------
+
+@pytest.fixture
+def sesiones():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def cliente(sesiones, monkeypatch):
+    from routers import buses
+
+    with sesiones() as db:
+        bus = Bus(nombre_transporte="Transporte", zona=ZonaBus.SUR, activo=True)
+        bus.horarios = [Horario(tipo=TipoHorario.SALIDA, destino_procedencia="Managua", hora=h)
+                        for h in ("11:30 pm", "5:00 am", "12:00 pm", "12:15 am", "6:45 pm")]
+        bus.horarios.append(Horario(tipo=TipoHorario.ENTRADA, destino_procedencia="León", hora="7:00 am"))
+        db.add(bus)
+        db.commit()
+
+    monkeypatch.setattr(buses, "tableros", TablerosHorarios())
+    app = FastAPI()
+    app.include_router(buses.router)
+
+    def get_db_prueba():
+        with sesiones() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_db_prueba
+    return TestClient(app)
+
+
+def proximas(cliente, **params):
+    respuesta = cliente.get("/buses/sur/proximas", params=params)
+    assert respuesta.status_code == 200
+    return [(h["hora"], h["minutos_restantes"]) for h in respuesta.json()]
+
+
+def test_proximas_en_orden(cliente):
+    assert proximas(cliente, desde="11:00", n=3) == [("12:00 pm", 60), ("6:45 pm", 465), ("11:30 pm", 750)]
+    # Misma hora: todavía cuenta
+    assert proximas(cliente, desde="12:00 pm", n=1) == [("12:00 pm", 0)]
+    assert proximas(cliente, desde="12:00 pm", tipo="entrada") == [("7:00 am", 19 * 60)]
+
+
+def test_proximas_pasada_la_medianoche(cliente):
+    assert proximas(cliente, desde="11:00 pm", n=3) == [("11:30 pm", 30), ("12:15 am", 75), ("5:00 am", 360)]
+    # n mayor que los horarios: cada uno una vez
+    assert [h for h, _ in proximas(cliente, desde="23:45", n=50)] == [
+        "12:15 am", "5:00 am", "12:00 pm", "6:45 pm", "11:30 pm"
+    ]
+
+
+def test_proximas_parametros(cliente):
+    assert cliente.get("/buses/sur/proximas", params={"desde": "25:00"}).status_code == 400
+    assert cliente.get("/buses/sur/proximas", params={"desde": "tarde"}).status_code == 400
+    assert cliente.get("/buses/sur/proximas", params={"n": 0}).status_code == 422
+    assert cliente.get("/buses/sur/proximas", params={"n": 51}).status_code == 422
+    assert cliente.get("/buses/oeste/proximas").json() == []
+    assert len(proximas(cliente)) == 5  # Sin `desde`: la hora actual
+
+
+# ---------- migrar_horarios.depurar_duplicados ----------
+
+def test_depurar_duplicados(sesiones, monkeypatch, capsys):
+    # Base anterior a la migración: sin los índices únicos
+    with sesiones() as db:
+        db.execute(text("DROP INDEX uq_buses_nombre_zona"))
+        db.execute(text("DROP INDEX uq_horarios_bus_tipo_minuto"))
+        db.commit()
+
+        def bus(nombre, zona, *horas):
+            nuevo = Bus(nombre_transporte=nombre, zona=zona, activo=True)
+            nuevo.horarios = [Horario(tipo=TipoHorario.SALIDA, destino_procedencia=destino, hora=h)
+                              for h, destino in horas]
+            db.add(nuevo)
+            db.flush()
+            return nuevo.id
+
+        primero = bus("Unidos", ZonaBus.SUR, ("5:00 am", "Managua"), ("6:00 am", "Managua"))
+        segundo = bus("Unidos", ZonaBus.SUR, ("05:00 am", "León"), ("7:00 am", "Managua"))
+        tercero = bus("Unidos", ZonaBus.SUR, ("5:00 am", "Masaya"))
+        norte = bus("Unidos", ZonaBus.NORTE, ("5:00 am", "Managua"))
+        db.commit()
+
+    monkeypatch.setattr(migrar_horarios, "SessionLocal", sesiones)
+    migrar_horarios.depurar_duplicados()
+    salida = capsys.readouterr().out
+    assert f"buses [{segundo}, {tercero}] unidos al {primero}" in salida
+    assert "2 buses repetidos unidos, 2 horarios repetidos eliminados" in salida
+
+    with sesiones() as db:
+        assert sorted(db.query(Bus.id)) == [(primero,), (norte,)]
+        horarios = db.query(Horario).filter(Horario.bus_id == primero).order_by(Horario.minuto_del_dia).all()
+        # De las tres salidas de las 5:00 queda la última cargada
+        assert [(h.hora, h.destino_procedencia) for h in horarios] == [
+            ("5:00 am", "Masaya"), ("6:00 am", "Managua"), ("7:00 am", "Managua")
+        ]
+        assert db.query(Horario).filter(Horario.bus_id == norte).count() == 1
+
+    # Sin repetidos no cambia nada
+    migrar_horarios.depurar_duplicados()
+    assert "0 buses repetidos unidos, 0 horarios repetidos eliminados" in capsys.readouterr().out
@@ -0,0 +1,237 @@
+"""
+Pruebas del índice espacial en grilla (indice_espacial.py)
+Los resultados se comparan con un recorrido completo con haversine sobre
+puntos aleatorios. No requiere MySQL:
+    python -m pytest test_indice_espacial.py
+"""
+import random
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import indice_espacial
+from database import Base, get_db
+from enrutamiento import haversine_m
+from indice_espacial import TAMANO_CELDA, IndiceEspacial, IndiceParadasBus
+from models import ParadaBus, ZonaBus
+
+
+def puntos_aleatorios(cantidad, semilla=11, lat=13.09, lng=-86.0, ancho=0.05):
+    aleatorio = random.Random(semilla)
+    return [(i, lat + aleatorio.uniform(-ancho, ancho), lng + aleatorio.uniform(-ancho, ancho), {"i": i})
+            for i in range(cantidad)]
+
+
+def fuerza_bruta(puntos, lat, lng, radio_m=None, k=None):
+    distancias = sorted((haversine_m(lat, lng, plat, plng), clave) for clave, plat, plng, _ in puntos)
+    if radio_m is not None:
+        distancias = [d for d in distancias if d[0] <= radio_m]
+    return [clave for _, clave in distancias][:k]
+
+
+def claves(resultado):
+    return [clave for _, clave, _ in resultado]
+
+
+@pytest.fixture
+def indice():
+    puntos = puntos_aleatorios(400)
+    indice = IndiceEspacial()
+    indice.cargar(puntos)
+    return indice, puntos
+
+
+def test_k_mas_cercanos_igual_a_fuerza_bruta(indice):
+    indice, puntos = indice
+    aleatorio = random.Random(3)
+    for _ in range(50):
+        lat, lng = 13.09 + aleatorio.uniform(-0.05, 0.05), -86.0 + aleatorio.uniform(-0.05, 0.05)
+        for k in (1, 5, 25):
+            resultado = indice.cercanos(lat, lng, k=k)
+            assert claves(resultado) == fuerza_bruta(puntos, lat, lng, k=k)
+            assert all(a[0] <= b[0] for a, b in zip(resultado, resultado[1:]))
+
+
+def test_cota_de_anillos_entre_celdas():
+    # El más cercano está en la celda vecina; otro de la misma celda queda más lejos
+    lat, lng = 13.0 + TAMANO_CELDA * 0.02, -86.0 + TAMANO_CELDA * 0.02
+    puntos = [
+        ("vecina", lat - TAMANO_CELDA * 0.05, lng, None),  # ~28 m al sur, en la celda de abajo
+        ("misma", lat + TAMANO_CELDA * 0.9, lng + TAMANO_CELDA * 0.9, None),  # ~700 m, en la misma celda
+        ("lejos", lat + TAMANO_CELDA * 3, lng, None),
+    ]
+    indice = IndiceEspacial()
+    indice.cargar(puntos)
+    assert claves(indice.cercanos(lat, lng, k=1)) == ["vecina"]
+    assert claves(indice.cercanos(lat, lng, k=2)) == ["vecina", "misma"]
+    assert claves(indice.cercanos(lat, lng, k=10)) == ["vecina", "misma", "lejos"]
+
+
+def test_radio(indice):
+    indice, puntos = indice
+    for radio in (0, 150, 800, 3000):
+        resultado = indice.cercanos(13.09, -86.0, radio_m=radio)
+        assert claves(resultado) == fuerza_bruta(puntos, 13.09, -86.0, radio_m=radio)
+        assert all(distancia <= radio for distancia, _, _ in resultado)
+    # Radio y k a la vez
+    assert claves(indice.cercanos(13.09, -86.0, radio_m=3000, k=4)) == fuerza_bruta(puntos, 13.09, -86.0, 3000, 4)
+
+
+def test_filtro(indice):
+    indice, puntos = indice
+    pares = [p for p in puntos if p[3]["i"] % 2 == 0]
+    resultado = indice.cercanos(13.09, -86.0, k=10, filtro=lambda datos: datos["i"] % 2 == 0)
+    assert claves(resultado) == fuerza_bruta(pares, 13.09, -86.0, k=10)
+
+
+def test_punto_lejano_usa_recorrido_lineal(indice, monkeypatch):
+    indice, puntos = indice
+    llamadas = []
+    original = IndiceEspacial._lineal
+
+    def lineal(*args):
+        llamadas.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(IndiceEspacial, "_lineal", staticmethod(lineal))
+    assert claves(indice.cercanos(14.0, -85.0, k=3)) == fuerza_bruta(puntos, 14.0, -85.0, k=3)
+    assert llamadas
+    assert indice.cercanos(14.0, -85.0, radio_m=1000) == []
+
+    llamadas.clear()
+    indice.cercanos(13.09, -86.0, k=3)
+    assert not llamadas
+
+
+def test_insertar_mover_y_eliminar():
+    indice = IndiceEspacial()
+    assert indice.cercanos(13.09, -86.0, k=1) == []
+    with pytest.raises(ValueError):
+        indice.cercanos(13.09, -86.0)
+
+    indice.insertar("a", 13.09, -86.0, "A")
+    indice.insertar("b", 13.10, -86.0, "B")
+    assert len(indice) == 2 and "a" in indice
+    assert claves(indice.cercanos(13.1, -86.0, k=1)) == ["b"]
+
+    indice.insertar("a", 13.1001, -86.0, "A2")  # Mover
+    assert len(indice) == 2
+    distancia, clave, datos = indice.cercanos(13.1001, -86.0, k=1)[0]
+    assert (clave, datos, distancia) == ("a", "A2", 0.0)
+    assert indice.en_caja(13.08, 13.095, -86.01, -85.99) == []
+
+    indice.eliminar("a")
+    indice.eliminar("no existe")
+    assert "a" not in indice
+    assert claves(indice.cercanos(13.1001, -86.0, k=5)) == ["b"]
+
+
+def test_cargar_reemplaza_todo():
+    indice = IndiceEspacial()
+    indice.cargar(puntos_aleatorios(50))
+    anterior = indice._grilla
+    nuevos = puntos_aleatorios(5, semilla=2, lat=12.0)
+    indice.cargar(nuevos)
+    assert len(indice) == 5
+    assert len(anterior.puntos) == 50  # Una consulta en curso sigue viendo la carga anterior completa
+    assert claves(indice.cercanos(12.0, -86.0, k=10)) == fuerza_bruta(nuevos, 12.0, -86.0)
+    assert indice.cercanos(13.09, -86.0, radio_m=5000) == []
+
+
+# ---------- Búsquedas por lote (NumPy) ----------
+
+def test_lote_vectorizado_igual_a_grilla(indice):
+    indice, puntos = indice
+    aleatorio = random.Random(5)
+    consultas = [(13.09 + aleatorio.uniform(-0.08, 0.08), -86.0 + aleatorio.uniform(-0.08, 0.08)) for _ in range(60)]
+    def pares(datos):
+        return datos["i"] % 2 == 0
+
+    for k, radio_m, filtro in ((1, None, None), (7, None, None), (7, 900, None), (5, None, pares), (500, 2000, pares)):
+        lote = indice.cercanos_lote(consultas, k, radio_m, filtro)
+        assert len(lote) == len(consultas)
+        for (lat, lng), aciertos in zip(consultas, lote):
+            grilla = indice.cercanos(lat, lng, radio_m=radio_m, k=k, filtro=filtro)
+            assert claves(aciertos) == claves(grilla)
+            assert [d for d, _, _ in aciertos] == pytest.approx([d for d, _, _ in grilla], abs=1e-6)
+
+
+def test_lote_por_bloques_y_sin_numpy(indice, monkeypatch):
+    indice, puntos = indice
+    consultas = [(13.09, -86.0), (13.12, -85.97), (13.05, -86.03)]
+    esperado = [claves(indice.cercanos(lat, lng, k=4)) for lat, lng in consultas]
+
+    monkeypatch.setattr(indice_espacial, "MAX_ELEMENTOS_LOTE", len(puntos))  # Un punto por bloque
+    assert [claves(a) for a in indice.cercanos_lote(consultas, 4)] == esperado
+
+    monkeypatch.setattr(indice_espacial, "np", None)
+    assert [claves(a) for a in indice.cercanos_lote(consultas, 4)] == esperado
+    assert indice.cercanos_lote(consultas, 4, filtro=lambda datos: False) == [[], [], []]
+
+
+def test_lote_refleja_cambios(indice):
+    indice, puntos = indice
+    indice.cercanos_lote([(13.09, -86.0)], 1)  # Arma los arreglos
+    indice.insertar("nuevo", 13.5, -86.5, {"i": -1})
+    assert claves(indice.cercanos_lote([(13.5, -86.5)], 1)[0]) == ["nuevo"]
+
+
+def crear_cliente_paradas(monkeypatch, cantidad=30):
+    from routers import buses
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    with Sesion() as db:
+        for i, lat, lng, _ in puntos_aleatorios(cantidad):
+            db.add(ParadaBus(nombre=f"Parada {i}", lat=lat, lng=lng, zona=(ZonaBus.SUR, ZonaBus.NORTE)[i % 2]))
+        db.commit()
+    monkeypatch.setattr(buses, "indice_paradas", IndiceParadasBus())
+
+    app = FastAPI()
+    app.include_router(buses.router_paradas)
+
+    def get_db_prueba():
+        with Sesion() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_db_prueba
+    return TestClient(app)
+
+
+def test_endpoint_lote(monkeypatch):
+    cliente = crear_cliente_paradas(monkeypatch)
+    puntos = [{"lat": 13.09, "lng": -86.0}, {"lat": 13.1, "lng": -85.99}]
+    respuesta = cliente.post("/paradas-buses/cercanas/batch", json={"puntos": puntos, "k": 3, "zona": "sur"})
+    assert respuesta.status_code == 200
+    resultado = respuesta.json()
+    assert [(r["lat"], r["lng"]) for r in resultado] == [(p["lat"], p["lng"]) for p in puntos]
+    for punto, fila in zip(puntos, resultado):
+        assert len(fila["paradas"]) == 3
+        assert all(p["zona"] == "sur" for p in fila["paradas"])
+        distancias = [p["distancia_km"] for p in fila["paradas"]]
+        assert distancias == sorted(distancias)
+        # Lo mismo que la búsqueda de a un punto
+        individual = cliente.get("/paradas-buses/cercanas", params={**punto, "limit": 3, "zona": "sur"}).json()
+        assert [p["id"] for p in fila["paradas"]] == [p["id"] for p in individual]
+
+    con_radio = cliente.post("/paradas-buses/cercanas/batch", json={"puntos": puntos[:1], "k": 50, "radio_km": 0.5})
+    assert all(p["distancia_km"] <= 0.5 for p in con_radio.json()[0]["paradas"])
+
+
+@pytest.mark.parametrize("cuerpo", [
+    {"puntos": []},
+    {"puntos": [{"lat": 13.09, "lng": -86.0}] * 5001},
+    {"puntos": [{"lat": 91, "lng": -86.0}]},
+    {"puntos": [{"lat": 13.09, "lng": -86.0}], "k": 0},
+    {"puntos": [{"lat": 13.09, "lng": -86.0}], "k": 51},
+    {"puntos": [{"lat": 13.09, "lng": -86.0}], "radio_km": 0},
+    {"puntos": [{"lat": 13.09, "lng": -86.0}], "zona": "oeste"},
+])
+def test_endpoint_lote_validacion(monkeypatch, cuerpo):
+    cliente = crear_cliente_paradas(monkeypatch, cantidad=0)
+    assert cliente.post("/paradas-buses/cercanas/batch", json=cuerpo).status_code == 422
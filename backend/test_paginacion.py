@@ -0,0 +1,114 @@
+"""
+Pruebas de la paginación por cursor (paginacion.py) sobre SQLite en memoria,
+no requiere MySQL:
+    python -m pytest test_paginacion.py
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from consultas import query_rutas
+from database import Base
+from models import Notificacion, Ruta, Usuario
+from paginacion import (CABECERA_CURSOR, codificar_cursor, decodificar_cursor, paginar,
+                        paginar_union_async)
+from test_consultas import crear_sesion, poblar
+from test_versiones import crear_cliente
+
+
+def nombres(rutas):
+    return [r.name for r in rutas]
+
+
+def test_paginas_consecutivas():
+    engine, db = crear_sesion()
+    poblar(db, 5)
+    pagina, siguiente = paginar(query_rutas(db), [Ruta.id], None, 2)
+    assert nombres(pagina) == ["Ruta 0", "Ruta 1"]
+    pagina, siguiente = paginar(query_rutas(db), [Ruta.id], siguiente, 2)
+    assert nombres(pagina) == ["Ruta 2", "Ruta 3"]
+    pagina, siguiente = paginar(query_rutas(db), [Ruta.id], siguiente, 2)
+    assert nombres(pagina) == ["Ruta 4"]
+    assert siguiente is None
+
+
+def test_skip_obsoleto():
+    engine, db = crear_sesion()
+    poblar(db, 5)
+    pagina, siguiente = paginar(query_rutas(db), [Ruta.id], None, 2, saltar=1)
+    assert nombres(pagina) == ["Ruta 1", "Ruta 2"]
+    # El cursor devuelto continúa desde esa página
+    assert nombres(paginar(query_rutas(db), [Ruta.id], siguiente, 2)[0]) == ["Ruta 3", "Ruta 4"]
+    with pytest.raises(HTTPException) as error:
+        paginar(query_rutas(db), [Ruta.id], siguiente, 2, saltar=1)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!",
+    codificar_cursor([1, 2]),
+    codificar_cursor([[1]]),
+    codificar_cursor([{"id": 1}]),
+    "eyJpZCI6MX0",  # {"id":1}
+])
+def test_cursor_invalido(cursor):
+    with pytest.raises(HTTPException) as error:
+        decodificar_cursor(cursor, [Ruta.id])
+    assert error.value.status_code == 400
+
+
+def test_router_rutas(monkeypatch):
+    cliente, Sesion = crear_cliente(monkeypatch)
+    with Sesion() as otro:
+        poblar(otro, 3)
+
+    respuesta = cliente.get("/rutas", params={"limit": 1, "skip": 1})
+    assert [r["name"] for r in respuesta.json()] == ["Ruta 1"]
+    siguiente = respuesta.headers[CABECERA_CURSOR]
+    assert [r["name"] for r in cliente.get("/rutas", params={"cursor": siguiente}).json()] == ["Ruta 2"]
+    assert cliente.get("/rutas", params={"cursor": siguiente, "skip": 1}).status_code == 400
+    assert cliente.get("/rutas", params={"cursor": codificar_cursor([{"id": 1}])}).status_code == 400
+
+
+def test_union_de_rangos_igual_a_or():
+    async def probar():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conexion:
+            await conexion.run_sync(Base.metadata.create_all)
+        Sesion = async_sessionmaker(engine, expire_on_commit=False)
+        inicio = datetime(2026, 1, 1)
+        async with Sesion() as db:
+            db.add_all([Usuario(nombre=f"U{i}", email=f"u{i}@viajero.app", password_hash="x") for i in (1, 2)])
+            await db.flush()
+            # Usuario 1, usuario 2 y globales intercaladas, con fechas repetidas
+            for i in range(30):
+                db.add(Notificacion(usuario_id=(1, 2, None)[i % 3], titulo=f"N{i}", mensaje="-",
+                                    created_at=inicio + timedelta(minutes=i // 2)))
+            await db.commit()
+
+            esperado = [n.id for n in (await db.execute(
+                select(Notificacion).where((Notificacion.usuario_id == 1) | (Notificacion.usuario_id == None))
+                .order_by(Notificacion.created_at.desc(), Notificacion.id.desc())
+            )).scalars()]
+
+            consultas = [select(Notificacion).where(Notificacion.usuario_id == 1),
+                         select(Notificacion).where(Notificacion.usuario_id == None)]
+            columnas = [Notificacion.created_at, Notificacion.id]
+            obtenidos, cursor = [], None
+            while True:
+                pagina, cursor = await paginar_union_async(db, Notificacion, consultas, columnas, cursor, 3,
+                                                           descendente=True)
+                assert len(pagina) <= 3
+                obtenidos += [n.id for n in pagina]
+                if cursor is None:
+                    break
+        await engine.dispose()
+        return esperado, obtenidos
+
+    esperado, obtenidos = asyncio.run(probar())
+    assert len(esperado) == 20
+    assert obtenidos == esperado
@@ -0,0 +1,141 @@
+"""
+Pruebas del planificador de viajes (planificador.py) sobre SQLite en memoria,
+no requiere MySQL:
+    python -m pytest test_planificador.py
+"""
+import pytest
+
+import planificador
+from models import Parada, Ruta
+from planificador import (Planificador, calcular_costo, formatear_duracion, formatear_hora,
+                          obtener_planificador, parsear_hora)
+from test_consultas import crear_sesion
+
+LAT = 13.09
+# Ruta 1 hacia el este y ruta 2 hacia el norte desde unos 50 m de la última
+# parada de la ruta 1 (transbordo a pie). Paradas cada ~1 km.
+#
+#                  N2 (13.11, -85.97)
+#                  |
+#                  N0 (13.09, -85.9695)
+# E0 ---- E1 ---- E2
+ESTE = [(LAT, -86.0), (LAT, -85.99), (LAT, -85.98), (LAT, -85.97)]
+NORTE = [(LAT, -85.9695), (13.10, -85.9695), (13.11, -85.9695)]
+
+
+def ruta(nombre, numero, paradas, **campos):
+    datos = {"start_time": "06:00", "end_time": "20:00", "frequency": 10, **campos}
+    nueva = Ruta(name=nombre, number=numero, **datos)
+    nueva.paradas = [Parada(name=f"{nombre} {i}", lat=lat, lng=lng, order=i) for i, (lat, lng) in enumerate(paradas)]
+    return nueva
+
+
+@pytest.fixture
+def red():
+    engine, db = crear_sesion()
+    db.add_all([ruta("Este", "1", ESTE), ruta("Norte", "2", NORTE)])
+    db.commit()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def planificar(db, origen, destino, hora):
+    plan = Planificador(db.query(Ruta).all())
+    return plan.planificar(origen, destino, parsear_hora(hora))
+
+
+def test_formatos():
+    assert parsear_hora("07:30") == 7 * 3600 + 30 * 60
+    assert parsear_hora("07:30:15") == 7 * 3600 + 30 * 60 + 15
+    assert parsear_hora("7") is None
+    assert parsear_hora("25:00") is None
+    assert parsear_hora(None) is None
+    assert formatear_hora(parsear_hora("23:59") + 120) == "00:01"
+    assert formatear_duracion(45) == "45 min"
+    assert formatear_duracion(120) == "2h"
+    assert formatear_duracion(135) == "2h 15min"
+    assert calcular_costo(0) == 10.0
+    assert calcular_costo(2) == 15.0
+    assert calcular_costo(4.5) == 20.0  # 10 + 11.25 redondeado a múltiplo de 5
+
+
+def test_un_bus(red):
+    itinerario, = planificar(red, ESTE[0], ESTE[3], "07:00")
+    assert itinerario["numero_buses"] == 1
+    bus, = itinerario["tramos"]  # Origen y destino en las paradas: sin tramos a pie
+    assert bus["ruta_numero"] == "1"
+    assert bus["paradas"] == 3
+    assert bus["subir"]["hora"] == "07:00"
+    assert bus["distancia_km"] == pytest.approx(3.25, abs=0.02)
+    # Sin duración en la ruta se usa VELOCIDAD_BUS_KMH
+    assert itinerario["duracion_minutos"] == round(3250 / (planificador.VELOCIDAD_BUS_KMH / 3.6) / 60)
+
+
+def test_espera_al_proximo_bus(red):
+    itinerario, = planificar(red, ESTE[0], ESTE[3], "07:01")
+    assert itinerario["tramos"][0]["subir"]["hora"] == "07:10"
+    # Antes del primer bus se espera al de start_time
+    itinerario, = planificar(red, ESTE[0], ESTE[3], "05:00")
+    assert itinerario["tramos"][0]["subir"]["hora"] == "06:00"
+    # Después del último no hay itinerario
+    assert planificar(red, ESTE[0], ESTE[3], "20:30") == []
+
+
+def test_transbordo_a_pie(red):
+    itinerario, = planificar(red, ESTE[0], NORTE[2], "07:00")
+    assert itinerario["numero_buses"] == 2
+    assert [t["tipo"] for t in itinerario["tramos"]] == ["bus", "caminar", "bus"]
+    primero, caminata, segundo = itinerario["tramos"]
+    assert (primero["ruta_numero"], segundo["ruta_numero"]) == ("1", "2")
+    assert caminata["distancia_km"] == pytest.approx(0.05, abs=0.01)
+    assert segundo["subir"]["hora"] >= caminata["hasta"]["hora"]
+    assert itinerario["costo_estimado"] == primero["costo"] + segundo["costo"]
+
+
+def test_bajada_final_en_bus_aunque_se_llegue_antes_a_pie(red):
+    # A la parada X se llega antes con la ruta rápida y un transbordo a pie desde Y,
+    # pero Y queda lejos del destino: el itinerario baja en X de la ruta lenta
+    origen, x, y, destino = (LAT, -86.0), (LAT, -85.956), (LAT + 0.00225, -85.956), (LAT - 0.006, -85.956)
+    red.add_all([ruta("Lenta", "5", [origen, x], duration=60),
+                 ruta("Rápida", "6", [(LAT + 0.001, -86.0), y], duration=5)])
+    red.commit()
+    itinerario, = planificar(red, origen, destino, "07:00")
+    bus, caminata = itinerario["tramos"]
+    assert bus["ruta_numero"] == "5"
+    assert (bus["subir"]["hora"], bus["bajar"]["hora"]) == ("07:00", "08:00")
+    assert caminata["desde"]["hora"] == "08:00"
+    assert itinerario["numero_buses"] == 1
+
+
+def test_caminar_si_esta_cerca(red):
+    itinerario, = planificar(red, (LAT, -86.0), (LAT + 0.002, -86.0), "07:00")
+    assert itinerario["numero_buses"] == 0
+    assert itinerario["tramos"][0]["tipo"] == "caminar"
+
+
+def test_sin_paradas_cercanas(red):
+    assert planificar(red, (12.0, -86.0), ESTE[3], "07:00") == []
+
+
+def test_rutas_no_visibles_o_incompletas(red):
+    red.query(Ruta).filter(Ruta.number == "2").one().visible = False
+    red.add(ruta("Sin frecuencia", "3", ESTE, frequency=0))
+    red.add(ruta("Sin horario", "4", ESTE, start_time="--"))
+    red.commit()
+    plan = Planificador(red.query(Ruta).all())
+    assert plan.total_rutas == 1
+    assert plan.planificar(ESTE[0], NORTE[2], parsear_hora("07:00")) == []
+
+
+def test_se_reconstruye_con_la_version(red, monkeypatch):
+    monkeypatch.setattr(planificador, "_planificador", None)
+    plan = obtener_planificador(red)
+    assert obtener_planificador(red) is plan
+    assert plan.total_rutas == 2
+
+    red.query(Ruta).filter(Ruta.number == "2").one().visible = False
+    red.commit()
+    nuevo = obtener_planificador(red)
+    assert nuevo is not plan
+    assert nuevo.total_rutas == 1
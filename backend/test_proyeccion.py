@@ -0,0 +1,155 @@
+"""
+Pruebas de la proyección de campos (fields= / exclude=) de proyeccion.py y de
+los listados GET /rutas y GET /buses. No requiere MySQL:
+    python -m pytest test_proyeccion.py
+"""
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from cache import CacheVersionado
+from database import Base, get_db
+from proyeccion import PROYECCION_BUS, PROYECCION_RUTA, PROYECCION_USUARIO
+from test_consultas import contar_consultas, poblar
+
+
+def test_sin_parametros_no_hay_proyeccion():
+    assert PROYECCION_RUTA.resolver(None, None) is None
+    assert PROYECCION_RUTA.resolver("", "") is None
+
+
+def test_fields_respeta_el_orden_del_modelo_y_conserva_id():
+    assert PROYECCION_RUTA.resolver("frequency, name", None) == ["id", "name", "frequency"]
+    assert PROYECCION_RUTA.resolver("id,number", None) == ["id", "number"]
+
+
+def test_exclude_parte_de_los_campos_por_defecto():
+    campos = PROYECCION_USUARIO.resolver(None, "foto_perfil,email", por_defecto=["id", "nombre", "email", "foto_perfil"])
+    assert campos == ["id", "nombre"]
+
+
+def test_id_no_se_puede_excluir():
+    assert PROYECCION_BUS.resolver("zona", "id") == ["id", "zona"]
+    assert PROYECCION_BUS.resolver(None, "id,horarios") == ["id", "nombre_transporte", "zona", "activo", "created_at"]
+
+
+@pytest.mark.parametrize("fields, exclude", [("name,clave", None), (None, "geometria"), ("ID", None)])
+def test_campo_desconocido(fields, exclude):
+    with pytest.raises(HTTPException) as error:
+        PROYECCION_RUTA.resolver(fields, exclude)
+    assert error.value.status_code == 400
+    assert "Campos desconocidos" in error.value.detail
+
+
+def test_opciones_solo_cargan_las_columnas_pedidas():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    poblar(db, 2)
+    try:
+        campos = PROYECCION_RUTA.resolver("name", None)
+        with contar_consultas(engine) as sentencias:
+            rutas = db.query(PROYECCION_RUTA.modelo).options(*PROYECCION_RUTA.opciones(campos)).all()
+        assert [PROYECCION_RUTA.serializar(ruta, campos) for ruta in rutas] == [
+            {"id": ruta.id, "name": f"Ruta {i}"} for i, ruta in enumerate(rutas)
+        ]
+        assert len(sentencias) == 1
+        columnas = sentencias[0].split("FROM")[0]
+        assert "rutas.id" in columnas and "rutas.name" in columnas
+        assert "route_geometry" not in columnas and "geometria" not in columnas and "frequency" not in columnas
+    finally:
+        db.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    """App con los routers de rutas y buses sobre SQLite en memoria; devuelve (cliente, engine)"""
+    from routers import buses, rutas
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    with Sesion() as db:
+        poblar(db, 3)
+    monkeypatch.setattr(rutas, "cache_rutas", CacheVersionado())
+
+    def get_db_prueba():
+        sesion = Sesion()
+        try:
+            yield sesion
+        finally:
+            sesion.close()
+
+    app = FastAPI()
+    app.include_router(rutas.router)
+    app.include_router(buses.router)
+    app.dependency_overrides[get_db] = get_db_prueba
+    yield TestClient(app), engine
+    engine.dispose()
+
+
+def test_rutas_con_fields(cliente):
+    cliente, engine = cliente
+    with contar_consultas(engine) as sentencias:
+        respuesta = cliente.get("/rutas", params={"fields": "name,number"})
+    assert respuesta.status_code == 200
+    assert respuesta.json() == [{"id": i + 1, "name": f"Ruta {i}", "number": str(i)} for i in range(3)]
+    # Sin paradas pedidas no se consultan, y de rutas solo se leen las columnas necesarias
+    consultas_rutas = [s for s in sentencias if "FROM rutas" in s and "rutas.name" in s]
+    assert len(consultas_rutas) == 1
+    assert "route_geometry" not in consultas_rutas[0] and "frequency" not in consultas_rutas[0]
+    assert not [s for s in sentencias if "FROM paradas" in s]
+
+
+def test_rutas_con_exclude(cliente):
+    cliente, _ = cliente
+    filas = cliente.get("/rutas", params={"exclude": "routeGeometry,paradas"}).json()
+    assert set(filas[0]) == {"id", "name", "number", "startTime", "endTime", "frequency",
+                             "visible", "createdAt", "distance", "duration"}
+    # Con exclude el formato polyline sigue omitiendo routeGeometry
+    filas = cliente.get("/rutas", params={"exclude": "paradas", "formato": "polyline"}).json()
+    assert "routePolyline" in filas[0] and "routeGeometry" not in filas[0]
+
+
+def test_rutas_con_paradas_y_cursor(cliente):
+    cliente, _ = cliente
+    respuesta = cliente.get("/rutas", params={"fields": "paradas", "limit": 2})
+    filas = respuesta.json()
+    assert [fila["id"] for fila in filas] == [1, 2]
+    assert all(set(fila) == {"id", "paradas"} and len(fila["paradas"]) == 3 for fila in filas)
+    siguiente = cliente.get("/rutas", params={"fields": "paradas", "limit": 2,
+                                              "cursor": respuesta.headers["x-next-cursor"]})
+    assert [fila["id"] for fila in siguiente.json()] == [3]
+
+
+def test_rutas_campo_desconocido(cliente):
+    cliente, _ = cliente
+    respuesta = cliente.get("/rutas", params={"fields": "name,secreto"})
+    assert respuesta.status_code == 400
+    assert "secreto" in respuesta.json()["detail"]
+    assert cliente.get("/rutas", params={"exclude": "route_geometry"}).status_code == 400
+
+
+def test_buses_con_fields_y_exclude(cliente):
+    cliente, engine = cliente
+    with contar_consultas(engine) as sentencias:
+        filas = cliente.get("/buses/", params={"fields": "zona"}).json()
+    assert filas == [{"id": i + 1, "zona": "sur"} for i in range(3)]
+    assert not [s for s in sentencias if "FROM horarios" in s]
+    consulta_buses = next(s for s in sentencias if "FROM buses" in s)
+    assert "nombre_transporte" not in consulta_buses.split("FROM")[0]
+
+    filas = cliente.get("/buses/", params={"exclude": "horarios,created_at"}).json()
+    assert filas[0] == {"id": 1, "nombre_transporte": "Transporte 0", "zona": "sur", "activo": True}
+
+    filas = cliente.get("/buses/", params={"fields": "horarios"}).json()
+    assert all(set(fila) == {"id", "horarios"} and len(fila["horarios"]) == 4 for fila in filas)
+
+
+def test_buses_campo_desconocido(cliente):
+    cliente, _ = cliente
+    assert cliente.get("/buses/", params={"fields": "placa"}).status_code == 400
@@ -0,0 +1,206 @@
+"""
+Pruebas del enrutamiento a la réplica de lectura (SesionEnrutada /
+SesionEnrutadaSync) y del endpoint de métricas de los pools, con dos bases
+SQLite como primario y réplica. No requiere MySQL:
+    python -m pytest test_replica.py
+"""
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+from config import settings
+from database import SOLO_LECTURA, SesionEnrutada, SesionEnrutadaSync, get_async_db, get_db, usar_primario
+from metricas_db import PoolAsyncMedido, PoolMedido, estado_pool, metricas
+from models import Base, Ruta
+from test_consultas import contar_consultas
+
+
+def _crear_base(archivo, nombre):
+    """Base SQLite con una sola ruta llamada `nombre`, para saber de qué engine se leyó"""
+    engine = create_engine(f"sqlite:///{archivo}", poolclass=PoolMedido, pool_logging_name=f"prueba_{nombre}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(Ruta(id=1, name=nombre, number="1", start_time="06:00", end_time="18:00", frequency=15))
+        db.commit()
+    return engine
+
+
+@pytest.fixture
+def engines(tmp_path, monkeypatch):
+    """Primario y réplica (síncronos y asíncronos) instalados en database"""
+    primario = _crear_base(tmp_path / "primario.db", "primario")
+    replica = _crear_base(tmp_path / "replica.db", "replica")
+    primario_async = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primario.db'}",
+                                         poolclass=PoolAsyncMedido, pool_logging_name="prueba_primario_async")
+    replica_async = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}",
+                                        poolclass=PoolAsyncMedido, pool_logging_name="prueba_replica_async")
+    monkeypatch.setattr(database, "engine", primario)
+    monkeypatch.setattr(database, "replica_engine", replica)
+    monkeypatch.setattr(database, "async_engine", primario_async)
+    monkeypatch.setattr(database, "async_replica_engine", replica_async)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(class_=SesionEnrutadaSync, bind=primario))
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(
+        sync_session_class=SesionEnrutada, expire_on_commit=False))
+    yield primario, replica
+    primario.dispose()
+    replica.dispose()
+    asyncio.run(primario_async.dispose())
+    asyncio.run(replica_async.dispose())
+
+
+def _nombre(db):
+    return db.scalar(select(Ruta.name).where(Ruta.id == 1))
+
+
+def test_sesion_sin_marcar_usa_el_primario(engines):
+    with database.SessionLocal() as db:
+        assert _nombre(db) == "primario"
+
+
+def test_solo_lectura_lee_de_la_replica(engines):
+    primario, replica = engines
+    with database.SessionLocal() as db, contar_consultas(primario) as en_primario, \
+            contar_consultas(replica) as en_replica:
+        db.info[SOLO_LECTURA] = True
+        assert _nombre(db) == "replica"
+    assert en_replica and not en_primario
+
+
+def test_flush_fija_la_sesion_al_primario(engines):
+    with database.SessionLocal() as db:
+        db.info[SOLO_LECTURA] = True
+        assert _nombre(db) == "replica"
+        db.add(Ruta(name="nueva", number="2", start_time="06:00", end_time="18:00", frequency=15))
+        db.flush()
+        # Tras escribir, el resto de la sesión lee lo que escribió
+        assert db.scalar(select(Ruta.id).where(Ruta.name == "nueva")) is not None
+        assert _nombre(db) == "primario"
+
+
+def test_dml_directo_fija_la_sesion_al_primario(engines):
+    primario, replica = engines
+    with database.SessionLocal() as db, contar_consultas(replica) as en_replica:
+        db.info[SOLO_LECTURA] = True
+        db.execute(update(Ruta).where(Ruta.id == 1).values(frequency=20))
+        assert _nombre(db) == "primario"
+        assert db.scalar(select(Ruta.frequency).where(Ruta.id == 1)) == 20
+    assert not en_replica
+
+
+def test_usar_primario(engines):
+    with database.SessionLocal() as db:
+        db.info[SOLO_LECTURA] = True
+        usar_primario(db)
+        assert _nombre(db) == "primario"
+
+
+def test_sin_replica_todo_va_al_primario(engines, monkeypatch):
+    monkeypatch.setattr(database, "replica_engine", None)
+    with database.SessionLocal() as db:
+        db.info[SOLO_LECTURA] = True
+        assert _nombre(db) == "primario"
+
+
+def test_sesion_asincrona(engines):
+    async def probar():
+        async with database.AsyncSessionLocal() as db:
+            assert await db.scalar(select(Ruta.name).where(Ruta.id == 1)) == "primario"
+        async with database.AsyncSessionLocal() as db:
+            db.info[SOLO_LECTURA] = True
+            assert await db.scalar(select(Ruta.name).where(Ruta.id == 1)) == "replica"
+            db.add(Ruta(name="nueva", number="2", start_time="06:00", end_time="18:00", frequency=15))
+            await db.flush()
+            assert await db.scalar(select(Ruta.name).where(Ruta.id == 1)) == "primario"
+            await db.rollback()
+
+    asyncio.run(probar())
+
+
+@pytest.fixture
+def cliente(engines):
+    """App con endpoints mínimos que leen y escriben con get_db y get_async_db"""
+    app = FastAPI()
+
+    @app.get("/sync")
+    def leer_sync(db=Depends(get_db)):
+        return {"nombre": _nombre(db)}
+
+    @app.post("/sync")
+    def escribir_sync(db=Depends(get_db)):
+        db.execute(update(Ruta).where(Ruta.id == 1).values(frequency=30))
+        return {"nombre": _nombre(db)}
+
+    @app.get("/async")
+    async def leer_async(db=Depends(get_async_db)):
+        return {"nombre": await db.scalar(select(Ruta.name).where(Ruta.id == 1))}
+
+    @app.post("/async")
+    async def escribir_async(db=Depends(get_async_db)):
+        return {"nombre": await db.scalar(select(Ruta.name).where(Ruta.id == 1))}
+
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+def test_get_lee_de_la_replica_y_post_del_primario(cliente):
+    assert cliente.get("/sync").json() == {"nombre": "replica"}
+    assert cliente.post("/sync").json() == {"nombre": "primario"}
+    assert cliente.get("/async").json() == {"nombre": "replica"}
+    assert cliente.post("/async").json() == {"nombre": "primario"}
+
+
+@pytest.fixture
+def cliente_metricas(engines, monkeypatch):
+    from routers import interno
+
+    monkeypatch.setattr(settings, "METRICAS_TOKEN", "secreto")
+    app = FastAPI()
+    app.include_router(interno.router)
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+@pytest.mark.parametrize("cabecera", [None, "Bearer otro", "Basic secreto", "secreto"])
+def test_metricas_sin_token_valido(cliente_metricas, cabecera):
+    headers = {"Authorization": cabecera} if cabecera else {}
+    respuesta = cliente_metricas.get("/internal/metrics/db", headers=headers)
+    assert respuesta.status_code == 401
+    assert respuesta.headers["www-authenticate"] == "Bearer"
+
+
+def test_metricas_sin_token_configurado(cliente_metricas, monkeypatch):
+    monkeypatch.setattr(settings, "METRICAS_TOKEN", "")
+    respuesta = cliente_metricas.get("/internal/metrics/db", headers={"Authorization": "Bearer "})
+    assert respuesta.status_code == 401
+
+
+def test_metricas_de_los_pools(cliente_metricas, engines):
+    primario, _ = engines
+    antes = metricas("prueba_primario").to_dict()["checkouts"]
+    with primario.connect():
+        estado = cliente_metricas.get("/internal/metrics/db", headers={"Authorization": "Bearer secreto"}).json()
+
+    assert set(estado) == {"primario", "primario_async", "replica", "replica_async"}
+    assert estado["primario"]["en_uso"] == 1
+    assert estado["primario"]["checkouts"] == antes + 1
+    for pool in estado.values():
+        assert {"tamano", "en_uso", "libres", "overflow", "timeout_s", "checkouts", "timeouts",
+                "espera_promedio_ms", "espera_max_ms", "espera_histograma_ms"} <= set(pool)
+
+
+def test_metricas_sin_replica(cliente_metricas, monkeypatch):
+    monkeypatch.setattr(database, "replica_engine", None)
+    monkeypatch.setattr(database, "async_replica_engine", None)
+    estado = cliente_metricas.get("/internal/metrics/db", headers={"Authorization": "Bearer secreto"}).json()
+    assert set(estado) == {"primario", "primario_async"}
+
+
+def test_estado_pool_sin_queuepool():
+    engine = create_engine("sqlite://")
+    assert estado_pool(engine) == {"pool": type(engine.pool).__name__}
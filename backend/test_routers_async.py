@@ -0,0 +1,187 @@
+"""
+Pruebas de los routers que usan la sesión asíncrona (auth, notificaciones,
+favoritos y viajes) a través de get_async_db, sobre SQLite con aiosqlite.
+No requiere MySQL:
+    python -m pytest test_routers_async.py
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+import database
+from database import Base, SesionEnrutadaSync
+from paginacion import CABECERA_CURSOR, codificar_cursor
+from test_consultas import contar_consultas
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    """App con los routers asíncronos; get_async_db y get_db abren sesiones sobre el mismo archivo SQLite"""
+    from routers import auth, favoritos, notificaciones
+
+    archivo = tmp_path / "prueba.db"
+    engine = create_engine(f"sqlite:///{archivo}")
+    Base.metadata.create_all(bind=engine)
+    # NullPool: cada sesión abre su conexión en el loop que la usa
+    engine_async = create_async_engine(f"sqlite+aiosqlite:///{archivo}", poolclass=NullPool)
+    monkeypatch.setattr(database, "async_engine", engine_async)
+    monkeypatch.setattr(database, "async_replica_engine", None)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(class_=SesionEnrutadaSync, bind=engine))
+
+    app = FastAPI()
+    for router in (auth.router, notificaciones.router, favoritos.router, favoritos.router_viajes):
+        app.include_router(router)
+    with TestClient(app) as cliente:
+        yield cliente, engine
+    engine.dispose()
+
+
+def fechas_como_sqlalchemy(engine, tabla):
+    """
+    CURRENT_TIMESTAMP de SQLite guarda created_at sin microsegundos y el cursor
+    compara como texto contra el formato de SQLAlchemy ("...:00.000000").
+    En MySQL la comparación es entre DATETIME y no hace falta
+    """
+    with engine.begin() as conexion:
+        conexion.execute(text(
+            f"UPDATE {tabla} SET created_at = strftime('%Y-%m-%d %H:%M:%f000', created_at)"
+        ))
+
+
+def registrar(cliente, nombre, password="secreta1"):
+    respuesta = cliente.post("/auth/register", json={
+        "nombre": nombre, "email": f"{nombre.lower()}@viajero.app", "password": password
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    return respuesta.json()["usuario"]["id"]
+
+
+def todas_las_paginas(cliente, ruta, **params):
+    """IDs de todas las páginas siguiendo X-Next-Cursor"""
+    ids, paginas = [], 0
+    while paginas < 20:
+        respuesta = cliente.get(ruta, params=params)
+        assert respuesta.status_code == 200, respuesta.text
+        ids += [fila["id"] for fila in respuesta.json()]
+        paginas += 1
+        siguiente = respuesta.headers.get(CABECERA_CURSOR)
+        if siguiente is None:
+            return ids, paginas
+        params = {**params, "cursor": siguiente}
+    raise AssertionError("El cursor no avanza")
+
+
+def test_registro_login_y_perfil(cliente):
+    cliente, _ = cliente
+    usuario_id = registrar(cliente, "Ana")
+    assert cliente.post("/auth/register", json={
+        "nombre": "Otra", "email": "ana@viajero.app", "password": "secreta1"
+    }).status_code == 400
+
+    assert cliente.post("/auth/login", json={"email": "ana@viajero.app", "password": "mala"}).status_code == 401
+    login = cliente.post("/auth/login", json={"email": "ana@viajero.app", "password": "secreta1"})
+    assert login.status_code == 200
+    assert login.json()["usuario"]["ultimo_acceso"] is not None
+
+    perfil = cliente.get(f"/auth/users/{usuario_id}")
+    assert perfil.json()["nombre"] == "Ana"
+    assert cliente.get(f"/auth/users/{usuario_id}", headers={"If-None-Match": perfil.headers["etag"]}).status_code == 304
+
+    assert cliente.put(f"/auth/users/{usuario_id}", json={"nombre": "Ana María"}).status_code == 200
+    perfil = cliente.get(f"/auth/users/{usuario_id}", headers={"If-None-Match": perfil.headers["etag"]})
+    assert perfil.status_code == 200
+    assert perfil.json()["nombre"] == "Ana María"
+    assert cliente.get("/auth/users/999").status_code == 404
+
+
+def test_usuarios_por_cursor(cliente):
+    cliente, _ = cliente
+    ids = [registrar(cliente, f"U{i}") for i in range(5)]
+    assert todas_las_paginas(cliente, "/auth/users", limit=2) == (ids, 3)
+    assert todas_las_paginas(cliente, "/auth/users", limit=10) == (ids, 1)
+
+    respuesta = cliente.get("/auth/users", params={"limit": 2, "skip": 1})
+    assert [u["id"] for u in respuesta.json()] == ids[1:3]
+    assert [u["id"] for u in cliente.get("/auth/users", params={
+        "cursor": respuesta.headers[CABECERA_CURSOR]
+    }).json()] == ids[3:]
+
+    assert cliente.get("/auth/users", params={"cursor": "basura"}).status_code == 400
+    assert cliente.get("/auth/users", params={"cursor": codificar_cursor([[1]])}).status_code == 400
+
+
+def test_usuarios_con_fields_y_exclude(cliente):
+    cliente, _ = cliente
+    ids = [registrar(cliente, f"U{i}") for i in range(3)]
+    with contar_consultas(database.async_engine.sync_engine) as sentencias:
+        respuesta = cliente.get("/auth/users", params={"fields": "nombre"})
+    assert respuesta.json() == [{"id": i, "nombre": f"U{n}"} for n, i in enumerate(ids)]
+    # foto_perfil (puede ser una imagen en base64) y password_hash no se leen
+    consulta = next(s for s in sentencias if "FROM usuarios" in s)
+    assert "foto_perfil" not in consulta and "password_hash" not in consulta and "email" not in consulta
+
+    filas = cliente.get("/auth/users", params={"exclude": "foto_perfil,id"}).json()
+    assert "foto_perfil" not in filas[0] and filas[0]["id"] == ids[0] and filas[0]["email"] == "u0@viajero.app"
+
+    respuesta = cliente.get("/auth/users", params={"fields": "password_hash"})
+    assert respuesta.status_code == 400
+    assert "password_hash" in respuesta.json()["detail"]
+
+
+def test_notificaciones_propias_y_globales(cliente):
+    cliente, engine = cliente
+    ana, beto = registrar(cliente, "Ana"), registrar(cliente, "Beto")
+    creadas = {}
+    for i, destino in enumerate([ana, None, beto, ana, None, beto, ana]):
+        respuesta = cliente.post("/notificaciones/", json={"titulo": f"N{i}", "mensaje": "-", "usuario_id": destino})
+        assert respuesta.status_code == 201
+        creadas[respuesta.json()["id"]] = destino
+    fechas_como_sqlalchemy(engine, "notificaciones")
+
+    de_ana = sorted((i for i, destino in creadas.items() if destino in (ana, None)), reverse=True)
+    assert todas_las_paginas(cliente, f"/notificaciones/usuario/{ana}", limit=2) == (de_ana, 3)
+
+    assert cliente.put(f"/notificaciones/{de_ana[0]}/leer", json={"leida": True}).status_code == 200
+    assert cliente.delete(f"/notificaciones/{de_ana[1]}").status_code == 200
+    ids, _ = todas_las_paginas(cliente, f"/notificaciones/usuario/{ana}", limit=2, solo_no_leidas=True)
+    assert ids == de_ana[2:]
+    assert cliente.get("/notificaciones/usuario/999").status_code == 404
+
+
+def test_favoritos_y_viajes(cliente):
+    cliente, engine = cliente
+    usuario_id = registrar(cliente, "Ana")
+    for i, lat in enumerate((13.090, 13.095, 13.200)):
+        respuesta = cliente.post(f"/favoritos/usuario/{usuario_id}", json={
+            "lugar_nombre": f"Lugar {i}", "lat": lat, "lng": -86.0, "tags": {"tipo": "casa"}
+        })
+        assert respuesta.status_code == 201
+    favoritos = cliente.get(f"/favoritos/usuario/{usuario_id}").json()
+    assert [f["lugar_nombre"] for f in favoritos] == ["Lugar 0", "Lugar 1", "Lugar 2"]
+    cercanos = cliente.get(f"/favoritos/usuario/{usuario_id}/cercanos", params={"lat": 13.09, "lng": -86.0}).json()
+    assert [f["lugar_nombre"] for f in cercanos] == ["Lugar 0", "Lugar 1"]
+    assert cliente.delete(f"/favoritos/{favoritos[0]['id']}").status_code == 200
+    assert len(cliente.get(f"/favoritos/usuario/{usuario_id}").json()) == 2
+
+    viajes = []
+    for i in range(5):
+        respuesta = cliente.post(f"/viajes/usuario/{usuario_id}", json={
+            "origen_nombre": "Casa", "origen_lat": 13.09, "origen_lng": -86.0,
+            "destino_nombre": f"Destino {i}", "destino_lat": 13.1, "destino_lng": -86.01,
+        })
+        assert respuesta.status_code == 201
+        viajes.append(respuesta.json()["id"])
+    fechas_como_sqlalchemy(engine, "viajes_planeados")
+    assert todas_las_paginas(cliente, f"/viajes/usuario/{usuario_id}", limit=2) == (viajes[::-1], 3)
+
+    assert cliente.put(f"/viajes/{viajes[1]}", json={"completado": True}).status_code == 200
+    assert todas_las_paginas(cliente, f"/viajes/usuario/{usuario_id}", solo_completados=True)[0] == [viajes[1]]
+    assert cliente.delete(f"/viajes/{viajes[0]}").status_code == 200
+    assert cliente.delete(f"/viajes/{viajes[0]}").status_code == 404
+    assert cliente.post("/viajes/usuario/999", json={
+        "origen_nombre": "a", "origen_lat": 0, "origen_lng": 0, "destino_nombre": "b", "destino_lat": 0, "destino_lng": 0
+    }).status_code == 404
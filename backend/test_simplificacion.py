@@ -0,0 +1,85 @@
+"""
+Pruebas de los niveles de detalle de las geometrías (simplificacion.py),
+no requiere MySQL:
+    python -m pytest test_simplificacion.py
+"""
+import math
+import random
+
+from geometria import codificar_geometria, decodificar_geometria
+from simplificacion import (
+    METROS_POR_GRADO_LAT, NIVELES_TOLERANCIA, GeometriasMultinivel, resolver_nivel, simplificar
+)
+
+LAT = 13.09
+
+
+def zigzag(amplitud_m: float, puntos: int = 21):
+    """Línea hacia el este (~100 m por punto) que oscila `amplitud_m` al norte y al sur"""
+    desvio = amplitud_m / METROS_POR_GRADO_LAT
+    return [[-86.0 + i * 0.001, LAT + (desvio if i % 2 else -desvio)] for i in range(puntos)]
+
+
+def distancia_a_linea_m(punto, linea):
+    """Distancia (m) del punto a la polilínea, en la misma proyección local que simplificar()"""
+    escala_x = 111320.0 * math.cos(math.radians(LAT))
+    px, py = punto[0] * escala_x, punto[1] * METROS_POR_GRADO_LAT
+    mejor = math.inf
+    for (ax, ay), (bx, by) in zip(linea, linea[1:]):
+        ax, ay, bx, by = ax * escala_x, ay * METROS_POR_GRADO_LAT, bx * escala_x, by * METROS_POR_GRADO_LAT
+        dx, dy = bx - ax, by - ay
+        largo2 = dx * dx + dy * dy
+        t = 0.0 if largo2 == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / largo2))
+        mejor = min(mejor, math.hypot(px - (ax + t * dx), py - (ay + t * dy)))
+    return mejor
+
+
+def test_puntos_colineales_se_eliminan():
+    recta = [[-86.0 + i * 0.001, LAT] for i in range(50)]
+    assert simplificar(recta, 2) == [recta[0], recta[-1]]
+    assert simplificar(recta, 0) == recta
+    assert simplificar(recta[:2], 512) == recta[:2]
+
+
+def test_tolerancia_decide_que_se_conserva():
+    linea = zigzag(5)  # 10 m entre picos: el desvío respecto de la línea media es ~5 m
+    assert simplificar(linea, 2) == linea
+    assert simplificar(linea, 32) == [linea[0], linea[-1]]
+
+
+def test_niveles_dentro_de_su_tolerancia():
+    aleatorio = random.Random(3)
+    lat, lng, linea = LAT, -86.0, []
+    for _ in range(400):
+        lat += aleatorio.uniform(-0.0003, 0.0003)
+        lng += aleatorio.uniform(0, 0.0004)
+        linea.append([lng, lat])
+
+    anterior = len(linea) + 1
+    for tolerancia in NIVELES_TOLERANCIA:
+        simplificada = simplificar(linea, tolerancia)
+        assert simplificada[0] == linea[0] and simplificada[-1] == linea[-1]
+        assert len(simplificada) <= anterior  # Más tolerancia, menos puntos
+        anterior = len(simplificada)
+        assert all(distancia_a_linea_m(p, simplificada) <= tolerancia + 1e-6 for p in linea)
+
+
+def test_resolver_nivel():
+    assert resolver_nivel() == 0
+    assert resolver_nivel(tolerancia=1) == 0
+    assert resolver_nivel(tolerancia=10) == 8
+    assert resolver_nivel(tolerancia=10000) == 512
+    assert resolver_nivel(zoom=18) == 0  # ~0.6 m por pixel
+    assert resolver_nivel(zoom=10) == 128  # ~149 m por pixel
+    assert resolver_nivel(zoom=0) == 512
+
+
+def test_niveles_se_recalculan_si_cambia_la_geometria():
+    niveles = GeometriasMultinivel()
+    original = codificar_geometria(zigzag(50))
+    assert niveles.obtener(1, original, 0) is original
+    assert len(decodificar_geometria(niveles.obtener(1, original, 8))) == 21
+
+    # Otra geometría para la misma ruta (p. ej. escrita por otro worker)
+    nueva = codificar_geometria(zigzag(1))
+    assert len(decodificar_geometria(niveles.obtener(1, nueva, 8))) == 2
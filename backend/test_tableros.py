@@ -0,0 +1,74 @@
+"""
+Pruebas de los tableros de horarios por zona (tableros.py) sobre SQLite en memoria,
+no requiere MySQL:
+    python -m pytest test_tableros.py
+"""
+import orjson
+
+from models import Bus, Horario, TipoHorario, ZonaBus
+from tableros import TablerosHorarios
+from test_consultas import crear_sesion
+
+
+def crear_tableros(horas, zona=ZonaBus.SUR, activo=True):
+    engine, db = crear_sesion()
+    bus = Bus(nombre_transporte="Transporte", zona=zona, activo=activo)
+    bus.horarios = [Horario(tipo=TipoHorario.SALIDA, destino_procedencia="Managua", hora=h) for h in horas]
+    db.add(bus)
+    db.commit()
+    return TablerosHorarios(), db
+
+
+def horas(horarios):
+    return [h["hora"] for h in horarios]
+
+
+def test_ordenado_por_hora_del_dia():
+    tableros, db = crear_tableros(["1:00 pm", "11:30 am", "12:15 am", "sin hora", "5:00 am"])
+    tablero = tableros.obtener(db, "sur", TipoHorario.SALIDA)
+    # 12:15 am es pasada la medianoche; los que no se reconocen se listan igual
+    assert "sin hora" in horas(tablero.horarios)
+    reconocidas = [h for h in horas(tablero.horarios) if h != "sin hora"]
+    assert reconocidas == ["12:15 am", "5:00 am", "11:30 am", "1:00 pm"]
+    assert orjson.loads(tablero.cuerpo.datos) == tablero.horarios
+    assert tablero.cuerpo.etag is not None
+
+
+def test_proximos_continuan_al_dia_siguiente():
+    tableros, db = crear_tableros(["5:00 am", "11:30 am", "1:00 pm", "sin hora"])
+    tablero = tableros.obtener(db, "sur", TipoHorario.SALIDA)
+    # Un horario a la misma hora todavía cuenta como próximo
+    proximos = tablero.proximos(11 * 60 + 30, 2)
+    assert horas(proximos) == ["11:30 am", "1:00 pm"]
+    assert [h["minutos_restantes"] for h in proximos] == [0, 90]
+
+    proximos = tablero.proximos(22 * 60, 5)
+    assert horas(proximos) == ["5:00 am", "11:30 am", "1:00 pm"]  # Sin repetir ni incluir "sin hora"
+    assert proximos[0]["minutos_restantes"] == 7 * 60
+
+
+def test_zonas_tipos_y_buses_inactivos():
+    tableros, db = crear_tableros(["5:00 am"])
+    assert tableros.obtener(db, "oeste", TipoHorario.SALIDA) is None
+    assert tableros.obtener(db, "norte", TipoHorario.SALIDA).horarios == []
+    assert tableros.obtener(db, "sur", TipoHorario.ENTRADA).horarios == []
+    assert tableros.obtener(db, "sur", TipoHorario.ENTRADA).proximos(0, 5) == []
+
+    inactivos, db = crear_tableros(["5:00 am"], activo=False)
+    assert inactivos.obtener(db, "sur", TipoHorario.SALIDA).horarios == []
+
+
+def test_se_rearma_al_cambiar_la_version():
+    tableros, db = crear_tableros(["5:00 am"])
+    tablero = tableros.obtener(db, "sur", TipoHorario.SALIDA)
+    assert tableros.obtener(db, "sur", TipoHorario.SALIDA) is tablero
+
+    bus = db.query(Bus).one()
+    db.add(Horario(bus_id=bus.id, tipo=TipoHorario.SALIDA, destino_procedencia="León", hora="4:00 am"))
+    db.commit()
+    nuevo = tableros.obtener(db, "sur", TipoHorario.SALIDA)
+    assert nuevo is not tablero
+    assert horas(nuevo.horarios) == ["4:00 am", "5:00 am"]
+    assert nuevo.cuerpo.etag != tablero.cuerpo.etag
+    # Cada (zona, tipo) tiene su propia ETag aunque compartan versión
+    assert tableros.obtener(db, "sur", TipoHorario.ENTRADA).cuerpo.etag != nuevo.cuerpo.etag
@@ -0,0 +1,159 @@
+"""
+Pruebas de las teselas GeoJSON (teselas.py y routers/teselas.py) sobre SQLite
+en memoria, no requiere MySQL:
+    python -m pytest test_teselas.py
+"""
+import math
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import teselas
+from database import Base, get_db
+from indice_espacial import IndiceParadasBus
+from models import Parada, ParadaBus, Ruta, ZonaBus
+from teselas import CacheTeselas, _recortar_segmento, caja_tesela, recortar_linea
+
+CAJA = (0.0, 0.0, 1.0, 1.0)
+
+
+def test_segmento_dentro_fuera_y_en_esquina():
+    a, b = (0.2, 0.2), (0.8, 0.6)
+    inicio, fin = _recortar_segmento(a, b, CAJA)
+    assert inicio is a and fin is b  # Sin recortar se devuelven los mismos puntos
+
+    assert _recortar_segmento((1.5, 0.2), (2.0, 0.8), CAJA) is None  # A la derecha
+    assert _recortar_segmento((0.2, -1.0), (0.8, -0.5), CAJA) is None  # Debajo
+    assert _recortar_segmento((-0.5, 0.8), (0.3, 1.6), CAJA) is None  # Pasa junto a la esquina sin entrar
+    assert _recortar_segmento((0.5, 1.5), (0.5, 2.0), CAJA) is None  # Vertical, fuera
+
+    # Corta la esquina superior izquierda
+    inicio, fin = _recortar_segmento((-0.1, 0.8), (0.3, 1.2), CAJA)
+    assert inicio == pytest.approx((0.0, 0.9))
+    assert fin == pytest.approx((0.1, 1.0))
+
+    # Atraviesa la caja entera
+    inicio, fin = _recortar_segmento((-1.0, 0.5), (2.0, 0.5), CAJA)
+    assert (inicio, fin) == ((0.0, 0.5), (1.0, 0.5))
+
+
+def test_linea_que_sale_y_vuelve_a_entrar():
+    linea = [[0.2, 0.2], [0.5, 0.5], [1.5, 0.5], [0.5, 0.8], [0.4, 0.9]]
+    partes = recortar_linea(linea, CAJA)
+    assert len(partes) == 2
+    assert partes[0][:2] == [[0.2, 0.2], [0.5, 0.5]]
+    assert partes[0][-1] == pytest.approx((1.0, 0.5))
+    assert partes[1][0] == pytest.approx((1.0, 0.65))
+    assert partes[1][-1] == [0.4, 0.9]
+    assert recortar_linea([[2, 2], [3, 3]], CAJA) == []
+
+
+def test_caja_tesela():
+    lng_min, lat_min, lng_max, lat_max = caja_tesela(0, 0, 0, margen=0)
+    assert (lng_min, lng_max) == (-180.0, 180.0)
+    assert lat_max == pytest.approx(85.0511, abs=1e-4)
+    assert lat_min == pytest.approx(-85.0511, abs=1e-4)
+    # Con margen la tesela se extiende a las vecinas
+    assert caja_tesela(1, 0, 0)[2] > 0.0
+
+
+# ---------- Endpoint ----------
+
+LAT, LNG = 13.08, -85.99  # Cerca del centro de su tesela en Z
+Z = 14
+
+
+def tesela_de(lat, lng, z=Z):
+    n = 2 ** z
+    x = int((lng + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return z, x, y
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    from routers import teselas as router_teselas
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    with Sesion() as db:
+        ruta = Ruta(name="Centro", number="1", start_time="06:00", end_time="18:00", frequency=15)
+        ruta.set_coordenadas([[LNG - 0.01, LAT], [LNG + 0.01, LAT]])
+        ruta.paradas = [Parada(name="Central", lat=LAT, lng=LNG, order=0)]
+        db.add(ruta)
+        db.add(ParadaBus(nombre="Terminal", lat=LAT + 0.001, lng=LNG, zona=ZonaBus.SUR))
+        db.commit()
+
+    monkeypatch.setattr(teselas, "indice_paradas", IndiceParadasBus())
+    monkeypatch.setattr(router_teselas, "cache_teselas", CacheTeselas())
+    app = FastAPI()
+    app.include_router(router_teselas.router)
+
+    def get_db_prueba():
+        with Sesion() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_db_prueba
+    return TestClient(app), Sesion
+
+
+def tipos(respuesta):
+    return sorted(f["properties"]["tipo"] for f in respuesta.json()["features"])
+
+
+def test_contenido_y_limites(cliente):
+    cliente, _ = cliente
+    z, x, y = tesela_de(LAT, LNG)
+    respuesta = cliente.get(f"/tiles/{z}/{x}/{y}")
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-type"] == "application/geo+json"
+    assert tipos(respuesta) == ["parada", "parada_bus", "ruta"]
+
+    # Tesela lejana: vacía
+    assert cliente.get(f"/tiles/{z}/{x + 10}/{y}").json()["features"] == []
+
+    assert cliente.get(f"/tiles/{z}/{2 ** z}/{y}").status_code == 404
+    assert cliente.get(f"/tiles/{z}/{x}/{2 ** z}").status_code == 404
+    assert cliente.get("/tiles/0/0/0").status_code == 200
+    assert cliente.get("/tiles/23/0/0").status_code == 422
+    assert cliente.get(f"/tiles/{z}/-1/{y}").status_code == 422
+
+
+def test_etag_cambia_con_paradas_y_rutas(cliente):
+    cliente, Sesion = cliente
+    ruta = "/tiles/{}/{}/{}".format(*tesela_de(LAT, LNG))
+    etag = cliente.get(ruta).headers["etag"]
+    assert cliente.get(ruta, headers={"If-None-Match": etag}).status_code == 304
+
+    with Sesion() as otro:
+        otro.add(ParadaBus(nombre="Nueva", lat=LAT - 0.001, lng=LNG, zona=ZonaBus.NORTE))
+        otro.commit()
+    respuesta = cliente.get(ruta, headers={"If-None-Match": etag})
+    assert respuesta.status_code == 200
+    assert tipos(respuesta).count("parada_bus") == 2
+    etag_paradas = respuesta.headers["etag"]
+    assert etag_paradas != etag
+
+    with Sesion() as otro:
+        otro.query(Ruta).one().visible = False
+        otro.commit()
+    respuesta = cliente.get(ruta, headers={"If-None-Match": etag_paradas})
+    assert respuesta.status_code == 200
+    assert "ruta" not in tipos(respuesta)
+    assert respuesta.headers["etag"] not in (etag, etag_paradas)
+
+
+def test_cache_por_version(cliente):
+    _, Sesion = cliente
+    cache = CacheTeselas()
+    with Sesion() as db:
+        primera = cache.obtener(db, *tesela_de(LAT, LNG))
+        assert cache.obtener(db, *tesela_de(LAT, LNG)) is primera
+        db.add(ParadaBus(nombre="Otra", lat=LAT, lng=LNG + 0.001, zona=ZonaBus.SUR))
+        db.commit()
+        assert cache.obtener(db, *tesela_de(LAT, LNG)) is not primera
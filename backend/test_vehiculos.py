@@ -0,0 +1,59 @@
+"""
+Pruebas de las posiciones en vivo (vehiculos.py) sobre SQLite en memoria,
+no requiere MySQL:
+    python -m pytest test_vehiculos.py
+"""
+import asyncio
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import database
+import vehiculos
+from database import Base
+from models import PosicionVehiculo
+from vehiculos import DESFASE_MAXIMO, Flota, Ping
+
+
+def test_descarta_momentos_adelantados():
+    flota = Flota()
+    ahora = time.time()
+    aceptados, _ = flota.registrar([
+        ("A", 1, Ping(ahora - 10, 13.09, -86.0, None)),
+        ("A", 1, Ping(ahora + DESFASE_MAXIMO / 2, 13.091, -86.0, None)),  # Desfase tolerado
+        ("A", 1, Ping(ahora + 24 * 3600, 13.092, -86.0, None)),
+    ])
+    assert aceptados == 2
+    # El ping del día siguiente no bloquea a los que llegan después
+    aceptados, _ = flota.registrar([("A", 1, Ping(ahora + DESFASE_MAXIMO, 13.093, -86.0, None))])
+    assert aceptados == 1
+
+
+def test_escritura_periodica_sin_pings_nuevos(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+    flota = Flota()
+    monkeypatch.setattr(database, "SessionLocal", Sesion)
+    monkeypatch.setattr(vehiculos, "flota", flota)
+    monkeypatch.setattr(vehiculos, "INTERVALO_ESCRITURA", 0.0)
+
+    flota.registrar([("A", 1, Ping(time.time(), 13.09, -86.0, 20.0))])
+
+    async def una_vuelta():
+        tarea = asyncio.create_task(flota.escribir_periodicamente(0.01))
+        await asyncio.sleep(0.2)
+        tarea.cancel()
+
+    asyncio.run(una_vuelta())
+    with Sesion() as db:
+        assert db.query(PosicionVehiculo).count() == 1
+
+    # Al apagar se escribe lo que quede aunque no se cumpla el intervalo
+    monkeypatch.setattr(vehiculos, "INTERVALO_ESCRITURA", 3600.0)
+    flota.registrar([("A", 1, Ping(time.time() + 1, 13.091, -86.0, 20.0))])
+    assert vehiculos.escribir_pendientes(esperar=True) == 1
+    with Sesion() as db:
+        assert db.query(PosicionVehiculo).count() == 2
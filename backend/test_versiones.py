@@ -0,0 +1,147 @@
+"""
+Pruebas de las versiones por colección (versiones.py) y de los caches que dependen de ellas
+Una escritura hecha por otra sesión (como la de otro worker) debe verse en
+las lecturas siguientes aunque no pase por los routers de este proceso.
+
+Usa una base de datos SQLite en memoria, no requiere MySQL:
+    python -m pytest test_versiones.py
+"""
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base, get_db
+from models import Bus, Horario, Parada, Ruta, TipoHorario, Usuario, ZonaBus
+from busqueda import IndiceBusqueda
+from cache import CacheVersionado
+from carga_masiva import cargar_horarios
+from eventos import CanalEventos
+from tableros import TablerosHorarios
+from versiones import BUSES, RUTAS, USUARIOS, leer_version
+from test_consultas import crear_sesion, poblar
+
+
+def crear_cliente(monkeypatch):
+    """App con los routers de rutas y buses sobre SQLite compartida y una sesión para "otro worker" """
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Sesion = sessionmaker(bind=engine)
+
+    from routers import buses, rutas
+
+    # Caches vacíos: los de otras pruebas corresponden a otra base de datos
+    monkeypatch.setattr(rutas, "cache_rutas", CacheVersionado())
+    monkeypatch.setattr(rutas, "indice_rutas", IndiceBusqueda())
+    monkeypatch.setattr(buses, "tableros", TablerosHorarios())
+
+    app = FastAPI()
+    app.include_router(rutas.router)
+    app.include_router(buses.router)
+
+    def get_db_prueba():
+        db = Sesion()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_db_prueba
+    return TestClient(app), Sesion
+
+
+def test_una_version_por_transaccion():
+    engine, db = crear_sesion()
+    assert leer_version(db, RUTAS).numero == 0
+
+    poblar(db, 2)
+    rutas = leer_version(db, RUTAS)
+    assert rutas.numero == 1  # Varias filas y tablas (rutas y paradas) en un solo commit
+    assert leer_version(db, BUSES).numero == 1
+
+    ruta = db.query(Ruta).first()
+    ruta.name = "Otra"
+    db.flush()
+    ruta.frequency = 30
+    db.commit()
+    siguiente = leer_version(db, RUTAS)
+    assert siguiente.numero == 2
+    assert siguiente.modificado > rutas.modificado  # Estrictamente creciente aunque sea el mismo segundo
+
+    ruta.name = "Revertida"
+    db.rollback()
+    assert leer_version(db, RUTAS).numero == 2
+
+
+def test_sentencias_directas_incrementan():
+    engine, db = crear_sesion()
+    poblar(db, 1)
+    db.query(Parada).filter(Parada.order == 0).delete()
+    db.commit()
+    assert leer_version(db, RUTAS).numero == 2
+
+    cargar_horarios(db, [{"transporte": "Nuevo", "zona": "sur", "tipo": "salida",
+                          "destino_procedencia": "Managua", "hora": "5:30 am"}])
+    assert leer_version(db, BUSES).numero == 2
+
+
+def test_escritura_de_otro_worker_invalida_caches(monkeypatch):
+    cliente, Sesion = crear_cliente(monkeypatch)
+    with Sesion() as otro:
+        poblar(otro, 1)
+
+    etag = cliente.get("/rutas").headers["etag"]
+    assert cliente.get("/rutas", headers={"If-None-Match": etag}).status_code == 304
+    assert [r["name"] for r in cliente.get("/rutas/search/ruta").json()] == ["Ruta 0"]
+    assert len(cliente.get("/buses/sur/salidas").json()) == 2
+
+    with Sesion() as otro:
+        otro.query(Ruta).one().name = "Ruta Norte"
+        bus = otro.query(Bus).one()
+        otro.add(Horario(bus_id=bus.id, tipo=TipoHorario.SALIDA, destino_procedencia="León", hora="9:00 am"))
+        otro.add(Bus(nombre_transporte="Otro", zona=ZonaBus.NORTE, activo=True))
+        otro.commit()
+
+    respuesta = cliente.get("/rutas", headers={"If-None-Match": etag})
+    assert respuesta.status_code == 200
+    assert [r["name"] for r in respuesta.json()] == ["Ruta Norte"]
+    assert cliente.get("/rutas/1").json()["name"] == "Ruta Norte"
+    assert [r["name"] for r in cliente.get("/rutas/search/norte").json()] == ["Ruta Norte"]
+    assert len(cliente.get("/buses/sur/salidas").json()) == 3
+
+
+def test_ultimo_acceso_no_cambia_la_version():
+    engine, db = crear_sesion()
+    usuario = Usuario(nombre="Ana", email="ana@viajero.app", password_hash="x")
+    db.add(usuario)
+    db.commit()
+    assert leer_version(db, USUARIOS).numero == 1
+
+    usuario.ultimo_acceso = datetime(2026, 1, 1, 8, 0)  # Login
+    db.commit()
+    assert leer_version(db, USUARIOS).numero == 1
+    db.expire_all()
+    assert usuario.ultimo_acceso == datetime(2026, 1, 1, 8, 0)
+
+    usuario.ultimo_acceso = datetime(2026, 1, 2, 8, 0)
+    usuario.nombre = "Ana María"
+    db.commit()
+    assert leer_version(db, USUARIOS).numero == 2
+
+
+def test_resync_solo_por_escrituras_ajenas():
+    canal = CanalEventos()
+    suscripcion = canal.suscribir("sur")
+    assert not canal.revisar(5)  # Primera revisión: solo toma la referencia
+
+    canal.registrar_propia(6)
+    canal.registrar_propia(7)
+    assert not canal.revisar(7)
+    assert suscripcion.cola.empty()
+
+    canal.registrar_propia(9)
+    assert canal.revisar(9)  # La 8 la escribió otro worker
+    assert suscripcion.cola.get_nowait() == '{"evento":"resync"}'
@@ -0,0 +1,214 @@
+"""
+Posiciones de vehículos en vivo
+Cada ping (vehículo, ruta, lat, lng, velocidad, momento) se guarda en un
+buffer circular por vehículo (últimas MAX_HISTORIAL posiciones) y en una
+lista de pendientes que se escribe en la tabla `posiciones_vehiculos` por
+lotes, nunca un INSERT por ping: al completar TAMANO_LOTE pings (tarea en
+segundo plano de la petición), cada INTERVALO_ESCRITURA segundos
+(escribir_periodicamente, en el lifespan de main.py) y al apagar el servidor.
+
+Los pings con `momento` más de DESFASE_MAXIMO segundos en el futuro se
+descartan: uno así dejaría fuera de orden a todos los siguientes del vehículo.
+
+Las lecturas (unidades activas por ruta, historial de un vehículo) se
+responden desde memoria.
+
+Nota: igual que cache.py, los buffers viven en memoria del proceso; con
+varios workers los pings de un vehículo deberían llegar siempre al mismo.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import database
+from geometria import ESCALA
+from models import PosicionVehiculo
+
+# Posiciones recientes que se conservan por vehículo
+MAX_HISTORIAL = 32
+
+# Un vehículo cuenta como unidad activa si envió un ping en este tiempo
+SEGUNDOS_ACTIVO = 120
+
+# Vehículos sin pings por más de este tiempo se olvidan
+SEGUNDOS_OLVIDO = 3600
+
+# Escritura de pendientes: por cantidad o por antigüedad
+TAMANO_LOTE = 2000
+INTERVALO_ESCRITURA = 5.0
+
+# Adelanto tolerado del reloj del vehículo respecto del servidor (segundos)
+DESFASE_MAXIMO = 30.0
+
+# Si la base de datos no responde, pendientes que se conservan (los más viejos se descartan)
+MAX_PENDIENTES = 50 * TAMANO_LOTE
+
+
+class Ping(NamedTuple):
+    momento: float  # Segundos desde epoch
+    lat: float
+    lng: float
+    velocidad: Optional[float]  # km/h informada por el vehículo
+
+
+class Vehiculo:
+    """Estado en memoria de un vehículo: ruta actual y sus últimas posiciones"""
+
+    __slots__ = ("id", "ruta_id", "historial")
+
+    def __init__(self, vehiculo_id: str, ruta_id: int):
+        self.id = vehiculo_id
+        self.ruta_id = ruta_id
+        self.historial: Deque[Ping] = deque(maxlen=MAX_HISTORIAL)
+
+    @property
+    def ultimo(self) -> Ping:
+        return self.historial[-1]
+
+    def to_dict(self, ahora: float) -> dict:
+        ping = self.ultimo
+        return {
+            "vehiculo": self.id,
+            "ruta_id": self.ruta_id,
+            "lat": ping.lat,
+            "lng": ping.lng,
+            "velocidad": ping.velocidad,
+            "momento": datetime.fromtimestamp(ping.momento).isoformat(),
+            "segundos": round(ahora - ping.momento, 1),
+        }
+
+
+class Flota:
+    """Buffers de todos los vehículos y pings pendientes de escribir"""
+
+    def __init__(self):
+        self._vehiculos: Dict[str, Vehiculo] = {}
+        self._por_ruta: Dict[int, Set[str]] = {}
+        self._pendientes: List[dict] = []
+        self._ultima_escritura = time.time()
+        self._lock = threading.Lock()
+        self._escribiendo = threading.Lock()
+
+    def registrar(self, pings: Iterable[tuple]) -> Tuple[int, List[Vehiculo]]:
+        """
+        Agregar pings (vehiculo, ruta_id, Ping) a los buffers
+        Se descartan los repetidos, los fuera de orden y los adelantados más de
+        DESFASE_MAXIMO; devuelve cuántos se aceptaron y los vehículos que recibieron alguno
+        """
+        aceptados = 0
+        actualizados: Dict[str, Vehiculo] = {}
+        limite = time.time() + DESFASE_MAXIMO
+        with self._lock:
+            # Un lote puede traer varios pings del mismo vehículo en cualquier orden
+            for vehiculo_id, ruta_id, ping in sorted(pings, key=lambda p: p[2].momento):
+                if ping.momento > limite:
+                    continue
+                vehiculo = self._vehiculos.get(vehiculo_id)
+                if vehiculo is None:
+                    vehiculo = self._vehiculos[vehiculo_id] = Vehiculo(vehiculo_id, ruta_id)
+                    self._por_ruta.setdefault(ruta_id, set()).add(vehiculo_id)
+                elif vehiculo.historial and ping.momento <= vehiculo.ultimo.momento:
+                    continue
+                elif vehiculo.ruta_id != ruta_id:
+                    # Cambió de ruta: el historial de la anterior no sirve para estimar
+                    self._por_ruta[vehiculo.ruta_id].discard(vehiculo_id)
+                    self._por_ruta.setdefault(ruta_id, set()).add(vehiculo_id)
+                    vehiculo.ruta_id = ruta_id
+                    vehiculo.historial.clear()
+
+                vehiculo.historial.append(ping)
+                aceptados += 1
+                actualizados[vehiculo_id] = vehiculo
+                self._pendientes.append({
+                    "vehiculo": vehiculo_id,
+                    "ruta_id": ruta_id,
+                    "lat_e6": round(ping.lat * ESCALA),
+                    "lng_e6": round(ping.lng * ESCALA),
+                    "velocidad": ping.velocidad,
+                    "registrado_en": datetime.fromtimestamp(ping.momento),
+                })
+        return aceptados, list(actualizados.values())
+
+    def vehiculo(self, vehiculo_id: str) -> Optional[Vehiculo]:
+        return self._vehiculos.get(vehiculo_id)
+
+    def unidades(self, ruta_id: int, segundos_activo: float = SEGUNDOS_ACTIVO) -> List[dict]:
+        """Vehículos de la ruta con un ping reciente, el más reciente primero"""
+        ahora = time.time()
+        with self._lock:
+            activos = [
+                self._vehiculos[v] for v in self._por_ruta.get(ruta_id, ())
+                if ahora - self._vehiculos[v].ultimo.momento <= segundos_activo
+            ]
+            activos.sort(key=lambda v: v.ultimo.momento, reverse=True)
+            return [v.to_dict(ahora) for v in activos]
+
+    def debe_escribir(self) -> bool:
+        """Hay un lote completo o pendientes con más de INTERVALO_ESCRITURA segundos"""
+        return len(self._pendientes) >= TAMANO_LOTE or (
+            bool(self._pendientes) and time.time() - self._ultima_escritura >= INTERVALO_ESCRITURA
+        )
+
+    def escribir_pendientes(self, db: Session, esperar: bool = False) -> int:
+        """
+        Insertar los pings pendientes por lotes (executemany) y olvidar vehículos inactivos
+        Si la escritura falla los pings vuelven a la cola para el siguiente intento.
+
+        - **esperar**: si hay otra escritura en curso, esperar a que termine y
+          escribir lo que quede (al apagar); si no, no hacer nada
+        """
+        if not self._escribiendo.acquire(blocking=esperar):
+            return 0  # Ya hay otra escritura en curso
+        try:
+            with self._lock:
+                pendientes, self._pendientes = self._pendientes, []
+                self._ultima_escritura = time.time()
+                self._olvidar_inactivos()
+            if not pendientes:
+                return 0
+            try:
+                for i in range(0, len(pendientes), TAMANO_LOTE):
+                    db.execute(insert(PosicionVehiculo), pendientes[i:i + TAMANO_LOTE])
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self._pendientes[:0] = pendientes
+                    del self._pendientes[:-MAX_PENDIENTES]
+                raise
+            return len(pendientes)
+        finally:
+            self._escribiendo.release()
+
+    async def escribir_periodicamente(self, intervalo: float = INTERVALO_ESCRITURA):
+        """Tarea de fondo (lifespan de main.py): escribe los pendientes aunque no lleguen más pings"""
+        while True:
+            await asyncio.sleep(intervalo)
+            if not self.debe_escribir():
+                continue
+            try:
+                await run_in_threadpool(escribir_pendientes)
+            except Exception:
+                continue  # Los pings quedan en la cola para la próxima vuelta
+
+    def _olvidar_inactivos(self):
+        limite = time.time() - SEGUNDOS_OLVIDO
+        for vehiculo_id in [v.id for v in self._vehiculos.values() if v.ultimo.momento < limite]:
+            vehiculo = self._vehiculos.pop(vehiculo_id)
+            self._por_ruta[vehiculo.ruta_id].discard(vehiculo_id)
+
+
+flota = Flota()
+
+
+def escribir_pendientes(esperar: bool = False) -> int:
+    """Escribir los pings pendientes de la flota con una sesión propia"""
+    with database.SessionLocal() as db:
+        return flota.escribir_pendientes(db, esperar)
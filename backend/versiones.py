@@ -0,0 +1,222 @@
+"""
+Versión de cada colección en la base de datos
+Las estructuras en memoria (cache_rutas, índice de búsqueda, tableros,
+planificador, teselas, índice de paradas, modelo de ETA) viven en cada
+worker. Para que una escritura recibida por un worker invalide las copias de
+todos, cada colección tiene una fila en `versiones_colecciones` con un
+contador que se incrementa dentro de la misma transacción que la escritura:
+
+- Escrituras por el ORM (add/delete/cambios de atributos): evento before_flush.
+- INSERT/UPDATE/DELETE directos con session.execute (query.delete(), carga
+  masiva): evento do_orm_execute.
+
+Los cambios que solo tocan atributos de ATRIBUTOS_SIN_VERSION (como
+`ultimo_acceso`, que se escribe en cada login) no incrementan la versión:
+serializarían todos los logins sobre la fila de la colección y anularían las
+respuestas 304 del catálogo de usuarios. Esos campos pueden verse
+desactualizados en las respuestas cacheadas hasta la siguiente escritura.
+
+Una vez por colección y transacción: la fila queda bloqueada hasta el commit,
+así que nadie más la incrementa entre medio y el número identifica la versión
+que queda visible al confirmar.
+
+Los lectores consultan la versión (una búsqueda por clave primaria) al
+principio de la petición, antes que los datos: en la misma transacción ven
+los datos de esa versión o de una posterior, nunca de una anterior.
+
+`modificado` (segundos desde epoch) es la hora de la escritura y crece
+estrictamente con cada versión: si hay dos escrituras en el mismo segundo la
+segunda toma el segundo siguiente.
+"""
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import BigInteger, Column, String, event, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import USAR_PRIMARIO, Base
+
+# Colecciones
+RUTAS = "rutas"
+BUSES = "buses"
+PARADAS_BUSES = "paradas_buses"
+USUARIOS = "usuarios"
+
+COLECCIONES = (RUTAS, BUSES, PARADAS_BUSES, USUARIOS)
+
+# Tabla -> colección que la incluye en sus respuestas
+COLECCION_DE_TABLA = {
+    "rutas": RUTAS,
+    "paradas": RUTAS,
+    "buses": BUSES,
+    "horarios": BUSES,
+    "paradas_buses": PARADAS_BUSES,
+    "usuarios": USUARIOS,
+}
+
+# Tabla -> atributos que por sí solos no cambian la colección
+ATRIBUTOS_SIN_VERSION = {
+    "usuarios": frozenset({"ultimo_acceso"}),
+}
+
+# Claves de session.info
+_PENDIENTES = "versiones_pendientes"
+
+
+class VersionColeccion(Base):
+    """Contador de escrituras de una colección"""
+    __tablename__ = "versiones_colecciones"
+
+    nombre = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    modificado = Column(BigInteger, nullable=True)  # Segundos desde epoch (UTC)
+
+
+class Version(NamedTuple):
+    """Versión de una colección tal como se leyó de la base de datos"""
+    numero: int
+    modificado: Optional[datetime]
+
+
+SIN_ESCRITURAS = Version(0, None)
+
+
+# ==================== ESCRITURA ====================
+
+_oyentes: List[Callable[[Dict[str, int]], None]] = []
+
+
+def al_confirmar(funcion: Callable[[Dict[str, int]], None]):
+    """
+    Registrar una función que recibe {colección: versión} después de cada
+    commit que incrementó alguna versión en este proceso
+    """
+    _oyentes.append(funcion)
+    return funcion
+
+
+def _incrementar(session: Session, colecciones):
+    pendientes: Dict[str, int] = session.info.setdefault(_PENDIENTES, {})
+    nuevas = sorted(set(colecciones) - set(pendientes))  # Orden fijo para no cruzar bloqueos
+    if not nuevas:
+        return
+    tabla = VersionColeccion.__table__
+    session.info[USAR_PRIMARIO] = True  # Sesiones enrutadas: la fila se bloquea en el primario
+    conexion = session.connection()
+    for nombre in nuevas:
+        fila = conexion.execute(
+            select(tabla.c.version, tabla.c.modificado).where(tabla.c.nombre == nombre).with_for_update()
+        ).first()
+        ahora = int(time.time())
+        if fila is None:
+            numero, modificado = 1, ahora
+            conexion.execute(insert(tabla).values(nombre=nombre, version=numero, modificado=modificado))
+        else:
+            numero = fila.version + 1
+            modificado = max(ahora, (fila.modificado or 0) + 1)
+            conexion.execute(
+                update(tabla).where(tabla.c.nombre == nombre).values(version=numero, modificado=modificado)
+            )
+        pendientes[nombre] = numero
+
+
+def _colecciones_de(objetos) -> set:
+    colecciones = set()
+    for objeto in objetos:
+        tabla = getattr(objeto, "__tablename__", None)
+        if tabla in COLECCION_DE_TABLA:
+            colecciones.add(COLECCION_DE_TABLA[tabla])
+    return colecciones
+
+
+def _cambia_coleccion(objeto) -> bool:
+    """Si el objeto modificado tiene cambios fuera de ATRIBUTOS_SIN_VERSION"""
+    ignorados = ATRIBUTOS_SIN_VERSION.get(getattr(objeto, "__tablename__", None))
+    if not ignorados:
+        return True
+    return any(
+        atributo.history.has_changes()
+        for atributo in inspect(objeto).attrs
+        if atributo.key not in ignorados
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _antes_de_flush(session, flush_context, instances):
+    modificados = [
+        o for o in session.dirty
+        if session.is_modified(o, include_collections=False) and _cambia_coleccion(o)
+    ]
+    colecciones = _colecciones_de(session.new) | _colecciones_de(session.deleted) | _colecciones_de(modificados)
+    if colecciones:
+        _incrementar(session, colecciones)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _antes_de_ejecutar(estado):
+    if not (estado.is_insert or estado.is_update or estado.is_delete):
+        return
+    tabla = getattr(estado.statement, "table", None)
+    coleccion = COLECCION_DE_TABLA.get(getattr(tabla, "name", None))
+    if coleccion is not None:
+        _incrementar(estado.session, [coleccion])
+
+
+@event.listens_for(Session, "after_commit")
+def _despues_de_commit(session):
+    confirmadas = session.info.pop(_PENDIENTES, None)
+    if confirmadas:
+        for oyente in _oyentes:
+            oyente(confirmadas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _despues_de_rollback(session):
+    # Los números de una transacción revertida los vuelve a usar la siguiente escritura
+    session.info.pop(_PENDIENTES, None)
+
+
+def asegurar_versiones(db: Session):
+    """Crear las filas que falten (al iniciar, para que dos workers no las inserten a la vez)"""
+    existentes = set(db.execute(select(VersionColeccion.nombre)).scalars())
+    faltantes = [{"nombre": n, "version": 0, "modificado": None} for n in COLECCIONES if n not in existentes]
+    if not faltantes:
+        return
+    try:
+        db.execute(insert(VersionColeccion.__table__), faltantes)
+        db.commit()
+    except IntegrityError:  # Otro worker las creó al mismo tiempo
+        db.rollback()
+
+
+# ==================== LECTURA ====================
+
+def consulta_versiones(*colecciones: str):
+    """SELECT de (nombre, version, modificado) de las colecciones"""
+    return select(VersionColeccion.nombre, VersionColeccion.version, VersionColeccion.modificado).where(
+        VersionColeccion.nombre.in_(colecciones)
+    )
+
+
+def _a_versiones(filas, colecciones) -> Tuple[Version, ...]:
+    leidas = {
+        nombre: Version(version, datetime.fromtimestamp(modificado, timezone.utc) if modificado else None)
+        for nombre, version, modificado in filas
+    }
+    return tuple(leidas.get(nombre, SIN_ESCRITURAS) for nombre in colecciones)
+
+
+def leer_versiones(db: Session, *colecciones: str) -> Tuple[Version, ...]:
+    """Versiones vigentes, en el orden pedido (Version(0, None) si nunca se escribió)"""
+    return _a_versiones(db.execute(consulta_versiones(*colecciones)), colecciones)
+
+
+async def leer_versiones_async(db: AsyncSession, *colecciones: str) -> Tuple[Version, ...]:
+    return _a_versiones(await db.execute(consulta_versiones(*colecciones)), colecciones)
+
+
+def leer_version(db: Session, coleccion: str) -> Version:
+    return leer_versiones(db, coleccion)[0]